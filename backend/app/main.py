@@ -30,6 +30,17 @@ from .utils.file_handler import FileHandler
 from .utils.trace_handler import TraceHandler
 from .utils.logger import setup_logger
 from .middleware.logging_middleware import LoggingMiddleware
+from .services.llm_cache import get_response_cache
+from .services.rate_limiter import get_rate_limiter
+from .services.hedging import get_request_hedger
+from .services.model_health import get_model_health
+from .services.extraction_cascade import get_cascade_stats
+from .services.json_repair import get_json_repair_stats
+from .services.provider_router import get_provider_router
+from .services.http_clients import close_http_clients, http_client_stats
+from .services.llm_accounting import llm_stage, process_usage_summary, start_job_accounting
+from .services.job_budget import current_budget, start_job_budget, JOB_DEADLINE_SECONDS
+from .services.stream_rule_parser import dedupe_rules
 from .models.analysis_models import AnalysisMethod, LLMProvider
 
 # Set up logging
@@ -259,6 +270,11 @@ async def startup_background_tasks():
                 # Cleanup old jobs (already has 24-hour retention, but can be adjusted)
                 cleanup_old_jobs()
                 
+                # Purge expired LLM cache entries (retention set by LLM_CACHE_TTL_SECONDS)
+                removed = await asyncio.to_thread(get_response_cache().purge_expired)
+                if removed:
+                    logger.debug(f"Purged {removed} expired LLM cache entries")
+                
                 # Cleanup old markdown files (older than 1 hour)
                 try:
                     markdown_dir = get_file_handler().markdown_dir
@@ -359,6 +375,11 @@ async def startup_background_tasks():
     # Return immediately - don't await anything
     return
 
+@app.on_event("shutdown")
+async def shutdown_http_clients():
+    """Close the shared pooled HTTP clients used for LLM and embedding calls"""
+    await close_http_clients()
+
 # WebSocket connection manager
 class ConnectionManager:
     def __init__(self):
@@ -437,9 +458,25 @@ async def get_available_models():
     return {
         "ollama_models": svc.get_ollama_models(),
         "openai_models": svc.get_openai_models(),
+        "stub_models": svc.providers["stub"].get_available_models(),
         "default_model": "gpt-5.2"
     }
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """Runtime metrics for the LLM pipeline"""
+    return {
+        "llm_cache": await asyncio.to_thread(get_response_cache().stats),
+        "rate_limiter": get_rate_limiter().stats(),
+        "hedging": get_request_hedger().stats(),
+        "model_health": get_model_health().stats(),
+        "extraction_cascade": get_cascade_stats().summary(),
+        "json_repair": get_json_repair_stats().summary(),
+        "provider_router": get_provider_router().stats(),
+        "http": http_client_stats(),
+        "llm_usage": process_usage_summary()
+    }
+
 @app.post("/api/upload")
 async def upload_file(file: UploadFile = File(...)):
     """Upload and validate PDF file"""
@@ -519,8 +556,10 @@ async def analyze_document(request: AnalysisRequest, enable_tracing: bool = True
 
 async def run_analysis(job_id: str, request: AnalysisRequest, trace_id: str = None):
     """Run analysis in background with progress updates"""
-    # Maximum time for entire analysis (15 minutes)
-    MAX_ANALYSIS_TIME = 900.0
+    # Maximum time for entire analysis (JOB_DEADLINE_SECONDS, 15 minutes by default).
+    # Every stage sees the time left in the job budget and degrades before this hard stop.
+    MAX_ANALYSIS_TIME = JOB_DEADLINE_SECONDS
+    start_job_budget(job_id, MAX_ANALYSIS_TIME)
     
     try:
         # Wrap entire analysis in timeout to prevent hanging
@@ -556,6 +595,9 @@ async def _run_analysis_internal(job_id: str, request: AnalysisRequest, trace_id
             if job_id not in jobs:
                 logger.warning(f"Job {job_id} not found in jobs dictionary")
                 return
+
+            # Collect tokens, cost and latency of every LLM/embedding call made for this job
+            usage = start_job_accounting(job_id)
                 
             # Update status
             jobs[job_id].status = "processing"
@@ -587,7 +629,9 @@ async def _run_analysis_internal(job_id: str, request: AnalysisRequest, trace_id
                 await get_trace_handler().save_meta(trace_id, meta_data)
                 
                 # Extract text with tracing (returns paths, not large strings)
-                extraction_result = await get_file_handler().extract_pdf_text_with_tracing(request.file_path, trace_id)
+                # RAG indexing runs here, so its embedding calls are attributed to "indexing"
+                with llm_stage("indexing"):
+                    extraction_result = await get_file_handler().extract_pdf_text_with_tracing(request.file_path, trace_id)
                 clean_text_path = extraction_result["clean_text_path"]
                 chunks_path = extraction_result["chunks_path"]
                 is_image_only = extraction_result.get("is_image_only", False)
@@ -700,13 +744,24 @@ async def _run_analysis_internal(job_id: str, request: AnalysisRequest, trace_id
                     logger.info("📄 Loading text via extract_pdf_text (non-traced)")
                     text_for_analysis = await get_file_handler().extract_pdf_text(request.file_path)
                 
+                # Push rules to the websocket as soon as they are streamed from the LLM
+                # (once per rule - retries and re-routed calls stream the same rules again)
+                async def send_partial_rule(rule_type: str, rule: dict):
+                    await manager.send_message(job_id, {
+                        "job_id": job_id,
+                        "type": "partial_rule",
+                        "rule_type": rule_type,
+                        "rule": rule
+                    })
+
                 result = await svc.analyze_document(
                 text=text_for_analysis,
                 analysis_method=request.analysis_method,
                 llm_provider=request.llm_provider,
                 model=request.model,
                 fund_id=request.fund_id,
-                trace_id=trace_id
+                trace_id=trace_id,
+                on_rule=dedupe_rules(send_partial_rule)
             )
             
             # FREE MEMORY: Clear text from memory immediately after analysis (if it was loaded)
@@ -714,6 +769,21 @@ async def _run_analysis_internal(job_id: str, request: AnalysisRequest, trace_id
                 del text_for_analysis
                 import gc
                 gc.collect()  # Force garbage collection to free memory immediately
+
+            # Attach LLM usage totals (per stage / per model) to the result and trace metadata
+            usage_summary = usage.summary()
+            result["llm_usage"] = usage_summary
+            budget = current_budget()
+            if budget is not None:
+                result["job_budget"] = budget.summary()
+            totals = usage_summary["total"]
+            logger.info(
+                f"LLM usage [{job_id}]: {totals['calls']} calls, {totals['cache_hits']} cache hits, "
+                f"{totals['total_tokens']} tokens, ~${totals['cost_usd']:.4f}, {totals['latency_seconds']:.1f}s in calls"
+            )
+            if trace_id:
+                meta_data["llm_usage"] = usage_summary
+                await get_trace_handler().save_meta(trace_id, meta_data)
             
             jobs[job_id].progress = 90
             jobs[job_id].message = "Analysis complete, finalizing results"
@@ -12,6 +12,7 @@ class LLMProvider(str, Enum):
     OPENAI = "openai"
     OLLAMA = "ollama"
     CLAUDE = "claude"
+    STUB = "stub"  # offline stub for load/latency testing (no tokens spent)
 
 class AnalysisRequest(BaseModel):
     """Request model for document analysis"""
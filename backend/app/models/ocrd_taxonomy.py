@@ -0,0 +1,213 @@
+"""
+OCRD Taxonomy
+The OCRD instrument taxonomy (sections and their instrument keys) in one immutable
+place, plus the compact row that holds the verdict for one instrument.
+
+Section and key names are interned and every (section, key) pair has a fixed index
+position, so the analysis code, the Excel LLM search and the match confidence all
+share one definition instead of their own dict literals.
+
+Rows are OcrdRow objects (__slots__, no per-row dicts) while a job is analysed. They
+support the dict access the analysis code uses (row["allowed"], row.get("evidence"),
+row.update({...})) and ocrd_sections_json() turns them back into the JSON shape the
+API returns:
+    {"allowed": ..., "confidence": ..., "note": "...", "evidence": {"page": ..., "text": "..."}}
+"""
+import sys
+from collections.abc import MutableMapping
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, Mapping, Optional, Tuple
+
+SPECIAL_OTHER_RESTRICTIONS = "special_other_restrictions"
+
+# Sections and their instrument keys, in output order
+# Note: future, option, and warrant are top-level sections (no parent "derivatives" category)
+_SCHEMA = (
+    ("bond", ("covered_bond", "asset_backed_security", "mortgage_bond", "pfandbrief", "public_mortgage_bond",
+              "convertible_bond_regular", "convertible_bond_coco", "reverse_convertible", "credit_linked_note",
+              "commercial_paper", "genussscheine_bondlike", "inflation_linked", "participation_paper",
+              "plain_vanilla_bond", "promissory_note", "warrant_linked_bond")),
+    ("certificate", ("bond_certificate", "commodity_certificate", "currency_certificate", "fund_certificate",
+                     "index_certificate", "stock_certificate")),
+    ("stock", ("common_stock", "depositary_receipt", "genussschein_stocklike", "partizipationsschein",
+               "preferred_stock", "reit", "right")),
+    ("fund", ("alternative_investment_fund", "commodity_fund", "equity_fund", "fixed_income_fund",
+              "mixed_allocation_fund", "moneymarket_fund", "private_equity_fund", "real_estate_fund", "speciality_fund")),
+    ("deposit", ("call_money", "cash", "time_deposit")),
+    ("future", ("bond_future", "commodity_future", "currency_future", "fund_future", "index_future", "single_stock_future")),
+    ("option", ("bond_future_option", "commodity_future_option", "commodity_option", "currency_future_option",
+                "currency_option", "fund_future_option", "fund_option", "index_future_option", "index_option", "stock_option")),
+    ("warrant", ("commodity_warrant", "currency_warrant", "fund_warrant", "index_warrant", "stock_warrant")),
+    ("commodity", ("precious_metal",)),
+    ("forex", ("forex_outright", "forex_spot")),
+    ("swap", ("credit_default_swap", "interest_swap", "total_return_swap")),
+    ("loan", ()),
+    ("private_equity", ()),
+    ("real_estate", ()),
+    ("rights", ("subscription_rights",)),
+)
+
+# Section → instrument keys
+OCRD_SCHEMA: Mapping[str, Tuple[str, ...]] = MappingProxyType({
+    sys.intern(section): tuple(sys.intern(key) for key in keys) for section, keys in _SCHEMA
+})
+OCRD_SECTIONS: Tuple[str, ...] = tuple(OCRD_SCHEMA)
+
+# OCRD ids ("bond.covered_bond", or the section name for a section without keys)
+# and the index position of every (section, key) pair - (section, None) for those
+_PAIRS = tuple(
+    pair for section, keys in OCRD_SCHEMA.items()
+    for pair in ([(section, key) for key in keys] if keys else [(section, None)])
+)
+OCRD_IDS: Tuple[str, ...] = tuple(sys.intern(f"{section}.{key}" if key else section) for section, key in _PAIRS)
+OCRD_INDEX: Mapping[Tuple[str, Optional[str]], int] = MappingProxyType({pair: position for position, pair in enumerate(_PAIRS)})
+# Instrument OCRD ids (sections without keys have no instrument row)
+OCRD_INSTRUMENT_IDS: Tuple[str, ...] = tuple(ocrd_id for ocrd_id, (_, key) in zip(OCRD_IDS, _PAIRS) if key)
+
+# Asset Tree type2 (and type3 parts) from the Excel mapping → OCRD key
+# This mapping is generated from Investment_Mapping.xlsx
+TYPE2_TO_KEY: Mapping[str, str] = MappingProxyType({
+    # Bonds
+    "plain vanilla bond": "plain_vanilla_bond",
+    "covered bond": "covered_bond",
+    "asset backed security": "asset_backed_security",
+    "mortgage bond": "mortgage_bond",
+    "pfandbrief": "pfandbrief",
+    "public mortgage bond": "public_mortgage_bond",
+    "convertible bond": "convertible_bond_regular",
+    "commercial paper": "commercial_paper",
+    "inflation linked": "inflation_linked",
+    "promissory note": "promissory_note",
+    "credit linked note": "credit_linked_note",
+    "warrant linked bond": "warrant_linked_bond",
+    "participation paper": "participation_paper",
+    "reverse convertible": "reverse_convertible",
+    # Stocks
+    "common stock": "common_stock",
+    "preferred stock": "preferred_stock",
+    "depositary receipt": "depositary_receipt",
+    "right": "right",
+    "partizipationsschein": "partizipationsschein",
+    "reit": "reit",
+    # Funds
+    "equity fund": "equity_fund",
+    "fixed income fund": "fixed_income_fund",
+    "moneymarket fund": "moneymarket_fund",
+    "real estate fund": "real_estate_fund",
+    "real estate": "real_estate_fund",
+    "alternative investment fund": "alternative_investment_fund",
+    "private equity fund": "private_equity_fund",
+    # Deposits
+    "cash": "cash",
+    "call money": "call_money",
+    "time deposit": "time_deposit",
+    # Futures
+    "bond future": "bond_future",
+    "index future": "index_future",
+    "currency future": "currency_future",
+    "equity future": "single_stock_future",
+    "equity futures": "single_stock_future",
+    "single stock future": "single_stock_future",
+    "equity index future": "index_future",
+    "equity index futures": "index_future",
+    "aktienfutures": "single_stock_future",
+    "aktienindexfutures": "index_future",
+    # Options
+    "currency option": "currency_option",
+    "index option": "index_option",
+    "stock option": "stock_option",
+    "equity option": "stock_option",
+    "equity options": "stock_option",
+    "equity index option": "index_option",
+    "equity index options": "index_option",
+    "aktienoptionen": "stock_option",
+    "aktienindexoptionen": "index_option",
+    # Forex
+    "forex outright": "forex_outright",
+    # Commodities
+    "precious metal": "precious_metal",
+})
+
+
+class OcrdRow(MutableMapping):
+    """Verdict for one OCRD instrument (allowed / confidence / note / evidence page and text)"""
+
+    __slots__ = ("allowed", "confidence", "note", "page", "text")
+
+    FIELDS = ("allowed", "confidence", "note", "evidence")
+
+    def __init__(self, allowed: Optional[bool] = None, confidence: Optional[float] = None, note: str = "",
+                 page: Optional[int] = None, text: str = ""):
+        self.allowed = allowed
+        self.confidence = confidence
+        self.note = note
+        self.page = page
+        self.text = text
+
+    def __getitem__(self, name: str) -> Any:
+        if name == "evidence":
+            return {"page": self.page, "text": self.text}
+        if name in ("allowed", "confidence", "note"):
+            return getattr(self, name)
+        raise KeyError(name)
+
+    def __setitem__(self, name: str, value: Any) -> None:
+        if name == "evidence":
+            self.page = value.get("page")
+            self.text = value.get("text", "")
+        elif name in ("allowed", "confidence", "note"):
+            setattr(self, name, value)
+        else:
+            raise KeyError(f"OCRD rows have no field {name!r}")
+
+    def __delitem__(self, name: str) -> None:
+        raise TypeError("OCRD row fields cannot be deleted")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.FIELDS)
+
+    def __len__(self) -> int:
+        return len(self.FIELDS)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.FIELDS
+
+    def __repr__(self) -> str:
+        return f"OcrdRow({self.to_dict()!r})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "allowed": self.allowed,
+            "confidence": self.confidence,
+            "note": self.note,
+            "evidence": {"page": self.page, "text": self.text}
+        }
+
+
+def parse_ocrd_id(value: str) -> Optional[Tuple[str, str]]:
+    """(section, key) of an instrument OCRD id such as "bond.covered_bond", None for anything else"""
+    section, _, key = value.strip().lower().partition(".")
+    return (section, key) if key and (section, key) in OCRD_INDEX else None
+
+
+def empty_ocrd_sections() -> Dict[str, Dict[str, Any]]:
+    """
+    Sections with an undetermined row per instrument and an empty special_other_restrictions list.
+
+    allowed=None means not yet determined (will be set by rules), or manual approval
+    required when a mapping is ambiguous; True / False mean explicitly allowed / prohibited.
+    """
+    sections = {}
+    for section, keys in OCRD_SCHEMA.items():
+        rows: Dict[str, Any] = {key: OcrdRow() for key in keys}
+        rows[SPECIAL_OTHER_RESTRICTIONS] = []
+        sections[section] = rows
+    return sections
+
+
+def ocrd_sections_json(sections: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Sections in the JSON shape returned by the API (rows as plain dicts)"""
+    return {
+        section: {key: value.to_dict() if isinstance(value, OcrdRow) else value for key, value in rows.items()}
+        for section, rows in sections.items()
+    }
@@ -2,22 +2,87 @@ import os
 import re
 import time
 import uuid
+import random
 import asyncio
-from typing import Dict, Any, Optional, Tuple, List
+from collections.abc import Mapping
+from typing import Dict, Any, Optional, Tuple, List, Callable, Awaitable
 from datetime import datetime
-from .llm_service import LLMService
+from .llm_service import LLMService, EXTRACTION_PREFIX
 from .rag_retrieve import retrieve_rules
 from .rag_index import build_chunks
-from .excel_mapping_service import ExcelMappingService
+from .excel_mapping_service import ExcelMappingService, EXCEL_BATCH_PROMPT_VERSION
 from .conservative_classifier import build_items_hits, decide
+from .stream_rule_parser import RuleListener
+from .section_prescreen import prescreen_sections, term_pattern_for, SECTION_PRESCREEN_ENABLED
+from .section_planner import plan_sections, estimate_tokens, SECTION_PLANNER_ENABLED
+from .extraction_cascade import CascadeStats, ExtractFn, cascade_applies, extract_with_cascade, EXTRACTION_CASCADE_CHEAP_MODEL
+from .llm_accounting import llm_stage
+from .compact_output import InstrumentCatalog
+from .decomposed_extraction import extract_decomposed, is_decomposed_mode
+from .provider_router import router_applies
+from .job_budget import current_budget, mark_stage_cut, stage_allowed, stage_timeout, JOB_EXCEL_SEARCH_SHARE, JOB_MIN_EXCEL_SEARCH_SECONDS, JOB_MIN_FALLBACK_SECONDS
+from .json_repair import parse_extraction_json, parse_json_lenient
+from .scoped_fallback import fallback_candidates, looks_non_german, FALLBACK_SPECULATIVE_ENABLED, FALLBACK_TIMEOUT
+from .instrument_resolver import direct_ocrd_key, match_section_key, normalize_instrument_name, resolve_section
 from ..models.analysis_models import AnalysisResult, AnalysisMethod, LLMProvider, AnalysisRequest
 from ..models.llm_response_models import LLMResponse
+from ..models.ocrd_taxonomy import TYPE2_TO_KEY, empty_ocrd_sections, ocrd_sections_json, parse_ocrd_id
 from ..utils.trace_handler import TraceHandler
 from ..utils.file_handler import FileHandler
 from ..utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# Section-based extraction tuning (documents > 50k chars)
+# SECTION_CONCURRENCY: max sections sent to the LLM at the same time
+# SECTION_TIMEOUT: seconds allowed per section attempt
+# SECTION_MAX_RETRIES: extra attempts for a section after a timeout or error
+SECTION_CONCURRENCY = int(os.getenv("SECTION_CONCURRENCY", "4"))
+SECTION_TIMEOUT = float(os.getenv("SECTION_TIMEOUT", "120"))
+SECTION_MAX_RETRIES = int(os.getenv("SECTION_MAX_RETRIES", "1"))
+
+# Providers whose extraction calls LLMService makes itself (cache, compact output, rate limiter);
+# other providers are called through their provider instance
+LLM_SERVICE_PROVIDERS = ("openai", "stub")
+
+# Section header lines for _split_document_into_sections, as one alternation matched
+# per line with re.MULTILINE. [^\S\n] is \s without the newline, so a match never
+# runs into the next line (the headers used to be tested line by line).
+SECTION_HEADER_PATTERN = re.compile(
+    r'^[^\S\n]*(?:'
+    # German section headers (case-insensitive)
+    r'(?i:Zulässige[^\S\n]+Anlagen?|Zulässige[^\S\n]+Anlageinstrumente?'
+    r'|Unzulässige[^\S\n]+Anlagen?|Unzulässige[^\S\n]+Anlageinstrumente?'
+    r'|Erlaubte[^\S\n]+Anlagen?|Erlaubte[^\S\n]+Instrumente?'
+    r'|Verbotene[^\S\n]+Anlagen?|Verbotene[^\S\n]+Instrumente?'
+    r'|Zugelassene[^\S\n]+Anlagen?|Zugelassene[^\S\n]+Instrumente?)'
+    r'|\d+[\.\)][^\S\n]+[A-ZÄÖÜ][^\n]{5,100}'  # Numbered sections: "1. Section Title"
+    r'|[A-ZÄÖÜ](?:[A-ZÄÖÜ]|[^\S\n]){5,50}:?[^\S\n]*$'  # All caps headers
+    r'|[A-ZÄÖÜ][^\n]{5,100}[^\S\n]*$'  # Title case headers on their own line
+    r')',
+    re.MULTILINE
+)
+
+# Minimum distance (chars) between two section boundaries
+SECTION_MIN_DISTANCE = 1000
+
+
+def find_section_boundaries(text: str, min_distance: int = SECTION_MIN_DISTANCE) -> List[int]:
+    """
+    Character offsets where sections start, plus 0 and len(text).
+
+    A header boundary sits on the newline before the header line and is kept only if
+    it is more than min_distance chars past the previous one. One pass over the text.
+    """
+    boundaries = [0]
+    for match in SECTION_HEADER_PATTERN.finditer(text):
+        char_pos = max(0, match.start() - 1)
+        if char_pos > boundaries[-1] + min_distance:
+            boundaries.append(char_pos)
+    boundaries.append(len(text))
+    return boundaries
+
+
 def get_enum_value(value):
     """Safely get enum value, handling both enum objects and strings"""
     if hasattr(value, 'value'):
@@ -43,6 +108,10 @@ class AnalysisService:
         except Exception as e:
             logger.warning(f"Failed to initialize ExcelMappingService: {e}")
             self.excel_mapping = None
+
+        # Catalog ids for compact extraction output (EXTRACTION_OUTPUT_MODE=compact)
+        if self.llm_service and self.excel_mapping:
+            self.llm_service.instrument_catalog = InstrumentCatalog.from_entries(self.excel_mapping.get_all_entries())
     
     async def analyze_document(
         self, 
@@ -51,9 +120,13 @@ class AnalysisService:
         llm_provider: LLMProvider,
         model: str,
         fund_id: str,
-        trace_id: Optional[str] = None
+        trace_id: Optional[str] = None,
+        on_rule: Optional[RuleListener] = None
     ) -> Dict[str, Any]:
-        """Main analysis method that coordinates different analysis approaches"""
+        """
+        Main analysis method that coordinates different analysis approaches.
+        on_rule(rule_type, rule) receives extracted rules while the LLM response is still streaming.
+        """
         
         # Early validation: Check if LLM service is available
         if not self.llm_service:
@@ -74,62 +147,28 @@ class AnalysisService:
         data = self._create_empty_ocrd_json(fund_id)
         
         # NEW: Apply conservative, evidence-based classification
-        if self.excel_mapping:
-            logger.info("🔍 Step 1: Applying conservative, evidence-based classification...")
-            try:
-                # Get term_map from Excel mapping
-                term_map = self.excel_mapping.get_term_map()
-                
-                if term_map:
-                    # Build items_hits by scanning text sentence-by-sentence
-                    items_hits = build_items_hits(text, term_map)
-                    
-                    logger.info(f"   📊 Found {sum(len(hits) for hits in items_hits.values())} total evidence hits across {len(items_hits)} terms")
-                    
-                    # Apply conservative classification
-                    decisions, evidence = decide(items_hits, term_map)
-                    
-                    # Update Excel mapping entries with conservative decisions
-                    for term, status in decisions.items():
-                        # Map status to allowed boolean
-                        if status == "Allowed":
-                            allowed = True
-                        elif status == "Prohibited":
-                            allowed = False
-                        else:  # Conditional or Review
-                            allowed = None  # Mark for manual review
-                        
-                        # Update Excel entry
-                        evid_text = evidence.get(term, "")[:300]  # Limit evidence to 300 chars
-                        self.excel_mapping.update_entry_by_instrument(term, allowed, evid_text)
-                    
-                    allowed_count = sum(1 for s in decisions.values() if s == "Allowed")
-                    prohibited_count = sum(1 for s in decisions.values() if s == "Prohibited")
-                    conditional_count = sum(1 for s in decisions.values() if s == "Conditional")
-                    review_count = sum(1 for s in decisions.values() if s == "Review")
-                    
-                    logger.info(f"✅ Conservative classification complete: {allowed_count} Allowed, {prohibited_count} Prohibited, {conditional_count} Conditional, {review_count} Review")
-                else:
-                    logger.warning("⚠️ No term_map available - skipping conservative classification")
-            except Exception as e:
-                logger.error(f"Error in conservative classification: {e}", exc_info=True)
-                # Continue with LLM analysis even if conservative classification fails
+        self._apply_conservative_classification(text)
         
         # NEW: Search document text for ALL Excel entries (Column A) and use LLM to determine allowed/prohibited
         # Add timeout to prevent hanging on large Excel files
-        if self.excel_mapping and self.llm_service:
+        # Optional stage: skipped when the job budget would not leave enough time for the main pass
+        if self.excel_mapping and self.llm_service and not stage_allowed("excel_search", JOB_MIN_EXCEL_SEARCH_SECONDS):
+            logger.warning("Skipping Excel mapping LLM search: job budget reserved for the main analysis")
+        elif self.excel_mapping and self.llm_service:
             logger.info("Step 2: Searching document for Excel entries using LLM analysis...")
             try:
-                # Limit Excel search time to prevent crashes (5 minutes max)
-                search_stats = await asyncio.wait_for(
-                    self.excel_mapping.search_document_with_llm(
-                        text, 
-                        self.llm_service, 
-                        get_enum_value(llm_provider), 
-                        model
-                    ),
-                    timeout=300.0  # 5 minutes max
-                )
+                # Limit Excel search time to prevent crashes (5 minutes max, at most its share of the job budget)
+                with llm_stage("excel_search"):
+                    search_stats = await asyncio.wait_for(
+                        self.excel_mapping.search_document_with_llm(
+                            text, 
+                            self.llm_service, 
+                            get_enum_value(llm_provider), 
+                            model,
+                            doc_id=trace_id
+                        ),
+                        timeout=stage_timeout("excel_search", 300.0, JOB_EXCEL_SEARCH_SHARE)
+                    )
                 logger.info(f"LLM search complete: {search_stats['matches_found']} Excel entries found, {search_stats['allowed_found']} allowed, {search_stats['prohibited_found']} prohibited")
             except asyncio.TimeoutError:
                 logger.warning("Excel mapping LLM search timed out - continuing with main analysis")
@@ -140,14 +179,32 @@ class AnalysisService:
         
         # ONLY USE LLM ANALYSIS - No keyword analysis or fallback
         # All analysis methods use LLM only
-        if trace_id:
-            result, raw_analysis = await self._analyze_with_llm_traced(data, text, llm_provider, model, trace_id)
-        else:
-            result, raw_analysis = await self._analyze_with_llm(data, text, llm_provider, model, trace_id)
+        with llm_stage("extraction"):
+            if trace_id:
+                result, raw_analysis = await self._analyze_with_llm_traced(data, text, llm_provider, model, trace_id, on_rule=on_rule)
+            else:
+                result, raw_analysis = await self._analyze_with_llm(data, text, llm_provider, model, trace_id, on_rule=on_rule)
         analysis_method_used = f"llm_{get_enum_value(llm_provider)}"
         
+        budget = current_budget()
+        budget_note = budget.note() if budget else None
+        if budget_note:
+            result.setdefault("notes", []).append(budget_note)
+
         processing_time = time.time() - start_time
-        
+        return self._analysis_response(fund_id, analysis_method_used, get_enum_value(llm_provider), model, result, raw_analysis, processing_time)
+
+    def _analysis_response(
+        self,
+        fund_id: str,
+        analysis_method: str,
+        llm_provider: str,
+        model: str,
+        result: Dict[str, Any],
+        raw_analysis: Dict[str, Any],
+        processing_time: float
+    ) -> Dict[str, Any]:
+        """Analysis result returned to the client (metrics + confidence score over the OCRD sections)"""
         # Calculate metrics
         total_instruments, allowed_instruments, evidence_coverage = self._calculate_metrics(result)
         
@@ -161,19 +218,136 @@ class AnalysisService:
         
         return {
             "fund_id": fund_id,
-            "analysis_method": analysis_method_used,
-            "llm_provider": get_enum_value(llm_provider),
+            "analysis_method": analysis_method,
+            "llm_provider": llm_provider,
             "model": model,
             "total_instruments": total_instruments,
             "allowed_instruments": allowed_instruments,
             "evidence_coverage": evidence_coverage,
             "confidence_score": confidence_score,
-            "sections": result["sections"],
+            "sections": ocrd_sections_json(result["sections"]),
             "notes": result.get("notes", []),  # Include debug notes in response
             "processing_time": round(processing_time, 2),
             "created_at": datetime.now().isoformat()
         }
     
+    def _apply_conservative_classification(self, text: str) -> None:
+        """Step 1: conservative, evidence-based classification of the Excel entries (no LLM)"""
+        if self.excel_mapping:
+            logger.info("🔍 Step 1: Applying conservative, evidence-based classification...")
+            try:
+                # Get term_map from Excel mapping
+                term_map = self.excel_mapping.get_term_map()
+                
+                if term_map:
+                    # Build items_hits by scanning text sentence-by-sentence
+                    items_hits = build_items_hits(text, term_map)
+                    
+                    logger.info(f"   📊 Found {sum(len(hits) for hits in items_hits.values())} total evidence hits across {len(items_hits)} terms")
+                    
+                    # Apply conservative classification
+                    decisions, evidence = decide(items_hits, term_map)
+                    
+                    # Update Excel mapping entries with conservative decisions
+                    for term, status in decisions.items():
+                        # Map status to allowed boolean
+                        if status == "Allowed":
+                            allowed = True
+                        elif status == "Prohibited":
+                            allowed = False
+                        else:  # Conditional or Review
+                            allowed = None  # Mark for manual review
+                        
+                        # Update Excel entry
+                        evid_text = evidence.get(term, "")[:300]  # Limit evidence to 300 chars
+                        self.excel_mapping.update_entry_by_instrument(term, allowed, evid_text)
+                    
+                    allowed_count = sum(1 for s in decisions.values() if s == "Allowed")
+                    prohibited_count = sum(1 for s in decisions.values() if s == "Prohibited")
+                    conditional_count = sum(1 for s in decisions.values() if s == "Conditional")
+                    review_count = sum(1 for s in decisions.values() if s == "Review")
+                    
+                    logger.info(f"✅ Conservative classification complete: {allowed_count} Allowed, {prohibited_count} Prohibited, {conditional_count} Conditional, {review_count} Review")
+                else:
+                    logger.warning("⚠️ No term_map available - skipping conservative classification")
+            except Exception as e:
+                logger.error(f"Error in conservative classification: {e}", exc_info=True)
+                # Continue with LLM analysis even if conservative classification fails
+
+    def batch_requests(self, text: str, llm_provider: str, model: str) -> List[Tuple[str, Dict, str]]:
+        """
+        (key, api_params, prompt_version) of the LLM calls analyze_document makes for text,
+        for the offline batch mode (see batch_analysis): one extraction request per unit of
+        the primary pass and one Excel search request per (instrument group, chunk).
+        """
+        requests = []
+        units, _ = self._extraction_units(text, model)
+        for idx, unit in enumerate(units):
+            api_params, prompt_version = self.llm_service.extraction_request(unit["text"], llm_provider, unit.get("model", model))
+            requests.append((f"x{idx}", api_params, prompt_version))
+        if self.excel_mapping:
+            groups, chunks = self.excel_mapping.batch_search_plan(text)
+            for group_idx, group in enumerate(groups):
+                for chunk_idx, chunk in enumerate(chunks):
+                    prompt = self.excel_mapping.build_batch_prompt(chunk, group)
+                    api_params, prompt_version = self.llm_service.text_request(prompt, EXCEL_BATCH_PROMPT_VERSION, llm_provider)
+                    requests.append((f"e{group_idx}.{chunk_idx}", api_params, prompt_version))
+        return requests
+
+    def analyze_batch_responses(
+        self,
+        fund_id: str,
+        text: str,
+        llm_provider: str,
+        model: str,
+        responses: Dict[str, Optional[str]],
+        processing_time: float = 0.0
+    ) -> Dict[str, Any]:
+        """
+        Analysis result from the raw responses to batch_requests (by key, None = the request
+        failed): Excel verdicts are applied after the conservative classification, section
+        results are merged with _merge_section_results and converted with
+        _convert_llm_response_to_ocrd_format, like analyze_document.
+        """
+        self._apply_conservative_classification(text)
+        failed = [key for key, raw in responses.items() if raw is None]
+
+        if self.excel_mapping:
+            groups, chunks = self.excel_mapping.batch_search_plan(text)
+            verdicts: Dict[Tuple[int, int], Optional[Dict[str, Dict]]] = {}
+            for group_idx in range(len(groups)):
+                for chunk_idx in range(len(chunks)):
+                    key = f"e{group_idx}.{chunk_idx}"
+                    try:
+                        response, _ = parse_json_lenient(responses.get(key) or "", f"batch {key}")
+                        verdicts[(group_idx, chunk_idx)] = self.excel_mapping.batch_verdicts(response) if isinstance(response, dict) else None
+                    except ValueError:
+                        verdicts[(group_idx, chunk_idx)] = None
+            search_stats = self.excel_mapping.apply_batch_verdicts(groups, len(chunks), verdicts)
+            logger.info(f"Batch Excel search: {search_stats['matches_found']} Excel entries found, {search_stats['allowed_found']} allowed, {search_stats['prohibited_found']} prohibited")
+
+        units, prescreen_audit = self._extraction_units(text, model)
+        section_results = []
+        for idx in range(len(units)):
+            raw = responses.get(f"x{idx}")
+            if raw is None:
+                continue
+            try:
+                section_results.append(parse_extraction_json(raw, f"batch section {idx + 1}"))
+            except ValueError:
+                failed.append(f"x{idx}")
+        analysis = self._merge_section_results(section_results)
+
+        data = self._convert_llm_response_to_ocrd_format(analysis, full_text=text)
+        data["fund_id"] = fund_id
+        notes = data.setdefault("notes", [])
+        prescreen_note = self._prescreen_note(prescreen_audit)
+        if prescreen_note:
+            notes.append(prescreen_note)
+        if failed:
+            notes.append(f"Batch mode: {len(failed)} of {len(responses)} requests failed or returned invalid JSON ({', '.join(sorted(failed)[:10])})")
+        return self._analysis_response(fund_id, "llm_batch", llm_provider, model, data, analysis, processing_time)
+
     def map_rows_to_excel(self, rows: List[Dict], fund_id: str) -> Dict[str, Any]:
         """
         Map vision-extracted rows to Excel instruments using fuzzy matching.
@@ -336,14 +510,15 @@ class AnalysisService:
         # Use vision-based LLM analysis
         logger.info(f"🔍 Starting vision-based LLM analysis with {get_enum_value(llm_provider)}/{model}")
         
-        if trace_id:
-            analysis = await self.llm_service.analyze_document_vision(
-                pdf_path, get_enum_value(llm_provider), model, trace_id
-            )
-        else:
-            analysis = await self.llm_service.analyze_document_vision(
-                pdf_path, get_enum_value(llm_provider), model, None
-            )
+        with llm_stage("vision"):
+            if trace_id:
+                analysis = await self.llm_service.analyze_document_vision(
+                    pdf_path, get_enum_value(llm_provider), model, trace_id
+                )
+            else:
+                analysis = await self.llm_service.analyze_document_vision(
+                    pdf_path, get_enum_value(llm_provider), model, None
+                )
         
         # Log what LLM returned
         if isinstance(analysis, dict):
@@ -413,7 +588,7 @@ class AnalysisService:
             "allowed_instruments": allowed_instruments,
             "evidence_coverage": evidence_coverage,
             "confidence_score": confidence_score,
-            "sections": data["sections"],
+            "sections": ocrd_sections_json(data["sections"]),
             "notes": data.get("notes", []),
             "processing_time": round(processing_time, 2),
             "created_at": datetime.now().isoformat()
@@ -471,8 +646,8 @@ class AnalysisService:
                 f.write(combined_context)
             # ================================================
 
-            # 6. Send to LLM
-            llm_service = LLMService()
+            # 6. Send to LLM (reuse the service's client instead of building a new one per request)
+            llm_service = self.llm_service or LLMService()
             # RAG system prompt for extraction (simpler version for RAG context)
             rag_system_prompt = f"""
             You are a compliance analyst. Based on the following policy text, extract explicit investment permissions or prohibitions.
@@ -480,7 +655,8 @@ class AnalysisService:
             Context:
             {combined_context}
             """
-            llm_response = await llm_service.analyze_document(rag_system_prompt, get_enum_value(request.llm_provider), request.model, trace_id)
+            with llm_stage("rag"):
+                llm_response = await llm_service.analyze_document(rag_system_prompt, get_enum_value(request.llm_provider), request.model, trace_id)
             trace_handler.log_step("llm_response", {"length": len(str(llm_response))})
 
             # 7. Convert LLM output into structured format
@@ -517,42 +693,7 @@ class AnalysisService:
             List of section dicts with keys: 'section_id', 'title', 'text', 'start_char', 'end_char'
         """
         sections = []
-        
-        # German section headers to look for (case-insensitive)
-        german_section_patterns = [
-            r'(?i)^\s*(Zulässige\s+Anlagen?|Zulässige\s+Anlageinstrumente?)',
-            r'(?i)^\s*(Unzulässige\s+Anlagen?|Unzulässige\s+Anlageinstrumente?)',
-            r'(?i)^\s*(Erlaubte\s+Anlagen?|Erlaubte\s+Instrumente?)',
-            r'(?i)^\s*(Verbotene\s+Anlagen?|Verbotene\s+Instrumente?)',
-            r'(?i)^\s*(Zugelassene\s+Anlagen?|Zugelassene\s+Instrumente?)',
-        ]
-        
-        # Common section header patterns (numbered sections, all caps, etc.)
-        section_header_patterns = [
-            r'^\s*\d+[\.\)]\s+[A-ZÄÖÜ][^\n]{5,100}',  # Numbered sections: "1. Section Title"
-            r'^\s*[A-ZÄÖÜ][A-ZÄÖÜ\s]{5,50}:?\s*$',  # All caps headers
-            r'^\s*[A-ZÄÖÜ][^\n]{5,100}\s*$',  # Title case headers on their own line
-        ]
-        
-        # Combine all patterns
-        all_patterns = german_section_patterns + section_header_patterns
-        
-        # Try to find section boundaries
-        lines = text.split('\n')
-        section_boundaries = [0]  # Start of document
-        
-        for i, line in enumerate(lines):
-            # Check if this line matches any section header pattern
-            for pattern in all_patterns:
-                if re.search(pattern, line):
-                    # Found a section header - mark this position
-                    char_pos = len('\n'.join(lines[:i]))
-                    if char_pos > section_boundaries[-1] + 1000:  # Only add if significant distance
-                        section_boundaries.append(char_pos)
-                    break
-        
-        # Add end of document
-        section_boundaries.append(len(text))
+        section_boundaries = find_section_boundaries(text)
         
         # If we found meaningful sections (more than just start/end), use them
         if len(section_boundaries) > 2:
@@ -564,8 +705,7 @@ class AnalysisService:
                 
                 # Extract section title (first line or nearby)
                 section_text = text[start:end]
-                first_lines = section_text.split('\n')[:3]
-                title = first_lines[0].strip()[:100] if first_lines else f"Section {i+1}"
+                title = section_text.split('\n', 1)[0].strip()[:100]
                 
                 # If section is too large, split it further
                 if len(section_text) > max_section_size:
@@ -633,7 +773,7 @@ class AnalysisService:
             chunk_text = text[start:end]
             
             # Extract a title from first line
-            first_line = chunk_text.split('\n')[0].strip()[:100]
+            first_line = chunk_text.split('\n', 1)[0].strip()[:100]
             title = first_line if first_line else f"Chunk {chunk_id}"
             
             chunks.append({
@@ -649,7 +789,265 @@ class AnalysisService:
             chunk_id += 1
         
         return chunks
-    
+
+    async def _analyze_sections_concurrently(
+        self,
+        sections: List[Dict[str, Any]],
+        analyze_section: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        concurrency: int = SECTION_CONCURRENCY,
+        section_timeout: float = SECTION_TIMEOUT,
+        max_retries: int = SECTION_MAX_RETRIES
+    ) -> List[Dict[str, Any]]:
+        """
+        Run per-section extraction with bounded concurrency.
+
+        At most `concurrency` sections are in flight at once. Each attempt is limited
+        by `section_timeout` and retried up to `max_retries` times with a short backoff.
+        Results are returned in section order (not completion order) so that
+        _merge_section_results resolves duplicates exactly as the sequential loop did.
+
+        Args:
+            sections: Section dicts from _split_document_into_sections
+            analyze_section: Coroutine factory called with a section dict
+            concurrency: Maximum number of concurrent section calls
+            section_timeout: Timeout in seconds per attempt
+            max_retries: Additional attempts after a timeout or error
+
+        Returns:
+            List of analysis dicts, one per section ({} for failed sections)
+        """
+        total = len(sections)
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        logger.info(f"Processing {total} sections with concurrency={max(1, concurrency)}, timeout={section_timeout}s, retries={max_retries}")
+
+        async def run_section(section_idx: int, section: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                for attempt in range(max_retries + 1):
+                    # Packed sections (section_planner) carry a longer per-attempt timeout; the job budget caps it
+                    attempt_timeout = stage_timeout("sections", max(section_timeout, section.get('timeout', 0)))
+                    if attempt_timeout <= 0:
+                        logger.warning(f"⏱️ Section {section_idx + 1} not analyzed - job budget exhausted")
+                        mark_stage_cut("sections")
+                        return {}
+                    logger.info(f"Processing section {section_idx + 1}/{total}: '{section['title'][:50]}' ({len(section['text'])} chars), attempt {attempt + 1}")
+                    try:
+                        section_analysis = await asyncio.wait_for(analyze_section(section), timeout=attempt_timeout)
+                    except asyncio.TimeoutError:
+                        logger.error(f"Section {section_idx + 1} timed out after {attempt_timeout}s (attempt {attempt + 1}/{max_retries + 1})")
+                    except Exception as e:
+                        logger.error(f"Error processing section {section_idx + 1} (attempt {attempt + 1}/{max_retries + 1}): {e}")
+                    else:
+                        if isinstance(section_analysis, dict):
+                            instrument_count = len(section_analysis.get("instrument_rules", []))
+                            logger.info(f"Section {section_idx + 1} found {instrument_count} instrument rules")
+                            return section_analysis
+                        logger.warning(f"Section {section_idx + 1} returned non-dict result")
+                        return {}
+
+                    budget = current_budget()
+                    if budget is not None and budget.exhausted:
+                        mark_stage_cut("sections")
+                        return {}
+                    if attempt < max_retries:
+                        # Exponential backoff with jitter so retries don't fire in lockstep
+                        await asyncio.sleep(min(2 ** attempt, 10) + random.uniform(0, 0.5))
+
+                logger.error(f"Section {section_idx + 1} failed after {max_retries + 1} attempts - skipping")
+                return {}  # Continue with other sections
+
+        return list(await asyncio.gather(*(run_section(idx, section) for idx, section in enumerate(sections))))
+
+    def _prescreen_sections(self, sections: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Drop sections without investment-rule content before the LLM (see section_prescreen).
+        Returns (sections_to_analyze, audit) - audit is None when pre-screening is disabled.
+        """
+        if not SECTION_PRESCREEN_ENABLED:
+            return sections, None
+        return prescreen_sections(sections, self._mapping_term_map().keys())
+
+    def _plan_sections(self, sections: List[Dict[str, Any]], text: str, model: str) -> List[Dict[str, Any]]:
+        """Pack adjacent sections into as few calls as the model's context allows (see section_planner)"""
+        if not SECTION_PLANNER_ENABLED:
+            return sections
+        prompt_tokens = estimate_tokens(EXTRACTION_PREFIX.system + EXTRACTION_PREFIX.instructions)
+        return plan_sections(sections, text, model, prompt_tokens)
+
+    def _extraction_units(self, text: str, model: str) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Units of the primary extraction pass, as chosen by _analyze_with_llm: the whole
+        document, or the pre-screened and planned sections of a large document.
+        Returns (units, prescreen_audit).
+        """
+        document = [{"section_id": 1, "title": "document", "text": text}]
+        if len(text) <= 50000:
+            return document, None
+        sections = self._split_document_into_sections(text, overlap=0 if SECTION_PLANNER_ENABLED else 2000)
+        if len(sections) == 1:
+            return document, None
+        sections, prescreen_audit = self._prescreen_sections(sections)
+        return self._plan_sections(sections, text, model), prescreen_audit
+
+    def _mapping_term_map(self) -> Dict[str, Dict]:
+        """Excel mapping term map ({} if the mapping is unavailable)"""
+        if not self.excel_mapping:
+            return {}
+        try:
+            return self.excel_mapping.get_term_map()
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load mapping terms: {e}")
+            return {}
+
+    def _document_extractor(self, llm_provider: LLMProvider, trace_id: Optional[str], cascade: bool = False) -> ExtractFn:
+        """
+        Extraction call for one document or section - shared by the traced and untraced
+        analysis so both use decomposed extraction, the provider router and compact output.
+        Providers that LLMService does not call itself (Ollama, Claude) go through their
+        provider instance, with tracing when a trace id is given.
+        With cascade, the cheap-model pass gets no fallback models: a failure has to reach
+        the cascade as an error so it escalates, not be answered by a more expensive model.
+        """
+        provider = get_enum_value(llm_provider)
+
+        def extract(section_text: str, section_model: str, listener: Optional[RuleListener]):
+            fallback = not (cascade and section_model == EXTRACTION_CASCADE_CHEAP_MODEL)
+            if is_decomposed_mode():
+                # One focused request per rule family, merged like sections (EXTRACTION_DECOMPOSED_ENABLED)
+                return extract_decomposed(
+                    lambda family: self.llm_service.analyze_document_family(
+                        section_text, provider, section_model, family, on_rule=listener, fallback=fallback
+                    ),
+                    self._merge_section_results
+                )
+            if router_applies(provider):
+                # Split calls between OpenAI and the local Ollama server (LLM_ROUTER_ENABLED)
+                return self.llm_service.analyze_document_routed(section_text, provider, section_model, trace_id, on_rule=listener, fallback=fallback)
+            if trace_id and provider not in LLM_SERVICE_PROVIDERS:
+                return self.llm_service.analyze_document_with_tracing(section_text, provider, section_model, trace_id, on_rule=listener)
+            return self.llm_service.analyze_document(section_text, provider, section_model, trace_id, on_rule=listener, fallback=fallback)
+
+        return extract
+
+    async def _run_extraction(
+        self,
+        text: str,
+        model: str,
+        extract: ExtractFn,
+        on_rule: Optional[RuleListener],
+        cascade_stats: Optional[CascadeStats],
+        term_map: Dict[str, Dict],
+        label: str
+    ) -> Dict[str, Any]:
+        """Extract text with the requested model, or cheap-model-first when the cascade is active"""
+        if cascade_stats is None or model == EXTRACTION_CASCADE_CHEAP_MODEL:
+            return await extract(text, model, on_rule)
+        analysis, _ = await extract_with_cascade(text, model, extract, term_map, on_rule, cascade_stats, label)
+        return analysis
+
+    @staticmethod
+    def _cascade_note(cascade_stats: Optional[CascadeStats]) -> Optional[str]:
+        """Result note with the cascade escalation rate"""
+        if cascade_stats is None or not cascade_stats.sections:
+            return None
+        summary = cascade_stats.summary()
+        reasons = ", ".join(f"{reason}={count}" for reason, count in summary["reasons"].items()) or "none"
+        return (
+            f"Extraction cascade: {summary['escalated']}/{summary['sections']} sections escalated from "
+            f"{summary['cheap_model']} to the requested model (reasons: {reasons})"
+        )
+
+    @staticmethod
+    def _prescreen_note(audit: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Result note listing the sections skipped by the pre-screen"""
+        if not audit or not audit["skipped_sections"]:
+            return None
+        skipped = ", ".join(f"{s['section_id']} ('{s['title'][:40]}', score {s['score']})" for s in audit["skipped_sections"])
+        return (
+            f"Section pre-screen: {len(audit['skipped_sections'])}/{audit['total_sections']} sections "
+            f"had no investment-rule content and were not sent to the LLM: {skipped}"
+        )
+
+    def _start_speculative_fallback(
+        self,
+        text: str,
+        units: List[Dict[str, Any]],
+        provider: str,
+        model: str,
+        trace_id: Optional[str]
+    ) -> Optional["asyncio.Task"]:
+        """Start the fallback prompt next to the primary pass for non-German documents (see scoped_fallback)"""
+        if not FALLBACK_SPECULATIVE_ENABLED or not looks_non_german(text):
+            return None
+        candidates = fallback_candidates(units, [{}] * len(units), self._fallback_term_pattern())
+        if not candidates:
+            return None
+        logger.info(f"🏁 Document does not look German - starting the fallback prompt on {len(candidates)} sections speculatively")
+        return asyncio.create_task(self._run_fallback(candidates, provider, model, trace_id))
+
+    def _fallback_term_pattern(self):
+        """Mapping term matcher for the fallback pre-screen (None = no screening)"""
+        return term_pattern_for(self._mapping_term_map().keys())
+
+    async def _run_fallback(
+        self,
+        candidates: List[Tuple[int, Dict[str, Any]]],
+        provider: str,
+        model: str,
+        trace_id: Optional[str]
+    ) -> Dict[int, Dict[str, Any]]:
+        """Universal fallback prompt on (index, unit) pairs, concurrently - returns index -> result"""
+        with llm_stage("fallback_prompt"):
+            results = await self._analyze_sections_concurrently(
+                [unit for _, unit in candidates],
+                lambda unit: self.llm_service.analyze_document_fallback(unit['text'], provider, model, trace_id),
+                section_timeout=stage_timeout("fallback_prompt", FALLBACK_TIMEOUT),
+                max_retries=0
+            )
+        return {idx: result for (idx, _), result in zip(candidates, results)}
+
+    async def _scoped_fallback(
+        self,
+        units: List[Dict[str, Any]],
+        unit_results: List[Dict[str, Any]],
+        analysis: Dict[str, Any],
+        provider: str,
+        model: str,
+        trace_id: Optional[str],
+        speculative: Optional["asyncio.Task"] = None
+    ) -> Dict[str, Any]:
+        """
+        Run the universal fallback prompt on the units without instrument rules that pass the
+        pre-screen and merge what it finds into analysis. A speculative run (started with
+        _start_speculative_fallback) is reused for the units it covered.
+        """
+        candidates = fallback_candidates(units, unit_results, self._fallback_term_pattern())
+        if not candidates:
+            if speculative is not None:
+                speculative.cancel()
+            logger.warning("⚠️ No empty section has rule content - skipping the fallback prompt")
+            return analysis
+
+        logger.info(f"🔄 Attempting fallback analysis with universal prompt on {len(candidates)}/{len(units)} sections...")
+        done: Dict[int, Dict[str, Any]] = {}
+        if speculative is not None:
+            try:
+                done = await speculative
+            except Exception as e:
+                logger.warning(f"⚠️ Speculative fallback failed: {e}")
+        missing = [(idx, unit) for idx, unit in candidates if idx not in done]
+        if missing and not stage_allowed("fallback_prompt", JOB_MIN_FALLBACK_SECONDS):
+            missing = []
+        if missing:
+            done.update(await self._run_fallback(missing, provider, model, trace_id))
+
+        fallback_results = [done.get(idx, {}) for idx, _ in candidates]
+        found = sum(len(result.get("instrument_rules", [])) for result in fallback_results if isinstance(result, dict))
+        if not found:
+            logger.warning("⚠️ Fallback analysis also returned ZERO instrument rules. Document may not contain investment rules.")
+            return analysis
+        logger.info(f"✅ Fallback analysis successful! Found {found} instrument rules")
+        return self._merge_section_results([analysis] + fallback_results)
+
     def _merge_section_results(self, section_results: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Merge extraction results from multiple sections.
@@ -789,37 +1187,9 @@ class AnalysisService:
     
     def _create_empty_ocrd_json(self, fund_id: str) -> Dict[str, Any]:
         """Create empty OCRD data structure"""
-        # OCRD schema with flat structure: future, option, and warrant are top-level sections (no parent "derivatives" category)
-        OCRD_SCHEMA = {
-            "bond": ["covered_bond", "asset_backed_security", "mortgage_bond", "pfandbrief", "public_mortgage_bond", "convertible_bond_regular", "convertible_bond_coco", "reverse_convertible", "credit_linked_note", "commercial_paper", "genussscheine_bondlike", "inflation_linked", "participation_paper", "plain_vanilla_bond", "promissory_note", "warrant_linked_bond"],
-            "certificate": ["bond_certificate", "commodity_certificate", "currency_certificate", "fund_certificate", "index_certificate", "stock_certificate"],
-            "stock": ["common_stock", "depositary_receipt", "genussschein_stocklike", "partizipationsschein", "preferred_stock", "reit", "right"],
-            "fund": ["alternative_investment_fund", "commodity_fund", "equity_fund", "fixed_income_fund", "mixed_allocation_fund", "moneymarket_fund", "private_equity_fund", "real_estate_fund", "speciality_fund"],
-            "deposit": ["call_money", "cash", "time_deposit"],
-            "future": ["bond_future", "commodity_future", "currency_future", "fund_future", "index_future", "single_stock_future"],
-            "option": ["bond_future_option", "commodity_future_option", "commodity_option", "currency_future_option", "currency_option", "fund_future_option", "fund_option", "index_future_option", "index_option", "stock_option"],
-            "warrant": ["commodity_warrant", "currency_warrant", "fund_warrant", "index_warrant", "stock_warrant"],
-            "commodity": ["precious_metal"],
-            "forex": ["forex_outright", "forex_spot"],
-            "swap": ["credit_default_swap", "interest_swap", "total_return_swap"],
-            "loan": [],
-            "private_equity": [],
-            "real_estate": [],
-            "rights": ["subscription_rights"]
-        }
-        
-        out = {"fund_id": fund_id, "as_of": None, "sections": {}, "notes": []}
-        # Note: allowed=None means not yet determined (will be set by rules)
-        # allowed=True means explicitly allowed, allowed=False means explicitly prohibited
-        # allowed=None can also mean manual approval required (set when mappings are ambiguous)
+        # Flat structure: future, option, and warrant are top-level sections (no parent "derivatives" category)
         # confidence: 0.0-1.0 score indicating match quality
-        for section, rows in OCRD_SCHEMA.items():
-            out["sections"][section] = {}
-            for r in rows:
-                out["sections"][section][r] = {"allowed": None, "confidence": None, "note": "", "evidence": {"page": None, "text": ""}}
-            if section in ("stock", "fund", "bond", "certificate", "deposit", "commodity", "forex", "swap", "loan", "private_equity", "real_estate", "rights", "future", "option", "warrant"):
-                out["sections"][section]["special_other_restrictions"] = []
-
+        out = {"fund_id": fund_id, "as_of": None, "sections": empty_ocrd_sections(), "notes": []}
         return out
 
     def _calculate_match_confidence(
@@ -852,49 +1222,8 @@ class AnalysisService:
         original_normalized = original_instrument.lower()
         
         # 1. Exact match on type2 mapping (40 points)
-        type2_to_key = {
-            "plain vanilla bond": "plain_vanilla_bond",
-            "covered bond": "covered_bond",
-            "asset backed security": "asset_backed_security",
-            "mortgage bond": "mortgage_bond",
-            "pfandbrief": "pfandbrief",
-            "public mortgage bond": "public_mortgage_bond",
-            "convertible bond": "convertible_bond_regular",
-            "commercial paper": "commercial_paper",
-            "inflation linked": "inflation_linked",
-            "promissory note": "promissory_note",
-            "credit linked note": "credit_linked_note",
-            "warrant linked bond": "warrant_linked_bond",
-            "participation paper": "participation_paper",
-            "reverse convertible": "reverse_convertible",
-            "common stock": "common_stock",
-            "preferred stock": "preferred_stock",
-            "depositary receipt": "depositary_receipt",
-            "right": "right",
-            "partizipationsschein": "partizipationsschein",
-            "reit": "reit",
-            "equity fund": "equity_fund",
-            "fixed income fund": "fixed_income_fund",
-            "moneymarket fund": "moneymarket_fund",
-            "real estate fund": "real_estate_fund",
-            "real estate": "real_estate_fund",
-            "alternative investment fund": "alternative_investment_fund",
-            "private equity fund": "private_equity_fund",
-            "cash": "cash",
-            "call money": "call_money",
-            "time deposit": "time_deposit",
-            "bond future": "bond_future",
-            "index future": "index_future",
-            "currency future": "currency_future",
-            "currency option": "currency_option",
-            "index option": "index_option",
-            "stock option": "stock_option",
-            "forex outright": "forex_outright",
-            "precious metal": "precious_metal",
-        }
-        
-        if type2 and type2 in type2_to_key:
-            if type2_to_key[type2] == ocrd_key:
+        if type2 and type2 in TYPE2_TO_KEY:
+            if TYPE2_TO_KEY[type2] == ocrd_key:
                 score += 40.0
         max_score += 40.0
         
@@ -902,7 +1231,7 @@ class AnalysisService:
         if type3 and type3 != 'nan':
             type3_parts = [p.strip().lower() for p in type3.split(',')]
             for part in type3_parts:
-                if part in type2_to_key and type2_to_key[part] == ocrd_key:
+                if part in TYPE2_TO_KEY and TYPE2_TO_KEY[part] == ocrd_key:
                     score += 30.0
                     break
                 # Fuzzy match on type3
@@ -931,30 +1260,8 @@ class AnalysisService:
         return confidence
     
     def _normalize_instrument_name(self, name: str) -> str:
-        """Normalize instrument names to improve matching accuracy."""
-        if not name:
-            return ""
-
-        normalized = name.lower().strip()
-        normalized = normalized.replace("-", " ")
-        normalized = normalized.replace("_", " ")
-
-        # Remove parenthetical text (e.g., "Interest rate futures (bond and money market)" -> "Interest rate futures")
-        # This helps match instruments with descriptive text in parentheses
-        normalized = re.sub(r"\([^)]*\)", "", normalized)
-
-        # Treat FX as synonym for FOREX before matching
-        normalized = re.sub(r"\bfx\b", "forex", normalized)
-        normalized = re.sub(r"\bfx(?=\s)", "forex", normalized)
-        normalized = re.sub(r"\bfx(?=[a-z])", "forex", normalized)
-
-        # Normalize "foreign exchange" phrases to forex for consistency
-        normalized = normalized.replace("foreign exchange", "forex")
-
-        # Collapse multiple spaces
-        normalized = re.sub(r"\s+", " ", normalized)
-
-        return normalized.strip()
+        """Normalize instrument names to improve matching accuracy (memoized)."""
+        return normalize_instrument_name(name)
 
     def _analyze_with_keywords(self, data: Dict[str, Any], text: str) -> Dict[str, Any]:
         """Fast keyword-based analysis"""
@@ -1017,8 +1324,9 @@ class AnalysisService:
         
         return data
     
-    async def _analyze_with_llm(self, data: Dict[str, Any], text: str, llm_provider: LLMProvider, model: str, trace_id: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    async def _analyze_with_llm(self, data: Dict[str, Any], text: str, llm_provider: LLMProvider, model: str, trace_id: Optional[str] = None, on_rule: Optional[RuleListener] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
         """LLM-based analysis with section-based extraction - returns (structured_data, raw_analysis)"""
+        speculative_fallback = None
         try:
             # Check if LLM service is available
             if not self.llm_service:
@@ -1031,86 +1339,82 @@ class AnalysisService:
             # FIXED: Only use section-based extraction for large documents (>50k chars)
             # For smaller documents, process as single section to maintain backward compatibility
             USE_SECTION_BASED_EXTRACTION = len(text) > 50000
+            prescreen_audit = None
+
+            # Cheap-model-first cascade (EXTRACTION_CASCADE_ENABLED)
+            cascade_stats = CascadeStats() if cascade_applies(get_enum_value(llm_provider), model) else None
+            term_map = self._mapping_term_map() if cascade_stats else {}
+
+            # Units of the primary pass (whole document or planner packs) for the scoped fallback
+            units = [{"section_id": 1, "title": "document", "text": text}]
+
+            extract = self._document_extractor(llm_provider, trace_id, cascade=cascade_stats is not None)
             
             # Add timeout wrapper to prevent hanging
-            LLM_TIMEOUT = 300.0  # 5 minutes max per LLM call
+            LLM_TIMEOUT = stage_timeout("extraction", 300.0)  # 5 minutes max per LLM call, less if the job budget runs out
             
             if not USE_SECTION_BASED_EXTRACTION:
                 # Small document - process normally (backward compatible)
                 logger.info("Processing document as single section (document size < 50k chars)")
+                speculative_fallback = self._start_speculative_fallback(text, units, get_enum_value(llm_provider), model, trace_id)
                 try:
                     analysis = await asyncio.wait_for(
-                        self.llm_service.analyze_document(text, get_enum_value(llm_provider), model, trace_id),
+                        self._run_extraction(text, model, extract, on_rule, cascade_stats, term_map, "document"),
                         timeout=LLM_TIMEOUT
                     )
+                    unit_results = [analysis]
                 except asyncio.TimeoutError:
                     logger.error(f"LLM analysis timed out after {LLM_TIMEOUT}s")
                     raise TimeoutError(f"Analysis timed out after {LLM_TIMEOUT} seconds. Document may be too large or API is slow.")
             else:
                 # Large document - split into sections for better coverage
                 logger.info(f"Large document detected ({len(text)} chars) - using section-based extraction")
-                sections = self._split_document_into_sections(text)
+                # Packed calls repeat boundary sentences instead of a fixed char overlap
+                sections = self._split_document_into_sections(text, overlap=0 if SECTION_PLANNER_ENABLED else 2000)
                 
                 if len(sections) == 1:
                     # Even after splitting, only one section - process normally
                     logger.info("Processing document as single section")
+                    speculative_fallback = self._start_speculative_fallback(text, units, get_enum_value(llm_provider), model, trace_id)
                     try:
                         analysis = await asyncio.wait_for(
-                            self.llm_service.analyze_document(text, get_enum_value(llm_provider), model, trace_id),
+                            self._run_extraction(text, model, extract, on_rule, cascade_stats, term_map, "document"),
                             timeout=LLM_TIMEOUT
                         )
+                        unit_results = [analysis]
                     except asyncio.TimeoutError:
                         logger.error(f"LLM analysis timed out after {LLM_TIMEOUT}s")
                         raise TimeoutError(f"Analysis timed out after {LLM_TIMEOUT} seconds. Document may be too large or API is slow.")
                 else:
-                    # Multiple sections - process each section separately with timeouts
+                    # Multiple sections - skip sections without rule content, then process the rest
+                    # concurrently (bounded) with per-section timeouts
+                    sections, prescreen_audit = self._prescreen_sections(sections)
+                    sections = self._plan_sections(sections, text, model)
                     logger.info(f"Processing {len(sections)} sections separately for better coverage")
-                    section_results = []
-                    
-                    section_timeout = min(LLM_TIMEOUT, 120.0)  # 2 min per section max
-                    
-                    # Process sections sequentially (not concurrently) to save memory
-                    # Process ALL sections, but in smaller batches to prevent memory exhaustion
-                    logger.info(f"Processing all {len(sections)} sections sequentially...")
-                    
-                    for section_idx, section in enumerate(sections):
-                        logger.info(f"Processing section {section_idx + 1}/{len(sections)}: '{section['title'][:50]}' ({len(section['text'])} chars)")
-                        
-                        # Process full section text - no truncation
-                        section_text = section['text']
-                        
-                        try:
-                            # Add timeout per section
-                            section_analysis = await asyncio.wait_for(
-                                self.llm_service.analyze_document(
-                                    section_text, 
-                                    get_enum_value(llm_provider), 
-                                    model, 
-                                    trace_id
-                                ),
-                                timeout=section_timeout
-                            )
-                            
-                            if isinstance(section_analysis, dict):
-                                instrument_count = len(section_analysis.get("instrument_rules", []))
-                                logger.info(f"Section {section_idx + 1} found {instrument_count} instrument rules")
-                                section_results.append(section_analysis)
-                            else:
-                                logger.warning(f"Section {section_idx + 1} returned non-dict result")
-                                section_results.append({})
-                        except asyncio.TimeoutError:
-                            logger.error(f"Section {section_idx + 1} timed out after {section_timeout}s - skipping")
-                            section_results.append({})  # Continue with other sections
-                        except Exception as e:
-                            logger.error(f"Error processing section {section_idx + 1}: {e}")
-                            section_results.append({})  # Continue with other sections
-                        
-                        # Small delay between sections to prevent overwhelming the system
-                        await asyncio.sleep(0.5)  # 500ms delay between sections
-                    
+                    units = sections
+                    speculative_fallback = self._start_speculative_fallback(text, units, get_enum_value(llm_provider), model, trace_id)
+
+                    section_timeout = min(LLM_TIMEOUT, SECTION_TIMEOUT)
+
+                    # Process full section text - no truncation
+                    section_results = await self._analyze_sections_concurrently(
+                        sections,
+                        lambda section: self._run_extraction(
+                            section['text'],
+                            section.get('model', model),
+                            extract,
+                            on_rule,
+                            cascade_stats,
+                            term_map,
+                            f"section {section['section_id']}"
+                        ),
+                        section_timeout=section_timeout
+                    )
+
                     # Merge results from all sections
                     logger.info(f"Merging results from {len(section_results)} sections...")
                     analysis = self._merge_section_results(section_results)
+                    unit_results = section_results
             
             # Log what LLM returned
             if isinstance(analysis, dict):
@@ -1129,33 +1433,13 @@ class AnalysisService:
                     logger.warning("⚠️ LLM returned ZERO instrument rules! Attempting fallback with universal prompt...")
                     logger.warning("⚠️ This might indicate the document format doesn't match expected patterns (e.g., non-German format)")
                     
-                    # Try fallback prompt (universal/language-agnostic)
-                    try:
-                        logger.info("🔄 Attempting fallback analysis with universal prompt...")
-                        fallback_analysis = await asyncio.wait_for(
-                            self.llm_service.analyze_document_fallback(text, get_enum_value(llm_provider), model, trace_id),
-                            timeout=LLM_TIMEOUT
-                        )
-                        
-                        fallback_instrument_count = len(fallback_analysis.get("instrument_rules", []))
-                        if fallback_instrument_count > 0:
-                            logger.info(f"✅ Fallback analysis successful! Found {fallback_instrument_count} instrument rules")
-                            analysis = fallback_analysis  # Use fallback results
-                            instrument_count = fallback_instrument_count
-                            sector_count = len(analysis.get("sector_rules", []))
-                            country_count = len(analysis.get("country_rules", []))
-                            logger.info(f"📊 Fallback returned: {instrument_count} instrument rules, {sector_count} sector rules, {country_count} country rules")
-                        else:
-                            logger.warning("⚠️ Fallback analysis also returned ZERO instrument rules. Document may not contain investment rules.")
-                    except asyncio.TimeoutError:
-                        logger.error(f"Fallback analysis timed out after {LLM_TIMEOUT}s")
-                        logger.warning("⚠️ Continuing with empty results from primary analysis")
-                    except Exception as e:
-                        logger.error(f"Fallback analysis failed: {e}", exc_info=True)
-                        logger.warning("⚠️ Continuing with empty results from primary analysis")
+                    # Universal fallback prompt, only on the empty sections with rule content
+                    analysis = await self._scoped_fallback(units, unit_results, analysis, get_enum_value(llm_provider), model, trace_id, speculative_fallback)
             else:
                 logger.error(f"❌ LLM returned non-dict response: {type(analysis)}")
                 logger.error(f"❌ Response content: {str(analysis)[:500]}")
+            if speculative_fallback is not None:
+                speculative_fallback.cancel()  # not needed - the primary pass found instrument rules
             
             # Validate analysis response
             if not isinstance(analysis, dict):
@@ -1184,6 +1468,9 @@ class AnalysisService:
             # Merge with original data structure to preserve fund_id
             converted_data["fund_id"] = data.get("fund_id", "compliance_analysis")
             data = converted_data
+            for note in (self._prescreen_note(prescreen_audit), self._cascade_note(cascade_stats)):
+                if note:
+                    data.setdefault("notes", []).append(note)
             
             # Legacy code below - keeping for backward compatibility but not used if Excel mapping is active
             # Apply LLM results to data structure using helper function
@@ -1221,6 +1508,8 @@ class AnalysisService:
             
         except Exception as e:
             logger.error(f"LLM analysis error: {e}", exc_info=True)
+            if speculative_fallback is not None:
+                speculative_fallback.cancel()
             # Return data with error notes instead of failing completely
             for section_name in ["bond", "stock", "fund"]:
                 if section_name in data["sections"]:
@@ -1247,8 +1536,9 @@ class AnalysisService:
             #                     }
             return data, {}
     
-    async def _analyze_with_llm_traced(self, data: Dict[str, Any], text: str, llm_provider: LLMProvider, model: str, trace_id: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    async def _analyze_with_llm_traced(self, data: Dict[str, Any], text: str, llm_provider: LLMProvider, model: str, trace_id: str, on_rule: Optional[RuleListener] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
         """LLM-based analysis with forensic tracing and section-based extraction - returns (structured_data, raw_analysis)"""
+        speculative_fallback = None
         try:
             # Check if LLM service is available
             if not self.llm_service:
@@ -1261,50 +1551,62 @@ class AnalysisService:
             # FIXED: Only use section-based extraction for large documents (>50k chars)
             # For smaller documents, process as single section to maintain backward compatibility
             USE_SECTION_BASED_EXTRACTION = len(text) > 50000
+            prescreen_audit = None
+
+            # Cheap-model-first cascade (EXTRACTION_CASCADE_ENABLED)
+            cascade_stats = CascadeStats() if cascade_applies(get_enum_value(llm_provider), model) else None
+            term_map = self._mapping_term_map() if cascade_stats else {}
+
+            # Units of the primary pass (whole document or planner packs) for the scoped fallback
+            units = [{"section_id": 1, "title": "document", "text": text}]
+
+            extract = self._document_extractor(llm_provider, trace_id, cascade=cascade_stats is not None)
             
             if not USE_SECTION_BASED_EXTRACTION:
                 # Small document - process normally (backward compatible)
                 logger.info("📄 Processing document as single section (TRACED, document size < 50k chars)")
-                analysis = await self.llm_service.analyze_document_with_tracing(text, get_enum_value(llm_provider), model, trace_id)
+                speculative_fallback = self._start_speculative_fallback(text, units, get_enum_value(llm_provider), model, trace_id)
+                analysis = await self._run_extraction(text, model, extract, on_rule, cascade_stats, term_map, "document")
+                unit_results = [analysis]
             else:
                 # Large document - split into sections for better coverage
                 logger.info(f"📑 Large document detected ({len(text)} chars) - using section-based extraction (TRACED)")
-                sections = self._split_document_into_sections(text)
+                # Packed calls repeat boundary sentences instead of a fixed char overlap
+                sections = self._split_document_into_sections(text, overlap=0 if SECTION_PLANNER_ENABLED else 2000)
                 
                 if len(sections) == 1:
                     # Even after splitting, only one section - process normally
                     logger.info("📄 Processing document as single section (TRACED)")
-                    analysis = await self.llm_service.analyze_document_with_tracing(text, get_enum_value(llm_provider), model, trace_id)
+                    speculative_fallback = self._start_speculative_fallback(text, units, get_enum_value(llm_provider), model, trace_id)
+                    analysis = await self._run_extraction(text, model, extract, on_rule, cascade_stats, term_map, "document")
+                    unit_results = [analysis]
                 else:
-                    # Multiple sections - process each section separately
+                    # Multiple sections - skip sections without rule content, process the rest separately
+                    sections, prescreen_audit = self._prescreen_sections(sections)
+                    if prescreen_audit:
+                        await self.trace_handler.save_section_prescreen(trace_id, prescreen_audit)
+                    sections = self._plan_sections(sections, text, model)
                     logger.info(f"📑 Processing {len(sections)} sections separately for better coverage (TRACED)")
-                    section_results = []
-                    
-                    for section_idx, section in enumerate(sections):
-                        logger.info(f"   🔍 Processing section {section_idx + 1}/{len(sections)}: '{section['title'][:50]}' ({len(section['text'])} chars)")
-                        
-                        try:
-                            section_analysis = await self.llm_service.analyze_document_with_tracing(
-                                section['text'], 
-                                get_enum_value(llm_provider), 
-                                model, 
-                                trace_id
-                            )
-                            
-                            if isinstance(section_analysis, dict):
-                                instrument_count = len(section_analysis.get("instrument_rules", []))
-                                logger.info(f"      ✅ Section {section_idx + 1} found {instrument_count} instrument rules")
-                                section_results.append(section_analysis)
-                            else:
-                                logger.warning(f"      ⚠️ Section {section_idx + 1} returned non-dict result")
-                                section_results.append({})
-                        except Exception as e:
-                            logger.error(f"      ❌ Error processing section {section_idx + 1}: {e}", exc_info=True)
-                            section_results.append({})  # Continue with other sections
-                    
+                    units = sections
+                    speculative_fallback = self._start_speculative_fallback(text, units, get_enum_value(llm_provider), model, trace_id)
+
+                    section_results = await self._analyze_sections_concurrently(
+                        sections,
+                        lambda section: self._run_extraction(
+                            section['text'],
+                            section.get('model', model),
+                            extract,
+                            on_rule,
+                            cascade_stats,
+                            term_map,
+                            f"section {section['section_id']}"
+                        )
+                    )
+
                     # Merge results from all sections
                     logger.info(f"🔄 Merging results from {len(section_results)} sections...")
                     analysis = self._merge_section_results(section_results)
+                    unit_results = section_results
             
             # Log what LLM returned
             if isinstance(analysis, dict):
@@ -1323,31 +1625,10 @@ class AnalysisService:
                     logger.warning("⚠️ LLM returned ZERO instrument rules (TRACED)! Attempting fallback with universal prompt...")
                     logger.warning("⚠️ This might indicate the document format doesn't match expected patterns (e.g., non-German format)")
                     
-                    # Try fallback prompt (universal/language-agnostic)
-                    try:
-                        logger.info("🔄 Attempting fallback analysis with universal prompt (TRACED)...")
-                        LLM_TIMEOUT = 300.0
-                        fallback_analysis = await asyncio.wait_for(
-                            self.llm_service.analyze_document_fallback(text, get_enum_value(llm_provider), model, trace_id),
-                            timeout=LLM_TIMEOUT
-                        )
-                        
-                        fallback_instrument_count = len(fallback_analysis.get("instrument_rules", []))
-                        if fallback_instrument_count > 0:
-                            logger.info(f"✅ Fallback analysis successful (TRACED)! Found {fallback_instrument_count} instrument rules")
-                            analysis = fallback_analysis  # Use fallback results
-                            instrument_count = fallback_instrument_count
-                            sector_count = len(analysis.get("sector_rules", []))
-                            country_count = len(analysis.get("country_rules", []))
-                            logger.info(f"📊 Fallback returned (TRACED): {instrument_count} instrument rules, {sector_count} sector rules, {country_count} country rules")
-                        else:
-                            logger.warning("⚠️ Fallback analysis also returned ZERO instrument rules (TRACED). Document may not contain investment rules.")
-                    except asyncio.TimeoutError:
-                        logger.error(f"Fallback analysis timed out after {LLM_TIMEOUT}s (TRACED)")
-                        logger.warning("⚠️ Continuing with empty results from primary analysis")
-                    except Exception as e:
-                        logger.error(f"Fallback analysis failed (TRACED): {e}", exc_info=True)
-                        logger.warning("⚠️ Continuing with empty results from primary analysis")
+                    # Universal fallback prompt, only on the empty sections with rule content
+                    analysis = await self._scoped_fallback(units, unit_results, analysis, get_enum_value(llm_provider), model, trace_id, speculative_fallback)
+            if speculative_fallback is not None:
+                speculative_fallback.cancel()  # not needed - the primary pass found instrument rules
             
             # Validate analysis response
             if not isinstance(analysis, dict):
@@ -1362,6 +1643,9 @@ class AnalysisService:
             # Merge with original data structure to preserve fund_id
             converted_data["fund_id"] = data.get("fund_id", "compliance_analysis")
             data = converted_data
+            for note in (self._prescreen_note(prescreen_audit), self._cascade_note(cascade_stats)):
+                if note:
+                    data.setdefault("notes", []).append(note)
             
             # Legacy code below - keeping for backward compatibility but not used if Excel mapping is active
             # Apply LLM results to data structure using helper function
@@ -1393,6 +1677,8 @@ class AnalysisService:
             return data, analysis
             
         except Exception as e:
+            if speculative_fallback is not None:
+                speculative_fallback.cancel()
             raise Exception(f"LLM analysis failed: {str(e)}")
     
     def _apply_llm_decision(self, data: Dict[str, Any], analysis: Dict, llm_provider: LLMProvider, 
@@ -1520,37 +1806,11 @@ class AnalysisService:
                     f"[DEBUG] Rule {i+1}: '{rule.instrument}' = {rule.allowed}"
                 )
         
-        # OCRD schema
-        # Note: future, option, and warrant are now top-level sections (no parent "derivatives" category)
-        OCRD_SCHEMA = {
-            "bond": ["covered_bond", "asset_backed_security", "mortgage_bond", "pfandbrief", "public_mortgage_bond", "convertible_bond_regular", "convertible_bond_coco", "reverse_convertible", "credit_linked_note", "commercial_paper", "genussscheine_bondlike", "inflation_linked", "participation_paper", "plain_vanilla_bond", "promissory_note", "warrant_linked_bond"],
-            "certificate": ["bond_certificate", "commodity_certificate", "currency_certificate", "fund_certificate", "index_certificate", "stock_certificate"],
-            "stock": ["common_stock", "depositary_receipt", "genussschein_stocklike", "partizipationsschein", "preferred_stock", "reit", "right"],
-            "fund": ["alternative_investment_fund", "commodity_fund", "equity_fund", "fixed_income_fund", "mixed_allocation_fund", "moneymarket_fund", "private_equity_fund", "real_estate_fund", "speciality_fund"],
-            "deposit": ["call_money", "cash", "time_deposit"],
-            "future": ["bond_future", "commodity_future", "currency_future", "fund_future", "index_future", "single_stock_future"],
-            "option": ["bond_future_option", "commodity_future_option", "commodity_option", "currency_future_option", "currency_option", "fund_future_option", "fund_option", "index_future_option", "index_option", "stock_option"],
-            "warrant": ["commodity_warrant", "currency_warrant", "fund_warrant", "index_warrant", "stock_warrant"],
-            "commodity": ["precious_metal"],
-            "forex": ["forex_outright", "forex_spot"],
-            "swap": ["credit_default_swap", "interest_swap", "total_return_swap"],
-            "loan": [],
-            "private_equity": [],
-            "real_estate": [],
-            "rights": ["subscription_rights"]
-        }
-        
-        # Initialize sections
+        # Initialize sections (future, option, and warrant are top-level sections)
         # Note: allowed=None means not yet determined (will be set by rules)
         # allowed=True means explicitly allowed, allowed=False means explicitly prohibited
         # allowed=None can also mean manual approval required (set when mappings are ambiguous)
-        # Initialize all sections as flat structures (future, option, warrant are now top-level)
-        for section, rows in OCRD_SCHEMA.items():
-            data["sections"][section] = {}
-            for r in rows:
-                data["sections"][section][r] = {"allowed": None, "confidence": None, "note": "", "evidence": {"page": None, "text": ""}}
-            if section in ("stock", "fund", "bond", "certificate", "deposit", "commodity", "forex", "swap", "loan", "private_equity", "real_estate", "rights", "future", "option", "warrant"):
-                data["sections"][section]["special_other_restrictions"] = []
+        data["sections"] = empty_ocrd_sections()
         
         # Apply sector rules (using validated response)
         for rule in validated_response.sector_rules:
@@ -1706,6 +1966,23 @@ class AnalysisService:
                 f"reason='{reason[:100]}...'"
             )
 
+            # Compact output names OCRD instrument types by id ("bond.covered_bond") - set that row directly
+            ocrd_pair = parse_ocrd_id(original_instrument)
+            if ocrd_pair is not None:
+                ocrd_section, ocrd_key = ocrd_pair
+                evidence_text = reason if reason else (
+                    f"{original_instrument} is {'allowed' if allowed else 'prohibited'}"
+                )
+                data["sections"][ocrd_section][ocrd_key].update({
+                    "allowed": allowed,
+                    "confidence": 0.9,
+                    "note": f"Instrument rule: {original_instrument} - {evidence_text} (Confidence: 90%)",
+                    "evidence": {"page": 1, "text": evidence_text}
+                })
+                processed_instruments.add(instrument_normalized)
+                logger.info(f"[DEBUG] ✓ OCRD id rule: '{original_instrument}' (allowed={allowed})")
+                continue
+
             # Check for negative logic if Excel mapping is available
             excel_mapping_succeeded = False  # Track if Excel mapping actually updated OCRD structure
             if self.excel_mapping:
@@ -1830,77 +2107,13 @@ class AnalysisService:
                     type3 = str(raw_type3).lower().strip() if raw_type3 and str(raw_type3).lower().strip() != 'nan' else None
                     
                     if type1 and type1 in data["sections"]:
-                        # Map type2 to specific instrument names in OCRD schema
-                        # This mapping is generated from Investment_Mapping.xlsx
-                        type2_to_key = {
-                            # Bonds
-                            "plain vanilla bond": "plain_vanilla_bond",
-                            "covered bond": "covered_bond",
-                            "asset backed security": "asset_backed_security",
-                            "mortgage bond": "mortgage_bond",
-                            "pfandbrief": "pfandbrief",
-                            "public mortgage bond": "public_mortgage_bond",
-                            "convertible bond": "convertible_bond_regular",
-                            "commercial paper": "commercial_paper",
-                            "inflation linked": "inflation_linked",
-                            "promissory note": "promissory_note",
-                            "credit linked note": "credit_linked_note",
-                            "warrant linked bond": "warrant_linked_bond",
-                            "participation paper": "participation_paper",
-                            "reverse convertible": "reverse_convertible",
-                            # Stocks
-                            "common stock": "common_stock",
-                            "preferred stock": "preferred_stock",
-                            "depositary receipt": "depositary_receipt",
-                            "right": "right",
-                            "partizipationsschein": "partizipationsschein",
-                            "reit": "reit",
-                            # Funds
-                            "equity fund": "equity_fund",
-                            "fixed income fund": "fixed_income_fund",
-                            "moneymarket fund": "moneymarket_fund",
-                            "real estate fund": "real_estate_fund",
-                            "real estate": "real_estate_fund",
-                            "alternative investment fund": "alternative_investment_fund",
-                            "private equity fund": "private_equity_fund",
-                            # Deposits
-                            "cash": "cash",
-                            "call money": "call_money",
-                            "time deposit": "time_deposit",
-                            # Futures
-                            "bond future": "bond_future",
-                            "index future": "index_future",
-                            "currency future": "currency_future",
-                            "equity future": "single_stock_future",
-                            "equity futures": "single_stock_future",
-                            "single stock future": "single_stock_future",
-                            "equity index future": "index_future",
-                            "equity index futures": "index_future",
-                            "aktienfutures": "single_stock_future",
-                            "aktienindexfutures": "index_future",
-                            # Options
-                            "currency option": "currency_option",
-                            "index option": "index_option",
-                            "stock option": "stock_option",
-                            "equity option": "stock_option",
-                            "equity options": "stock_option",
-                            "equity index option": "index_option",
-                            "equity index options": "index_option",
-                            "aktienoptionen": "stock_option",
-                            "aktienindexoptionen": "index_option",
-                            # Forex
-                            "forex outright": "forex_outright",
-                            # Commodities
-                            "precious metal": "precious_metal",
-                        }
-                        
                         # Try to find matching key in section with confidence scoring
                         section = data["sections"][type1]
                         candidate_matches = []  # List of (key, confidence_score) tuples
                         
                         # First try type2 mapping
-                        if type2 and type2 in type2_to_key:
-                            key = type2_to_key[type2]
+                        if type2 and type2 in TYPE2_TO_KEY:
+                            key = TYPE2_TO_KEY[type2]
                             if key in section:
                                 confidence = self._calculate_match_confidence(entry, key, type1, original_instrument)
                                 candidate_matches.append((key, confidence))
@@ -1910,8 +2123,8 @@ class AnalysisService:
                             type3_parts = [p.strip().lower() for p in type3.split(',')]
                             for part in type3_parts:
                                 # Try direct mapping first
-                                if part in type2_to_key:
-                                    key = type2_to_key[part]
+                                if part in TYPE2_TO_KEY:
+                                    key = TYPE2_TO_KEY[part]
                                     if key in section:
                                         confidence = self._calculate_match_confidence(entry, key, type1, original_instrument)
                                         # Only add if not already added or with higher confidence
@@ -2071,178 +2284,8 @@ class AnalysisService:
             # Normalize instrument name (handle underscores, spaces, hyphens)
             instrument_normalized = instrument_normalized.replace("_", " ").replace("-", " ")
 
-            # Build comprehensive mapping of instruments to sections and specific instrument names
-            # Includes both English and German terms
-            # Note: future, option, and warrant are now top-level sections (no parent "derivatives" category)
-            instrument_mapping = {
-                # Generic terms (English)
-                "bonds": "bond",
-                "bond": "bond",
-                "equities": "stock",
-                "equity": "stock",
-                "stocks": "stock",
-                "stock": "stock",
-                "funds": "fund",
-                "fund": "fund",
-                "derivatives": "future",  # Map derivatives to future section (default)
-                "derivative": "future",  # Map derivative to future section (default)
-                "options": "option",
-                "option": "option",
-                "futures": "future",
-                "future": "future",
-                "warrants": "warrant",
-                "warrant": "warrant",
-                "commodities": "commodity",
-                "commodity": "commodity",
-                "forex": "forex",
-                "swaps": "swap",
-                "swap": "swap",
-                # Generic terms (German)
-                "anleihen": "bond",
-                "renten": "bond",
-                "rentenquote": "bond",
-                "aktien": "stock",
-                "stammaktien": "stock",
-                "vorzugsaktien": "stock",
-                "fonds": "fund",
-                "aktienfonds": "fund",
-                "rentenfonds": "fund",
-                "geldmarktfonds": "fund",
-                "derivate": "future",
-                "optionen": "option",
-                "futures": "future",
-                "scheine": "warrant",
-                "warrants": "warrant",
-                "rohstoffe": "commodity",
-                "währung": "forex",
-                "devisen": "forex",
-                "swaps": "swap",
-                # Money market instruments (German)
-                "geldmarktinstrumente": "deposit",
-                "geldmarktprodukte": "deposit",
-                "geldmarkt": "deposit",
-                # Specific bond types (English)
-                "covered bond": "bond",
-                "covered_bond": "bond",
-                "asset backed security": "bond",
-                "asset_backed_security": "bond",
-                "asset-backed security": "bond",
-                "mortgage bond": "bond",
-                "mortgage_bond": "bond",
-                "mortgage-bond": "bond",
-                "pfandbrief": "bond",
-                "pfandbriefe": "bond",
-                "convertible bond": "bond",
-                "convertible_bond": "bond",
-                "commercial paper": "bond",
-                "commercial_paper": "bond",
-                # Specific bond types (German)
-                "staatsanleihen": "bond",
-                "corporate bonds": "bond",
-                "corporate_bonds": "bond",
-                "schatzanweisungen": "bond",
-                "bezugsrechte": "right",
-                "subscription rights": "right",
-                "subscription_rights": "right",
-                # Specific stock types (English)
-                "common stock": "stock",
-                "common_stock": "stock",
-                "preferred stock": "stock",
-                "preferred_stock": "stock",
-                # Specific stock types (German)
-                "stammaktien": "stock",
-                "common_stock": "stock",
-                # Specific fund types (English)
-                "equity fund": "fund",
-                "equity_fund": "fund",
-                "fixed income fund": "fund",
-                "fixed_income_fund": "fund",
-                "money market fund": "fund",
-                "moneymarket_fund": "fund",
-                # Specific fund types (German)
-                "aktienfonds": "fund",
-                "rentenfonds": "fund",
-                "geldmarktfonds": "fund",
-                # Swaps (German)
-                "zinsswaps": "swap",
-                "interest swap": "swap",
-                "interest_swap": "swap",
-                "credit default swap": "swap",
-                "credit_default_swap": "swap",
-                "total return swap": "swap",
-                "total_return_swap": "swap",
-                # Forex (German)
-                "devisentermingeschäfte": "forex",
-                "fx forward": "forex",
-                "fx_forward": "forex",
-                "forex_outright": "forex",
-                "forex_spot": "forex",
-                "currency futures": "forex",
-                "currency_futures": "forex",
-            }
-            
-            # First try exact match
-            lookup_candidates = [instrument_lower, instrument_lower.replace(" ", "_"), instrument_normalized]
-            section = None
-            for candidate in lookup_candidates:
-                if candidate in instrument_mapping:
-                    section = instrument_mapping[candidate]
-                    break
-            if not section and instrument_normalized:
-                section = instrument_mapping.get(instrument_normalized)
-
-            # If no exact match, try partial matching
-            if not section:
-                for key, value in instrument_mapping.items():
-                    if key in instrument_normalized or instrument_normalized in key:
-                        section = value
-                        break
-
-            # If still no match, try to infer from instrument name (English and German)
-            if not section:
-                instrument_lower_normalized = instrument_normalized.lower()
-                # German terms
-                if any(term in instrument_lower_normalized for term in ["anleihe", "rente", "pfandbrief", "schatzanweisung"]):
-                    section = "bond"
-                elif any(term in instrument_lower_normalized for term in ["aktie", "stammaktie", "vorzugsaktie"]):
-                    section = "stock"
-                elif any(term in instrument_lower_normalized for term in ["fonds", "aktienfonds", "rentenfonds", "geldmarktfonds"]):
-                    section = "fund"
-                elif any(term in instrument_lower_normalized for term in ["option", "optionen"]):
-                    section = "option"
-                elif any(term in instrument_lower_normalized for term in ["future", "futures"]):
-                    section = "future"
-                elif any(term in instrument_lower_normalized for term in ["warrant", "schein", "scheine"]):
-                    section = "warrant"
-                elif any(term in instrument_lower_normalized for term in ["swap", "swaps", "zinsswap"]):
-                    section = "swap"
-                elif any(term in instrument_lower_normalized for term in ["rohstoff", "commodity", "edelmetall"]):
-                    section = "commodity"
-                elif any(term in instrument_lower_normalized for term in ["forex", "währung", "devisen", "currency"]):
-                    section = "forex"
-                elif any(term in instrument_lower_normalized for term in ["geldmarkt", "money market", "deposit", "kasse", "bankguthaben"]):
-                    section = "deposit"
-                elif any(term in instrument_lower_normalized for term in ["bezugsrecht", "subscription right", "right"]):
-                    section = "rights"
-                # English terms (fallback)
-                elif "bond" in instrument_lower_normalized:
-                    section = "bond"
-                elif "stock" in instrument_lower_normalized or "equity" in instrument_lower_normalized:
-                    section = "stock"
-                elif "fund" in instrument_lower_normalized:
-                    section = "fund"
-                elif "option" in instrument_lower_normalized:
-                    section = "option"
-                elif "future" in instrument_lower_normalized:
-                    section = "future"
-                elif "warrant" in instrument_lower_normalized:
-                    section = "warrant"
-                elif "swap" in instrument_lower_normalized:
-                    section = "swap"
-                elif "commodity" in instrument_lower_normalized:
-                    section = "commodity"
-                elif "forex" in instrument_lower_normalized or "currency" in instrument_lower_normalized:
-                    section = "forex"
+            # Section from the instrument tables (exact, partial, then terms in the name)
+            section = resolve_section(instrument_lower, instrument_normalized)
 
             # Handle hierarchical sections (tuples) vs flat sections (strings)
             section_path = None
@@ -2277,71 +2320,6 @@ class AnalysisService:
                     ]
                 )
 
-                # Normalize instrument to word list for flexible matching
-                instrument_words = set(instrument_normalized.split())
-                
-                # German-to-English mapping for specific instruments
-                german_to_ocrd = {
-                    "stammaktien": "common_stock",
-                    "common stock": "common_stock",
-                    "vorzugsaktien": "preferred_stock",
-                    "preferred stock": "preferred_stock",
-                    "geldmarktinstrumente": "call_money",  # or time_deposit, cash
-                    "geldmarktprodukte": "call_money",
-                    "money market": "call_money",
-                    "credit default swap": "credit_default_swap",
-                    "credit-default-swap": "credit_default_swap",
-                    "interest swap": "interest_swap",
-                    "zinsswap": "interest_swap",
-                    "total return swap": "total_return_swap",
-                    "fx forward": "forex_outright",
-                    "forex forward": "forex_outright",
-                    "devisentermingeschäft": "forex_outright",
-                    "currency future": "forex_spot",
-                    "devisenfuture": "forex_spot",
-                    "bezugsrecht": "subscription_rights",
-                    "subscription right": "subscription_rights",
-                    "edelmetall": "precious_metal",
-                    "precious metal": "precious_metal",
-                    # Equity derivatives (critical for matching)
-                    "equity future": "single_stock_future",
-                    "equity futures": "single_stock_future",
-                    "aktienfutures": "single_stock_future",
-                    "equity index future": "index_future",
-                    "equity index futures": "index_future",
-                    "aktienindexfutures": "index_future",
-                    "equity option": "stock_option",
-                    "equity options": "stock_option",
-                    "aktienoptionen": "stock_option",
-                    "equity index option": "index_option",
-                    "equity index options": "index_option",
-                    "aktienindexoptionen": "index_option",
-                    # Interest rate futures (critical for correct classification)
-                    "interest rate future": "bond_future",
-                    "interest rate futures": "bond_future",
-                    "interest-rate future": "bond_future",
-                    "interest-rate futures": "bond_future",
-                    "zinsfutures": "bond_future",
-                    "zinsfuture": "bond_future",
-                    "zins futures": "bond_future",
-                    "zins future": "bond_future",
-                    "rentenfutures": "bond_future",
-                    "rentenfuture": "bond_future",
-                    "renten futures": "bond_future",
-                    "renten future": "bond_future",
-                    "geldmarktfutures": "bond_future",
-                    "geldmarktfuture": "bond_future",
-                    "geldmarkt futures": "bond_future",
-                    "geldmarkt future": "bond_future",
-                    "bond future": "bond_future",
-                    "bond futures": "bond_future",
-                    "money market future": "bond_future",
-                    "money market futures": "bond_future",
-                    # Handle German compound terms that might be extracted separately
-                    "zinsfutures renten und geldmarktfutures": "bond_future",
-                    "zinsfutures renten geldmarktfutures": "bond_future",
-                }
-                
                 # Helper function to get section data (all sections are now flat)
                 def get_section_data(section_path):
                     return data["sections"][section_path]
@@ -2351,9 +2329,8 @@ class AnalysisService:
                     data["sections"][section_path][key].update(value_dict)
                 
                 # Check if we have a direct German-to-OCRD mapping
-                instrument_lower_for_mapping = instrument_normalized.lower().strip()
-                if instrument_lower_for_mapping in german_to_ocrd:
-                    ocrd_key = german_to_ocrd[instrument_lower_for_mapping]
+                ocrd_key = direct_ocrd_key(instrument_normalized)
+                if ocrd_key:
                     section_data = get_section_data(section_path)
                     if ocrd_key in section_data:
                         # Ensure evidence text is not empty, especially for prohibited instruments
@@ -2371,167 +2348,54 @@ class AnalysisService:
                         continue
 
                 section_data = get_section_data(section_path)
-                for key in section_data:
-                    if key != "special_other_restrictions":
-                        # Normalize key name
-                        key_normalized = key.replace("_", " ").replace("-", " ")
-                        key_words = set(key_normalized.split())
-                        
-                        # Smart matching function that handles variations
-                        def matches_flexibly(instrument_str: str, instrument_word_set: set, key_str: str, key_word_set: set) -> bool:
-                            """Check if instrument matches key with flexible word matching"""
-                            # Exact match
-                            if instrument_str == key_str:
-                                return True
-                            
-                            # One contains the other (handles "commodity certificate" -> "commodity_certificate")
-                            if instrument_str in key_str or key_str in instrument_str:
-                                return True
-                            
-                            # Word-based matching: check if all significant words from instrument are in key
-                            # Significant words are those with 3+ characters (skip "the", "a", "an", etc.)
-                            significant_instrument_words = {w for w in instrument_word_set if len(w) >= 3}
-                            significant_key_words = {w for w in key_word_set if len(w) >= 3}
-                            
-                            # Special handling for equity derivatives:
-                            # "equity future" / "equity futures" should match "single_stock_future"
-                            # "equity option" / "equity options" should match "stock_option"
-                            # "equity index future" should match "index_future"
-                            # "equity index option" should match "index_option"
-                            # CRITICAL: Any variant of "index future" (equity index future, etc.) should match "index_future"
-                            # CRITICAL: Any variant of "index option" (equity index option, etc.) should match "index_option"
-                            equity_derivative_mappings = {
-                                ("equity", "future"): ("single", "stock", "future"),
-                                ("equity", "futures"): ("single", "stock", "future"),
-                                ("equity", "option"): ("stock", "option"),
-                                ("equity", "options"): ("stock", "option"),
-                                ("equity", "index", "future"): ("index", "future"),
-                                ("equity", "index", "futures"): ("index", "future"),
-                                ("equity", "index", "option"): ("index", "option"),
-                                ("equity", "index", "options"): ("index", "option"),
-                            }
-                            instrument_tuple = tuple(sorted(significant_instrument_words))
-                            if instrument_tuple in equity_derivative_mappings:
-                                expected_key_words = set(equity_derivative_mappings[instrument_tuple])
-                                if expected_key_words.issubset(significant_key_words):
-                                    return True
-                            
-                            # CRITICAL FIX: Handle any variant of index future/option matching to base category
-                            # If instrument contains "index" and "future" (or "futures"), and key is "index_future", match it
-                            # If instrument contains "index" and "option" (or "options"), and key is "index_option", match it
-                            # This ensures "equity index future" -> "index_future" and "equity index option" -> "index_option"
-                            has_index = "index" in significant_instrument_words
-                            has_future = "future" in significant_instrument_words or "futures" in significant_instrument_words
-                            has_option = "option" in significant_instrument_words or "options" in significant_instrument_words
-                            
-                            # Check if key is index_future
-                            is_index_future = "index" in significant_key_words and "future" in significant_key_words
-                            # Check if key is index_option
-                            is_index_option = "index" in significant_key_words and "option" in significant_key_words
-                            
-                            # Match any variant of index future to index_future
-                            if has_index and has_future and is_index_future:
-                                return True
-                            
-                            # Match any variant of index option to index_option
-                            if has_index and has_option and is_index_option:
-                                return True
-                            
-                            # Special handling for interest rate futures:
-                            # "interest rate future" / "interest rate futures" / "zinsfutures" should match "bond_future"
-                            # "rentenfutures" / "geldmarktfutures" should match "bond_future"
-                            # Also handle "Interest rate futures (bond and money market)" -> "bond_future"
-                            interest_rate_future_terms = {"interest", "rate", "zins", "renten", "geldmarkt", "bond", "money", "market"}
-                            bond_future_terms = {"bond", "future"}
-                            
-                            # Check if instrument contains interest rate future terms AND future/futures
-                            has_interest_rate_terms = bool(interest_rate_future_terms & significant_instrument_words)
-                            has_future_term = "future" in significant_instrument_words or "futures" in significant_instrument_words
-                            
-                            # Check if key is bond_future
-                            is_bond_future = bond_future_terms.issubset(significant_key_words)
-                            
-                            if has_interest_rate_terms and has_future_term and is_bond_future:
-                                return True
-                            
-                            # Also check if instrument contains "bond" and "future" together (for "bond future" variations)
-                            if "bond" in significant_instrument_words and has_future_term and is_bond_future:
-                                return True
-                            
-                            # If all significant instrument words are in key words, it's a match
-                            # E.g., "commodity certificate" -> ["commodity", "certificate"] both in "commodity_certificate"
-                            if significant_instrument_words and significant_instrument_words.issubset(significant_key_words):
-                                return True
-                            
-                            # Reverse: if all significant key words are in instrument words
-                            if significant_key_words and significant_key_words.issubset(significant_instrument_words):
-                                return True
-                            
-                            # Partial overlap: if at least 1 significant word matches (reduced from 2 for better matching)
-                            # This helps match "equity future" -> "single_stock_future" (both have "future")
-                            # E.g., "certificate" should match "commodity_certificate" if certificate is the main word
-                            overlap = significant_instrument_words & significant_key_words
-                            if len(overlap) >= min(1, len(significant_instrument_words), len(significant_key_words)):
-                                # Additional check: if one word matches and it's a key term (future, option, etc.)
-                                key_terms = {"future", "futures", "option", "options", "warrant", "warrants", "stock", "equity", "index"}
-                                if overlap & key_terms:  # If overlap contains any key term
-                                    return True
-                            
-                            return False
-                        
-                        # Check if instrument matches this key
-                        if matches_flexibly(instrument_normalized, instrument_words, key_normalized, key_words):
-                            # Calculate confidence for fallback match (simpler scoring)
-                            # Exact match = 0.9, partial match = 0.7, word-based = 0.5
-                            if instrument_normalized == key_normalized:
-                                confidence = 0.9
-                            elif instrument_normalized in key_normalized or key_normalized in instrument_normalized:
-                                confidence = 0.7
-                            else:
-                                confidence = 0.5
-                            
-                            # Found specific match - only update this one
-                            # CRITICAL: Instrument-level rules ALWAYS override section-level rules
-                            # This ensures that specific prohibitions (e.g., "Interest rate futures: Not Allowed")
-                            # take precedence over general allowances (e.g., "Derivatives: Allowed")
-                            # Check current value to preserve explicit prohibitions
-                            current_allowed = get_section_data(section_path)[key].get("allowed")
-                            current_note = get_section_data(section_path)[key].get("note", "")
-                            
-                            # If this is an instrument-level rule, it ALWAYS overrides section-level rules
-                            # Even if a section-level rule was already applied
-                            is_instrument_level_rule = "Instrument rule:" in current_note or current_note.startswith("Instrument rule:")
-                            is_section_level_rule = "Section-level rule:" in current_note or current_note.startswith("Section-level rule:")
-                            
-                            # Instrument-level rules always win, regardless of what was there before
-                            # Ensure evidence text is not empty, especially for prohibited instruments
-                            evidence_text = reason if reason else (
-                                f"{original_instrument} is {'allowed' if allowed else 'prohibited'}"
-                            )
-                            set_section_value(section_path, key, {
-                                "allowed": allowed,
-                                "confidence": confidence,
-                                "note": f"Instrument rule: {original_instrument} - {evidence_text} (Confidence: {confidence:.0%})",
-                                "evidence": {
-                                    "page": 1,
-                                    "text": evidence_text
-                                }
-                            })
-                            if is_section_level_rule:
-                                logger.info(
-                                    f"🔄 OVERRIDE: Instrument-level rule for '{original_instrument}' → '{key}' "
-                                    f"(allowed={allowed}) is overriding previous section-level rule "
-                                    f"(previous allowed={current_allowed})"
-                                )
-                            instrument_found = True
-                            match_msg = (
-                                f"[DEBUG] ✓ Matched '{original_instrument}' "
-                                f"(normalized='{instrument_normalized}') → '{key}' in '{section_path}' "
-                                f"(allowed={allowed}, confidence={confidence:.0%})"
-                            )
-                            logger.info(match_msg)  # Changed to info level for better visibility
-                            data["notes"].append(match_msg)  # Add to notes for visibility
-                            break  # Stop after first match to avoid duplicate matches
+                # First key of the section the instrument matches (flexible word matching)
+                match = match_section_key(
+                    instrument_normalized,
+                    tuple(key for key in section_data if key != "special_other_restrictions")
+                )
+                if match:
+                    key, confidence = match
+                    # Found specific match - only update this one
+                    # CRITICAL: Instrument-level rules ALWAYS override section-level rules
+                    # This ensures that specific prohibitions (e.g., "Interest rate futures: Not Allowed")
+                    # take precedence over general allowances (e.g., "Derivatives: Allowed")
+                    # Check current value to preserve explicit prohibitions
+                    current_allowed = get_section_data(section_path)[key].get("allowed")
+                    current_note = get_section_data(section_path)[key].get("note", "")
+                    
+                    # If this is an instrument-level rule, it ALWAYS overrides section-level rules
+                    # Even if a section-level rule was already applied
+                    is_instrument_level_rule = "Instrument rule:" in current_note or current_note.startswith("Instrument rule:")
+                    is_section_level_rule = "Section-level rule:" in current_note or current_note.startswith("Section-level rule:")
+                    
+                    # Instrument-level rules always win, regardless of what was there before
+                    # Ensure evidence text is not empty, especially for prohibited instruments
+                    evidence_text = reason if reason else (
+                        f"{original_instrument} is {'allowed' if allowed else 'prohibited'}"
+                    )
+                    set_section_value(section_path, key, {
+                        "allowed": allowed,
+                        "confidence": confidence,
+                        "note": f"Instrument rule: {original_instrument} - {evidence_text} (Confidence: {confidence:.0%})",
+                        "evidence": {
+                            "page": 1,
+                            "text": evidence_text
+                        }
+                    })
+                    if is_section_level_rule:
+                        logger.info(
+                            f"🔄 OVERRIDE: Instrument-level rule for '{original_instrument}' → '{key}' "
+                            f"(allowed={allowed}) is overriding previous section-level rule "
+                            f"(previous allowed={current_allowed})"
+                        )
+                    instrument_found = True
+                    match_msg = (
+                        f"[DEBUG] ✓ Matched '{original_instrument}' "
+                        f"(normalized='{instrument_normalized}') → '{key}' in '{section_path}' "
+                        f"(allowed={allowed}, confidence={confidence:.0%})"
+                    )
+                    logger.info(match_msg)  # Changed to info level for better visibility
+                    data["notes"].append(match_msg)  # Add to notes for visibility
 
                 # CRITICAL: For generic terms or section-level matches, if LLM says allowed=True, mark all as allowed
                 # Also handle cases where no specific match was found but we have a section
@@ -2757,12 +2621,12 @@ class AnalysisService:
                     # Only apply if not already set by explicit rule, or if this is more specific
                     if current_value.get("allowed") is None or "conservative default" in current_value.get("note", ""):
                         evidence_text = rule.reason if rule.reason else f"{rule.instrument} is {'allowed' if rule.allowed else 'prohibited'}"
-                        data["sections"]["future"]["index_future"] = {
+                        data["sections"]["future"]["index_future"].update({
                             "allowed": rule.allowed,
                             "confidence": 0.8,
                             "note": f"Instrument rule: {rule.instrument} → index_future - {evidence_text} (Confidence: 80%)",
                             "evidence": {"page": 1, "text": evidence_text}
-                        }
+                        })
                         logger.info(f"✅ Mapped '{rule.instrument}' → 'index_future' (allowed={rule.allowed})")
             
             if is_index_option_variant and "option" in data["sections"]:
@@ -2772,12 +2636,12 @@ class AnalysisService:
                     # Only apply if not already set by explicit rule, or if this is more specific
                     if current_value.get("allowed") is None or "conservative default" in current_value.get("note", ""):
                         evidence_text = rule.reason if rule.reason else f"{rule.instrument} is {'allowed' if rule.allowed else 'prohibited'}"
-                        data["sections"]["option"]["index_option"] = {
+                        data["sections"]["option"]["index_option"].update({
                             "allowed": rule.allowed,
                             "confidence": 0.8,
                             "note": f"Instrument rule: {rule.instrument} → index_option - {evidence_text} (Confidence: 80%)",
                             "evidence": {"page": 1, "text": evidence_text}
-                        }
+                        })
                         logger.info(f"✅ Mapped '{rule.instrument}' → 'index_option' (allowed={rule.allowed})")
         
         # POST-PROCESSING: 
@@ -2793,7 +2657,7 @@ class AnalysisService:
             if isinstance(section_data, dict):
                 # Handle all sections as flat (including future, option, warrant which are now top-level)
                 for key, value in section_data.items():
-                    if key != "special_other_restrictions" and isinstance(value, dict):
+                    if key != "special_other_restrictions" and isinstance(value, Mapping):
                         current_allowed = value.get("allowed")
                         evidence = value.get("evidence", {})
                         evidence_text = evidence.get("text", "")
@@ -2894,7 +2758,7 @@ class AnalysisService:
                 summary = {
                     key: value.get("allowed")
                     for key, value in section_data.items()
-                    if isinstance(value, dict) and key != "special_other_restrictions"
+                    if isinstance(value, Mapping) and key != "special_other_restrictions"
                 }
                 # Count by status
                 allowed_count = sum(1 for v in summary.values() if v is True)
@@ -2915,26 +2779,26 @@ class AnalysisService:
         final_allowed_count = sum(
             1 for section in data["sections"].values()
             for key, value in section.items()
-            if isinstance(value, dict) and value.get("allowed") is True
+            if isinstance(value, Mapping) and value.get("allowed") is True
         )
         
         final_prohibited_count = sum(
             1 for section in data["sections"].values()
             for key, value in section.items()
-            if isinstance(value, dict) and value.get("allowed") is False
+            if isinstance(value, Mapping) and value.get("allowed") is False
         )
         
         final_manual_approval_count = sum(
             1 for section in data["sections"].values()
             for key, value in section.items()
-            if isinstance(value, dict) and value.get("allowed") is None and value.get("note", "").startswith("Manual approval required")
+            if isinstance(value, Mapping) and value.get("allowed") is None and value.get("note", "").startswith("Manual approval required")
         )
         
         # Count total instruments
         total_instruments_count = sum(
             1 for section in data["sections"].values()
             for key, value in section.items()
-            if isinstance(value, dict) and "allowed" in value
+            if isinstance(value, Mapping) and "allowed" in value
         )
         
         final_debug = f"[DEBUG] After processing: {final_allowed_count} allowed, {final_prohibited_count} prohibited, {final_manual_approval_count} require manual approval (out of {total_instruments_count} total OCRD instruments)"
@@ -2957,7 +2821,7 @@ class AnalysisService:
                 summary = {
                     key: value.get("allowed")
                     for key, value in section_data.items()
-                    if isinstance(value, dict) and key != "special_other_restrictions"
+                    if isinstance(value, Mapping) and key != "special_other_restrictions"
                 }
                 # Count by status for quick diagnosis
                 true_count = sum(1 for v in summary.values() if v is True)
@@ -2982,7 +2846,7 @@ class AnalysisService:
         
         for section, items in data.get("sections", {}).items():
             for key, value in items.items():
-                if isinstance(value, dict) and "allowed" in value:
+                if isinstance(value, Mapping) and "allowed" in value:
                     total_instruments += 1
                     if value.get("allowed"):
                         allowed_instruments += 1
@@ -3024,7 +2888,7 @@ class AnalysisService:
         
         for section, items in data.get("sections", {}).items():
             for key, value in items.items():
-                if isinstance(value, dict) and value.get("allowed"):
+                if isinstance(value, Mapping) and value.get("allowed"):
                     evidence_text = value.get("evidence", {}).get("text", "")
                     if evidence_text:
                         evidence_length_sum += len(evidence_text)
@@ -3072,6 +2936,7 @@ class AnalysisService:
         try:
             # Convert LLM response to OCRD format (includes validation)
             ocrd_data = self._convert_llm_response_to_ocrd_format(llm_response)
+            ocrd_data["sections"] = ocrd_sections_json(ocrd_data["sections"])
             
             # Create Excel export
             excel_path = await self.file_handler.create_excel_export(ocrd_data)
@@ -0,0 +1,334 @@
+"""
+Batch Analysis
+Offline bulk mode for full re-runs where interactive latency does not matter.
+Instead of one synchronous chat completion per section / instrument group, every
+request of every document (AnalysisService.batch_requests) is written to one JSONL
+batch file, submitted through a provider batch interface and polled until done.
+The responses are then fed back through AnalysisService.analyze_batch_responses
+(_merge_section_results and _convert_llm_response_to_ocrd_format).
+
+Backends (BATCH_BACKEND):
+- openai: the OpenAI Batch API (files + batches, completion window BATCH_COMPLETION_WINDOW)
+- local: file-based stand-in that answers every request with the offline stub, for testing
+
+Requests already in the LLM response cache are not submitted, and batch responses
+are written to the cache, so an interactive re-run of the same documents is free.
+With the local backend the requests carry stub model names (stub_model), so stub
+answers are cached apart from real ones and never served to real-model calls.
+
+A batch directory (BATCH_DIR/<name>) holds the manifest, the document texts, the
+batch input file and, after collection, results.json. Use bulk_analyze.py to run it.
+"""
+import asyncio
+import json
+import os
+import re
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from .llm_cache import make_cache_key
+from .providers.stub_provider import StubPlan, stub_model
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Batch configuration
+# BATCH_BACKEND: openai (Batch API) or local (file-based stand-in answered by the offline stub)
+# BATCH_DIR: directory for batch manifests, input files and results
+# BATCH_POLL_INTERVAL: seconds between status checks
+# BATCH_COMPLETION_WINDOW: completion window requested from the Batch API
+BATCH_BACKEND = os.getenv("BATCH_BACKEND", "openai").lower()
+BATCH_DIR = os.getenv("BATCH_DIR", "var/batches")
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", "60"))
+BATCH_COMPLETION_WINDOW = os.getenv("BATCH_COMPLETION_WINDOW", "24h")
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_MAX_REQUESTS = 50000  # Batch API limit per input file
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+MANIFEST_FILE = "manifest.json"
+INPUT_FILE = "requests.jsonl"
+CACHED_FILE = "cached.jsonl"
+RESULTS_FILE = "results.json"
+
+
+class OpenAIBatchBackend:
+    """OpenAI Batch API (upload input file, create batch, download output/error files)"""
+
+    name = "openai"
+
+    def __init__(self, client):
+        if client is None:
+            raise ValueError("OpenAI client not initialized. Please set OPENAI_API_KEY environment variable.")
+        self.client = client
+
+    async def submit(self, input_path: str) -> str:
+        with open(input_path, "rb") as f:
+            uploaded = await self.client.files.create(file=f, purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=BATCH_COMPLETION_WINDOW
+        )
+        return batch.id
+
+    async def status(self, batch_id: str) -> Dict[str, Any]:
+        batch = await self.client.batches.retrieve(batch_id)
+        counts = getattr(batch, "request_counts", None)
+        return {
+            "status": batch.status,
+            "total": getattr(counts, "total", 0),
+            "completed": getattr(counts, "completed", 0),
+            "failed": getattr(counts, "failed", 0),
+            "output_file_id": getattr(batch, "output_file_id", None),
+            "error_file_id": getattr(batch, "error_file_id", None)
+        }
+
+    async def output_lines(self, status: Dict[str, Any]) -> List[Dict[str, Any]]:
+        lines = []
+        for file_id in (status.get("output_file_id"), status.get("error_file_id")):
+            if file_id:
+                content = await self.client.files.content(file_id)
+                lines.extend(json.loads(line) for line in content.text.splitlines() if line.strip())
+        return lines
+
+
+class LocalBatchBackend:
+    """
+    File-based stand-in for the Batch API: a submitted file is answered right away by
+    the offline stub and written in the Batch API output format.
+    """
+
+    name = "local"
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.path.join(BATCH_DIR, "local")
+
+    def _answer(self, input_path: str, batch_dir: str) -> Dict[str, Any]:
+        outputs = []
+        failed = 0
+        with open(input_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                plan = StubPlan(request["body"])
+                if plan.rate_limited:
+                    failed += 1
+                    outputs.append({"custom_id": request["custom_id"], "response": None, "error": {"code": "rate_limit_exceeded", "message": "Stub rate limit"}})
+                else:
+                    outputs.append({"custom_id": request["custom_id"], "response": {"status_code": 200, "body": plan.completion_dict()}, "error": None})
+
+        output_path = os.path.join(batch_dir, "output.jsonl")
+        with open(output_path, "w", encoding="utf-8") as f:
+            for output in outputs:
+                f.write(json.dumps(output) + "\n")
+        status = {"status": "completed", "total": len(outputs), "completed": len(outputs) - failed, "failed": failed, "output_file_id": output_path, "error_file_id": None}
+        with open(os.path.join(batch_dir, "status.json"), "w", encoding="utf-8") as f:
+            json.dump(status, f)
+        return status
+
+    async def submit(self, input_path: str) -> str:
+        batch_id = f"local_{uuid.uuid4().hex[:12]}"
+        batch_dir = os.path.join(self.directory, batch_id)
+        os.makedirs(batch_dir, exist_ok=True)
+        await asyncio.to_thread(self._answer, input_path, batch_dir)
+        return batch_id
+
+    async def status(self, batch_id: str) -> Dict[str, Any]:
+        with open(os.path.join(self.directory, batch_id, "status.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    async def output_lines(self, status: Dict[str, Any]) -> List[Dict[str, Any]]:
+        with open(status["output_file_id"], "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+
+def get_batch_backend(llm_service, name: Optional[str] = None):
+    """Batch backend by name (defaults to BATCH_BACKEND)"""
+    name = (name or BATCH_BACKEND).lower()
+    if name == "local":
+        return LocalBatchBackend()
+    if name == "openai":
+        return OpenAIBatchBackend(llm_service.client)
+    raise ValueError(f"Unknown batch backend: {name}")
+
+
+def _response_content(output: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """(content, finish_reason) of one Batch API output line (content None = the request failed)"""
+    response = output.get("response") or {}
+    if output.get("error") or response.get("status_code") != 200:
+        return None, None
+    choices = (response.get("body") or {}).get("choices") or []
+    if not choices:
+        return None, None
+    return (choices[0].get("message") or {}).get("content"), choices[0].get("finish_reason")
+
+
+class BulkAnalyzer:
+    """Prepares, submits, polls and collects offline batch analyses of many documents"""
+
+    def __init__(self, analysis_service, backend=None):
+        self.analysis = analysis_service
+        self.llm_service = analysis_service.llm_service
+        self.backend = backend or get_batch_backend(self.llm_service)
+
+    @staticmethod
+    def _load_manifest(batch_dir: str) -> Dict[str, Any]:
+        with open(os.path.join(batch_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _save_manifest(batch_dir: str, manifest: Dict[str, Any]) -> None:
+        with open(os.path.join(batch_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+    def prepare(self, documents: List[Tuple[str, str]], llm_provider: str, model: str, name: Optional[str] = None) -> str:
+        """
+        Write the batch input file for (fund_id, text) documents.
+
+        Returns:
+            the batch directory
+        """
+        name = name or datetime.now().strftime("batch_%Y%m%d_%H%M%S")
+        batch_dir = os.path.join(BATCH_DIR, name)
+        os.makedirs(os.path.join(batch_dir, "texts"), exist_ok=True)
+        cache = self.llm_service.response_cache
+
+        jobs = []
+        submitted = 0
+        cached = 0
+        with open(os.path.join(batch_dir, INPUT_FILE), "w", encoding="utf-8") as requests_file, \
+                open(os.path.join(batch_dir, CACHED_FILE), "w", encoding="utf-8") as cached_file:
+            for idx, (fund_id, text) in enumerate(documents, 1):
+                job_id = f"job{idx}_{re.sub(r'[^A-Za-z0-9_-]+', '_', fund_id)[:40]}"
+                with open(os.path.join(batch_dir, "texts", f"{job_id}.txt"), "w", encoding="utf-8") as f:
+                    f.write(text)
+
+                keys = {}  # key -> prompt version (the Batch API rejects extra fields in request lines)
+                for key, api_params, prompt_version in self.analysis.batch_requests(text, llm_provider, model):
+                    custom_id = f"{job_id}:{key}"
+                    keys[key] = prompt_version
+                    if self.backend.name == LocalBatchBackend.name:
+                        api_params = {**api_params, "model": stub_model(api_params.get("model"))}
+                    content = cache.get(make_cache_key(api_params, prompt_version)) if cache.enabled else None
+                    if content is not None:
+                        cached_file.write(json.dumps({"custom_id": custom_id, "content": content}) + "\n")
+                        cached += 1
+                        continue
+                    requests_file.write(json.dumps({
+                        "custom_id": custom_id,
+                        "method": "POST",
+                        "url": BATCH_ENDPOINT,
+                        "body": api_params
+                    }) + "\n")
+                    submitted += 1
+                jobs.append({"job_id": job_id, "fund_id": fund_id, "keys": keys})
+                logger.info(f"📦 Batch {name}: {fund_id} → {len(keys)} requests")
+
+        if submitted > BATCH_MAX_REQUESTS:
+            raise ValueError(f"Batch {name} has {submitted} requests - the Batch API accepts at most {BATCH_MAX_REQUESTS} per file, split the documents")
+
+        self._save_manifest(batch_dir, {
+            "name": name,
+            "backend": self.backend.name,
+            "llm_provider": llm_provider,
+            "model": model,
+            "created_at": datetime.now().isoformat(),
+            "batch_id": None,
+            "requests": submitted,
+            "cached": cached,
+            "jobs": jobs
+        })
+        logger.info(f"📦 Batch {name}: {submitted} requests to submit, {cached} served from the response cache")
+        return batch_dir
+
+    async def submit(self, batch_dir: str) -> Optional[str]:
+        """Submit the batch input file (None if every request was cached)"""
+        manifest = self._load_manifest(batch_dir)
+        if manifest.get("batch_id") or not manifest["requests"]:
+            return manifest.get("batch_id")
+        batch_id = await self.backend.submit(os.path.join(batch_dir, INPUT_FILE))
+        manifest["batch_id"] = batch_id
+        manifest["submitted_at"] = datetime.now().isoformat()
+        self._save_manifest(batch_dir, manifest)
+        logger.info(f"🚀 Batch {manifest['name']} submitted as {batch_id} ({self.backend.name})")
+        return batch_id
+
+    async def wait(self, batch_dir: str, poll_interval: float = BATCH_POLL_INTERVAL) -> Optional[Dict[str, Any]]:
+        """Poll until the batch reaches a terminal status"""
+        manifest = self._load_manifest(batch_dir)
+        if not manifest.get("batch_id"):
+            return None
+        while True:
+            status = await self.backend.status(manifest["batch_id"])
+            logger.info(f"⏳ Batch {manifest['name']}: {status['status']} ({status.get('completed', 0)}/{status.get('total', 0)} done, {status.get('failed', 0)} failed)")
+            if status["status"] in TERMINAL_STATUSES:
+                return status
+            await asyncio.sleep(poll_interval)
+
+    async def collect(self, batch_dir: str, status: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Feed the batch (and cached) responses back through the analysis pipeline.
+        Requests missing from a failed / expired batch count as failed; successful
+        responses are stored in the response cache.
+        """
+        manifest = self._load_manifest(batch_dir)
+        started = time.time()
+        contents: Dict[str, str] = {}
+
+        with open(os.path.join(batch_dir, CACHED_FILE), "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    cached = json.loads(line)
+                    contents[cached["custom_id"]] = cached["content"]
+
+        if manifest.get("batch_id"):
+            status = status or await self.backend.status(manifest["batch_id"])
+            prompt_versions = {f"{job['job_id']}:{key}": version for job in manifest["jobs"] for key, version in job["keys"].items()}
+            requests = {}
+            with open(os.path.join(batch_dir, INPUT_FILE), "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        request = json.loads(line)
+                        requests[request["custom_id"]] = request["body"]
+            cache = self.llm_service.response_cache
+            for output in await self.backend.output_lines(status):
+                content, finish_reason = _response_content(output)
+                custom_id = output.get("custom_id")
+                if content is None or custom_id not in requests:
+                    continue
+                contents[custom_id] = content
+                if cache.enabled and finish_reason != "length":
+                    body, prompt_version = requests[custom_id], prompt_versions[custom_id]
+                    cache.set(make_cache_key(body, prompt_version), content, body.get("model", ""), prompt_version)
+
+        results = []
+        for job in manifest["jobs"]:
+            with open(os.path.join(batch_dir, "texts", f"{job['job_id']}.txt"), "r", encoding="utf-8") as f:
+                text = f.read()
+            responses = {key: contents.get(f"{job['job_id']}:{key}") for key in job["keys"]}
+            try:
+                result = self.analysis.analyze_batch_responses(
+                    job["fund_id"], text, manifest["llm_provider"], manifest["model"], responses
+                )
+            except Exception as e:
+                logger.error(f"❌ Batch {manifest['name']}: {job['fund_id']} failed: {e}", exc_info=True)
+                result = {"fund_id": job["fund_id"], "error": str(e)}
+            results.append(result)
+
+        elapsed = time.time() - started
+        with open(os.path.join(batch_dir, RESULTS_FILE), "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, default=str)
+        answered = sum(1 for job in manifest["jobs"] for key in job["keys"] if f"{job['job_id']}:{key}" in contents)
+        total = sum(len(job["keys"]) for job in manifest["jobs"])
+        logger.info(f"✅ Batch {manifest['name']}: {len(results)} documents collected in {elapsed:.1f}s ({answered}/{total} requests answered)")
+        return results
+
+    async def run(self, documents: List[Tuple[str, str]], llm_provider: str, model: str, name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """prepare + submit + wait + collect"""
+        batch_dir = self.prepare(documents, llm_provider, model, name)
+        await self.submit(batch_dir)
+        status = await self.wait(batch_dir)
+        return await self.collect(batch_dir, status)
@@ -0,0 +1,201 @@
+"""
+Compact Extraction Output
+Optional output mode (EXTRACTION_OUTPUT_MODE=compact) that cuts completion tokens:
+the model gets short ids for the Excel mapping instruments and the OCRD instrument
+types (E1.., O1..) and a document with numbered lines, and answers with tuples instead of verbose objects:
+
+    {"i": [["E12", 1, [41, 42]], ["n:Wandelanleihen", 0, [57, 57]]],
+     "s": [["Tabak", 0, [80, 80]]], "c": [], "x": [["category", "detail"]]}
+
+i/s/c = instrument/sector/country rules, 1 = allowed, 0 = prohibited, [a, b] = first
+and last evidence line. Evidence text is recovered locally from the source lines, and
+expand_compact() turns the answer into the regular extraction format
+({"instrument_rules": [{"instrument", "allowed", "reason"}], ...}).
+
+Line numbers are used instead of character offsets - models cannot count characters
+reliably, but they copy the line labels they see.
+"""
+import hashlib
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from ..models.ocrd_taxonomy import OCRD_INSTRUMENT_IDS
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Output mode configuration
+# EXTRACTION_OUTPUT_MODE: "verbose" (objects with verbatim quotes) or "compact" (id tuples + line spans)
+# COMPACT_MAX_LINE_CHARS: longer source lines are split so evidence spans stay precise
+# COMPACT_MAX_EVIDENCE_CHARS: recovered evidence is cut to this length
+EXTRACTION_OUTPUT_MODE = os.getenv("EXTRACTION_OUTPUT_MODE", "verbose").strip().lower()
+COMPACT_MAX_LINE_CHARS = int(os.getenv("COMPACT_MAX_LINE_CHARS", "300"))
+COMPACT_MAX_EVIDENCE_CHARS = int(os.getenv("COMPACT_MAX_EVIDENCE_CHARS", "600"))
+
+COMPACT_PROMPT_VERSION = "extraction-compact-v2"
+FREE_NAME_PREFIX = "n:"
+
+COMPACT_KEYS = {"i": ("instrument_rules", "instrument"), "s": ("sector_rules", "sector"), "c": ("country_rules", "country")}
+
+COMPACT_OUTPUT_INSTRUCTIONS = """**COMPACT OUTPUT FORMAT (replaces every JSON format described above):**
+The document lines are numbered as `L<n>| text`. Instruments are referenced by their catalog id.
+Return ONLY this JSON object - no reasons, no quotes, no other fields:
+{"i": [["E12", 1, [41, 42]]], "s": [["Tabak", 0, [80, 80]]], "c": [["Russland", 0, [95, 95]]], "x": [["category", "detail"]]}
+- "i": instrument rules as [id, verdict, [first_line, last_line]]; id = catalog id of the instrument, or "n:<exact name from document>" if no catalog entry matches
+- Catalog ids: E<n> = instrument categories of the mapping (prefer these), O<n> = OCRD instrument types (section.type) for instruments without an E entry
+- "s" / "c": sector / country rules as [exact name from document, verdict, [first_line, last_line]]
+- verdict: 1 = allowed, 0 = prohibited
+- [first_line, last_line]: line numbers of the evidence (the table row, bullet or sentence), e.g. [41, 41]
+- "x": conflicts as [category, detail]
+- One entry per rule; every rule from the instructions above still has to be extracted
+"""
+
+
+def is_compact_mode() -> bool:
+    return EXTRACTION_OUTPUT_MODE == "compact"
+
+
+class InstrumentCatalog:
+    """Excel mapping instrument categories (E1, E2, ...) and OCRD instrument ids (O1, O2, ...) with short ids"""
+
+    def __init__(self, names: Iterable[str], ocrd_ids: Iterable[str] = OCRD_INSTRUMENT_IDS):
+        self.names: List[str] = list(dict.fromkeys(n.strip() for n in names if n and n.strip() and n.strip() != "nan"))
+        self.ocrd_ids: List[str] = list(ocrd_ids)
+        self.ids = {f"E{idx}": name for idx, name in enumerate(self.names, 1)}
+        self.ids.update({f"O{idx}": ocrd_id for idx, ocrd_id in enumerate(self.ocrd_ids, 1)})
+        self.fingerprint = hashlib.sha256("\n".join(self.names + self.ocrd_ids).encode("utf-8")).hexdigest()[:12]
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Dict[str, Any]]) -> "InstrumentCatalog":
+        return cls(str(entry.get("instrument_category", "")) for entry in entries)
+
+    def prompt_block(self) -> str:
+        if not self.ids:
+            return "**INSTRUMENT CATALOG:** (empty - use \"n:<exact name>\" for every instrument)\n"
+        lines = "\n".join(f"{item_id}: {name}" for item_id, name in self.ids.items())
+        return f"**INSTRUMENT CATALOG (id: name):**\n{lines}\n"
+
+    def resolve(self, ref: Any) -> Optional[str]:
+        """Instrument name for a catalog id or "n:<name>" reference"""
+        ref = str(ref or "").strip()
+        if ref.startswith(FREE_NAME_PREFIX):
+            return ref[len(FREE_NAME_PREFIX):].strip() or None
+        return self.ids.get(ref.upper())
+
+
+def build_compact_instructions(base_instructions: str, catalog: InstrumentCatalog) -> str:
+    """
+    Compact variant of the extraction instructions: the domain guidance of
+    base_instructions, the compact output format and the catalog, then the numbered document
+    """
+    guidance = base_instructions.rsplit("**Document text to analyze", 1)[0]
+    return (
+        f"{guidance}{COMPACT_OUTPUT_INSTRUCTIONS}\n{catalog.prompt_block()}\n"
+        "**Document text to analyze (numbered lines `L<n>| text`):**\n"
+    )
+
+
+class NumberedDocument:
+    """Document text with numbered lines and their character spans in the source"""
+
+    _SENTENCE_BREAK = re.compile(r"(?<=[.;:!?])\s+")
+    _SPACE = re.compile(r"\s+")
+
+    def __init__(self, text: str, max_line_chars: int = COMPACT_MAX_LINE_CHARS):
+        self.source = text
+        self.spans: List[Tuple[int, int]] = []
+        position = 0
+        for line in text.split("\n"):
+            start, end = position, position + len(line)
+            position = end + 1
+            if line.strip():
+                self.spans.extend(self._split(start, end, max_line_chars))
+        self.text = "\n".join(f"L{n}| {self.source[s:e].strip()}" for n, (s, e) in enumerate(self.spans, 1))
+
+    def _split(self, start: int, end: int, max_chars: int) -> List[Tuple[int, int]]:
+        pieces = []
+        while end - start > max_chars:
+            window = self.source[start:start + max_chars]
+            # Prefer sentence ends, then any whitespace, in the second half of the window
+            breaks = [m.end() for m in self._SENTENCE_BREAK.finditer(window) if m.end() > max_chars // 2]
+            breaks = breaks or [m.end() for m in self._SPACE.finditer(window) if m.end() > max_chars // 2]
+            cut = start + (breaks[-1] if breaks else max_chars)
+            pieces.append((start, cut))
+            start = cut
+        pieces.append((start, end))
+        return pieces
+
+    def evidence(self, span: Any) -> str:
+        """Source text of a [first_line, last_line] span ("" if invalid)"""
+        try:
+            first, last = int(span[0]), int(span[-1])
+        except (TypeError, ValueError, IndexError, KeyError):
+            return ""
+        first, last = min(first, last), max(first, last)
+        if first < 1 or last > len(self.spans):
+            return ""
+        text = " ".join(self.source[self.spans[first - 1][0]:self.spans[last - 1][1]].split())
+        return text[:COMPACT_MAX_EVIDENCE_CHARS]
+
+
+def _json_object(raw: str) -> Dict[str, Any]:
+    cleaned = raw.strip()
+    start, end = cleaned.find("{"), cleaned.rfind("}") + 1
+    if start == -1 or end <= start:
+        raise ValueError(f"Compact LLM response does not contain a JSON object. Response preview: {cleaned[:300]}")
+    payload = json.loads(cleaned[start:end])
+    if not isinstance(payload, dict):
+        raise ValueError("Compact LLM response is not a JSON object")
+    return payload
+
+
+_TUPLE = re.compile(r'\[\s*"((?:[^"\\]|\\.)*)"\s*,\s*([01])\s*,\s*\[\s*(\d+)\s*(?:,\s*(\d+)\s*)?\]\s*\]')
+_KEY = re.compile(r'"([isc])"\s*:\s*\[')
+
+
+def salvage_compact(raw: str) -> Optional[Dict[str, Any]]:
+    """Complete rule tuples of a truncated compact response (None if there are none)"""
+    keys = [(m.start(), m.group(1)) for m in _KEY.finditer(raw)]
+    if not keys:
+        return None
+    payload: Dict[str, List[Any]] = {key: [] for key in COMPACT_KEYS}
+    for match in _TUPLE.finditer(raw):
+        owner = [key for pos, key in keys if pos < match.start()]
+        if not owner:
+            continue
+        last = int(match.group(4) or match.group(3))
+        payload[owner[-1]].append([match.group(1), int(match.group(2)), [int(match.group(3)), last]])
+    return payload if any(payload.values()) else None
+
+
+def expand_compact(payload: Dict[str, Any], catalog: InstrumentCatalog, document: NumberedDocument) -> Dict[str, Any]:
+    """Regular extraction result from a compact answer (evidence recovered from the source)"""
+    result: Dict[str, Any] = {"sector_rules": [], "country_rules": [], "instrument_rules": [], "conflicts": []}
+    dropped = 0
+    for key, (rules_key, field) in COMPACT_KEYS.items():
+        for item in payload.get(key) or []:
+            if not isinstance(item, (list, tuple)) or len(item) < 2:
+                dropped += 1
+                continue
+            name = catalog.resolve(item[0]) if key == "i" else str(item[0] or "").strip()
+            if not name or item[1] not in (0, 1, True, False):
+                dropped += 1
+                continue
+            evidence = document.evidence(item[2]) if len(item) > 2 else ""
+            result[rules_key].append({field: name, "allowed": bool(item[1]), "reason": evidence or name})
+    for conflict in payload.get("x") or []:
+        if isinstance(conflict, (list, tuple)) and conflict:
+            result["conflicts"].append({"category": str(conflict[0]), "detail": str(conflict[1]) if len(conflict) > 1 else ""})
+    if dropped:
+        logger.warning(f"⚠️ Compact output: dropped {dropped} malformed or unknown entries")
+    return result
+
+
+def parse_compact(raw: str, catalog: InstrumentCatalog, document: NumberedDocument) -> Dict[str, Any]:
+    """Parse and expand a compact response; raises ValueError if it is not JSON"""
+    try:
+        payload = _json_object(raw)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid compact JSON: {e}") from e
+    return expand_compact(payload, catalog, document)
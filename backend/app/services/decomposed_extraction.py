@@ -0,0 +1,119 @@
+"""
+Decomposed Extraction
+Optional extraction mode (EXTRACTION_DECOMPOSED_ENABLED) that replaces the single
+prompt asking for instrument, sector and country rules at once with one focused
+request per rule family, run concurrently over the same text. Each family has its
+own completion cap, so latency tracks the slowest family instead of one long
+completion, and a truncated or failed family does not take the others with it.
+
+The family results are combined with AnalysisService._merge_section_results, the
+same merge that combines section results.
+"""
+import asyncio
+import os
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+from .prompt_prefix import StaticPromptPrefix
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Decomposition configuration
+# EXTRACTION_DECOMPOSED_ENABLED: one concurrent request per rule family instead of one combined request
+# EXTRACTION_INSTRUMENT_MAX_TOKENS / _SECTOR_ / _COUNTRY_: completion cap per family
+EXTRACTION_DECOMPOSED_ENABLED = os.getenv("EXTRACTION_DECOMPOSED_ENABLED", "false").lower() == "true"
+EXTRACTION_INSTRUMENT_MAX_TOKENS = int(os.getenv("EXTRACTION_INSTRUMENT_MAX_TOKENS", "4000"))
+EXTRACTION_SECTOR_MAX_TOKENS = int(os.getenv("EXTRACTION_SECTOR_MAX_TOKENS", "1500"))
+EXTRACTION_COUNTRY_MAX_TOKENS = int(os.getenv("EXTRACTION_COUNTRY_MAX_TOKENS", "1500"))
+
+DECOMPOSED_PROMPT_VERSION = "extraction-family-v1"
+
+# family -> (result keys it answers, completion cap, focus)
+RULE_FAMILIES: Dict[str, Tuple[Tuple[str, ...], int, str]] = {
+    "instruments": (
+        ("instrument_rules", "conflicts"),
+        EXTRACTION_INSTRUMENT_MAX_TOKENS,
+        "instrument types and asset classes (equities, bonds, derivatives, funds, certificates, ...)"
+    ),
+    "sectors": (
+        ("sector_rules",),
+        EXTRACTION_SECTOR_MAX_TOKENS,
+        "sectors and industries (e.g. tobacco, weapons, coal, gambling)"
+    ),
+    "countries": (
+        ("country_rules",),
+        EXTRACTION_COUNTRY_MAX_TOKENS,
+        "countries and regions (e.g. Russia, emerging markets)"
+    )
+}
+
+# family -> analysis dict for that family
+FamilyExtractFn = Callable[[str], Awaitable[Dict[str, Any]]]
+
+
+def is_decomposed_mode() -> bool:
+    return EXTRACTION_DECOMPOSED_ENABLED
+
+
+def family_focus(family: str) -> str:
+    """Instructions that narrow the extraction prompt to one rule family"""
+    keys, _, subject = RULE_FAMILIES[family]
+    answer = ", ".join(f'"{key}": [...]' for key in keys)
+    return (
+        "**FOCUSED TASK (replaces the output scope described above):**\n"
+        f"RULE FAMILY: {keys[0]}\n"
+        f"Extract ONLY rules about {subject}. Other rule types are extracted by separate requests - leave them out.\n"
+        f"Use the same rule fields as above and return ONLY this JSON object: {{{answer}}}\n\n"
+    )
+
+
+@lru_cache(maxsize=16)
+def family_prefix(family: str, system: str, base_instructions: str) -> StaticPromptPrefix:
+    """Static prefix for one family: extraction guidance + focus, document header last"""
+    guidance, header = base_instructions.rsplit("**Document text to analyze", 1)
+    return StaticPromptPrefix(
+        f"extraction_{family}",
+        DECOMPOSED_PROMPT_VERSION,
+        system,
+        f"{guidance}{family_focus(family)}**Document text to analyze{header}"
+    )
+
+
+def family_result(family: str, analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep only the keys a family answers (models sometimes return the full schema)"""
+    keys = RULE_FAMILIES[family][0]
+    result: Dict[str, Any] = {"sector_rules": [], "country_rules": [], "instrument_rules": [], "conflicts": []}
+    for key in keys:
+        value = analysis.get(key) if isinstance(analysis, dict) else None
+        result[key] = value if isinstance(value, list) else []
+    return result
+
+
+async def extract_decomposed(
+    extract_family: FamilyExtractFn,
+    merge: Callable[[List[Dict[str, Any]]], Dict[str, Any]],
+    label: str = "document"
+) -> Dict[str, Any]:
+    """
+    Run every rule family concurrently and merge the results.
+
+    A failed family is logged and left out; only if every family fails is the
+    first error raised (so section retries / fallbacks still apply).
+    """
+    families = list(RULE_FAMILIES)
+    outcomes = await asyncio.gather(*(extract_family(family) for family in families), return_exceptions=True)
+
+    results: List[Dict[str, Any]] = []
+    errors: List[BaseException] = []
+    for family, outcome in zip(families, outcomes):
+        if isinstance(outcome, BaseException):
+            logger.warning(f"⚠️ Decomposed extraction: {family} failed on {label}: {str(outcome)[:160]}")
+            errors.append(outcome)
+        else:
+            results.append(family_result(family, outcome))
+
+    if not results:
+        raise errors[0]
+    if errors:
+        logger.warning(f"⚠️ Decomposed extraction: {len(results)}/{len(families)} rule families extracted for {label}")
+    return merge(results)
@@ -9,10 +9,43 @@ from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 import re
 from difflib import get_close_matches
+from ..models.ocrd_taxonomy import OCRD_IDS
+from .job_budget import stage_timeout
 from ..utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# Version of the per-entry search prompt (part of the LLM response cache key)
+EXCEL_SEARCH_PROMPT_VERSION = "excel-entry-v1"
+EXCEL_BATCH_PROMPT_VERSION = "excel-batch-v1"
+
+# Excel LLM search configuration
+# EXCEL_LLM_SEARCH_MODE: "batched" (groups of instruments per call), "retrieval" (per instrument on
+#   RAG-retrieved chunks) or "per_entry" (one call per instrument on the full document)
+# EXCEL_BATCH_SIZE: instruments per batched prompt
+# EXCEL_BATCH_CONCURRENCY: batched prompts in flight at the same time
+# EXCEL_BATCH_TIMEOUT: seconds allowed per batched prompt (less if the job budget runs out)
+EXCEL_LLM_SEARCH_MODE = os.getenv("EXCEL_LLM_SEARCH_MODE", "batched").lower()
+EXCEL_BATCH_SIZE = int(os.getenv("EXCEL_BATCH_SIZE", "20"))
+EXCEL_BATCH_CONCURRENCY = int(os.getenv("EXCEL_BATCH_CONCURRENCY", "4"))
+EXCEL_BATCH_TIMEOUT = float(os.getenv("EXCEL_BATCH_TIMEOUT", "120"))
+
+# Retrieval-scoped search ("retrieval" mode) - classifies each instrument on chunks from the RAG index
+# EXCEL_RETRIEVAL_TOP_K: chunks retrieved per instrument (before neighbour expansion)
+# EXCEL_RETRIEVAL_NEIGHBORS: neighbouring chunks added on each side of a hit
+# EXCEL_RETRIEVAL_MAX_QUERIES: instrument name + synonyms used as queries
+# EXCEL_RETRIEVAL_MAX_CONTEXT: max context chars per prompt
+# EXCEL_RETRIEVAL_CONCURRENCY: retrievals / LLM calls in flight
+# EXCEL_RETRIEVAL_TIMEOUT: seconds allowed per instrument call (less if the job budget runs out)
+# RAG_VECTORDB_DIR: Chroma directory the upload pipeline indexes into
+EXCEL_RETRIEVAL_TOP_K = int(os.getenv("EXCEL_RETRIEVAL_TOP_K", "5"))
+EXCEL_RETRIEVAL_NEIGHBORS = int(os.getenv("EXCEL_RETRIEVAL_NEIGHBORS", "1"))
+EXCEL_RETRIEVAL_MAX_QUERIES = int(os.getenv("EXCEL_RETRIEVAL_MAX_QUERIES", "4"))
+EXCEL_RETRIEVAL_MAX_CONTEXT = int(os.getenv("EXCEL_RETRIEVAL_MAX_CONTEXT", "12000"))
+EXCEL_RETRIEVAL_CONCURRENCY = int(os.getenv("EXCEL_RETRIEVAL_CONCURRENCY", "8"))
+EXCEL_RETRIEVAL_TIMEOUT = float(os.getenv("EXCEL_RETRIEVAL_TIMEOUT", "30"))
+EXCEL_RETRIEVAL_VECTORDB_DIR = os.getenv("RAG_VECTORDB_DIR", "var/chroma")
+
 # =========================
 # NEW: Guardrails & Helpers
 # =========================
@@ -32,6 +65,35 @@ def _normalize_simple(s: str) -> str:
 def _is_generic_parent(term: str) -> bool:
     return _normalize_simple(term) in GENERIC_PARENTS
 
+def _split_document_chunks(document_text: str, max_chunk_size: int = 200000, overlap: int = 5000) -> List[str]:
+    """Split a document into overlapping chunks small enough for one LLM prompt"""
+    if len(document_text) <= max_chunk_size:
+        return [document_text]
+    chunks = []
+    start = 0
+    while start < len(document_text):
+        end = min(start + max_chunk_size, len(document_text))
+        chunks.append(document_text[start:end])
+        if end == len(document_text):
+            break
+        start = end - overlap
+    return chunks
+
+def _entry_ocrd_ids(entry: Dict) -> List[str]:
+    """OCRD IDs (asset tree types) for a mapping entry"""
+    type1 = entry.get('asset_tree_type1', '').strip()
+    type2 = entry.get('asset_tree_type2', '').strip()
+    type3 = entry.get('asset_tree_type3', '').strip()
+    ocrd_ids = []
+    if type1: ocrd_ids.append(type1)
+    if type2 and type2 != 'nan':
+        ocrd_ids.append(f"{type1}.{type2}" if type1 else type2)
+    if type3 and type3 != 'nan':
+        for part in [p.strip() for p in type3.split(',')]:
+            if part and part != 'nan':
+                ocrd_ids.append(part)
+    return ocrd_ids
+
 def _sentence_window(text: str, pos: int, span: int = 260) -> str:
     start = max(0, pos - span)
     end = min(len(text), pos + span)
@@ -552,48 +614,30 @@ class ExcelMappingService:
         except Exception as e:
             raise Exception(f"Failed to export Excel: {str(e)}")
     
-    async def search_document_with_llm(self, document_text: str, llm_service, llm_provider: str, model: str) -> Dict:
+    async def search_document_with_llm(self, document_text: str, llm_service, llm_provider: str, model: str, mode: Optional[str] = None, doc_id: Optional[str] = None) -> Dict:
         """
         Search document for ALL Excel entries (Column A terms) using LLM with OCRD IDs and semantic matching.
         DEMO-SAFE: conservative defaults, explicit evidence only, no parent roll-up without quantifier.
+        
+        mode: "retrieval", "batched" or "per_entry" (defaults to EXCEL_LLM_SEARCH_MODE)
+        doc_id: RAG index document id (trace_id) - required for retrieval mode
         """
+        mode = (mode or EXCEL_LLM_SEARCH_MODE).lower()
+        if mode == "retrieval":
+            if doc_id:
+                return await self._search_document_retrieval(document_text, llm_service, doc_id, llm_provider)
+            logger.warning("Retrieval-scoped search needs a doc_id - using batched search instead")
+            mode = "batched"
+        if mode == "batched":
+            return await self._search_document_batched(document_text, llm_service, llm_provider)
+        
         matches_found = 0
         allowed_found = 0
         prohibited_found = 0
         
         logger.info(f"🔍 Searching document for {len(self.mapping_data)} Excel entries using LLM semantic analysis...")
         
-        ocrd_taxonomy = {
-            "bond": ["covered_bond", "asset_backed_security", "mortgage_bond", "pfandbrief", "public_mortgage_bond", 
-                    "convertible_bond_regular", "convertible_bond_coco", "reverse_convertible", "credit_linked_note", 
-                    "commercial_paper", "genussscheine_bondlike", "inflation_linked", "participation_paper", 
-                    "plain_vanilla_bond", "promissory_note", "warrant_linked_bond"],
-            "certificate": ["bond_certificate", "commodity_certificate", "currency_certificate", "fund_certificate", 
-                           "index_certificate", "stock_certificate"],
-            "stock": ["common_stock", "depositary_receipt", "genussschein_stocklike", "partizipationsschein", 
-                     "preferred_stock", "reit", "right"],
-            "fund": ["alternative_investment_fund", "commodity_fund", "equity_fund", "fixed_income_fund", 
-                    "mixed_allocation_fund", "moneymarket_fund", "private_equity_fund", "real_estate_fund", "speciality_fund"],
-            "deposit": ["call_money", "cash", "time_deposit"],
-            "future": ["bond_future", "commodity_future", "currency_future", "fund_future", "index_future", "single_stock_future"],
-            "option": ["bond_future_option", "commodity_future_option", "commodity_option", 
-                      "currency_future_option", "currency_option", "fund_future_option", "fund_option", 
-                      "index_future_option", "index_option", "stock_option"],
-            "warrant": ["commodity_warrant", "currency_warrant", "fund_warrant", "index_warrant", "stock_warrant"],
-            "commodity": ["precious_metal"],
-            "forex": ["forex_outright", "forex_spot"],
-            "swap": ["credit_default_swap", "interest_swap", "total_return_swap"],
-            "loan": [],
-            "private_equity": [],
-            "real_estate": [],
-            "rights": ["subscription_rights"]
-        }
-        all_ocrd_ids = []
-        for category, ids in ocrd_taxonomy.items():
-            all_ocrd_ids.extend([f"{category}.{id}" for id in ids])
-            if not ids:
-                all_ocrd_ids.append(category)
-        ocrd_ids_text = "\n".join([f"- {id}" for id in all_ocrd_ids[:50]])
+        ocrd_ids_text = "\n".join([f"- {id}" for id in OCRD_IDS[:50]])
 
         for entry_idx, entry in enumerate(self.mapping_data, 1):
             instrument_name = entry['instrument_category'].strip()
@@ -601,32 +645,14 @@ class ExcelMappingService:
                 continue
             
             logger.info(f"🔍 [{entry_idx}/{len(self.mapping_data)}] Analyzing: '{instrument_name}'")
-            type1 = entry.get('asset_tree_type1', '').strip()
-            type2 = entry.get('asset_tree_type2', '').strip()
-            type3 = entry.get('asset_tree_type3', '').strip()
-            ocrd_ids_for_entry = []
-            if type1: ocrd_ids_for_entry.append(type1)
-            if type2 and type2 != 'nan':
-                ocrd_ids_for_entry.append(f"{type1}.{type2}" if type1 else type2)
-            if type3 and type3 != 'nan':
-                for part in [p.strip() for p in type3.split(',')]:
-                    if part and part != 'nan':
-                        ocrd_ids_for_entry.append(part)
+            ocrd_ids_for_entry = _entry_ocrd_ids(entry)
             ocrd_ids_str = ", ".join(ocrd_ids_for_entry) if ocrd_ids_for_entry else "N/A"
             logger.info(f"   📋 OCRD IDs to check: {ocrd_ids_str}")
             
             try:
                 import json
-                max_chunk_size = 200000
-                if len(document_text) > max_chunk_size:
-                    chunk_size = max_chunk_size
-                    overlap = 5000
-                    document_chunks = []
-                    start = 0
-                    while start < len(document_text):
-                        end = min(start + chunk_size, len(document_text))
-                        document_chunks.append(document_text[start:end])
-                        start = end - overlap
+                if len(document_text) > 200000:
+                    document_chunks = _split_document_chunks(document_text)
                     logger.info(f"   📄 Document split into {len(document_chunks)} chunks (total size: {len(document_text)} chars)")
                 else:
                     document_chunks = [document_text]
@@ -787,7 +813,7 @@ Respond with ONLY a JSON object:
                         # Add timeout to prevent hanging (30 seconds per chunk)
                         import asyncio
                         llm_response = await asyncio.wait_for(
-                            llm_service.analyze_text(llm_prompt),
+                            llm_service.analyze_text(llm_prompt, prompt_version=EXCEL_SEARCH_PROMPT_VERSION, provider=llm_provider),
                             timeout=30.0
                         )
                         logger.info(f"   LLM Response received (type: {type(llm_response).__name__})")
@@ -866,6 +892,277 @@ Respond with ONLY a JSON object:
                 entry['allowed'] = None
                 entry['reason'] = f"LLM error: {str(e)}"
         
+        return self._search_summary(matches_found, allowed_found, prohibited_found)
+    
+    def build_batch_prompt(self, chunk: str, group: List[Tuple[str, Dict]]) -> str:
+        """
+        Build one multi-instrument classification prompt.
+        Static instructions come first and the document precedes the instrument list,
+        so all groups for the same chunk share the longest possible prompt prefix.
+        """
+        instrument_lines = []
+        for item_id, entry in group:
+            ocrd_ids = _entry_ocrd_ids(entry)
+            ocrd_part = f" (OCRD: {', '.join(ocrd_ids)})" if ocrd_ids else ""
+            instrument_lines.append(f'{item_id}: "{entry["instrument_category"].strip()}"{ocrd_part}')
+        instruments_text = "\n".join(instrument_lines)
+
+        return f"""You are classifying whether specific instruments are ALLOWED or PROHIBITED in an investment policy document. Finding ALLOWED items is just as important as finding prohibited ones.
+
+**CLASSIFICATION RULES (apply to each instrument separately):**
+1. Work at the SENTENCE, BULLET, or TABLE ROW level and only use explicit evidence from the document.
+2. "Ja/yes", "Ja / yes", "Ja", "yes", "erlaubt", "zulässig", "zugelassen", "darf", "allowed", "permitted", "may invest", "eligible" next to the instrument → allowed
+3. "nein/no", "nein", "no", "verboten", "nicht erlaubt", "ausgeschlossen", "darf nicht", "unzulässig", "prohibited", "not allowed", "excluded", "may not invest" → prohibited
+4. "X" (cross) or "✓" in the "ja" column → allowed; "X" in the "nein" column or a "-" (dash) mark → prohibited
+5. Listed under "Zulässige Anlagen" / "Permitted Investments" → allowed; under "Unzulässige Anlagen" / "Prohibited Investments" → prohibited
+6. Conditional permission ("subject to", "up to", "provided that", "max X%") → allowed, keep the condition in the quote
+7. Semantic matches count (e.g. "Staatsanleihen / Government Bonds: Ja/yes" matches "Government Bonds"), but do NOT infer from broader categories.
+8. A parent category (e.g. "Bonds", "Renten") marked "Ja/yes" does NOT make every subtype allowed - check subtype rows separately.
+9. Generic parents (bonds, equities, derivatives) are only allowed when the sentence says "all", "any" or "including but not limited to".
+10. If an instrument is mentioned but its status is unclear → found=1 without "a".
+
+**Document excerpt to search:**
+{chunk}
+
+**INSTRUMENTS TO CHECK (id: name, OCRD IDs):**
+{instruments_text}
+
+Respond with ONLY a JSON object containing one verdict per instrument id you found in the document (omit instruments that are not mentioned):
+{{"v": [{{"id": "I1", "f": 1, "a": 1, "m": "matched phrase", "o": "OCRD ID or N/A", "q": "verbatim quote, max 200 chars"}}]}}
+- "f": 1 if the instrument (or a semantic match) is mentioned
+- "a": 1 = allowed, 0 = prohibited; omit "a" if there is no explicit allowed/prohibited evidence"""
+
+    async def _search_document_batched(self, document_text: str, llm_service, llm_provider: Optional[str] = None) -> Dict:
+        """
+        Batched LLM search: classify groups of EXCEL_BATCH_SIZE instruments per call instead of
+        one call per instrument, with up to EXCEL_BATCH_CONCURRENCY calls in flight.
+        Verdicts are applied to the entries with the same semantics as the per-entry search
+        (first chunk with explicit evidence wins).
+        """
+        import asyncio
+
+        groups, document_chunks = self.batch_search_plan(document_text)
+
+        logger.info(
+            f"🔍 Batched LLM search: {sum(len(group) for group in groups)} entries in {len(groups)} groups x {len(document_chunks)} chunk(s) "
+            f"(batch size {EXCEL_BATCH_SIZE}, concurrency {EXCEL_BATCH_CONCURRENCY})"
+        )
+
+        semaphore = asyncio.Semaphore(max(1, EXCEL_BATCH_CONCURRENCY))
+
+        async def classify(group_idx: int, chunk_idx: int) -> Optional[Dict[str, Dict]]:
+            prompt = self.build_batch_prompt(document_chunks[chunk_idx], groups[group_idx])
+            async with semaphore:
+                try:
+                    response = await asyncio.wait_for(
+                        llm_service.analyze_text(prompt, prompt_version=EXCEL_BATCH_PROMPT_VERSION, provider=llm_provider),
+                        timeout=stage_timeout("excel_search", EXCEL_BATCH_TIMEOUT)
+                    )
+                except asyncio.TimeoutError:
+                    logger.warning(f"   Batch {group_idx + 1}/{len(groups)} chunk {chunk_idx + 1} timed out - skipping")
+                    return None
+                except Exception as e:
+                    logger.warning(f"   Batch {group_idx + 1}/{len(groups)} chunk {chunk_idx + 1} failed: {e}")
+                    return None
+
+            if not isinstance(response, dict) or "error" in response:
+                error = response.get("error") if isinstance(response, dict) else type(response).__name__
+                logger.warning(f"   LLM error in batch {group_idx + 1}/{len(groups)} chunk {chunk_idx + 1}: {error}")
+                return None
+            return self.batch_verdicts(response)
+
+        tasks = [(g, c) for g in range(len(groups)) for c in range(len(document_chunks))]
+        responses = await asyncio.gather(*(classify(g, c) for g, c in tasks))
+        return self.apply_batch_verdicts(groups, len(document_chunks), dict(zip(tasks, responses)))
+
+    def batch_search_plan(self, document_text: str) -> Tuple[List[List[Tuple[str, Dict]]], List[str]]:
+        """
+        Instrument groups and document chunks of the batched search - one prompt
+        (build_batch_prompt) per (group, chunk) pair.
+        """
+        entries = [
+            entry for entry in self.mapping_data
+            if entry['instrument_category'].strip() and entry['instrument_category'].strip() != 'nan'
+        ]
+        items = [(f"I{idx}", entry) for idx, entry in enumerate(entries, 1)]
+        groups = [items[i:i + EXCEL_BATCH_SIZE] for i in range(0, len(items), EXCEL_BATCH_SIZE)]
+        return groups, _split_document_chunks(document_text)
+
+    @staticmethod
+    def batch_verdicts(response: Dict) -> Dict[str, Dict]:
+        """Verdicts of one batched classification response, by instrument id"""
+        verdicts = {}
+        for verdict in response.get("v", []) or []:
+            if isinstance(verdict, dict) and verdict.get("id"):
+                verdicts[str(verdict["id"]).strip()] = verdict
+        return verdicts
+
+    def apply_batch_verdicts(
+        self,
+        groups: List[List[Tuple[str, Dict]]],
+        chunk_count: int,
+        results: Dict[Tuple[int, int], Optional[Dict[str, Dict]]]
+    ) -> Dict:
+        """
+        Apply the verdicts of every (group, chunk) call to the entries (None = the call failed)
+        and return the search summary.
+        """
+        chunks = range(chunk_count)
+        matches_found = 0
+        allowed_found = 0
+        prohibited_found = 0
+
+        for group_idx, group in enumerate(groups):
+            group_failed = all(results.get((group_idx, c)) is None for c in chunks)
+            for item_id, entry in group:
+                if group_failed:
+                    entry['allowed'] = None
+                    entry['reason'] = "LLM error: batched classification failed"
+                    continue
+
+                verdicts = [(results.get((group_idx, c)) or {}).get(item_id) for c in chunks]
+                found_in_document, allowed_status = self._apply_verdicts(entry, verdicts)
+                if found_in_document:
+                    matches_found += 1
+                    if allowed_status is True:
+                        allowed_found += 1
+                    elif allowed_status is False:
+                        prohibited_found += 1
+
+        return self._search_summary(matches_found, allowed_found, prohibited_found)
+
+    def _apply_verdicts(self, entry: Dict, verdicts: List[Optional[Dict]]) -> Tuple[bool, Optional[bool]]:
+        """
+        Apply compact LLM verdicts ({"f", "a", "m", "o", "q"}) for one entry, in document order.
+        The first verdict with explicit evidence wins. Sets entry['allowed'] / entry['reason'].
+        
+        Returns:
+            (found_in_document, allowed_status)
+        """
+        instrument_name = entry['instrument_category'].strip()
+        found_in_document = False
+        allowed_status = None
+        reason_text = ""
+        for verdict in verdicts:
+            if not verdict or not verdict.get("f"):
+                continue
+            found_in_document = True
+            semantic_match = verdict.get("m") or instrument_name
+            ocrd_match = verdict.get("o") or "N/A"
+            if verdict.get("a") is not None:
+                allowed_status = bool(verdict.get("a"))
+                reason_text = verdict.get("q") or f"Found semantically as: {semantic_match}"
+                if ocrd_match != "N/A":
+                    reason_text += f" (OCRD: {ocrd_match})"
+                break
+            reason_text = verdict.get("q") or f"Found semantically as: {semantic_match}; evidence inconclusive"
+
+        if found_in_document:
+            if allowed_status is not None:
+                entry['allowed'] = allowed_status
+                entry['reason'] = f"LLM semantic match: {reason_text}"
+            else:
+                entry['allowed'] = None
+                entry['reason'] = f"Found semantically but permission status unclear: {reason_text}"
+        else:
+            entry['allowed'] = None
+            entry['reason'] = "Not found in document (semantic search)"
+        return found_in_document, allowed_status
+
+    def _retrieval_queries(self, entry: Dict) -> List[str]:
+        """Instrument name plus a few distinct synonyms to query the RAG index with"""
+        queries = [entry['instrument_category'].strip()]
+        seen = {_normalize_simple(queries[0])}
+        for candidate in self._extract_candidate_synonyms(entry):
+            key = _normalize_simple(candidate)
+            if key and key not in seen and key.rstrip('s') not in seen and len(queries) < EXCEL_RETRIEVAL_MAX_QUERIES:
+                seen.add(key)
+                queries.append(candidate)
+        return queries
+
+    async def _search_document_retrieval(self, document_text: str, llm_service, doc_id: str, llm_provider: Optional[str] = None) -> Dict:
+        """
+        Retrieval-scoped LLM search: for each instrument, fetch the top-k chunks for its name and
+        synonyms from the document's RAG index (plus neighbouring chunks) and classify it on that
+        context only. Falls back to the batched search when the index has no chunks for the document.
+        """
+        import asyncio
+        from .rag_retrieve import retrieve_context
+
+        entries = [
+            entry for entry in self.mapping_data
+            if entry['instrument_category'].strip() and entry['instrument_category'].strip() != 'nan'
+        ]
+        semaphore = asyncio.Semaphore(max(1, EXCEL_RETRIEVAL_CONCURRENCY))
+
+        async def fetch_context(entry: Dict) -> str:
+            async with semaphore:
+                chunks = await asyncio.to_thread(
+                    retrieve_context,
+                    self._retrieval_queries(entry),
+                    doc_id,
+                    EXCEL_RETRIEVAL_TOP_K,
+                    EXCEL_RETRIEVAL_VECTORDB_DIR,
+                    EXCEL_RETRIEVAL_NEIGHBORS
+                )
+            parts = []
+            for chunk in chunks:
+                meta = chunk.get("meta", {})
+                page = f", page {meta['page']}" if meta.get("page") else ""
+                parts.append(f"[Chunk {meta.get('chunk_id', '?')}{page}]\n{chunk.get('text', '')}")
+            return "\n\n".join(parts)[:EXCEL_RETRIEVAL_MAX_CONTEXT]
+
+        contexts = await asyncio.gather(*(fetch_context(entry) for entry in entries))
+        if entries and not any(contexts):
+            logger.warning(f"⚠️ No indexed chunks found for document {doc_id} - falling back to batched LLM search")
+            return await self._search_document_batched(document_text, llm_service, llm_provider)
+
+        logger.info(
+            f"🔍 Retrieval-scoped LLM search: {len(entries)} entries, "
+            f"avg context {sum(len(c) for c in contexts) // max(1, len(contexts))} chars"
+        )
+
+        async def classify(entry: Dict, context: str) -> Optional[Dict]:
+            if not context:
+                return None
+            prompt = self.build_batch_prompt(context, [("I1", entry)])
+            async with semaphore:
+                try:
+                    response = await asyncio.wait_for(
+                        llm_service.analyze_text(prompt, prompt_version=EXCEL_BATCH_PROMPT_VERSION, provider=llm_provider),
+                        timeout=stage_timeout("excel_search", EXCEL_RETRIEVAL_TIMEOUT)
+                    )
+                except asyncio.TimeoutError:
+                    logger.warning(f"   LLM call timed out for '{entry['instrument_category'].strip()}' - skipping")
+                    return None
+                except Exception as e:
+                    logger.warning(f"   Error in LLM call for '{entry['instrument_category'].strip()}': {e}")
+                    return None
+            if not isinstance(response, dict) or "error" in response:
+                return None
+            for verdict in response.get("v", []) or []:
+                if isinstance(verdict, dict) and str(verdict.get("id", "")).strip() == "I1":
+                    return verdict
+            return None
+
+        verdicts = await asyncio.gather(*(classify(entry, context) for entry, context in zip(entries, contexts)))
+
+        matches_found = 0
+        allowed_found = 0
+        prohibited_found = 0
+        for entry, verdict in zip(entries, verdicts):
+            found_in_document, allowed_status = self._apply_verdicts(entry, [verdict])
+            if found_in_document:
+                matches_found += 1
+                if allowed_status is True:
+                    allowed_found += 1
+                elif allowed_status is False:
+                    prohibited_found += 1
+
+        return self._search_summary(matches_found, allowed_found, prohibited_found)
+    
+    def _search_summary(self, matches_found: int, allowed_found: int, prohibited_found: int) -> Dict:
+        """Log and return the statistics of an LLM search run"""
         logger.info("=" * 80)
         logger.info(f"✅ LLM SEMANTIC ANALYSIS COMPLETE")
         logger.info(f"   📊 Total entries processed: {len(self.mapping_data)}")
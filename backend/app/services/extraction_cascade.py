@@ -0,0 +1,184 @@
+"""
+Extraction Cascade
+Cheap-model-first extraction: every section is extracted with a small model
+(EXTRACTION_CASCADE_CHEAP_MODEL) and only escalated to the requested model when
+the cheap answer looks unreliable:
+
+- parse_failure: the cheap call raised (invalid JSON, timeout, API error)
+- conflicts: the model reported conflicting statements
+- low_rule_count: few rules compared to the number of term + allow/prohibit lines
+- classifier_disagreement: rules contradict the conservative classifier's decision
+
+Escalation counts and reasons are kept per run and process-wide (/api/metrics).
+"""
+import os
+import threading
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from .conservative_classifier import build_items_hits, decide
+from .section_prescreen import score_section, term_pattern_for
+from .stream_rule_parser import RULE_KEYS, RuleListener, notify_rule
+from .llm_accounting import llm_stage
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Cascade configuration
+# EXTRACTION_CASCADE_ENABLED: extract with the cheap model first, escalate only unreliable sections
+# EXTRACTION_CASCADE_CHEAP_MODEL: first-pass model
+# EXTRACTION_CASCADE_MIN_RULE_LINES: term + marker lines needed before the rule count is checked
+# EXTRACTION_CASCADE_MIN_RULE_RATIO: escalate if rules < ratio * term + marker lines
+# EXTRACTION_CASCADE_MAX_DISAGREEMENTS: escalate at this many contradictions with the classifier
+EXTRACTION_CASCADE_ENABLED = os.getenv("EXTRACTION_CASCADE_ENABLED", "false").lower() == "true"
+EXTRACTION_CASCADE_CHEAP_MODEL = os.getenv("EXTRACTION_CASCADE_CHEAP_MODEL", "gpt-4o-mini")
+EXTRACTION_CASCADE_MIN_RULE_LINES = int(os.getenv("EXTRACTION_CASCADE_MIN_RULE_LINES", "3"))
+EXTRACTION_CASCADE_MIN_RULE_RATIO = float(os.getenv("EXTRACTION_CASCADE_MIN_RULE_RATIO", "0.25"))
+EXTRACTION_CASCADE_MAX_DISAGREEMENTS = int(os.getenv("EXTRACTION_CASCADE_MAX_DISAGREEMENTS", "1"))
+
+# Providers whose models can be swapped for the cheap model (Ollama has its own model list)
+CASCADE_PROVIDERS = ("openai", "stub")
+
+# extract(text, model, on_rule) -> analysis dict
+ExtractFn = Callable[[str, str, Optional[RuleListener]], Awaitable[Dict[str, Any]]]
+
+
+class CascadeStats:
+    """Thread-safe escalation counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sections = 0
+        self.escalated = 0
+        self.reasons: Counter = Counter()
+
+    def record(self, reasons: List[str]) -> None:
+        with self._lock:
+            self.sections += 1
+            if reasons:
+                self.escalated += 1
+                self.reasons.update(reasons)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": EXTRACTION_CASCADE_ENABLED,
+                "cheap_model": EXTRACTION_CASCADE_CHEAP_MODEL,
+                "sections": self.sections,
+                "escalated": self.escalated,
+                "escalation_rate": round(self.escalated / self.sections, 3) if self.sections else 0.0,
+                "reasons": dict(self.reasons)
+            }
+
+
+# Process-wide statistics (lazy initialization)
+_cascade_stats: Optional[CascadeStats] = None
+
+
+def get_cascade_stats() -> CascadeStats:
+    """Get the process-wide cascade statistics (lazy initialization)"""
+    global _cascade_stats
+    if _cascade_stats is None:
+        _cascade_stats = CascadeStats()
+    return _cascade_stats
+
+
+def cascade_applies(provider: str, model: str) -> bool:
+    """Whether a request for provider/model should go through the cascade"""
+    return (
+        EXTRACTION_CASCADE_ENABLED
+        and provider in CASCADE_PROVIDERS
+        and bool(EXTRACTION_CASCADE_CHEAP_MODEL)
+        and model != EXTRACTION_CASCADE_CHEAP_MODEL
+    )
+
+
+def _rule_allowed(rule: Any) -> Optional[bool]:
+    allowed = rule.get("allowed") if isinstance(rule, dict) else getattr(rule, "allowed", None)
+    return allowed if isinstance(allowed, bool) else None
+
+
+def _rule_instrument(rule: Any) -> str:
+    name = rule.get("instrument") if isinstance(rule, dict) else getattr(rule, "instrument", "")
+    return (name or "").strip().lower()
+
+
+def classifier_disagreements(analysis: Dict[str, Any], text: str, term_map: Dict[str, Dict]) -> List[str]:
+    """Instruments whose allowed flag contradicts the conservative classifier on the same text"""
+    if not term_map:
+        return []
+    decisions, _ = decide(build_items_hits(text, term_map), term_map)
+    classified = {
+        term.lower().strip(): status == "Allowed"
+        for term, status in decisions.items()
+        if status in ("Allowed", "Prohibited")
+    }
+    disagreements = []
+    for rule in analysis.get("instrument_rules", []):
+        expected = classified.get(_rule_instrument(rule))
+        allowed = _rule_allowed(rule)
+        if expected is not None and allowed is not None and allowed != expected:
+            disagreements.append(_rule_instrument(rule))
+    return disagreements
+
+
+def escalation_reasons(analysis: Any, text: str, term_map: Dict[str, Dict]) -> List[str]:
+    """Why a cheap-model answer should be redone with the requested model ([] = accept it)"""
+    if not isinstance(analysis, dict):
+        return ["parse_failure"]
+
+    reasons = []
+    if analysis.get("conflicts"):
+        reasons.append("conflicts")
+
+    rule_count = sum(len(analysis.get(key, []) or []) for key in RULE_KEYS)
+    rule_lines = score_section({"text": text}, term_pattern_for(term_map.keys()))["rule_lines"] if term_map else 0
+    if rule_lines >= EXTRACTION_CASCADE_MIN_RULE_LINES and rule_count < rule_lines * EXTRACTION_CASCADE_MIN_RULE_RATIO:
+        reasons.append("low_rule_count")
+
+    if len(classifier_disagreements(analysis, text, term_map)) >= max(1, EXTRACTION_CASCADE_MAX_DISAGREEMENTS):
+        reasons.append("classifier_disagreement")
+    return reasons
+
+
+async def extract_with_cascade(
+    text: str,
+    model: str,
+    extract: ExtractFn,
+    term_map: Optional[Dict[str, Dict]] = None,
+    on_rule: Optional[RuleListener] = None,
+    run_stats: Optional[CascadeStats] = None,
+    label: str = "section"
+) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Extract text with the cheap model and escalate to `model` if needed.
+
+    The cheap pass is not streamed to on_rule; its rules are replayed only when the
+    answer is accepted, so listeners never see rules that are later replaced.
+
+    Returns:
+        (analysis, escalation_reasons)
+    """
+    term_map = term_map or {}
+    cheap_model = EXTRACTION_CASCADE_CHEAP_MODEL
+    try:
+        with llm_stage("extraction_cheap"):
+            analysis = await extract(text, cheap_model, None)
+    except Exception as e:
+        logger.warning(f"⚠️ Cascade: {cheap_model} failed on {label} ({str(e)[:120]}) - escalating")
+        analysis = None
+
+    reasons = escalation_reasons(analysis, text, term_map)
+    get_cascade_stats().record(reasons)
+    if run_stats is not None:
+        run_stats.record(reasons)
+
+    if not reasons:
+        logger.info(f"✅ Cascade: {cheap_model} answer accepted for {label}")
+        for rule_type in RULE_KEYS:
+            for rule in analysis.get(rule_type, []):
+                await notify_rule(on_rule, rule_type, rule)
+        return analysis, reasons
+
+    logger.info(f"⬆️ Cascade: escalating {label} to {model} ({', '.join(reasons)})")
+    with llm_stage("extraction_escalated"):
+        return await extract(text, model, on_rule), reasons
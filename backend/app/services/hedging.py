@@ -0,0 +1,172 @@
+"""
+Hedged LLM Requests
+Cuts tail latency of chat completions: when a call runs longer than a configurable
+percentile of the latency observed for the same model and prompt size, a duplicate
+request is fired. The first valid response wins and the other request is cancelled.
+A hedge budget (fraction of all requests) keeps the extra spend bounded.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Hedging configuration
+# LLM_HEDGING_ENABLED: turn hedged requests on
+# LLM_HEDGE_PERCENTILE: hedge once a call is slower than this percentile of observed latency
+# LLM_HEDGE_MIN_SAMPLES: observations needed per (model, size bucket) before hedging starts
+# LLM_HEDGE_MIN_DELAY: never hedge earlier than this many seconds
+# LLM_HEDGE_BUDGET: max hedges as a fraction of requests (0.1 = at most 10% extra calls)
+LLM_HEDGING_ENABLED = os.getenv("LLM_HEDGING_ENABLED", "false").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "10"))
+LLM_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "0.1"))
+
+LATENCY_WINDOW = 200  # observations kept per (model, size bucket)
+
+
+def size_bucket(prompt_tokens: int) -> int:
+    """Power-of-two prompt size bucket (latency grows with prompt size)"""
+    return 1 << max(10, math.ceil(math.log2(max(1, prompt_tokens))))
+
+
+class RequestHedger:
+    """Latency tracker + hedge budget + first-valid-wins execution"""
+
+    def __init__(
+        self,
+        enabled: bool = LLM_HEDGING_ENABLED,
+        percentile: float = LLM_HEDGE_PERCENTILE,
+        min_samples: int = LLM_HEDGE_MIN_SAMPLES,
+        min_delay: float = LLM_HEDGE_MIN_DELAY,
+        budget: float = LLM_HEDGE_BUDGET
+    ):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.budget = budget
+        self._lock = threading.Lock()
+        self._latencies: Dict[Tuple[str, int], Deque[float]] = {}
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.budget_denied = 0
+
+    def record(self, key: Tuple[str, int], latency: float) -> None:
+        """Record the latency of a call (the elapsed time for a cancelled one)"""
+        with self._lock:
+            self._latencies.setdefault(key, deque(maxlen=LATENCY_WINDOW)).append(latency)
+
+    def hedge_delay(self, key: Tuple[str, int]) -> Optional[float]:
+        """Seconds after which to hedge, or None while there is too little history"""
+        with self._lock:
+            samples = sorted(self._latencies.get(key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        index = min(len(samples) - 1, int(math.ceil(self.percentile / 100.0 * len(samples))) - 1)
+        return max(self.min_delay, samples[max(0, index)])
+
+    def _take_budget(self) -> bool:
+        with self._lock:
+            # budget fraction of all requests, plus one hedge of burst allowance
+            if self.hedges >= self.budget * self.requests + 1:
+                self.budget_denied += 1
+                return False
+            self.hedges += 1
+            return True
+
+    async def run(
+        self,
+        key: Tuple[str, int],
+        call: Callable[[], Awaitable[Any]],
+        is_valid: Callable[[Any], bool]
+    ) -> Any:
+        """
+        Execute call(), hedging it with a duplicate if it exceeds the latency percentile.
+
+        Args:
+            key: (model, size bucket) for latency statistics
+            call: factory returning a fresh awaitable for each attempt
+            is_valid: whether a result is usable (e.g. contains parseable JSON)
+
+        Returns:
+            The first valid result; if none is valid, the primary's result (or its exception)
+        """
+        with self._lock:
+            self.requests += 1
+
+        delay = self.hedge_delay(key) if self.enabled else None
+        start = time.monotonic()
+        primary = asyncio.ensure_future(call())
+        started = {primary: start}
+        try:
+            hedge = None
+            if delay is not None:
+                done, _ = await asyncio.wait({primary}, timeout=delay)
+                if not done and self._take_budget():
+                    logger.info(f"⏱️ {key[0]}: no response after {delay:.1f}s - sending hedged request")
+                    hedge = asyncio.ensure_future(call())
+                    started[hedge] = time.monotonic()
+
+            if hedge is None:
+                result = await primary
+                self.record(key, time.monotonic() - start)
+                return result
+
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and is_valid(task.result()):
+                        self.record(key, time.monotonic() - started[task])
+                        if task is hedge:
+                            with self._lock:
+                                self.hedge_wins += 1
+                        return task.result()
+            # Neither attempt produced a valid result - surface the primary's outcome
+            return primary.result()
+        finally:
+            # Also when the caller is cancelled (job budget, wait_for): no attempt may keep
+            # running and holding its rate-limiter slot. A cancelled attempt was at least as
+            # slow as its elapsed time, which is recorded so slow calls raise the hedge delay.
+            now = time.monotonic()
+            for task, task_start in started.items():
+                if not task.done():
+                    task.cancel()
+                    self.record(key, now - task_start)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hedge counters and current per-key hedge thresholds"""
+        with self._lock:
+            keys = list(self._latencies.keys())
+            counters = {
+                "enabled": self.enabled,
+                "requests": self.requests,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "budget_denied": self.budget_denied,
+                "hedge_rate": round(self.hedges / self.requests, 4) if self.requests else 0.0
+            }
+        counters["thresholds"] = {
+            f"{model}/{bucket}": self.hedge_delay((model, bucket)) for model, bucket in keys
+        }
+        return counters
+
+
+# Process-wide hedger instance (lazy initialization)
+_hedger: Optional[RequestHedger] = None
+
+
+def get_request_hedger() -> RequestHedger:
+    """Get the shared request hedger (lazy initialization)"""
+    global _hedger
+    if _hedger is None:
+        _hedger = RequestHedger()
+    return _hedger
@@ -0,0 +1,161 @@
+"""
+Shared HTTP Clients
+Application-scoped httpx clients reused by every LLM and embedding call site so that
+TLS handshakes and connections are kept alive between calls and one pool limit
+applies to the whole process. HTTP/2 is used when the optional `h2` package is
+installed (pip install "httpx[http2]").
+
+Clients are closed by the FastAPI shutdown handler via close_http_clients().
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Set
+import httpx
+from openai import AsyncOpenAI
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+try:
+    import h2  # noqa: F401 - enables HTTP/2 in httpx
+    H2_AVAILABLE = True
+except ImportError:
+    H2_AVAILABLE = False
+
+# Connection pool configuration (shared by all outbound LLM/embedding traffic)
+# HTTP_MAX_CONNECTIONS: total open connections across all hosts
+# HTTP_MAX_KEEPALIVE: idle connections kept for reuse
+# HTTP_KEEPALIVE_EXPIRY: seconds an idle connection is kept
+# HTTP_CONNECT_TIMEOUT / HTTP_READ_TIMEOUT: seconds (read covers long completions of large docs)
+# HTTP2_ENABLED: negotiate HTTP/2 when the h2 package is available
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "15"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "180"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+
+
+def _client_options() -> Dict[str, Any]:
+    return {
+        "timeout": httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT, read=HTTP_READ_TIMEOUT),
+        "limits": httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+        ),
+        "http2": HTTP2_ENABLED and H2_AVAILABLE
+    }
+
+
+# Process-wide clients (lazy initialization)
+_async_client: Optional[httpx.AsyncClient] = None
+_async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_sync_client: Optional[httpx.Client] = None
+# AsyncOpenAI clients (by API key) on top of _async_client - dropped whenever it is replaced
+_async_openai_clients: Dict[str, AsyncOpenAI] = {}
+# Close tasks of replaced async clients (referenced until done)
+_closing: Set[Any] = set()
+
+
+async def _aclose_quietly(client: httpx.AsyncClient) -> None:
+    try:
+        await client.aclose()
+    except Exception as e:
+        logger.debug(f"Closing replaced async HTTP client failed: {e}")
+
+
+def _close_replaced_client(client: Optional[httpx.AsyncClient], client_loop: Optional[asyncio.AbstractEventLoop]) -> None:
+    """
+    Close an async client that is being replaced so its pooled connections are released:
+    on its own loop if that loop is still running, otherwise on the current loop.
+    """
+    if client is None or client.is_closed:
+        return
+    if client_loop is not None and client_loop.is_running() and not client_loop.is_closed():
+        future = asyncio.run_coroutine_threadsafe(_aclose_quietly(client), client_loop)
+    else:
+        future = asyncio.ensure_future(_aclose_quietly(client))
+    _closing.add(future)
+    future.add_done_callback(_closing.discard)
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Get the shared async client (lazy initialization).
+    Async connections belong to an event loop, so a new client is created if called
+    from a different loop (e.g. a CLI script using asyncio.run) and the old one is closed.
+    """
+    global _async_client, _async_client_loop
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+
+    if _async_client is None or _async_client.is_closed or (loop is not None and _async_client_loop not in (None, loop)):
+        _close_replaced_client(_async_client, _async_client_loop)
+        _async_client = httpx.AsyncClient(**_client_options())
+        _async_client_loop = loop
+        _async_openai_clients.clear()
+        logger.info(
+            f"Shared async HTTP client ready (max_connections={HTTP_MAX_CONNECTIONS}, "
+            f"keepalive={HTTP_MAX_KEEPALIVE}, http2={HTTP2_ENABLED and H2_AVAILABLE})"
+        )
+    elif _async_client_loop is None:
+        _async_client_loop = loop
+    return _async_client
+
+
+def get_async_openai_client(api_key: str) -> AsyncOpenAI:
+    """
+    Get an AsyncOpenAI client on the shared async client. It is rebuilt together with
+    the httpx client, so an SDK client never keeps a client bound to a finished loop.
+    Retries are handled by the shared rate limiter (max_retries=0).
+    """
+    http_client = get_async_client()
+    client = _async_openai_clients.get(api_key)
+    if client is None:
+        client = AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+        _async_openai_clients[api_key] = client
+    return client
+
+
+def get_sync_client() -> httpx.Client:
+    """Get the shared sync client used by the blocking OpenAI client (embeddings)"""
+    global _sync_client
+    if _sync_client is None or _sync_client.is_closed:
+        _sync_client = httpx.Client(**_client_options())
+    return _sync_client
+
+
+@asynccontextmanager
+async def shared_async_client() -> AsyncIterator[httpx.AsyncClient]:
+    """Borrow the shared async client in `async with` blocks - leaving the block does not close it"""
+    yield get_async_client()
+
+
+async def close_http_clients() -> None:
+    """Close the shared clients (FastAPI shutdown)"""
+    global _async_client, _async_client_loop, _sync_client
+    if _async_client is not None and not _async_client.is_closed:
+        await _async_client.aclose()
+    if _sync_client is not None and not _sync_client.is_closed:
+        _sync_client.close()
+    _async_client = None
+    _async_client_loop = None
+    _async_openai_clients.clear()
+    _sync_client = None
+    logger.info("Shared HTTP clients closed")
+
+
+def http_client_stats() -> Dict[str, Any]:
+    """Pool configuration and client state"""
+    return {
+        "http2": HTTP2_ENABLED and H2_AVAILABLE,
+        "max_connections": HTTP_MAX_CONNECTIONS,
+        "max_keepalive": HTTP_MAX_KEEPALIVE,
+        "keepalive_expiry": HTTP_KEEPALIVE_EXPIRY,
+        "async_client_open": _async_client is not None and not _async_client.is_closed,
+        "sync_client_open": _sync_client is not None and not _sync_client.is_closed
+    }
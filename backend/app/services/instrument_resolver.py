@@ -0,0 +1,382 @@
+"""
+Instrument Resolver
+Lookup tables and matching used by _convert_llm_response_to_ocrd_format to place an
+instrument rule in the OCRD structure, compiled once at import.
+
+The converter used to rebuild these tables (and the matching closures) for every
+instrument rule and re-tokenize every OCRD key of the section for every rule. Here
+the tables are module constants looked up by hash, OCRD keys are pre-tokenized into
+KeyProfile objects, and normalization and resolution results are memoized, so a rule
+that was seen before resolves with a few dict lookups. The results are the same as
+the inline matching they replace (first match in table / section order wins).
+"""
+import re
+from functools import lru_cache
+from typing import FrozenSet, Optional, Tuple
+
+# Instrument name → OCRD section (English and German terms)
+# Note: future, option, and warrant are top-level sections (no parent "derivatives" category)
+INSTRUMENT_SECTIONS = {
+    # Generic terms (English)
+    "bonds": "bond",
+    "bond": "bond",
+    "equities": "stock",
+    "equity": "stock",
+    "stocks": "stock",
+    "stock": "stock",
+    "funds": "fund",
+    "fund": "fund",
+    "derivatives": "future",  # Map derivatives to future section (default)
+    "derivative": "future",  # Map derivative to future section (default)
+    "options": "option",
+    "option": "option",
+    "futures": "future",
+    "future": "future",
+    "warrants": "warrant",
+    "warrant": "warrant",
+    "commodities": "commodity",
+    "commodity": "commodity",
+    "forex": "forex",
+    "swaps": "swap",
+    "swap": "swap",
+    # Generic terms (German)
+    "anleihen": "bond",
+    "renten": "bond",
+    "rentenquote": "bond",
+    "aktien": "stock",
+    "stammaktien": "stock",
+    "vorzugsaktien": "stock",
+    "fonds": "fund",
+    "aktienfonds": "fund",
+    "rentenfonds": "fund",
+    "geldmarktfonds": "fund",
+    "derivate": "future",
+    "optionen": "option",
+    "futures": "future",
+    "scheine": "warrant",
+    "warrants": "warrant",
+    "rohstoffe": "commodity",
+    "währung": "forex",
+    "devisen": "forex",
+    "swaps": "swap",
+    # Money market instruments (German)
+    "geldmarktinstrumente": "deposit",
+    "geldmarktprodukte": "deposit",
+    "geldmarkt": "deposit",
+    # Specific bond types (English)
+    "covered bond": "bond",
+    "covered_bond": "bond",
+    "asset backed security": "bond",
+    "asset_backed_security": "bond",
+    "asset-backed security": "bond",
+    "mortgage bond": "bond",
+    "mortgage_bond": "bond",
+    "mortgage-bond": "bond",
+    "pfandbrief": "bond",
+    "pfandbriefe": "bond",
+    "convertible bond": "bond",
+    "convertible_bond": "bond",
+    "commercial paper": "bond",
+    "commercial_paper": "bond",
+    # Specific bond types (German)
+    "staatsanleihen": "bond",
+    "corporate bonds": "bond",
+    "corporate_bonds": "bond",
+    "schatzanweisungen": "bond",
+    "bezugsrechte": "right",
+    "subscription rights": "right",
+    "subscription_rights": "right",
+    # Specific stock types (English)
+    "common stock": "stock",
+    "common_stock": "stock",
+    "preferred stock": "stock",
+    "preferred_stock": "stock",
+    # Specific stock types (German)
+    "stammaktien": "stock",
+    "common_stock": "stock",
+    # Specific fund types (English)
+    "equity fund": "fund",
+    "equity_fund": "fund",
+    "fixed income fund": "fund",
+    "fixed_income_fund": "fund",
+    "money market fund": "fund",
+    "moneymarket_fund": "fund",
+    # Specific fund types (German)
+    "aktienfonds": "fund",
+    "rentenfonds": "fund",
+    "geldmarktfonds": "fund",
+    # Swaps (German)
+    "zinsswaps": "swap",
+    "interest swap": "swap",
+    "interest_swap": "swap",
+    "credit default swap": "swap",
+    "credit_default_swap": "swap",
+    "total return swap": "swap",
+    "total_return_swap": "swap",
+    # Forex (German)
+    "devisentermingeschäfte": "forex",
+    "fx forward": "forex",
+    "fx_forward": "forex",
+    "forex_outright": "forex",
+    "forex_spot": "forex",
+    "currency futures": "forex",
+    "currency_futures": "forex",
+}
+
+# Section inferred from terms in the instrument name when no table entry matches,
+# checked in order (German terms first, English terms as fallback)
+SECTION_INFERENCE_TERMS = (
+    # German terms
+    (("anleihe", "rente", "pfandbrief", "schatzanweisung"), "bond"),
+    (("aktie", "stammaktie", "vorzugsaktie"), "stock"),
+    (("fonds", "aktienfonds", "rentenfonds", "geldmarktfonds"), "fund"),
+    (("option", "optionen"), "option"),
+    (("future", "futures"), "future"),
+    (("warrant", "schein", "scheine"), "warrant"),
+    (("swap", "swaps", "zinsswap"), "swap"),
+    (("rohstoff", "commodity", "edelmetall"), "commodity"),
+    (("forex", "währung", "devisen", "currency"), "forex"),
+    (("geldmarkt", "money market", "deposit", "kasse", "bankguthaben"), "deposit"),
+    (("bezugsrecht", "subscription right", "right"), "rights"),
+    # English terms (fallback)
+    (("bond",), "bond"),
+    (("stock", "equity"), "stock"),
+    (("fund",), "fund"),
+    (("option",), "option"),
+    (("future",), "future"),
+    (("warrant",), "warrant"),
+    (("swap",), "swap"),
+    (("commodity",), "commodity"),
+    (("forex", "currency"), "forex"),
+)
+
+# German-to-English mapping for specific instruments (normalized name → OCRD key)
+GERMAN_TO_OCRD = {
+    "stammaktien": "common_stock",
+    "common stock": "common_stock",
+    "vorzugsaktien": "preferred_stock",
+    "preferred stock": "preferred_stock",
+    "geldmarktinstrumente": "call_money",  # or time_deposit, cash
+    "geldmarktprodukte": "call_money",
+    "money market": "call_money",
+    "credit default swap": "credit_default_swap",
+    "credit-default-swap": "credit_default_swap",
+    "interest swap": "interest_swap",
+    "zinsswap": "interest_swap",
+    "total return swap": "total_return_swap",
+    "fx forward": "forex_outright",
+    "forex forward": "forex_outright",
+    "devisentermingeschäft": "forex_outright",
+    "currency future": "forex_spot",
+    "devisenfuture": "forex_spot",
+    "bezugsrecht": "subscription_rights",
+    "subscription right": "subscription_rights",
+    "edelmetall": "precious_metal",
+    "precious metal": "precious_metal",
+    # Equity derivatives (critical for matching)
+    "equity future": "single_stock_future",
+    "equity futures": "single_stock_future",
+    "aktienfutures": "single_stock_future",
+    "equity index future": "index_future",
+    "equity index futures": "index_future",
+    "aktienindexfutures": "index_future",
+    "equity option": "stock_option",
+    "equity options": "stock_option",
+    "aktienoptionen": "stock_option",
+    "equity index option": "index_option",
+    "equity index options": "index_option",
+    "aktienindexoptionen": "index_option",
+    # Interest rate futures (critical for correct classification)
+    "interest rate future": "bond_future",
+    "interest rate futures": "bond_future",
+    "interest-rate future": "bond_future",
+    "interest-rate futures": "bond_future",
+    "zinsfutures": "bond_future",
+    "zinsfuture": "bond_future",
+    "zins futures": "bond_future",
+    "zins future": "bond_future",
+    "rentenfutures": "bond_future",
+    "rentenfuture": "bond_future",
+    "renten futures": "bond_future",
+    "renten future": "bond_future",
+    "geldmarktfutures": "bond_future",
+    "geldmarktfuture": "bond_future",
+    "geldmarkt futures": "bond_future",
+    "geldmarkt future": "bond_future",
+    "bond future": "bond_future",
+    "bond futures": "bond_future",
+    "money market future": "bond_future",
+    "money market futures": "bond_future",
+    # Handle German compound terms that might be extracted separately
+    "zinsfutures renten und geldmarktfutures": "bond_future",
+    "zinsfutures renten geldmarktfutures": "bond_future",
+}
+
+# Equity derivatives: significant instrument words → words the OCRD key must contain
+# ("equity future" → single_stock_future, "equity index option" → index_option, ...)
+EQUITY_DERIVATIVE_KEY_WORDS = {
+    ("equity", "future"): frozenset(("single", "stock", "future")),
+    ("equity", "futures"): frozenset(("single", "stock", "future")),
+    ("equity", "option"): frozenset(("stock", "option")),
+    ("equity", "options"): frozenset(("stock", "option")),
+    ("equity", "index", "future"): frozenset(("index", "future")),
+    ("equity", "index", "futures"): frozenset(("index", "future")),
+    ("equity", "index", "option"): frozenset(("index", "option")),
+    ("equity", "index", "options"): frozenset(("index", "option")),
+}
+
+# Words marking an interest rate future ("zinsfutures", "interest rate futures (bond and money market)")
+INTEREST_RATE_FUTURE_TERMS = frozenset(("interest", "rate", "zins", "renten", "geldmarkt", "bond", "money", "market"))
+
+# A single shared word is enough for a match when it is one of these
+KEY_TERMS = frozenset(("future", "futures", "option", "options", "warrant", "warrants", "stock", "equity", "index"))
+
+_RESOLVER_CACHE_SIZE = 4096
+
+_PARENTHETICAL_RE = re.compile(r"\([^)]*\)")
+_FX_RES = (re.compile(r"\bfx\b"), re.compile(r"\bfx(?=\s)"), re.compile(r"\bfx(?=[a-z])"))
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=_RESOLVER_CACHE_SIZE)
+def normalize_instrument_name(name: str) -> str:
+    """Normalize instrument names to improve matching accuracy."""
+    if not name:
+        return ""
+
+    normalized = name.lower().strip()
+    normalized = normalized.replace("-", " ")
+    normalized = normalized.replace("_", " ")
+
+    # Remove parenthetical text (e.g., "Interest rate futures (bond and money market)" -> "Interest rate futures")
+    normalized = _PARENTHETICAL_RE.sub("", normalized)
+
+    # Treat FX as synonym for FOREX before matching
+    for fx_re in _FX_RES:
+        normalized = fx_re.sub("forex", normalized)
+
+    # Normalize "foreign exchange" phrases to forex for consistency
+    normalized = normalized.replace("foreign exchange", "forex")
+
+    # Collapse multiple spaces
+    normalized = _WHITESPACE_RE.sub(" ", normalized)
+
+    return normalized.strip()
+
+
+def _significant_words(text: str) -> FrozenSet[str]:
+    """Words with 3+ characters (skips "the", "a", "an", ...)"""
+    return frozenset(w for w in text.split() if len(w) >= 3)
+
+
+class KeyProfile:
+    """An OCRD key (e.g. "index_future") tokenized for matching"""
+
+    __slots__ = ("key", "text", "words", "is_index_future", "is_index_option", "is_bond_future")
+
+    def __init__(self, key: str):
+        self.key = key
+        self.text = key.replace("_", " ").replace("-", " ")
+        self.words = _significant_words(self.text)
+        self.is_index_future = "index" in self.words and "future" in self.words
+        self.is_index_option = "index" in self.words and "option" in self.words
+        self.is_bond_future = "bond" in self.words and "future" in self.words
+
+
+class InstrumentProfile:
+    """A normalized instrument name tokenized for matching"""
+
+    __slots__ = ("text", "words", "equity_key_words", "has_index", "has_future", "has_option", "has_interest_rate_terms")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.words = _significant_words(text)
+        self.equity_key_words = EQUITY_DERIVATIVE_KEY_WORDS.get(tuple(sorted(self.words)))
+        self.has_index = "index" in self.words
+        self.has_future = "future" in self.words or "futures" in self.words
+        self.has_option = "option" in self.words or "options" in self.words
+        self.has_interest_rate_terms = bool(INTEREST_RATE_FUTURE_TERMS & self.words)
+
+    def matches(self, key: KeyProfile) -> bool:
+        """Whether the instrument matches the OCRD key (flexible word matching)"""
+        # Exact match, or one contains the other ("commodity certificate" → "commodity_certificate")
+        if self.text in key.text or key.text in self.text:
+            return True
+        if self.equity_key_words is not None and self.equity_key_words <= key.words:
+            return True
+        # Any variant of index future / index option → index_future / index_option
+        if self.has_index and self.has_future and key.is_index_future:
+            return True
+        if self.has_index and self.has_option and key.is_index_option:
+            return True
+        # Interest rate futures ("zinsfutures", "rentenfutures", "bond futures") → bond_future
+        if self.has_future and key.is_bond_future and (self.has_interest_rate_terms or "bond" in self.words):
+            return True
+        # All significant words of one side in the other
+        if self.words and self.words <= key.words:
+            return True
+        if key.words and key.words <= self.words:
+            return True
+        # One shared word is enough if it is a key term (future, option, ...)
+        overlap = self.words & key.words
+        if len(overlap) >= min(1, len(self.words), len(key.words)):
+            if overlap & KEY_TERMS:
+                return True
+        return False
+
+    def confidence(self, key: KeyProfile) -> float:
+        """Match confidence: exact 0.9, partial 0.7, word-based 0.5"""
+        if self.text == key.text:
+            return 0.9
+        if self.text in key.text or key.text in self.text:
+            return 0.7
+        return 0.5
+
+
+@lru_cache(maxsize=_RESOLVER_CACHE_SIZE)
+def key_profile(key: str) -> KeyProfile:
+    return KeyProfile(key)
+
+
+@lru_cache(maxsize=_RESOLVER_CACHE_SIZE)
+def instrument_profile(instrument: str) -> InstrumentProfile:
+    return InstrumentProfile(instrument)
+
+
+@lru_cache(maxsize=_RESOLVER_CACHE_SIZE)
+def resolve_section(instrument_lower: str, instrument_normalized: str) -> Optional[str]:
+    """
+    OCRD section for an instrument rule (None if it cannot be placed).
+
+    Exact table match first (name, name with underscores, normalized name), then the
+    first table entry contained in (or containing) the normalized name, then terms
+    in the name (SECTION_INFERENCE_TERMS).
+    """
+    for candidate in (instrument_lower, instrument_lower.replace(" ", "_"), instrument_normalized):
+        section = INSTRUMENT_SECTIONS.get(candidate)
+        if section:
+            return section
+    for key, section in INSTRUMENT_SECTIONS.items():
+        if key in instrument_normalized or instrument_normalized in key:
+            return section
+    name = instrument_normalized.lower()
+    for terms, section in SECTION_INFERENCE_TERMS:
+        if any(term in name for term in terms):
+            return section
+    return None
+
+
+def direct_ocrd_key(instrument_normalized: str) -> Optional[str]:
+    """OCRD key from the German-to-English table (exact match on the normalized name)"""
+    return GERMAN_TO_OCRD.get(instrument_normalized.lower().strip())
+
+
+@lru_cache(maxsize=_RESOLVER_CACHE_SIZE)
+def match_section_key(instrument_normalized: str, keys: Tuple[str, ...]) -> Optional[Tuple[str, float]]:
+    """First key of a section (in section order) the instrument matches, with its confidence"""
+    instrument = instrument_profile(instrument_normalized)
+    for key in keys:
+        profile = key_profile(key)
+        if instrument.matches(profile):
+            return key, instrument.confidence(profile)
+    return None
@@ -1,12 +1,12 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List
+from typing import Any, Callable, Dict, List, Optional
 
 class LLMProviderInterface(ABC):
     """Abstract interface for LLM providers"""
     
     @abstractmethod
-    async def analyze_document(self, text: str, model: str) -> Dict:
-        """Analyze document and extract rules"""
+    async def analyze_document(self, text: str, model: str, on_rule: Optional[Callable[[str, Dict], Any]] = None) -> Dict:
+        """Analyze document and extract rules (on_rule receives rules as they are streamed, if supported)"""
         pass
     
     @abstractmethod
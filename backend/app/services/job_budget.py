@@ -0,0 +1,155 @@
+"""
+Job Budget
+One deadline per analysis job (JOB_DEADLINE_SECONDS) shared by every stage, instead
+of independent timeouts (Excel search 300 s, sections 120 s, LLM calls 300 s) that
+add up to more than the job is allowed to take.
+
+The budget is current for the job's task and the tasks it spawns, like the usage
+ledger in llm_accounting. Stages ask it for their timeout (the stage cap or the time
+left, whichever is smaller), LLM calls are bounded by the time left, and optional
+stages (RAG indexing, Excel LLM search, fallback prompt) are skipped when too little
+time is left for them. JOB_FINALIZE_RESERVE seconds are kept back for conversion and
+writing the result, so a job that runs out of time finishes with partial results
+(listed in the notes) instead of hitting the hard timeout with nothing to show.
+"""
+import asyncio
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Dict, List, Optional, TypeVar
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Budget configuration
+# JOB_DEADLINE_SECONDS: wall time per analysis job (queueing included)
+# JOB_FINALIZE_RESERVE: seconds kept back for conversion and writing the result
+# JOB_EXCEL_SEARCH_SHARE: share of the time left that the Excel LLM search may use
+# JOB_MIN_*_SECONDS: time that must be left to start an optional stage
+JOB_DEADLINE_SECONDS = float(os.getenv("JOB_DEADLINE_SECONDS", "900"))
+JOB_FINALIZE_RESERVE = float(os.getenv("JOB_FINALIZE_RESERVE", "30"))
+JOB_EXCEL_SEARCH_SHARE = float(os.getenv("JOB_EXCEL_SEARCH_SHARE", "0.3"))
+JOB_MIN_INDEXING_SECONDS = float(os.getenv("JOB_MIN_INDEXING_SECONDS", "300"))
+JOB_MIN_EXCEL_SEARCH_SECONDS = float(os.getenv("JOB_MIN_EXCEL_SEARCH_SECONDS", "240"))
+JOB_MIN_FALLBACK_SECONDS = float(os.getenv("JOB_MIN_FALLBACK_SECONDS", "60"))
+
+T = TypeVar("T")
+
+
+class JobBudgetExceeded(asyncio.TimeoutError):
+    """An LLM call was cut short (or not started) because the job deadline was reached"""
+
+
+class JobBudget:
+    """Deadline of one job plus the stages it skipped or cut short"""
+
+    def __init__(self, seconds: float = JOB_DEADLINE_SECONDS, job_id: Optional[str] = None, reserve: float = JOB_FINALIZE_RESERVE):
+        self.job_id = job_id
+        self.seconds = seconds
+        self.reserve = reserve
+        self.started_at = time.monotonic()
+        self.deadline = self.started_at + seconds
+        self.skipped: List[str] = []
+        self.cut: List[str] = []
+
+    def remaining(self) -> float:
+        """Seconds left for work (the finalize reserve excluded)"""
+        return max(0.0, self.deadline - self.reserve - time.monotonic())
+
+    @property
+    def exhausted(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, stage: str, cap: float, share: float = 1.0) -> float:
+        """Timeout for a stage: its cap, or its share of the time left if that is smaller"""
+        left = self.remaining() * share
+        if left < cap:
+            logger.debug(f"⏱️ Job budget: {stage} limited to {left:.0f}s (cap {cap:.0f}s)")
+        return max(0.0, min(cap, left))
+
+    def mark_cut(self, stage: str) -> None:
+        """Record that a stage was cut short by the deadline"""
+        if stage not in self.cut:
+            self.cut.append(stage)
+            logger.warning(f"⏱️ Job budget exhausted - {stage} cut short")
+
+    def allows(self, stage: str, min_seconds: float) -> bool:
+        """Whether an optional stage may start (records the skip if not)"""
+        left = self.remaining()
+        if left >= min_seconds:
+            return True
+        self.skipped.append(stage)
+        logger.warning(f"⏱️ Job budget: skipping {stage} ({left:.0f}s left, needs {min_seconds:.0f}s)")
+        return False
+
+    def note(self) -> Optional[str]:
+        """Result note on skipped / shortened stages (None if the job ran within budget)"""
+        parts = []
+        if self.skipped:
+            parts.append(f"skipped {', '.join(self.skipped)}")
+        if self.cut:
+            parts.append(f"cut short {', '.join(self.cut)}")
+        if not parts:
+            return None
+        return f"Job budget ({self.seconds:.0f}s): {'; '.join(parts)} - results may be partial"
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "seconds": self.seconds,
+            "elapsed_seconds": round(time.monotonic() - self.started_at, 3),
+            "remaining_seconds": round(self.remaining(), 3),
+            "skipped": list(self.skipped),
+            "cut": list(self.cut)
+        }
+
+
+# Budget of the running job (inherited by the tasks it spawns)
+_current_budget: ContextVar[Optional[JobBudget]] = ContextVar("job_budget", default=None)
+
+
+def start_job_budget(job_id: Optional[str] = None, seconds: float = JOB_DEADLINE_SECONDS) -> JobBudget:
+    """Create a budget for job_id and make it current for this task (and tasks it spawns)"""
+    budget = JobBudget(seconds, job_id)
+    _current_budget.set(budget)
+    return budget
+
+
+def current_budget() -> Optional[JobBudget]:
+    return _current_budget.get()
+
+
+def stage_timeout(stage: str, cap: float, share: float = 1.0) -> float:
+    """Timeout for a stage under the current budget (cap if there is none)"""
+    budget = _current_budget.get()
+    return cap if budget is None else budget.timeout(stage, cap, share)
+
+
+def mark_stage_cut(stage: str) -> None:
+    """Record that a stage was cut short by the current budget's deadline"""
+    budget = _current_budget.get()
+    if budget is not None:
+        budget.mark_cut(stage)
+
+
+def stage_allowed(stage: str, min_seconds: float) -> bool:
+    """Whether an optional stage may start under the current budget (always without one)"""
+    budget = _current_budget.get()
+    return budget is None or budget.allows(stage, min_seconds)
+
+
+async def within_budget(awaitable: Awaitable[T], stage: str) -> T:
+    """Await awaitable, bounded by the time left in the current budget"""
+    budget = _current_budget.get()
+    if budget is None:
+        return await awaitable
+    left = budget.remaining()
+    if left <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        budget.mark_cut(stage)
+        raise JobBudgetExceeded(f"Job budget exhausted before {stage}")
+    try:
+        return await asyncio.wait_for(awaitable, timeout=left)
+    except asyncio.TimeoutError:
+        budget.mark_cut(stage)
+        raise JobBudgetExceeded(f"Job budget exhausted during {stage} (after {left:.0f}s)")
@@ -0,0 +1,346 @@
+"""
+JSON Repair
+Tolerant parsing of LLM JSON responses. The strict path (first "{" to last "}",
+json.loads) is tried first; if it fails, the response is repaired in one pass
+instead of being thrown away (and re-requested):
+
+- code_fence / prose: text before or after the JSON value
+- trailing_comma: "," before "}" or "]"
+- unescaped_quote: '"' inside a string that is not followed by what continues the JSON
+  (":" after a key; "}", "]" or "," plus the next key / element after a value)
+- control_chars / raw_newline: raw control characters are dropped, newlines and tabs
+  inside strings are escaped
+- mismatched_bracket: "]" closing an object or "}" closing an array
+- truncated: the response ends inside the value - it is cut back to the last
+  complete element of the top-level object or one of its arrays, so every complete
+  rule object is kept and a half-written one is dropped
+
+If the repaired text still does not parse, the complete rule objects are recovered
+with the streaming rule parser (salvaged). Repairs are counted process-wide
+(/api/metrics "json_repair").
+
+A repair must not lose content: if the repaired value has fewer rules (objects with an
+instrument / sector / country key) or top-level keys than the raw text names, the
+repair guessed wrong (e.g. a quote inside a string followed by text that looks like the
+next key) and the response is rejected with JsonRepairLossError (a ValueError) instead
+of silently dropping rules. Only a
+response that really ends early may lose its last, half-written rule.
+"""
+import json
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from .stream_rule_parser import RULE_KEYS, salvage_rules
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+EXTRACTION_KEYS = ("sector_rules", "country_rules", "instrument_rules", "conflicts")
+
+_STRING_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+_CLOSERS = {"{": "}", "[": "]"}
+_SAFE_DEPTH = 2  # elements of the top-level value and of its arrays/objects
+_OBJECT_KEY = re.compile(r'"(?:[^"\\\n]|\\.)*"\s*:')
+_VALUE_STARTS = '"{[-0123456789tfn'
+
+RULE_SUBJECT_KEYS = ("instrument", "sector", "country")
+_RULE_SUBJECT_PATTERN = re.compile(r'"(?:%s)"\s*:' % "|".join(RULE_SUBJECT_KEYS))
+_EXTRACTION_KEY_PATTERN = re.compile(r'"(%s)"\s*:' % "|".join(EXTRACTION_KEYS))
+
+
+class JsonRepairLossError(ValueError):
+    """A malformed response could only be repaired by dropping rules or keys"""
+
+
+class JsonRepairStats:
+    """Thread-safe counters of parsed, repaired and unrecoverable responses"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.parsed = 0
+        self.repaired = 0
+        self.failed = 0
+        self.repairs: Counter = Counter()
+
+    def record(self, repairs: List[str], failed: bool = False) -> None:
+        with self._lock:
+            self.parsed += 1
+            if failed:
+                self.failed += 1
+            elif repairs:
+                self.repaired += 1
+                self.repairs.update(set(repairs))
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "parsed": self.parsed,
+                "repaired": self.repaired,
+                "failed": self.failed,
+                "repair_rate": round(self.repaired / self.parsed, 3) if self.parsed else 0.0,
+                "repairs": dict(self.repairs)
+            }
+
+
+# Process-wide statistics (lazy initialization)
+_json_repair_stats: Optional[JsonRepairStats] = None
+
+
+def get_json_repair_stats() -> JsonRepairStats:
+    """Get the process-wide JSON repair statistics (lazy initialization)"""
+    global _json_repair_stats
+    if _json_repair_stats is None:
+        _json_repair_stats = JsonRepairStats()
+    return _json_repair_stats
+
+
+def _without_control_chars(text: str) -> str:
+    return "".join(ch for ch in text if ch >= " " or ch in "\n\r\t")
+
+
+def _strict_parse(raw: str) -> Any:
+    """The original parse: strip fences, first "{" to last "}" (or a bare array), drop control characters"""
+    cleaned = raw.strip().strip("```json").strip("```").strip()
+    start, end = cleaned.find("{"), cleaned.rfind("}") + 1
+    array_start = cleaned.find("[")
+    if array_start != -1 and (start == -1 or array_start < start):
+        try:
+            return json.loads(_without_control_chars(cleaned[array_start:cleaned.rfind("]") + 1]))
+        except ValueError:
+            pass
+    if start == -1 or end <= start:
+        raise ValueError("no JSON object")
+    return json.loads(_without_control_chars(cleaned[start:end]))
+
+
+def _next_significant(text: str, index: int) -> Tuple[str, int]:
+    while index < len(text) and text[index].isspace():
+        index += 1
+    return (text[index] if index < len(text) else ""), index
+
+
+def _closes_string(text: str, index: int, is_key: bool, container: Optional[str]) -> bool:
+    """
+    Whether the '"' at index ends the current string: only if what follows continues the
+    JSON (":" after a key; "}", "]" or "," plus a next element after a value). Anything
+    else, e.g. '"A", B' inside a reason, is a quote that belongs to the string.
+    """
+    following, position = _next_significant(text, index + 1)
+    if following == "":
+        return True
+    if is_key:
+        return following == ":"
+    if following in "}]":
+        return True
+    if following != ",":
+        return False
+    element, position = _next_significant(text, position + 1)
+    if container == "{":
+        return element == "" or bool(_OBJECT_KEY.match(text, position))
+    return element == "" or element in _VALUE_STARTS
+
+
+def _drop_trailing_comma(out: List[str]) -> bool:
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+        return True
+    return False
+
+
+def repair_json(raw: str) -> Tuple[str, List[str]]:
+    """
+    Rewrite a malformed JSON response into parseable JSON text.
+
+    Returns:
+        (json_text, repairs) - repairs lists the kinds of fixes applied
+    Raises:
+        ValueError if the response contains no JSON value or nothing complete
+    """
+    text = raw or ""
+    repairs: List[str] = []
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        raise ValueError("LLM response does not contain a JSON value")
+    start = min(starts)
+    before = text[:start].strip()
+    if before:
+        repairs.append("code_fence" if before.strip("`").strip().lower() in ("", "json") else "prose")
+
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = False
+    string_is_key = False
+    safe: Optional[Tuple[int, Tuple[str, ...]]] = None
+    end = None
+    i = start
+    while i < len(text):
+        ch = text[i]
+        if in_string:
+            if ch == "\\" and i + 1 < len(text):
+                out.append(text[i:i + 2])
+                i += 2
+                continue
+            if ch == '"':
+                if _closes_string(text, i, string_is_key, stack[-1] if stack else None):
+                    in_string = False
+                    out.append(ch)
+                else:
+                    out.append('\\"')
+                    repairs.append("unescaped_quote")
+            elif ch in _STRING_ESCAPES:
+                out.append(_STRING_ESCAPES[ch])
+                repairs.append("raw_newline")
+            elif ch < " ":
+                repairs.append("control_chars")
+            else:
+                out.append(ch)
+            i += 1
+            continue
+
+        if ch == '"':
+            in_string = True
+            # In an object, a string after "{" or "," is a key, after ":" a value
+            previous = next((c for c in reversed(out) if not c.isspace()), "")
+            string_is_key = bool(stack) and stack[-1] == "{" and previous in ("{", ",")
+            out.append(ch)
+        elif ch in "{[":
+            stack.append(ch)
+            out.append(ch)
+            if len(stack) <= _SAFE_DEPTH:
+                safe = (len(out), tuple(stack))
+        elif ch in "}]":
+            if not stack:
+                break
+            if _drop_trailing_comma(out):
+                repairs.append("trailing_comma")
+            closer = _CLOSERS[stack.pop()]
+            if ch != closer:
+                repairs.append("mismatched_bracket")
+            out.append(closer)
+            if not stack:
+                end = i + 1
+                break
+            if len(stack) <= _SAFE_DEPTH:
+                safe = (len(out), tuple(stack))
+        elif ch == ",":
+            if len(stack) <= _SAFE_DEPTH:
+                safe = (len(out), tuple(stack))
+            out.append(ch)
+        elif ch < " " and ch not in "\n\r\t":
+            repairs.append("control_chars")
+        else:
+            out.append(ch)
+        i += 1
+
+    if end is None:
+        # Truncated: cut back to the last complete element and close what is open there
+        if safe is None:
+            raise ValueError("LLM response ends before any complete JSON element")
+        repairs.append("truncated")
+        length, open_stack = safe
+        out = out[:length]
+        _drop_trailing_comma(out)
+        out.extend(_CLOSERS[opener] for opener in reversed(open_stack))
+    elif text[end:].strip().strip("`").strip():
+        repairs.append("prose")
+
+    return "".join(out), repairs
+
+
+def _count_rules(value: Any) -> int:
+    """Objects anywhere in value that carry a rule subject (instrument / sector / country)"""
+    if isinstance(value, dict):
+        own = 1 if any(key in value for key in RULE_SUBJECT_KEYS) else 0
+        return own + sum(_count_rules(item) for item in value.values())
+    if isinstance(value, list):
+        return sum(_count_rules(item) for item in value)
+    return 0
+
+
+def _ends_early(raw: str) -> bool:
+    """Whether the response itself stops before its JSON value is closed"""
+    tail = raw.rstrip().rstrip("`").rstrip()
+    return not tail.endswith(("}", "]"))
+
+
+def lost_content(raw: str, value: Any) -> Optional[str]:
+    """
+    What a repaired value lost compared to the raw text (None if nothing).
+    A response that ends early may lose one half-written rule and the keys after it.
+    """
+    truncated = _ends_early(raw)
+    expected = len(_RULE_SUBJECT_PATTERN.findall(raw))
+    found = _count_rules(value)
+    if expected - found > (1 if truncated else 0):
+        return f"{expected - found} of {expected} rules"
+    if not truncated and isinstance(value, dict):
+        missing = sorted(set(_EXTRACTION_KEY_PATTERN.findall(raw)) - set(value))
+        if missing:
+            return f"keys {', '.join(missing)}"
+    return None
+
+
+def parse_json_lenient(raw: str, label: str = "LLM") -> Tuple[Any, List[str]]:
+    """
+    Parse an LLM JSON response, repairing it if needed.
+
+    Returns:
+        (value, repairs) - repairs is [] if the strict parse succeeded
+    Raises:
+        ValueError if nothing could be recovered (JsonRepairLossError if only with rules / keys lost)
+    """
+    stats = get_json_repair_stats()
+    try:
+        value = _strict_parse(raw or "")
+        stats.record([])
+        return value, []
+    except ValueError:
+        pass
+
+    repairs: List[str] = []
+    try:
+        repaired, repairs = repair_json(raw)
+        value = json.loads(repaired, strict=False)
+    except ValueError as e:
+        value = salvage_rules(raw or "")
+        if value is None:
+            stats.record(repairs, failed=True)
+            preview = (raw or "").strip()[:500]
+            logger.error(f"❌ {label} response could not be repaired: {e}")
+            raise ValueError(f"LLM response does not contain valid JSON. Response preview: {preview}") from e
+        repairs = repairs + ["salvaged"]
+
+    lost = lost_content(raw or "", value)
+    if lost is not None:
+        stats.record(repairs, failed=True)
+        logger.error(f"❌ {label} response repair ({', '.join(sorted(set(repairs)))}) would drop {lost} - rejected")
+        raise JsonRepairLossError(f"LLM response JSON could not be repaired without losing {lost}")
+
+    stats.record(repairs)
+    logger.warning(f"🩹 Repaired {label} JSON response ({', '.join(sorted(set(repairs)))})")
+    return value, repairs
+
+
+def parse_extraction_json(raw: str, label: str = "LLM") -> Dict[str, Any]:
+    """
+    Parse an extraction response ({"instrument_rules": [...], ...}) with repair.
+    A bare array is taken as instrument_rules; a repaired response gets empty lists
+    for the keys that were lost.
+    """
+    value, repairs = parse_json_lenient(raw, label)
+    if isinstance(value, list):
+        logger.warning("⚠️ Found JSON array instead of object, converting to object format")
+        value = {"instrument_rules": value}
+        repairs = repairs + ["array_root"]
+    if not isinstance(value, dict):
+        raise ValueError(f"Unexpected LLM output: {str(value)[:200]}")
+    if repairs:
+        for key in EXTRACTION_KEYS:
+            if not isinstance(value.get(key), list):
+                value[key] = []
+        for key in RULE_KEYS:
+            value[key] = [rule for rule in value[key] if isinstance(rule, dict)]
+    return value
@@ -0,0 +1,226 @@
+"""
+LLM Usage Accounting
+Records every chat and embedding call (tokens, provider-cached prompt tokens, latency,
+cache hits, retries, fallback-model use, estimated cost) and aggregates it per job, per stage and per
+model. The current job and stage travel in context variables, so the call sites
+(LLMService, OpenAIProvider, rag_index, the rate limiter) do not need extra
+parameters - asyncio tasks and asyncio.to_thread inherit the context.
+
+Usage:
+    usage = start_job_accounting(job_id)
+    with llm_stage("excel_search"):
+        ...  # every LLM call in here is attributed to the stage
+    result["llm_usage"] = usage.summary()
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Estimated USD prices per 1M tokens: {"model": {"input": x, "cached_input": c, "output": y}}.
+# cached_input applies to prompt tokens served from the provider's prompt cache (default: input).
+# LLM_MODEL_PRICES (JSON, same shape) overrides/extends the defaults.
+# Longest matching prefix wins (so "gpt-4o-mini-2024-07-18" uses "gpt-4o-mini").
+DEFAULT_MODEL_PRICES = {
+    "gpt-5.2": {"input": 1.75, "cached_input": 0.175, "output": 14.0},
+    "gpt-5.1": {"input": 1.25, "cached_input": 0.125, "output": 10.0},
+    "gpt-5": {"input": 1.25, "cached_input": 0.125, "output": 10.0},
+    "gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.60},
+    "gpt-4o": {"input": 2.50, "cached_input": 1.25, "output": 10.0},
+    "gpt-4.1": {"input": 2.00, "cached_input": 0.50, "output": 8.0},
+    "text-embedding-3-large": {"input": 0.13, "output": 0.0},
+    "text-embedding-3-small": {"input": 0.02, "output": 0.0},
+    "stub-": {"input": 0.0, "output": 0.0}
+}
+
+
+def _load_prices() -> Dict[str, Dict[str, float]]:
+    prices = dict(DEFAULT_MODEL_PRICES)
+    raw = os.getenv("LLM_MODEL_PRICES")
+    if raw:
+        try:
+            prices.update(json.loads(raw))
+        except (json.JSONDecodeError, TypeError) as e:
+            logger.warning(f"Ignoring invalid LLM_MODEL_PRICES: {e}")
+    return prices
+
+
+MODEL_PRICES = _load_prices()
+
+DEFAULT_STAGE = "other"
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """Estimated USD cost of a call (0.0 for unknown models)"""
+    matches = [name for name in MODEL_PRICES if model and model.startswith(name)]
+    if not matches:
+        return 0.0
+    price = MODEL_PRICES[max(matches, key=len)]
+    cached_tokens = min(cached_tokens, prompt_tokens)
+    input_cost = (
+        (prompt_tokens - cached_tokens) * price.get("input", 0.0)
+        + cached_tokens * price.get("cached_input", price.get("input", 0.0))
+    )
+    return (input_cost + completion_tokens * price.get("output", 0.0)) / 1_000_000
+
+
+def _empty_bucket() -> Dict[str, Any]:
+    return {
+        "calls": 0,
+        "cache_hits": 0,
+        "errors": 0,
+        "retries": 0,
+        "fallbacks": 0,
+        "prompt_tokens": 0,
+        "cached_tokens": 0,
+        "completion_tokens": 0,
+        "latency_seconds": 0.0,
+        "cost_usd": 0.0
+    }
+
+
+class UsageLedger:
+    """Thread-safe usage totals, broken down by stage and by model"""
+
+    def __init__(self, job_id: Optional[str] = None):
+        self.job_id = job_id
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self.total = _empty_bucket()
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.models: Dict[str, Dict[str, Any]] = {}
+
+    def _buckets(self, stage: str, model: str):
+        return (
+            self.total,
+            self.stages.setdefault(stage, _empty_bucket()),
+            self.models.setdefault(model or "unknown", _empty_bucket())
+        )
+
+    def add(self, stage: str, model: str, **deltas: Any) -> None:
+        with self._lock:
+            for bucket in self._buckets(stage, model):
+                for key, value in deltas.items():
+                    bucket[key] += value
+
+    def summary(self) -> Dict[str, Any]:
+        """JSON-serialisable totals (rounded)"""
+        def rounded(bucket: Dict[str, Any]) -> Dict[str, Any]:
+            result = dict(bucket)
+            result["latency_seconds"] = round(result["latency_seconds"], 3)
+            result["cost_usd"] = round(result["cost_usd"], 6)
+            result["total_tokens"] = result["prompt_tokens"] + result["completion_tokens"]
+            result["cached_prompt_ratio"] = round(result["cached_tokens"] / result["prompt_tokens"], 3) if result["prompt_tokens"] else 0.0
+            return result
+
+        with self._lock:
+            summary = {
+                "total": rounded(self.total),
+                "by_stage": {name: rounded(bucket) for name, bucket in self.stages.items()},
+                "by_model": {name: rounded(bucket) for name, bucket in self.models.items()}
+            }
+        if self.job_id:
+            summary["job_id"] = self.job_id
+            summary["wall_time_seconds"] = round(time.time() - self.started_at, 3)
+        return summary
+
+
+# Current job ledger / stage for the running task
+_current_ledger: ContextVar[Optional[UsageLedger]] = ContextVar("llm_usage_ledger", default=None)
+_current_stage: ContextVar[str] = ContextVar("llm_usage_stage", default=DEFAULT_STAGE)
+
+# Process-wide totals since startup (metrics endpoint)
+_process_ledger = UsageLedger()
+
+
+def start_job_accounting(job_id: str) -> UsageLedger:
+    """Create a ledger for job_id and make it current for this task (and tasks it spawns)"""
+    ledger = UsageLedger(job_id)
+    _current_ledger.set(ledger)
+    return ledger
+
+
+def current_ledger() -> Optional[UsageLedger]:
+    return _current_ledger.get()
+
+
+@contextmanager
+def llm_stage(name: str) -> Iterator[None]:
+    """Attribute LLM calls made inside the block to stage `name`"""
+    token = _current_stage.set(name)
+    try:
+        yield
+    finally:
+        _current_stage.reset(token)
+
+
+def _add(model: str, **deltas: Any) -> None:
+    stage = _current_stage.get()
+    _process_ledger.add(stage, model, **deltas)
+    ledger = _current_ledger.get()
+    if ledger is not None:
+        ledger.add(stage, model, **deltas)
+
+
+def record_call(
+    model: str,
+    prompt_tokens: Optional[int] = None,
+    completion_tokens: Optional[int] = None,
+    latency: float = 0.0,
+    error: bool = False,
+    cached_tokens: Optional[int] = None
+) -> None:
+    """Record one completed (or failed) chat/embedding request"""
+    prompt_tokens = int(prompt_tokens or 0)
+    completion_tokens = int(completion_tokens or 0)
+    cached_tokens = int(cached_tokens or 0)
+    _add(
+        model,
+        calls=1,
+        errors=1 if error else 0,
+        prompt_tokens=prompt_tokens,
+        cached_tokens=cached_tokens,
+        completion_tokens=completion_tokens,
+        latency_seconds=latency,
+        cost_usd=estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens)
+    )
+
+
+def record_usage(model: str, usage: Any, latency: float) -> None:
+    """
+    Record a call from an OpenAI usage object or dict (None = tokens unknown).
+    Prompt tokens served from the provider's prompt cache are in prompt_tokens_details.cached_tokens.
+    """
+    if isinstance(usage, dict):
+        prompt_tokens, completion_tokens = usage.get("prompt_tokens"), usage.get("completion_tokens")
+        details = usage.get("prompt_tokens_details") or {}
+        cached_tokens = details.get("cached_tokens") if isinstance(details, dict) else None
+    else:
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        completion_tokens = getattr(usage, "completion_tokens", None)
+        cached_tokens = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+    record_call(model, prompt_tokens, completion_tokens, latency, cached_tokens=cached_tokens)
+
+
+def record_cache_hit(model: str) -> None:
+    _add(model, cache_hits=1)
+
+
+def record_retry(model: str) -> None:
+    _add(model, retries=1)
+
+
+def record_fallback(model: str) -> None:
+    """A request was re-sent to `model` because the requested model failed"""
+    _add(model, fallbacks=1)
+
+
+def process_usage_summary() -> Dict[str, Any]:
+    """Totals since process start (for /api/metrics)"""
+    return _process_ledger.summary()
@@ -0,0 +1,236 @@
+"""
+Persistent LLM Response Cache
+Disk-backed (SQLite) cache for chat-completion responses so that re-analysing the
+same document or section costs no tokens and no latency.
+
+Entries are keyed by a SHA-256 over the full request parameters (model, temperature,
+token limits, complete messages) plus a prompt-template version. Bumping the version
+constant of a prompt invalidates every entry produced by the old template.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Cache configuration
+# LLM_CACHE_PATH: SQLite file location
+# LLM_CACHE_MAX_ENTRIES: LRU bound - least recently used entries are evicted beyond this
+# LLM_CACHE_TTL_SECONDS: entries older than this are treated as misses and purged
+#   (cached responses quote document text, so keep this in line with trace retention)
+# LLM_CACHE_DISABLED: bypass the cache entirely (no reads, no writes)
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "var/llm_cache.sqlite3")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+LLM_CACHE_DISABLED = os.getenv("LLM_CACHE_DISABLED", "false").lower() == "true"
+
+
+def make_cache_key(api_params: Dict[str, Any], prompt_version: str) -> str:
+    """
+    Build a stable cache key for a chat-completion request.
+
+    Args:
+        api_params: Exact parameters passed to chat.completions.create
+        prompt_version: Version tag of the prompt template that produced the messages
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    payload = json.dumps(
+        {"prompt_version": prompt_version, "params": api_params},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """SQLite-backed LRU + TTL cache for raw LLM responses"""
+
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = LLM_CACHE_TTL_SECONDS,
+        enabled: bool = not LLM_CACHE_DISABLED
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.expired = 0
+
+        if self.enabled:
+            try:
+                self._connect()
+            except Exception as e:
+                logger.warning(f"LLM response cache unavailable ({e}) - continuing without cache")
+                self.enabled = False
+
+    def _connect(self) -> None:
+        """Open the SQLite database and create the table if needed"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS llm_responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                prompt_version TEXT,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                hit_count INTEGER NOT NULL DEFAULT 0
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_last_access ON llm_responses(last_access)")
+        self._conn.commit()
+        logger.info(f"LLM response cache ready at {self.path} (max_entries={self.max_entries}, ttl={self.ttl_seconds}s)")
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for key, or None on miss/expiry"""
+        if not self.enabled or self._conn is None:
+            return None
+
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    "SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+
+                response, created_at = row
+                if self.ttl_seconds > 0 and now - created_at > self.ttl_seconds:
+                    self._conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                    self.expired += 1
+                    self.misses += 1
+                    return None
+
+                self._conn.execute(
+                    "UPDATE llm_responses SET last_access = ?, hit_count = hit_count + 1 WHERE key = ?",
+                    (now, key)
+                )
+                self._conn.commit()
+                self.hits += 1
+                return response
+            except Exception as e:
+                logger.warning(f"LLM cache read failed: {e}")
+                self.misses += 1
+                return None
+
+    def set(self, key: str, response: str, model: str = "", prompt_version: str = "") -> None:
+        """Store a response and evict least recently used entries beyond max_entries"""
+        if not self.enabled or self._conn is None or not response:
+            return
+
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute(
+                    """INSERT OR REPLACE INTO llm_responses
+                       (key, model, prompt_version, response, created_at, last_access, hit_count)
+                       VALUES (?, ?, ?, ?, ?, ?, 0)""",
+                    (key, model, prompt_version, response, now, now)
+                )
+                self.writes += 1
+                self._evict_locked()
+                self._conn.commit()
+            except Exception as e:
+                logger.warning(f"LLM cache write failed: {e}")
+
+    def discard(self, key: str) -> None:
+        """Remove an entry (e.g. when a cached response turned out to be unparseable)"""
+        if not self.enabled or self._conn is None:
+            return
+        with self._lock:
+            try:
+                self._conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                self._conn.commit()
+            except Exception as e:
+                logger.warning(f"LLM cache discard failed: {e}")
+
+    def _evict_locked(self) -> None:
+        """Evict LRU entries above max_entries (caller holds the lock)"""
+        if self.max_entries <= 0:
+            return
+        count = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                """DELETE FROM llm_responses WHERE key IN (
+                       SELECT key FROM llm_responses ORDER BY last_access ASC LIMIT ?
+                   )""",
+                (overflow,)
+            )
+            self.evictions += overflow
+
+    def purge_expired(self) -> int:
+        """Delete all entries older than the TTL. Returns the number of rows removed."""
+        if not self.enabled or self._conn is None or self.ttl_seconds <= 0:
+            return 0
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            try:
+                cursor = self._conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (cutoff,))
+                self._conn.commit()
+                removed = cursor.rowcount or 0
+                self.expired += removed
+                return removed
+            except Exception as e:
+                logger.warning(f"LLM cache purge failed: {e}")
+                return 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current size"""
+        entries = 0
+        if self.enabled and self._conn is not None:
+            with self._lock:
+                try:
+                    entries = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+                except Exception:
+                    entries = 0
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "expired": self.expired
+        }
+
+
+# Process-wide cache instance (lazy initialization)
+_response_cache: Optional[LLMResponseCache] = None
+
+
+def get_response_cache() -> LLMResponseCache:
+    """Get the shared response cache (lazy initialization)"""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = LLMResponseCache()
+    return _response_cache
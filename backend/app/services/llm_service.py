@@ -1,17 +1,40 @@
-import httpx
 import json
 import os
 import re
 import time
 import base64
 import io
-from typing import Dict, List, Optional
-from openai import AsyncOpenAI
+import asyncio
+from typing import Dict, List, Optional, Tuple
 import openai
 from .interfaces.llm_provider_interface import LLMProviderInterface
+from .prompt_prefix import StaticPromptPrefix
+from .compact_output import (
+    COMPACT_PROMPT_VERSION,
+    InstrumentCatalog,
+    NumberedDocument,
+    build_compact_instructions,
+    expand_compact,
+    is_compact_mode,
+    parse_compact,
+    salvage_compact
+)
 from .providers.openai_provider import OpenAIProvider
+from .providers.ollama_provider import OllamaProvider
+from .provider_router import Route, get_provider_router
+from .providers.stub_provider import LLM_STUB_ENABLED, STUB_PROVIDER, StubOpenAIClient, StubProvider, is_stub_model, stub_model
 from ..utils.trace_handler import TraceHandler
 from ..utils.logger import setup_logger
+from .llm_cache import get_response_cache, make_cache_key
+from .rate_limiter import get_rate_limiter, estimate_tokens
+from .hedging import get_request_hedger, size_bucket
+from .model_health import get_model_health, is_unavailable_error
+from .http_clients import get_async_openai_client
+from .llm_accounting import record_cache_hit, record_call, record_fallback, record_usage
+from .json_repair import JsonRepairLossError, parse_extraction_json
+from .job_budget import within_budget
+from .decomposed_extraction import RULE_FAMILIES, family_prefix, family_result
+from .stream_rule_parser import IncrementalRuleParser, LLM_STREAMING_ENABLED, RULE_KEYS, RuleListener, notify_rule, salvage_rules
 
 # Try to import pdf2image for vision analysis
 try:
@@ -22,6 +45,16 @@ except ImportError:
 
 logger = setup_logger(__name__)
 
+# Prompt template versions - part of the response cache key.
+# Bump the matching constant whenever a prompt template changes so responses
+# produced by the old template are no longer served from the cache.
+TEXT_PROMPT_VERSION = "text-v1"
+EXTRACTION_PROMPT_VERSION = "extraction-v1"
+FALLBACK_PROMPT_VERSION = "fallback-v2"
+
+# Models tried (in order) when the requested extraction model is unavailable
+EXTRACTION_FALLBACK_MODELS = ["gpt-4o", "gpt-4o-mini"]
+
 
 def _clean_json_string(json_str: str) -> str:
     """
@@ -34,6 +67,24 @@ def _clean_json_string(json_str: str) -> str:
     return cleaned
 
 
+def _response_has_json(response) -> bool:
+    """True if a chat completion contains a parseable JSON object or array (hedging validity check)"""
+    try:
+        raw = response.choices[0].message.content or ""
+    except (AttributeError, IndexError):
+        return False
+    cleaned = raw.strip().strip("```json").strip("```").strip()
+    for open_char, close_char in (("{", "}"), ("[", "]")):
+        start, end = cleaned.find(open_char), cleaned.rfind(close_char) + 1
+        if start != -1 and end > start:
+            try:
+                json.loads(_clean_json_string(cleaned[start:end]))
+                return True
+            except json.JSONDecodeError:
+                continue
+    return False
+
+
 # Core system prompt for compliance analysis (used in system role)
 SYSTEM_PROMPT = """You are an expert compliance analyst with 100% accuracy requirements. Your task is to extract investment rules with maximum precision and completeness.
 
@@ -254,106 +305,8 @@ Return ONLY valid JSON:
 **CRITICAL**: Investment guideline documents almost always contain rules. If you find tables with "Ja/Nein" columns or lists of instruments, extract them. Returning empty arrays is only acceptable if the document truly contains NO investment rules at all."""
 
 
-class LLMService:
-    """Service for managing different LLM providers with fallback and validation"""
-    
-    def __init__(self):
-        # Get API key - make it optional for graceful degradation
-        api_key = os.getenv("OPENAI_API_KEY")
-        
-        # Initialize client only if API key is available
-        self.client = None
-        if api_key:
-            try:
-                # Create a custom httpx client without proxies to avoid compatibility issues
-                # This prevents the "unexpected keyword argument 'proxies'" error
-                # Use connection pooling for faster requests (reuse connections)
-                http_client = httpx.AsyncClient(
-                    timeout=httpx.Timeout(180.0, connect=15.0, read=180.0),  # 3 min timeout for large docs
-                    limits=httpx.Limits(max_keepalive_connections=5, max_connections=10),
-                    # Explicitly don't pass proxies parameter
-                )
-                
-                # Initialize AsyncOpenAI client with custom http_client
-                self.client = AsyncOpenAI(
-                    api_key=api_key,
-                    http_client=http_client
-                )
-            except Exception as e:
-                logger.warning(f"Failed to initialize OpenAI client: {str(e)}")
-                logger.warning("OpenAI API key not found. Embedding generation will be disabled.")
-                self.client = None
-        else:
-            logger.warning("OpenAI API key not found. Embedding generation will be disabled.")
-        
-        self.providers = {
-            "openai": OpenAIProvider()
-        }
-        self.trace_handler = TraceHandler()
-    
-    def get_provider(self, provider_name: str) -> LLMProviderInterface:
-        """Get LLM provider by name"""
-        if provider_name not in self.providers:
-            raise ValueError(f"Unknown provider: {provider_name}")
-        return self.providers[provider_name]
-    
-    async def analyze_text(self, prompt_text: str) -> dict:
-        """Analyze text using the new OpenAI client with robust system prompt"""
-        if not self.client:
-            return {"error": "OpenAI client not initialized. Please set OPENAI_API_KEY environment variable."}
-        
-        try:
-            response = await self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                temperature=0,
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": prompt_text}
-                ]
-            )
-            raw = response.choices[0].message.content
-
-            # try to parse JSON safely
-            cleaned = raw.strip().strip("```json").strip("```")
-            # Clean invalid control characters before parsing
-            cleaned = _clean_json_string(cleaned)
-            return json.loads(cleaned)
-
-        except Exception as e:
-            logger.error(f"LLM Error: {e}", exc_info=True)
-            return {"error": str(e)}
-    
-    async def analyze_document(self, text: str, provider: str, model: str, trace_id: Optional[str] = None) -> Dict:
-        """Analyze document using new OpenAI client with robust system prompt"""
-        if not self.client:
-            raise ValueError("OpenAI client not initialized. Please set OPENAI_API_KEY environment variable.")
-        
-        # Calculate safe text limit based on model
-        # GPT-4o/GPT-4o-mini: 128k tokens (~512k chars), GPT-5/GPT-5.1: 128k+ tokens
-        # Note: gpt-4 check kept for backward compatibility but this model is deprecated
-        if model == "gpt-4":
-            # GPT-4 has 8192 token limit: reserve ~1200 for enhanced prompts, ~2000 for completion
-            max_text_length = 10000  # Conservative limit for GPT-4's 8k context
-        elif model == "gpt-5" or model == "gpt-5.1" or model == "gpt-5.2":
-            # GPT-5/GPT-5.1/GPT-5.2 assumed to have large context window (128k+ tokens) - support very large files
-            max_text_length = 1000000  # 1MB chars for very large documents (150+ pages)
-        else:
-            # Modern models (GPT-4o, GPT-4o-mini) have 128k context window (~512k chars)
-            max_text_length = 500000  # 500k chars for large documents
-        
-        # For very large documents, we'll use section-based processing instead of truncating
-        # Only truncate if absolutely necessary (old GPT-4 model)
-        if model == "gpt-4" and len(text) > max_text_length:
-            logger.warning(f"Document is {len(text)} chars, truncating to {max_text_length} for GPT-4 (deprecated model)")
-            text_to_analyze = text[:max_text_length]
-        else:
-            # For modern models, process full text (will be chunked by section-based extraction)
-            text_to_analyze = text
-            if len(text) > max_text_length:
-                logger.info(f"Large document ({len(text)} chars) - will use section-based chunking for analysis")
-        
-        # Detailed system prompt for extraction (used in user role for detailed instructions)
-        extraction_system_prompt = f"""You are an expert compliance analyst analyzing an investment policy document (Verkaufsprospekt, Prospectus, or similar). Your PRIMARY goal is to achieve 100% accuracy by finding ALL items that are explicitly stated as ALLOWED or PERMITTED, and ALL items that are PROHIBITED.
+# Extraction instructions (user message) - static; the document text is appended directly after them
+EXTRACTION_INSTRUCTIONS = """You are an expert compliance analyst analyzing an investment policy document (Verkaufsprospekt, Prospectus, or similar). Your PRIMARY goal is to achieve 100% accuracy by finding ALL items that are explicitly stated as ALLOWED or PERMITTED, and ALL items that are PROHIBITED.
 
 **CRITICAL: HANDLING LONG DOCUMENTS (VERKAUFSPROSPEKT, PROSPECTUS, ETC.)**
 This document may be very long (100+ pages). You MUST:
@@ -463,11 +416,11 @@ ABS/MBS/CDO/CLO | nein: X | ja: - | Detailrestriktionen: ...
 ```
 
 You MUST extract:
-- {{"instrument": "Aktien", "allowed": true, "reason": "X mark in 'ja' column"}}
-- {{"instrument": "Bezugsrechte", "allowed": true, "reason": "X mark in 'ja' column"}}
-- {{"instrument": "Staatsanleihen", "allowed": true, "reason": "X mark in 'ja' column"}}
-- {{"instrument": "Pfandbriefe", "allowed": true, "reason": "X mark in 'ja' column"}}
-- {{"instrument": "ABS/MBS/CDO/CLO", "allowed": false, "reason": "X mark in 'nein' column"}}
+- {"instrument": "Aktien", "allowed": true, "reason": "X mark in 'ja' column"}
+- {"instrument": "Bezugsrechte", "allowed": true, "reason": "X mark in 'ja' column"}
+- {"instrument": "Staatsanleihen", "allowed": true, "reason": "X mark in 'ja' column"}
+- {"instrument": "Pfandbriefe", "allowed": true, "reason": "X mark in 'ja' column"}
+- {"instrument": "ABS/MBS/CDO/CLO", "allowed": false, "reason": "X mark in 'nein' column"}
 
 **CRITICAL**: Extract ALL rows, not just a few!
 
@@ -512,8 +465,8 @@ When you find explicit evidence that an instrument is PROHIBITED, mark it as all
 **STEP 5: HANDLE CONDITIONAL RULES**
 If a rule has conditions, extract it with allowed=true but include the condition in the reason:
 - "subject to", "provided that", "up to X%", "with restrictions", "under certain conditions"
-- Example: "FX Forwards allowed up to 10% of portfolio" → {{"instrument": "FX Forwards", "allowed": true, "reason": "FX Forwards allowed up to 10% of portfolio"}}
-- Example: "Derivatives permitted subject to risk limits" → {{"instrument": "Derivatives", "allowed": true, "reason": "Derivatives permitted subject to risk limits"}}
+- Example: "FX Forwards allowed up to 10% of portfolio" → {"instrument": "FX Forwards", "allowed": true, "reason": "FX Forwards allowed up to 10% of portfolio"}
+- Example: "Derivatives permitted subject to risk limits" → {"instrument": "Derivatives", "allowed": true, "reason": "Derivatives permitted subject to risk limits"}
 
 **CRITICAL: DEFAULT BEHAVIOR**
 - Default assumption: All instruments are NOT ALLOWED (allowed=false) unless explicitly stated as allowed/permitted
@@ -542,7 +495,7 @@ Recognize these as the SAME instrument types (but use the EXACT name from docume
 - **Instruments**: Use EXACT names from document (e.g., "FX Forwards", "currency futures", "covered bonds", "common stock", "Aktien", "Bezugsrechte", "Schatzanweisungen", etc.)
 - **CRITICAL**: Extract each instrument individually - do not group them together
 - **CRITICAL FOR TABLES**: Extract every table row, including nested/sub-items, as separate entries. Do not skip any rows.
-- **🔴 SWAPS**: If "Swaps" is mentioned anywhere in the document, ALWAYS extract as: {{"instrument": "Swaps", "allowed": false, "reason": "Swaps are always prohibited"}} - No checking needed, always not allowed
+- **🔴 SWAPS**: If "Swaps" is mentioned anywhere in the document, ALWAYS extract as: {"instrument": "Swaps", "allowed": false, "reason": "Swaps are always prohibited"} - No checking needed, always not allowed
 
 **EVIDENCE REQUIREMENTS:**
 - The "reason" field must contain the EXACT quote from the document (verbatim copy)
@@ -577,8 +530,8 @@ Before finishing, you MUST verify:
 - If you still find nothing, include a conflict explaining why no rules were found
 
 **CRITICAL RULES WITH EXAMPLES:**
-1. If document says "FX Forwards are allowed" → extract: {{"instrument": "FX Forwards", "allowed": true, "reason": "FX Forwards are allowed"}}
-2. If document says "currency futures are permitted" → extract: {{"instrument": "currency futures", "allowed": true, "reason": "currency futures are permitted"}}
+1. If document says "FX Forwards are allowed" → extract: {"instrument": "FX Forwards", "allowed": true, "reason": "FX Forwards are allowed"}
+2. If document says "currency futures are permitted" → extract: {"instrument": "currency futures", "allowed": true, "reason": "currency futures are permitted"}
 3. If document has a section "Zulässige Anlagen" with a list of 20 items → extract 20 separate instrument rules, one for each item (verify you got all 20)
 4. If document has a section "Unzulässige Anlagen" with a list of 15 items → extract 15 separate instrument rules, one for each item (verify you got all 15)
 5. DO NOT mark something as "not allowed" unless explicitly prohibited - if not mentioned, do not include it
@@ -588,12 +541,12 @@ Before finishing, you MUST verify:
 9. If a table has 50 rows, extract 50 separate rules - count them to verify
 
 **Return JSON only (no explanations, no markdown, just valid JSON):**
-{{
-  "sector_rules": [{{"sector": "string", "allowed": true/false, "reason": "exact quote from document"}}],
-  "country_rules": [{{"country": "string", "allowed": true/false, "reason": "exact quote from document"}}],
-  "instrument_rules": [{{"instrument": "string", "allowed": true/false, "reason": "exact quote from document"}}],
-  "conflicts": [{{"category": "string", "detail": "string describing the conflict"}}]
-}}
+{
+  "sector_rules": [{"sector": "string", "allowed": true/false, "reason": "exact quote from document"}],
+  "country_rules": [{"country": "string", "allowed": true/false, "reason": "exact quote from document"}],
+  "instrument_rules": [{"instrument": "string", "allowed": true/false, "reason": "exact quote from document"}],
+  "conflicts": [{"category": "string", "detail": "string describing the conflict"}]
+}
 
 **═══════════════════════════════════════════════════════════════════════════════**
 **LEGEND / QUICK REFERENCE - READ THIS BEFORE ANALYZING THE DOCUMENT BELOW**
@@ -637,7 +590,7 @@ Before finishing, you MUST verify:
 
 **🔴 ABSOLUTE RULE: SWAPS ARE ALWAYS NOT ALLOWED**
 - **SWAPS = ALWAYS allowed=false** - No exceptions, no checking needed
-- Mark as: {{"instrument": "Swaps", "allowed": false, "reason": "Swaps are always prohibited"}}
+- Mark as: {"instrument": "Swaps", "allowed": false, "reason": "Swaps are always prohibited"}
 - Applies to ALL swap types: interest rate swaps, currency swaps, credit default swaps, etc.
 
 **REMEMBER:** Extract EVERY row from tables, count items in lists, search the ENTIRE document systematically.
@@ -645,7 +598,343 @@ Before finishing, you MUST verify:
 **═══════════════════════════════════════════════════════════════════════════════**
 
 **Document text to analyze (search through ALL of it systematically, section by section):**
-{text_to_analyze}"""
+"""
+
+# Static prefix of every extraction call (bump the version when SYSTEM_PROMPT or the instructions change)
+EXTRACTION_PREFIX = StaticPromptPrefix("extraction", EXTRACTION_PROMPT_VERSION, SYSTEM_PROMPT, EXTRACTION_INSTRUCTIONS)
+
+# Universal fallback instructions - the JSON schema comes before the document so the whole prefix is static
+FALLBACK_INSTRUCTIONS = """You are analyzing an investment guideline document (Anlagerichtlinie, Investment Guidelines, Prospectus, etc.). Extract ALL investment rules (instruments, sectors, countries) that are explicitly stated as ALLOWED or PROHIBITED.
+
+**CRITICAL INSTRUCTIONS:**
+1. Search through the ENTIRE document systematically - check all sections, tables, lists, and paragraphs
+2. This document likely contains TABLES with "Ja/Nein" columns - extract EVERY row from these tables
+3. Look for hierarchical sections (numbered like "2.1.4", "3.1") - extract rules from both parent and child sections
+4. Extract EVERY rule you find - if you see a table with 30 rows, extract all 30 rows
+5. Use the EXACT names and quotes from the document
+6. If "Min", "Max", or "Dimension" columns are empty, still extract the instrument if "Ja/Nein" has a value
+
+**TABLE EXTRACTION (HIGHEST PRIORITY):**
+- Look for tables with columns: "Ja/Nein", "Yes/No", "Min", "Max", "Dimension"
+- "Ja" or "Yes" = ALLOWED (allowed=true)
+- "Nein" or "No" = PROHIBITED (allowed=false)
+- Extract each table row as a separate instrument rule
+- Include table row content in evidence (e.g., "Ja/Nein: Ja, Max: 25%, Dimension: % des Fondsvermögens")
+
+**LIST EXTRACTION:**
+- "Zulässige Anlagen" / "Permitted Investments" → extract ALL items as allowed=true
+- "Unzulässige Anlagen" / "Prohibited Investments" → extract ALL items as allowed=false
+- Extract each list item separately
+
+**TEXT EXTRACTION:**
+- Look for statements: "X is allowed", "Y is prohibited", "investments in Z are permitted"
+- Check "Weitere Restriktionen" (Further Restrictions) sections
+- Include exact sentences/paragraphs as evidence
+
+**ALLOWED indicators (multi-language):**
+- German: "ja", "erlaubt", "zugelassen", "berechtigt", "darf", "zulässig"
+- English: "allowed", "permitted", "authorized", "approved", "may invest", "can invest", "eligible"
+- Table: "Ja", "Yes", "X" marks, checkmarks
+
+**PROHIBITED indicators (multi-language):**
+- German: "nein", "verboten", "nicht erlaubt", "ausgeschlossen", "darf nicht", "unzulässig"
+- English: "prohibited", "forbidden", "not allowed", "restricted", "excluded", "may not invest"
+- Table: "Nein", "No", "-" (dash)
+
+**SPECIAL PATTERNS:**
+- "Keine Restriktionen" (No Restrictions) = typically allowed
+- "Alle" (All) = typically all items allowed
+- Percentage limits (e.g., "max 50% des Fondsvermögens") = include in evidence
+
+Return ONLY valid JSON:
+{
+  "instrument_rules": [{"instrument": "exact name from document", "allowed": true/false, "reason": "exact quote including table row or text"}],
+  "sector_rules": [{"sector": "exact name from document", "allowed": true/false, "reason": "exact quote from document"}],
+  "country_rules": [{"country": "exact name from document", "allowed": true/false, "reason": "exact quote from document"}],
+  "conflicts": []
+}
+
+**Document text to analyze:**
+"""
+
+FALLBACK_PREFIX = StaticPromptPrefix("fallback", FALLBACK_PROMPT_VERSION, FALLBACK_SYSTEM_PROMPT, FALLBACK_INSTRUCTIONS)
+
+
+class LLMService:
+    """Service for managing different LLM providers with fallback and validation"""
+    
+    def __init__(self):
+        # Get API key - make it optional for graceful degradation
+        api_key = os.getenv("OPENAI_API_KEY")
+        
+        # The AsyncOpenAI client is resolved per call (see client) so that it is rebuilt
+        # together with the shared httpx client when a new event loop is used
+        self._openai_api_key = None
+        if api_key:
+            try:
+                # Pass our own httpx client (no proxies argument - avoids the "unexpected keyword
+                # argument 'proxies'" error). It is the application-wide pooled client, so every
+                # LLMService instance reuses the same keep-alive connections and pool limit.
+                get_async_openai_client(api_key)
+                self._openai_api_key = api_key
+            except Exception as e:
+                logger.warning(f"Failed to initialize OpenAI client: {str(e)}")
+                logger.warning("OpenAI API key not found. Embedding generation will be disabled.")
+        else:
+            logger.warning("OpenAI API key not found. Embedding generation will be disabled.")
+
+        # Offline stub (provider "stub", or every call with LLM_STUB_ENABLED=true)
+        self.stub_client = StubOpenAIClient()
+        if LLM_STUB_ENABLED:
+            logger.warning("LLM_STUB_ENABLED=true - all chat completions are answered by the offline stub")
+        
+        self.providers = {
+            "openai": OpenAIProvider(),
+            "ollama": OllamaProvider(),
+            STUB_PROVIDER: StubProvider()
+        }
+        self.trace_handler = TraceHandler()
+        self.response_cache = get_response_cache()
+
+        # Excel mapping instruments for compact output (registered by AnalysisService)
+        self.instrument_catalog: Optional[InstrumentCatalog] = None
+        self._compact_prefixes: Dict[str, StaticPromptPrefix] = {}
+
+    @property
+    def client(self):
+        """
+        AsyncOpenAI client on the shared httpx client of the running event loop (the
+        offline stub with LLM_STUB_ENABLED, None without an API key)
+        """
+        if LLM_STUB_ENABLED:
+            return self.stub_client
+        if self._openai_api_key is None:
+            return None
+        return get_async_openai_client(self._openai_api_key)
+
+    def _compact_prefix(self, catalog: InstrumentCatalog) -> StaticPromptPrefix:
+        """Compact extraction prefix for a catalog (built once per catalog so it stays cacheable)"""
+        prefix = self._compact_prefixes.get(catalog.fingerprint)
+        if prefix is None:
+            prefix = StaticPromptPrefix(
+                "extraction_compact",
+                COMPACT_PROMPT_VERSION,
+                SYSTEM_PROMPT,
+                build_compact_instructions(EXTRACTION_INSTRUCTIONS, catalog)
+            )
+            self._compact_prefixes[catalog.fingerprint] = prefix
+        return prefix
+
+    async def _chat_completion(self, api_params: Dict, prompt_version: str, use_cache: bool = True, on_rule: Optional[RuleListener] = None) -> str:
+        """
+        Run a chat completion and return the raw message content.
+        Responses are served from / stored in the persistent response cache unless
+        use_cache is False. Truncated responses (finish_reason == "length") are not cached.
+        The call is bounded by the time left in the current job budget (see job_budget).
+        With on_rule, the completion is streamed and each extracted rule is passed to
+        on_rule(rule_type, rule) as soon as it is complete (cache hits are replayed).
+        """
+        api_params = self._stub_params(api_params)
+        cache_key = None
+        if use_cache and self.response_cache.enabled:
+            cache_key = make_cache_key(api_params, prompt_version)
+            cached = await asyncio.to_thread(self.response_cache.get, cache_key)
+            if cached is not None:
+                logger.info(f"💾 LLM cache hit ({api_params.get('model')}, {prompt_version})")
+                record_cache_hit(api_params.get("model", ""))
+                if on_rule is not None:
+                    for rule_type, rule in IncrementalRuleParser().feed(cached):
+                        await notify_rule(on_rule, rule_type, rule)
+                return cached
+
+        async def complete():
+            if on_rule is not None and LLM_STREAMING_ENABLED:
+                return await self._stream_completion(api_params, on_rule)
+            # Hedged against tail latency: a slow call gets a duplicate, first valid JSON wins
+            hedge_key = (api_params.get("model", ""), size_bucket(estimate_tokens(api_params)))
+            response = await get_request_hedger().run(
+                hedge_key, lambda: self._create_completion(api_params), _response_has_json
+            )
+            return response.choices[0].message.content, getattr(response.choices[0], "finish_reason", None)
+
+        # Bounded by the job deadline (rate-limit waits and retries included)
+        raw, finish_reason = await within_budget(complete(), "llm_calls")
+
+        if cache_key and raw and finish_reason != "length":
+            await asyncio.to_thread(
+                self.response_cache.set, cache_key, raw, api_params.get("model", ""), prompt_version
+            )
+        return raw
+
+    async def _stream_completion(self, api_params: Dict, on_rule: RuleListener):
+        """
+        Stream a chat completion through the rate limiter, emitting rules as they close.
+
+        Returns:
+            (raw content, finish_reason)
+        """
+        limiter = get_rate_limiter()
+        model = api_params.get("model", "")
+        reserved = estimate_tokens(api_params)
+        usage_holder = {}
+
+        async def consume():
+            stream = await self._client_for(model).chat.completions.create(
+                **api_params, stream=True, stream_options={"include_usage": True}
+            )
+            parser = IncrementalRuleParser()
+            parts = []
+            finish_reason = None
+            async for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    usage_holder["usage"] = chunk.usage
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                delta = getattr(choice.delta, "content", None) or ""
+                if delta:
+                    parts.append(delta)
+                    for rule_type, rule in parser.feed(delta):
+                        await notify_rule(on_rule, rule_type, rule)
+                if choice.finish_reason:
+                    finish_reason = choice.finish_reason
+            logger.info(f"📡 Streamed {parser.rule_count} rules from {model} (finish_reason={finish_reason})")
+            return "".join(parts), finish_reason
+
+        health = get_model_health()
+        started = time.monotonic()
+        try:
+            result = await limiter.call(model, reserved, consume)
+        except Exception as e:
+            record_call(model, latency=time.monotonic() - started, error=True)
+            health.record_failure(model, e)
+            raise
+        health.record_success(model)
+        usage = usage_holder.get("usage")
+        record_usage(model, usage, time.monotonic() - started)
+        limiter.settle_tokens(model, reserved, getattr(usage, "total_tokens", None))
+        return result
+
+    @staticmethod
+    def _stub_params(api_params: Dict) -> Dict:
+        """
+        With LLM_STUB_ENABLED, the request under its stub model name - stub answers must not
+        be cached, counted or health-tracked under the real model they stand in for.
+        """
+        if not LLM_STUB_ENABLED or is_stub_model(api_params.get("model")):
+            return api_params
+        return {**api_params, "model": stub_model(api_params.get("model"))}
+
+    def _client_for(self, model: str):
+        """SDK client for a model - stub models are answered by the offline stub"""
+        return self.stub_client if is_stub_model(model) else self.client
+
+    async def _create_completion(self, api_params: Dict):
+        """Call chat.completions.create through the process-wide rate limiter"""
+        api_params = self._stub_params(api_params)
+        limiter = get_rate_limiter()
+        model = api_params.get("model", "")
+        reserved = estimate_tokens(api_params)
+        health = get_model_health()
+        started = time.monotonic()
+        try:
+            response = await limiter.call(model, reserved, lambda: self._client_for(model).chat.completions.create(**api_params))
+        except Exception as e:
+            record_call(model, latency=time.monotonic() - started, error=True)
+            health.record_failure(model, e)
+            raise
+        health.record_success(model)
+        usage = getattr(response, "usage", None)
+        record_usage(model, usage, time.monotonic() - started)
+        limiter.settle_tokens(model, reserved, getattr(usage, "total_tokens", None))
+        return response
+
+    async def _discard_cached_response(self, api_params: Dict, prompt_version: str) -> None:
+        """Drop a cached response that could not be parsed so the next run asks the model again"""
+        if self.response_cache.enabled:
+            await asyncio.to_thread(self.response_cache.discard, make_cache_key(self._stub_params(api_params), prompt_version))
+    
+    def get_provider(self, provider_name: str) -> LLMProviderInterface:
+        """Get LLM provider by name"""
+        if provider_name not in self.providers:
+            raise ValueError(f"Unknown provider: {provider_name}")
+        return self.providers[provider_name]
+    
+    async def analyze_text(self, prompt_text: str, prompt_version: str = TEXT_PROMPT_VERSION, use_cache: bool = True, provider: Optional[str] = None) -> dict:
+        """Analyze text using the new OpenAI client with robust system prompt"""
+        api_params, prompt_version = self.text_request(prompt_text, prompt_version, provider)
+        if not self._client_for(api_params["model"]):
+            return {"error": "OpenAI client not initialized. Please set OPENAI_API_KEY environment variable."}
+        
+        try:
+            raw = await self._chat_completion(api_params, prompt_version, use_cache)
+
+            # try to parse JSON safely
+            cleaned = raw.strip().strip("```json").strip("```")
+            # Clean invalid control characters before parsing
+            cleaned = _clean_json_string(cleaned)
+            try:
+                return json.loads(cleaned)
+            except json.JSONDecodeError:
+                await self._discard_cached_response(api_params, prompt_version)
+                raise
+
+        except Exception as e:
+            logger.error(f"LLM Error: {e}", exc_info=True)
+            return {"error": str(e)}
+    
+    async def analyze_document(self, text: str, provider: str, model: str, trace_id: Optional[str] = None, use_cache: bool = True, on_rule: Optional[RuleListener] = None, fallback: bool = True) -> Dict:
+        """
+        Analyze document using new OpenAI client with robust system prompt.
+        on_rule(rule_type, rule) is called for every rule as soon as it is streamed.
+        fallback=False keeps the call on `model` (no EXTRACTION_FALLBACK_MODELS) and lets
+        errors surface - the extraction cascade decides itself where to escalate.
+        """
+        if provider == STUB_PROVIDER:
+            model = stub_model(model)
+        if not self._client_for(model):
+            raise ValueError("OpenAI client not initialized. Please set OPENAI_API_KEY environment variable.")
+
+        # Skip models already known to be unavailable (404 / no access) instead of rediscovering it
+        model = get_model_health().route([model] + (EXTRACTION_FALLBACK_MODELS if fallback else []))
+        
+        # Calculate safe text limit based on model
+        # GPT-4o/GPT-4o-mini: 128k tokens (~512k chars), GPT-5/GPT-5.1: 128k+ tokens
+        # Note: gpt-4 check kept for backward compatibility but this model is deprecated
+        if model == "gpt-4":
+            # GPT-4 has 8192 token limit: reserve ~1200 for enhanced prompts, ~2000 for completion
+            max_text_length = 10000  # Conservative limit for GPT-4's 8k context
+        elif model == "gpt-5" or model == "gpt-5.1" or model == "gpt-5.2":
+            # GPT-5/GPT-5.1/GPT-5.2 assumed to have large context window (128k+ tokens) - support very large files
+            max_text_length = 1000000  # 1MB chars for very large documents (150+ pages)
+        else:
+            # Modern models (GPT-4o, GPT-4o-mini) have 128k context window (~512k chars)
+            max_text_length = 500000  # 500k chars for large documents
+        
+        # For very large documents, we'll use section-based processing instead of truncating
+        # Only truncate if absolutely necessary (old GPT-4 model)
+        if model == "gpt-4" and len(text) > max_text_length:
+            logger.warning(f"Document is {len(text)} chars, truncating to {max_text_length} for GPT-4 (deprecated model)")
+            text_to_analyze = text[:max_text_length]
+        else:
+            # For modern models, process full text (will be chunked by section-based extraction)
+            text_to_analyze = text
+            if len(text) > max_text_length:
+                logger.info(f"Large document ({len(text)} chars) - will use section-based chunking for analysis")
+        
+        # Static prefix (system prompt + instructions, cacheable by the provider) followed by the document
+        # Compact mode: catalog ids + numbered lines in, id tuples + line spans out (see compact_output)
+        compact = is_compact_mode()
+        if compact:
+            catalog = self.instrument_catalog or InstrumentCatalog([])
+            document = NumberedDocument(text_to_analyze)
+            prefix = self._compact_prefix(catalog)
+            prompt_version = COMPACT_PROMPT_VERSION
+            messages = prefix.messages(document.text)
+        else:
+            prefix = EXTRACTION_PREFIX
+            prompt_version = EXTRACTION_PROMPT_VERSION
+            messages = prefix.messages(text_to_analyze)
 
         if trace_id:
             prompt_data = {
@@ -657,50 +946,17 @@ Before finishing, you MUST verify:
                 "text_length": len(text),
                 "text_preview": text[:500] + "..." if len(text) > 500 else text,
                 "system_prompt": SYSTEM_PROMPT,
-                "extraction_system_prompt": extraction_system_prompt
+                "extraction_system_prompt": messages[1]["content"],
+                "prompt_prefix": prefix.describe()
             }
             await self.trace_handler.save_llm_prompt(trace_id, prompt_data)
 
+        raw = None
         try:
-            # Use new OpenAI client approach with optimized settings for speed
-            # GPT-4 has 8k context window, enhanced prompts are longer, so reduce max_tokens further
-            # Reserve ~2000 tokens for completion to leave room for input (~5500 tokens with enhanced prompts)
-            api_params = {
-                "model": model,
-                "top_p": 1,  # Conservative mode
-                "presence_penalty": 0,  # No penalty for presence
-                "frequency_penalty": 0,  # No penalty for frequency
-                "messages": [
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": extraction_system_prompt}
-                ]
-            }
-            
-            # Set temperature based on model requirements
-            # gpt-5/gpt-5.1/gpt-5.2 only supports default temperature (1), not 0
-            if model == "gpt-5" or model == "gpt-5.1" or model == "gpt-5.2":
-                # gpt-5/gpt-5.1/gpt-5.2 requires default temperature (1)
-                api_params["temperature"] = 1
-            else:
-                # Other models can use temperature 0 for deterministic responses
-                api_params["temperature"] = 0  # Deterministic, evidence-based mode
+            api_params = self._extraction_api_params(model, messages)
             
-            # Use correct parameter based on model
-            # GPT-5/5.1/5.2 require max_completion_tokens (newer models)
-            # Older models use max_tokens
-            if model in ["gpt-5", "gpt-5.1", "gpt-5.2"]:
-                # GPT-5/5.1/5.2 have large context windows - use higher limit to avoid truncation
-                api_params["max_completion_tokens"] = 8000
-            elif model in ["o1", "o1-mini", "o1-preview", "o1-2024-09-12", "gpt-4.1"]:
-                api_params["max_completion_tokens"] = 4000
-            else:
-                # Standard models use max_tokens
-                # Increased to 4000 to avoid truncation (costs more but ensures completeness)
-                # GPT-4 has 8k context, but we'll use 3500 to leave room for input
-                api_params["max_tokens"] = 3500 if model == "gpt-4" else 4000
-            
-            response = await self.client.chat.completions.create(**api_params)
-            raw = response.choices[0].message.content
+            # Compact tuples cannot be streamed as rules - they are replayed after expansion
+            raw = await self._chat_completion(api_params, prompt_version, use_cache, None if compact else on_rule)
 
             # Save raw LLM response to trace file (before parsing to rule out parser errors)
             if trace_id:
@@ -710,46 +966,24 @@ Before finishing, you MUST verify:
                 with open(raw_response_path, 'w', encoding='utf-8') as f:
                     f.write(raw)
 
-            # Parse JSON safely - extract JSON from response (handle extra text)
-            cleaned = raw.strip().strip("```json").strip("```").strip()
-            
-            # Find first { and last } to extract JSON even if there's extra text
-            json_start = cleaned.find('{')
-            json_end = cleaned.rfind('}') + 1
-            
-            if json_start == -1 or json_end <= json_start:
-                logger.error(f"❌ No valid JSON found in LLM response")
-                logger.error(f"❌ Full response (first 2000 chars): {cleaned[:2000]}")
-                logger.error(f"❌ Full response length: {len(cleaned)} chars")
-                logger.error(f"❌ Response contains '{{': {cleaned.find('{') != -1}")
-                logger.error(f"❌ Response contains '}}': {cleaned.find('}') != -1}")
-                logger.error(f"❌ Response contains '[': {cleaned.find('[') != -1}")
-                # Try to find JSON array instead
-                array_start = cleaned.find('[')
-                array_end = cleaned.rfind(']') + 1
-                if array_start != -1 and array_end > array_start:
-                    logger.warning(f"⚠️ Found JSON array instead of object, trying to parse...")
-                    try:
-                        array_str = cleaned[array_start:array_end]
-                        # Clean invalid control characters before parsing
-                        array_str = _clean_json_string(array_str)
-                        parsed_array = json.loads(array_str)
-                        # Convert array to object format
-                        logger.info(f"⚠️ Successfully parsed JSON array, converting to object format")
-                        return {
-                            "sector_rules": [],
-                            "country_rules": [],
-                            "instrument_rules": parsed_array if isinstance(parsed_array, list) else [],
-                            "conflicts": []
-                        }
-                    except json.JSONDecodeError as e:
-                        logger.error(f"❌ Failed to parse JSON array: {e}")
-                raise ValueError(f"LLM response does not contain valid JSON. Response preview: {cleaned[:500]}")
-            
-            json_str = cleaned[json_start:json_end]
-            # Clean invalid control characters before parsing
-            json_str = _clean_json_string(json_str)
-            result = json.loads(json_str)
+            if compact:
+                result = parse_compact(raw, catalog, document)
+                await self._replay_rules(on_rule, result)
+                validated_result = self._validate_result(result)
+                if trace_id:
+                    await self.trace_handler.save_llm_response(trace_id, {
+                        "provider": provider,
+                        "model": model,
+                        "result": validated_result,
+                        "output_mode": "compact",
+                        "timestamp": time.time(),
+                        "trace_id": trace_id,
+                        "success": True
+                    })
+                return validated_result
+
+            # Parse JSON - malformed or truncated responses are repaired instead of re-requested
+            result = parse_extraction_json(raw, f"{model} extraction")
             
             # Validate and return
             validated_result = self._validate_result(result)
@@ -767,67 +1001,60 @@ Before finishing, you MUST verify:
             return validated_result
             
         except Exception as e:
-            err_msg = str(e).lower()
+            # Unparseable response - don't replay it from the cache on the next run
+            if isinstance(e, ValueError):
+                await self._discard_cached_response(api_params, prompt_version)
+                # Truncated response: keep every rule that was completely received
+                # (not when the repair was rejected for losing rules - salvaging would lose them too)
+                partial = None
+                if not isinstance(e, JsonRepairLossError):
+                    partial = self._salvage(raw, catalog, document) if compact else (salvage_rules(raw) if raw else None)
+                if partial:
+                    logger.warning(f"⚠️ Incomplete LLM response - recovered {sum(len(partial[k]) for k in ('instrument_rules', 'sector_rules', 'country_rules'))} complete rules")
+                    if compact:
+                        await self._replay_rules(on_rule, partial)
+                    return self._validate_result(partial)
             
-            # Handle model not available - try fallback models
-            if "404" in err_msg or "does not exist" in err_msg:
-                logger.warning(f"Model '{model}' unavailable. Falling back to 'gpt-4o'")
-                try:
+            # Handle model not available - try the fallback models that are still healthy
+            if fallback and is_unavailable_error(e):
+                health = get_model_health()
+                fallback_models = [m for m in EXTRACTION_FALLBACK_MODELS if m != model]
+                for index, fallback_model in enumerate(fallback_models):
+                    if not health.is_available(fallback_model):
+                        logger.info(f"⏭️ Skipping unavailable fallback model '{fallback_model}'")
+                        continue
+                    logger.warning(f"Model '{model}' unavailable. Falling back to '{fallback_model}'")
+                    record_fallback(fallback_model)
                     fallback_params = {
-                        "model": "gpt-4o",
+                        "model": fallback_model,
                         "temperature": 0,
-                        "messages": [
-                            {"role": "system", "content": SYSTEM_PROMPT},
-                            {"role": "user", "content": extraction_system_prompt}
-                        ]
+                        "messages": messages
                     }
-                    # gpt-4o uses max_tokens, not max_completion_tokens
+                    # gpt-4o / gpt-4o-mini use max_tokens, not max_completion_tokens
                     fallback_params["max_tokens"] = 4000
-                    response = await self.client.chat.completions.create(**fallback_params)
-                    raw = response.choices[0].message.content
-                    
-                    # Save raw LLM response to trace file (fallback model)
-                    if trace_id:
-                        trace_dir = self.trace_handler.get_trace_dir(trace_id)
-                        os.makedirs(trace_dir, exist_ok=True)
-                        raw_response_path = os.path.join(trace_dir, f"{trace_id}_llm_raw.txt")
-                        with open(raw_response_path, 'w', encoding='utf-8') as f:
-                            f.write(raw)
-                    
-                    cleaned = raw.strip().strip("```json").strip("```")
-                    # Clean invalid control characters before parsing
-                    cleaned = _clean_json_string(cleaned)
-                    result = json.loads(cleaned)
-                    return self._validate_result(result)
-                except Exception as inner_e:
-                    logger.warning("gpt-4o also failed, falling back to 'gpt-4o-mini'")
-                    fallback_params = {
-                        "model": "gpt-4o-mini",
-                        "temperature": 0,
-                        "messages": [
-                            {"role": "system", "content": SYSTEM_PROMPT},
-                            {"role": "user", "content": extraction_system_prompt}
-                        ]
-                    }
-                    # gpt-4o-mini uses max_tokens, not max_completion_tokens
-                    fallback_params["max_tokens"] = 4000
-                    response = await self.client.chat.completions.create(**fallback_params)
-                    raw = response.choices[0].message.content
-                    
-                    # Save raw LLM response to trace file (fallback model)
-                    if trace_id:
-                        trace_dir = self.trace_handler.get_trace_dir(trace_id)
-                        os.makedirs(trace_dir, exist_ok=True)
-                        raw_response_path = os.path.join(trace_dir, f"{trace_id}_llm_raw.txt")
-                        with open(raw_response_path, 'w', encoding='utf-8') as f:
-                            f.write(raw)
-                    
-                    cleaned = raw.strip().strip("```json").strip("```")
-                    # Clean invalid control characters before parsing
-                    cleaned = _clean_json_string(cleaned)
-                    result = json.loads(cleaned)
-                    return self._validate_result(result)
-            
+                    try:
+                        raw = await self._chat_completion(fallback_params, prompt_version, use_cache)
+
+                        # Save raw LLM response to trace file (fallback model)
+                        if trace_id:
+                            trace_dir = self.trace_handler.get_trace_dir(trace_id)
+                            os.makedirs(trace_dir, exist_ok=True)
+                            raw_response_path = os.path.join(trace_dir, f"{trace_id}_llm_raw.txt")
+                            with open(raw_response_path, 'w', encoding='utf-8') as f:
+                                f.write(raw)
+
+                        if compact:
+                            result = parse_compact(raw, catalog, document)
+                            await self._replay_rules(on_rule, result)
+                            return self._validate_result(result)
+                        return self._validate_result(parse_extraction_json(raw, f"{fallback_model} extraction"))
+                    except Exception as inner_e:
+                        if isinstance(inner_e, ValueError):
+                            await self._discard_cached_response(fallback_params, prompt_version)
+                        if index == len(fallback_models) - 1:
+                            raise
+                        logger.warning(f"{fallback_model} also failed: {inner_e}")
+
             if trace_id:
                 await self.trace_handler.save_llm_response(trace_id, {
                     "provider": provider,
@@ -840,12 +1067,122 @@ Before finishing, you MUST verify:
             
             raise e
 
-    async def analyze_document_fallback(self, text: str, provider: str, model: str, trace_id: Optional[str] = None) -> Dict:
+    @staticmethod
+    def _extraction_api_params(model: str, messages: List[Dict[str, str]]) -> Dict:
+        """Chat completion parameters of an extraction request (shared with the offline batch mode)"""
+        # Use new OpenAI client approach with optimized settings for speed
+        # GPT-4 has 8k context window, enhanced prompts are longer, so reduce max_tokens further
+        # Reserve ~2000 tokens for completion to leave room for input (~5500 tokens with enhanced prompts)
+        api_params = {
+            "model": model,
+            "top_p": 1,  # Conservative mode
+            "presence_penalty": 0,  # No penalty for presence
+            "frequency_penalty": 0,  # No penalty for frequency
+            "messages": messages
+        }
+        
+        # Set temperature based on model requirements
+        # gpt-5/gpt-5.1/gpt-5.2 only supports default temperature (1), not 0
+        if model == "gpt-5" or model == "gpt-5.1" or model == "gpt-5.2":
+            # gpt-5/gpt-5.1/gpt-5.2 requires default temperature (1)
+            api_params["temperature"] = 1
+        else:
+            # Other models can use temperature 0 for deterministic responses
+            api_params["temperature"] = 0  # Deterministic, evidence-based mode
+        
+        # Use correct parameter based on model
+        # GPT-5/5.1/5.2 require max_completion_tokens (newer models)
+        # Older models use max_tokens
+        if model in ["gpt-5", "gpt-5.1", "gpt-5.2"]:
+            # GPT-5/5.1/5.2 have large context windows - use higher limit to avoid truncation
+            api_params["max_completion_tokens"] = 8000
+        elif model in ["o1", "o1-mini", "o1-preview", "o1-2024-09-12", "gpt-4.1"]:
+            api_params["max_completion_tokens"] = 4000
+        else:
+            # Standard models use max_tokens
+            # Increased to 4000 to avoid truncation (costs more but ensures completeness)
+            # GPT-4 has 8k context, but we'll use 3500 to leave room for input
+            api_params["max_tokens"] = 3500 if model == "gpt-4" else 4000
+        return api_params
+
+    def extraction_request(self, text: str, provider: str, model: str) -> Tuple[Dict, str]:
+        """
+        (api_params, prompt_version) of the standard extraction call analyze_document
+        would make for text - used to build offline batch files (see batch_analysis)
+        """
+        if provider == STUB_PROVIDER:
+            model = stub_model(model)
+        return self._extraction_api_params(model, EXTRACTION_PREFIX.messages(text)), EXTRACTION_PROMPT_VERSION
+
+    def text_request(self, prompt_text: str, prompt_version: str = TEXT_PROMPT_VERSION, provider: Optional[str] = None) -> Tuple[Dict, str]:
+        """(api_params, prompt_version) of the call analyze_text would make for prompt_text"""
+        model = stub_model("gpt-4o-mini") if provider == STUB_PROVIDER else "gpt-4o-mini"
+        api_params = {
+            "model": model,
+            "temperature": 0,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt_text}
+            ]
+        }
+        return api_params, prompt_version
+
+    async def analyze_document_routed(self, text: str, provider: str, model: str, trace_id: Optional[str] = None, on_rule: Optional[RuleListener] = None, label: str = "section", fallback: bool = True) -> Dict:
+        """
+        analyze_document on the route chosen by the provider router (OpenAI or the local
+        Ollama server, by live latency, errors, queue depth and context size)
+        """
+        def call(route: Route):
+            if route.name == "ollama":
+                return self.providers["ollama"].analyze_document(text, route.model_for(model), on_rule)
+            return self.analyze_document(text, provider, route.model_for(model), trace_id, on_rule=on_rule, fallback=fallback)
+
+        return await get_provider_router().run(text, model, call, label)
+
+    async def analyze_document_family(self, text: str, provider: str, model: str, family: str, use_cache: bool = True, on_rule: Optional[RuleListener] = None, fallback: bool = True) -> Dict:
+        """
+        Extract one rule family (see decomposed_extraction.RULE_FAMILIES) with a focused prompt
+        and the family's completion cap. Returns the regular result dict with only that family filled.
+        fallback=False keeps the call on `model` (see analyze_document).
+        """
+        if provider == STUB_PROVIDER:
+            model = stub_model(model)
+        if not self._client_for(model):
+            raise ValueError("OpenAI client not initialized. Please set OPENAI_API_KEY environment variable.")
+        model = get_model_health().route([model] + (EXTRACTION_FALLBACK_MODELS if fallback else []))
+
+        prefix = family_prefix(family, SYSTEM_PROMPT, EXTRACTION_INSTRUCTIONS)
+        max_tokens = RULE_FAMILIES[family][1]
+        api_params = {
+            "model": model,
+            "top_p": 1,
+            "presence_penalty": 0,
+            "frequency_penalty": 0,
+            "messages": prefix.messages(text),
+            # gpt-5/gpt-5.1/gpt-5.2 only support the default temperature
+            "temperature": 1 if model in ["gpt-5", "gpt-5.1", "gpt-5.2"] else 0
+        }
+        if model in ["gpt-5", "gpt-5.1", "gpt-5.2", "o1", "o1-mini", "o1-preview", "o1-2024-09-12", "gpt-4.1"]:
+            api_params["max_completion_tokens"] = max_tokens
+        else:
+            api_params["max_tokens"] = max_tokens
+
+        raw = await self._chat_completion(api_params, prefix.version, use_cache, on_rule)
+        try:
+            # Truncated / malformed responses keep every complete rule (see json_repair)
+            return family_result(family, parse_extraction_json(raw, f"{model} {family}"))
+        except ValueError:
+            await self._discard_cached_response(api_params, prefix.version)
+            raise
+
+    async def analyze_document_fallback(self, text: str, provider: str, model: str, trace_id: Optional[str] = None, use_cache: bool = True) -> Dict:
         """
         Fallback analysis method using universal prompt for documents that don't match German-specific patterns.
         This is used when the primary analysis returns 0 instrument rules.
         """
-        if not self.client:
+        if provider == STUB_PROVIDER:
+            model = stub_model(model)
+        if not self._client_for(model):
             raise ValueError("OpenAI client not initialized. Please set OPENAI_API_KEY environment variable.")
         
         # Calculate safe text limit based on model (same as primary method)
@@ -864,59 +1201,8 @@ Before finishing, you MUST verify:
             if len(text) > max_text_length:
                 logger.info(f"Large document ({len(text)} chars) - will use section-based chunking for analysis")
         
-        # Enhanced fallback prompt optimized for investment guideline documents
-        fallback_prompt = f"""You are analyzing an investment guideline document (Anlagerichtlinie, Investment Guidelines, Prospectus, etc.). Extract ALL investment rules (instruments, sectors, countries) that are explicitly stated as ALLOWED or PROHIBITED.
-
-**CRITICAL INSTRUCTIONS:**
-1. Search through the ENTIRE document systematically - check all sections, tables, lists, and paragraphs
-2. This document likely contains TABLES with "Ja/Nein" columns - extract EVERY row from these tables
-3. Look for hierarchical sections (numbered like "2.1.4", "3.1") - extract rules from both parent and child sections
-4. Extract EVERY rule you find - if you see a table with 30 rows, extract all 30 rows
-5. Use the EXACT names and quotes from the document
-6. If "Min", "Max", or "Dimension" columns are empty, still extract the instrument if "Ja/Nein" has a value
-
-**TABLE EXTRACTION (HIGHEST PRIORITY):**
-- Look for tables with columns: "Ja/Nein", "Yes/No", "Min", "Max", "Dimension"
-- "Ja" or "Yes" = ALLOWED (allowed=true)
-- "Nein" or "No" = PROHIBITED (allowed=false)
-- Extract each table row as a separate instrument rule
-- Include table row content in evidence (e.g., "Ja/Nein: Ja, Max: 25%, Dimension: % des Fondsvermögens")
-
-**LIST EXTRACTION:**
-- "Zulässige Anlagen" / "Permitted Investments" → extract ALL items as allowed=true
-- "Unzulässige Anlagen" / "Prohibited Investments" → extract ALL items as allowed=false
-- Extract each list item separately
-
-**TEXT EXTRACTION:**
-- Look for statements: "X is allowed", "Y is prohibited", "investments in Z are permitted"
-- Check "Weitere Restriktionen" (Further Restrictions) sections
-- Include exact sentences/paragraphs as evidence
-
-**ALLOWED indicators (multi-language):**
-- German: "ja", "erlaubt", "zugelassen", "berechtigt", "darf", "zulässig"
-- English: "allowed", "permitted", "authorized", "approved", "may invest", "can invest", "eligible"
-- Table: "Ja", "Yes", "X" marks, checkmarks
-
-**PROHIBITED indicators (multi-language):**
-- German: "nein", "verboten", "nicht erlaubt", "ausgeschlossen", "darf nicht", "unzulässig"
-- English: "prohibited", "forbidden", "not allowed", "restricted", "excluded", "may not invest"
-- Table: "Nein", "No", "-" (dash)
-
-**SPECIAL PATTERNS:**
-- "Keine Restriktionen" (No Restrictions) = typically allowed
-- "Alle" (All) = typically all items allowed
-- Percentage limits (e.g., "max 50% des Fondsvermögens") = include in evidence
-
-**Document text to analyze:**
-{text_to_analyze}
-
-Return ONLY valid JSON:
-{{
-  "instrument_rules": [{{"instrument": "exact name from document", "allowed": true/false, "reason": "exact quote including table row or text"}}],
-  "sector_rules": [{{"sector": "exact name from document", "allowed": true/false, "reason": "exact quote from document"}}],
-  "country_rules": [{{"country": "exact name from document", "allowed": true/false, "reason": "exact quote from document"}}],
-  "conflicts": []
-}}"""
+        # Static prefix (system prompt + instructions incl. JSON schema) followed by the document
+        messages = FALLBACK_PREFIX.messages(text_to_analyze)
 
         if trace_id:
             prompt_data = {
@@ -928,6 +1214,7 @@ Return ONLY valid JSON:
                 "text_length": len(text),
                 "text_preview": text[:500] + "..." if len(text) > 500 else text,
                 "system_prompt": FALLBACK_SYSTEM_PROMPT,
+                "prompt_prefix": FALLBACK_PREFIX.describe(),
                 "method": "fallback"
             }
             await self.trace_handler.save_llm_prompt(trace_id, prompt_data)
@@ -938,10 +1225,7 @@ Return ONLY valid JSON:
                 "top_p": 1,
                 "presence_penalty": 0,
                 "frequency_penalty": 0,
-                "messages": [
-                    {"role": "system", "content": FALLBACK_SYSTEM_PROMPT},
-                    {"role": "user", "content": fallback_prompt}
-                ]
+                "messages": messages
             }
             
             # Set temperature based on model requirements
@@ -960,8 +1244,7 @@ Return ONLY valid JSON:
                 api_params["max_tokens"] = 3500 if model == "gpt-4" else 4000
             
             logger.info(f"🔄 Using fallback prompt (universal/language-agnostic) for analysis")
-            response = await self.client.chat.completions.create(**api_params)
-            raw = response.choices[0].message.content
+            raw = await self._chat_completion(api_params, FALLBACK_PROMPT_VERSION, use_cache)
 
             # Save raw LLM response to trace file
             if trace_id:
@@ -971,21 +1254,8 @@ Return ONLY valid JSON:
                 with open(raw_response_path, 'w', encoding='utf-8') as f:
                     f.write(raw)
 
-            # Parse JSON safely
-            cleaned = raw.strip().strip("```json").strip("```").strip()
-            
-            # Find first { and last } to extract JSON even if there's extra text
-            json_start = cleaned.find('{')
-            json_end = cleaned.rfind('}') + 1
-            
-            if json_start == -1 or json_end <= json_start:
-                logger.error(f"❌ No valid JSON found in fallback LLM response")
-                logger.error(f"❌ Full response (first 2000 chars): {cleaned[:2000]}")
-                raise ValueError(f"LLM fallback response does not contain valid JSON. Response preview: {cleaned[:500]}")
-            
-            json_str = cleaned[json_start:json_end]
-            json_str = _clean_json_string(json_str)
-            result = json.loads(json_str)
+            # Parse JSON - malformed or truncated responses are repaired instead of re-requested
+            result = parse_extraction_json(raw, f"{model} fallback")
             
             # Validate and return
             validated_result = self._validate_result(result)
@@ -1006,6 +1276,8 @@ Return ONLY valid JSON:
             
         except Exception as e:
             logger.error(f"Fallback analysis error: {e}", exc_info=True)
+            if isinstance(e, ValueError):
+                await self._discard_cached_response(api_params, FALLBACK_PROMPT_VERSION)
             if trace_id:
                 await self.trace_handler.save_llm_response(trace_id, {
                     "provider": provider,
@@ -1018,7 +1290,7 @@ Return ONLY valid JSON:
                 })
             raise e
 
-    async def analyze_document_with_tracing(self, text: str, provider: str, model: str, trace_id: str) -> Dict:
+    async def analyze_document_with_tracing(self, text: str, provider: str, model: str, trace_id: str, on_rule: Optional[RuleListener] = None) -> Dict:
         """Analyze document with forensic tracing and validation"""
         provider_instance = self.get_provider(provider)
         messages = await self._get_llm_messages(provider_instance, text, model)
@@ -1036,7 +1308,7 @@ Return ONLY valid JSON:
         await self.trace_handler.save_llm_prompt(trace_id, prompt_data)
 
         try:
-            result = await provider_instance.analyze_document(text, model)
+            result = await provider_instance.analyze_document(text, model, on_rule=on_rule)
             validated = self._validate_result(result)
             await self.trace_handler.save_llm_response(trace_id, {
                 "provider": provider,
@@ -1340,7 +1612,7 @@ Return ONLY a valid JSON array with all extracted rows."""
                 else:
                     api_params["max_tokens"] = 8000  # Increased from 4000 to handle more rows
                 
-                response = await self.client.chat.completions.create(**api_params)
+                response = await self._create_completion(api_params)
                 
                 json_text = response.choices[0].message.content
                 try:
@@ -1439,6 +1711,19 @@ Return ONLY a valid JSON array with all extracted rows."""
                 })
             raise e
 
+    @staticmethod
+    def _salvage(raw: Optional[str], catalog: InstrumentCatalog, document: NumberedDocument) -> Optional[Dict]:
+        """Complete rules of a truncated compact response, expanded to the regular format"""
+        payload = salvage_compact(raw) if raw else None
+        return expand_compact(payload, catalog, document) if payload else None
+
+    @staticmethod
+    async def _replay_rules(on_rule: Optional[RuleListener], result: Dict) -> None:
+        """Pass the rules of a parsed (non-streamed) result to on_rule"""
+        for rule_type in RULE_KEYS:
+            for rule in result.get(rule_type, []):
+                await notify_rule(on_rule, rule_type, rule)
+
     def _validate_result(self, result: Dict) -> Dict:
         """Strictly validate the LLM output structure for compliance analysis"""
         if not isinstance(result, dict):
@@ -0,0 +1,173 @@
+"""
+Model Health Registry
+Process-wide circuit breaker per OpenAI model. A model that answers with 404 / 403
+(NotFoundError, PermissionDeniedError, code model_not_found) is marked unavailable
+(circuit open) so that later calls route straight to the next healthy model instead
+of paying a wasted round trip. After a cool-down a single half-open probe is allowed through; success
+closes the circuit, another availability error re-opens it.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Circuit breaker configuration
+# MODEL_HEALTH_COOLDOWN: seconds an unavailable model is skipped before a half-open probe
+# MODEL_HEALTH_DISABLED: always route to the requested model (no circuit breaking)
+MODEL_HEALTH_COOLDOWN = float(os.getenv("MODEL_HEALTH_COOLDOWN", "600"))
+MODEL_HEALTH_DISABLED = os.getenv("MODEL_HEALTH_DISABLED", "false").lower() == "true"
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# What marks "this model cannot be used with this key" (not transient): the HTTP status,
+# the SDK exception class or the explicit error code - never free text, which may
+# quote a page number or the word "permission" from the document
+_UNAVAILABLE_STATUS = (403, 404)
+_UNAVAILABLE_CLASSES = ("NotFoundError", "PermissionDeniedError")
+_UNAVAILABLE_CODE = "model_not_found"
+
+
+def is_unavailable_error(error: Any) -> bool:
+    """Whether an exception means the model itself is unavailable"""
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    if status is not None:
+        return status in _UNAVAILABLE_STATUS
+    if any(cls.__name__ in _UNAVAILABLE_CLASSES for cls in type(error).__mro__):
+        return True
+    return getattr(error, "code", None) == _UNAVAILABLE_CODE
+
+
+class _Circuit:
+    __slots__ = ("state", "opened_at", "failures", "last_error", "probing")
+
+    def __init__(self):
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.failures = 0
+        self.last_error = ""
+        self.probing = False
+
+
+class ModelHealthRegistry:
+    """Circuit breaker state for every model seen by LLMService and OpenAIProvider"""
+
+    def __init__(self, cooldown: float = MODEL_HEALTH_COOLDOWN, enabled: bool = not MODEL_HEALTH_DISABLED):
+        self.cooldown = cooldown
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._circuits: Dict[str, _Circuit] = {}
+        self.skipped = 0
+
+    def is_available(self, model: str) -> bool:
+        """
+        Whether a call to model should be attempted now.
+        An open circuit past its cool-down lets exactly one probe through (half-open).
+        """
+        if not self.enabled:
+            return True
+        with self._lock:
+            circuit = self._circuits.get(model)
+            if circuit is None or circuit.state == CLOSED:
+                return True
+            if circuit.state == OPEN and time.monotonic() - circuit.opened_at >= self.cooldown:
+                circuit.state = HALF_OPEN
+                circuit.probing = False
+            if circuit.state == HALF_OPEN and not circuit.probing:
+                circuit.probing = True
+                logger.info(f"🔌 Probing model '{model}' after {self.cooldown:.0f}s cool-down")
+                return True
+            return False
+
+    def record_success(self, model: str) -> None:
+        """Close the circuit of a model that answered"""
+        if not self.enabled:
+            return
+        with self._lock:
+            circuit = self._circuits.get(model)
+            if circuit is not None and circuit.state != CLOSED:
+                logger.info(f"✅ Model '{model}' is available again")
+                circuit.state = CLOSED
+                circuit.probing = False
+                circuit.failures = 0
+
+    def record_failure(self, model: str, error: Any) -> bool:
+        """
+        Record a failed call. Only availability errors open the circuit; transient
+        errors (timeouts, 429, 5xx) are left to the rate limiter's retries.
+
+        Returns:
+            True if the error marked the model unavailable
+        """
+        if not self.enabled:
+            return False
+        if not is_unavailable_error(error):
+            with self._lock:
+                circuit = self._circuits.get(model)
+                if circuit is not None and circuit.state == HALF_OPEN:
+                    # Inconclusive probe - let the next call probe again
+                    circuit.probing = False
+            return False
+        with self._lock:
+            circuit = self._circuits.setdefault(model, _Circuit())
+            if circuit.state != OPEN:
+                logger.warning(f"🚫 Model '{model}' unavailable - skipping it for {self.cooldown:.0f}s ({str(error)[:120]})")
+            circuit.state = OPEN
+            circuit.opened_at = time.monotonic()
+            circuit.probing = False
+            circuit.failures += 1
+            circuit.last_error = str(error)[:300]
+        return True
+
+    def route(self, models: Iterable[str]) -> Optional[str]:
+        """
+        First healthy model of a preference list. If every circuit is open, the
+        first model is returned anyway so the caller still gets a real error.
+        """
+        candidates = list(dict.fromkeys(m for m in models if m))
+        if not candidates:
+            return None
+        for model in candidates:
+            if self.is_available(model):
+                if model != candidates[0]:
+                    logger.info(f"🔀 Routing '{candidates[0]}' request to healthy model '{model}'")
+                return model
+            with self._lock:
+                self.skipped += 1
+        return candidates[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Circuit state per model"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "cooldown": self.cooldown,
+                "skipped": self.skipped,
+                "models": {
+                    model: {
+                        "state": circuit.state,
+                        "failures": circuit.failures,
+                        "retry_in": round(max(0.0, self.cooldown - (now - circuit.opened_at)), 1) if circuit.state == OPEN else 0.0,
+                        "last_error": circuit.last_error
+                    }
+                    for model, circuit in self._circuits.items()
+                }
+            }
+
+
+# Process-wide registry instance (lazy initialization)
+_model_health: Optional[ModelHealthRegistry] = None
+
+
+def get_model_health() -> ModelHealthRegistry:
+    """Get the shared model health registry (lazy initialization)"""
+    global _model_health
+    if _model_health is None:
+        _model_health = ModelHealthRegistry()
+    return _model_health
@@ -0,0 +1,46 @@
+"""
+Static Prompt Prefixes
+Extraction requests are laid out as a static prefix (system prompt + instructions,
+identical byte for byte across calls, sections and jobs) followed by the document
+text. OpenAI serves a repeated prefix of 1024+ tokens from its prompt cache, which
+lowers latency and bills those tokens at the cached-input price (reported as
+cached_tokens in the usage data and in llm_accounting).
+
+Anything that varies per call (model, document, section) must go after the prefix.
+Changing a prefix means bumping its version so traces and caches can tell them apart.
+"""
+import hashlib
+from typing import Any, Dict, List
+
+
+class StaticPromptPrefix:
+    """Versioned system prompt + instructions; the document is appended as the last bytes"""
+
+    def __init__(self, name: str, version: str, system: str, instructions: str):
+        self.name = name
+        self.version = version
+        self.system = system
+        self.instructions = instructions
+        self.fingerprint = hashlib.sha256(
+            f"{system}\x00{instructions}".encode("utf-8")
+        ).hexdigest()[:12]
+
+    def messages(self, document: str) -> List[Dict[str, str]]:
+        """Chat messages: static system + user prefix, document text last"""
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.instructions + document}
+        ]
+
+    @property
+    def chars(self) -> int:
+        return len(self.system) + len(self.instructions)
+
+    def describe(self) -> Dict[str, Any]:
+        """Trace metadata"""
+        return {
+            "name": self.name,
+            "version": self.version,
+            "fingerprint": self.fingerprint,
+            "chars": self.chars
+        }
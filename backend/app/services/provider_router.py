@@ -0,0 +1,210 @@
+"""
+Provider Router
+Splits extraction calls (whole documents, sections or planner packs) between the
+configured providers - OpenAI and a local Ollama server - instead of sending
+everything to the provider the user picked (LLM_ROUTER_ENABLED).
+
+Each route keeps live statistics: an EWMA of seconds per 1k input tokens, an EWMA
+error rate and the number of calls in flight (queue depth; Ollama serves
+LLM_ROUTER_OLLAMA_CONCURRENCY calls at a time). A call goes to the route with the
+lowest expected completion time among the routes whose context window fits the
+text; a failed call is re-routed to the next route once.
+
+Quota exhaustion (429 insufficient_quota) takes a route out for
+LLM_ROUTER_QUOTA_COOLDOWN seconds and a high error rate for LLM_ROUTER_ERROR_COOLDOWN,
+so an OpenAI outage shifts the remaining sections to Ollama instead of stalling in
+retries.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+from .rate_limiter import is_quota_exhausted, RATE_LIMIT_MAX_CONCURRENCY
+from .section_planner import context_window, SECTION_PLAN_CHARS_PER_TOKEN
+from .providers.ollama_provider import OLLAMA_MODEL, OllamaProvider
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Router configuration
+# LLM_ROUTER_ENABLED: route OpenAI extraction calls across LLM_ROUTER_PROVIDERS
+# LLM_ROUTER_PROVIDERS: comma-separated routes (openai, ollama)
+# LLM_ROUTER_OLLAMA_CONCURRENCY: calls served by the local Ollama server at the same time
+# LLM_ROUTER_QUOTA_COOLDOWN: seconds a route is skipped after quota exhaustion
+# LLM_ROUTER_ERROR_COOLDOWN / LLM_ROUTER_ERROR_THRESHOLD: skip a route for this long once its error rate reaches the threshold
+# LLM_ROUTER_EWMA_ALPHA: weight of the newest observation in the latency / error averages
+LLM_ROUTER_ENABLED = os.getenv("LLM_ROUTER_ENABLED", "false").lower() == "true"
+LLM_ROUTER_PROVIDERS = [p.strip() for p in os.getenv("LLM_ROUTER_PROVIDERS", "openai,ollama").split(",") if p.strip()]
+LLM_ROUTER_OLLAMA_CONCURRENCY = int(os.getenv("LLM_ROUTER_OLLAMA_CONCURRENCY", "1"))
+LLM_ROUTER_QUOTA_COOLDOWN = float(os.getenv("LLM_ROUTER_QUOTA_COOLDOWN", "300"))
+LLM_ROUTER_ERROR_COOLDOWN = float(os.getenv("LLM_ROUTER_ERROR_COOLDOWN", "30"))
+LLM_ROUTER_ERROR_THRESHOLD = float(os.getenv("LLM_ROUTER_ERROR_THRESHOLD", "0.5"))
+LLM_ROUTER_EWMA_ALPHA = float(os.getenv("LLM_ROUTER_EWMA_ALPHA", "0.3"))
+
+# Starting estimates (seconds per 1k input tokens) until a route has been measured
+PRIOR_SECONDS_PER_KTOKEN = {"openai": 3.0, "ollama": 12.0}
+ROUTER_PROVIDERS = ("openai",)  # requested providers whose calls may be routed
+
+# call(route) -> analysis dict
+RouteCall = Callable[["Route"], Awaitable[Dict[str, Any]]]
+
+
+def router_applies(provider: str) -> bool:
+    """Whether extraction calls for provider go through the router"""
+    return LLM_ROUTER_ENABLED and provider in ROUTER_PROVIDERS and len(LLM_ROUTER_PROVIDERS) > 1
+
+
+class Route:
+    """One provider/model target with live latency, error and queue statistics"""
+
+    def __init__(self, name: str, model: Optional[str], concurrency: int, context_tokens: Optional[int] = None):
+        self.name = name
+        self.model = model  # None = the requested model
+        self.concurrency = max(1, concurrency)
+        self.context_tokens = context_tokens  # None = context window of the requested model
+        self.seconds_per_ktoken = PRIOR_SECONDS_PER_KTOKEN.get(name, 5.0)
+        self.error_rate = 0.0
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.last_error = ""
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def model_for(self, requested: str) -> str:
+        return self.model or requested
+
+    def fits(self, tokens: int, requested: str) -> bool:
+        window = self.context_tokens if self.context_tokens is not None else context_window(requested)
+        return tokens <= window
+
+    def available(self, now: float) -> bool:
+        return now >= self.cooldown_until
+
+    def expected_seconds(self, tokens: int) -> float:
+        """Queue waves ahead of a new call, times the call's own duration, inflated by the error rate"""
+        waves = self.in_flight // self.concurrency + 1
+        duration = self.seconds_per_ktoken * max(tokens, 1) / 1000.0
+        return waves * duration / max(0.05, 1.0 - self.error_rate)
+
+    def slot(self) -> asyncio.Semaphore:
+        """Concurrency slot (one semaphore per event loop, like the shared HTTP client)"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+
+class ProviderRouter:
+    """Chooses a route per call and keeps the route statistics up to date"""
+
+    def __init__(self, routes: Iterable[Route]):
+        self.routes: List[Route] = list(routes)
+        self._lock = threading.Lock()
+
+    def choose(self, tokens: int, requested: str, exclude: Iterable[str] = ()) -> Optional[Route]:
+        """Route with the lowest expected completion time (cooling-down routes only if nothing else is left)"""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [r for r in self.routes if r.name not in set(exclude)]
+            pool = [r for r in candidates if r.available(now)] or candidates
+            pool = [r for r in pool if r.fits(tokens, requested)] or pool
+            if not pool:
+                return None
+            return min(pool, key=lambda r: r.expected_seconds(tokens))
+
+    def _record(self, route: Route, tokens: int, elapsed: Optional[float], error: Optional[BaseException]) -> None:
+        alpha = LLM_ROUTER_EWMA_ALPHA
+        with self._lock:
+            route.calls += 1
+            route.error_rate = (1 - alpha) * route.error_rate + alpha * (1.0 if error else 0.0)
+            if error is None:
+                observed = elapsed / max(tokens, 1) * 1000.0
+                route.seconds_per_ktoken = (1 - alpha) * route.seconds_per_ktoken + alpha * observed
+                return
+            route.errors += 1
+            route.last_error = str(error)[:200]
+            if is_quota_exhausted(error):
+                route.cooldown_until = time.monotonic() + LLM_ROUTER_QUOTA_COOLDOWN
+                logger.warning(f"🪫 Router: {route.name} quota exhausted - skipping it for {LLM_ROUTER_QUOTA_COOLDOWN:.0f}s")
+            elif route.error_rate >= LLM_ROUTER_ERROR_THRESHOLD:
+                route.cooldown_until = time.monotonic() + LLM_ROUTER_ERROR_COOLDOWN
+                logger.warning(f"⚠️ Router: {route.name} error rate {route.error_rate:.2f} - skipping it for {LLM_ROUTER_ERROR_COOLDOWN:.0f}s")
+
+    async def run(self, text: str, requested_model: str, call: RouteCall, label: str = "section") -> Dict[str, Any]:
+        """Run call on the best route; on failure try each remaining route once"""
+        tokens = math.ceil(len(text) / SECTION_PLAN_CHARS_PER_TOKEN)
+        tried: List[str] = []
+        last_error: Optional[BaseException] = None
+        while True:
+            route = self.choose(tokens, requested_model, tried)
+            if route is None:
+                raise last_error or RuntimeError("No LLM route available")
+            tried.append(route.name)
+            with self._lock:
+                route.in_flight += 1
+            try:
+                async with route.slot():
+                    started = time.monotonic()
+                    logger.info(f"🧭 Router: {label} ({tokens} tokens) → {route.name}/{route.model_for(requested_model)}")
+                    result = await call(route)
+            except Exception as e:
+                self._record(route, tokens, None, e)
+                last_error = e
+                logger.warning(f"↪️ Router: {route.name} failed on {label} ({str(e)[:120]}) - re-routing")
+                continue
+            finally:
+                with self._lock:
+                    route.in_flight -= 1
+            self._record(route, tokens, time.monotonic() - started, None)
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "enabled": LLM_ROUTER_ENABLED,
+                "routes": {
+                    r.name: {
+                        "model": r.model or "requested",
+                        "seconds_per_ktoken": round(r.seconds_per_ktoken, 3),
+                        "error_rate": round(r.error_rate, 3),
+                        "in_flight": r.in_flight,
+                        "calls": r.calls,
+                        "errors": r.errors,
+                        "cooldown_seconds": round(max(0.0, r.cooldown_until - now), 1),
+                        "last_error": r.last_error
+                    }
+                    for r in self.routes
+                }
+            }
+
+
+def _default_routes() -> List[Route]:
+    routes = []
+    for name in LLM_ROUTER_PROVIDERS:
+        if name == "openai":
+            routes.append(Route("openai", None, RATE_LIMIT_MAX_CONCURRENCY))
+        elif name == "ollama":
+            # Document tokens that fit next to the prompt and completion in OLLAMA_NUM_CTX
+            input_tokens = int(OllamaProvider().max_input_chars() / SECTION_PLAN_CHARS_PER_TOKEN)
+            routes.append(Route("ollama", OLLAMA_MODEL, LLM_ROUTER_OLLAMA_CONCURRENCY, input_tokens))
+        else:
+            logger.warning(f"Ignoring unknown LLM_ROUTER_PROVIDERS entry '{name}'")
+    return routes
+
+
+# Process-wide router (lazy initialization)
+_provider_router: Optional[ProviderRouter] = None
+
+
+def get_provider_router() -> ProviderRouter:
+    """Get the process-wide provider router (lazy initialization)"""
+    global _provider_router
+    if _provider_router is None:
+        _provider_router = ProviderRouter(_default_routes())
+    return _provider_router
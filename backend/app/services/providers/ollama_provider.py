@@ -1,98 +1,123 @@
-import httpx
 import json
-from typing import Dict, List
+import math
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+import httpx
 from ..interfaces.llm_provider_interface import LLMProviderInterface
+from ..http_clients import shared_async_client, get_sync_client
+from ..llm_accounting import record_call
+from ..stream_rule_parser import IncrementalRuleParser, notify_rule
+from ..json_repair import parse_extraction_json
+from .openai_provider import PROVIDER_EXTRACTION_PREFIX
 from ...utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# Ollama configuration
+# OLLAMA_BASE_URL: local Ollama server
+# OLLAMA_MODEL: model used when sections are routed to Ollama (see provider_router)
+# OLLAMA_NUM_CTX: context window requested from Ollama (tokens); longer input is truncated
+# OLLAMA_NUM_PREDICT: completion token cap
+# OLLAMA_CHARS_PER_TOKEN: token estimate for the context check
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434").rstrip("/")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.1")
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "32768"))
+OLLAMA_NUM_PREDICT = int(os.getenv("OLLAMA_NUM_PREDICT", "4000"))
+OLLAMA_CHARS_PER_TOKEN = float(os.getenv("OLLAMA_CHARS_PER_TOKEN", "3.5"))
+
+
 class OllamaProvider(LLMProviderInterface):
-    """Ollama LLM provider implementation"""
-    
-    def __init__(self, host: str = "localhost", port: int = 11434):
-        self.host = host
-        self.port = port
-        self.base_url = f"http://{host}:{port}"
+    """Ollama LLM provider implementation (streamed /api/chat over the shared HTTP client)"""
+
+    def __init__(self, base_url: str = OLLAMA_BASE_URL):
+        self.base_url = base_url
+
+    def max_input_chars(self) -> int:
+        """Document chars that fit into OLLAMA_NUM_CTX next to the extraction prompt and completion"""
+        prompt_tokens = math.ceil(PROVIDER_EXTRACTION_PREFIX.chars / OLLAMA_CHARS_PER_TOKEN)
+        return max(0, int((OLLAMA_NUM_CTX - prompt_tokens - OLLAMA_NUM_PREDICT) * OLLAMA_CHARS_PER_TOKEN))
+
+    async def chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        on_rule: Optional[Callable[[str, Dict], Any]] = None,
+        json_mode: bool = True
+    ) -> str:
+        """
+        Stream a chat completion and return the message content.
+        Connections come from the shared pool; the read timeout applies per streamed
+        chunk, so long local generations are not cut off while tokens keep arriving.
+        """
+        payload = {
+            "model": model,
+            "messages": messages,
+            "stream": True,
+            "options": {"temperature": 0, "num_ctx": OLLAMA_NUM_CTX, "num_predict": OLLAMA_NUM_PREDICT}
+        }
+        if json_mode:
+            payload["format"] = "json"
+
+        parser = IncrementalRuleParser() if on_rule is not None else None
+        parts: List[str] = []
+        usage: Dict[str, Any] = {}
+        started = time.monotonic()
+        try:
+            async with shared_async_client() as client:
+                async with client.stream("POST", f"{self.base_url}/api/chat", json=payload) as response:
+                    if response.status_code != 200:
+                        body = (await response.aread()).decode("utf-8", "replace")
+                        raise Exception(f"Ollama API error ({model}): {response.status_code} - {body[:300]}")
+                    async for line in response.aiter_lines():
+                        if not line.strip():
+                            continue
+                        event = json.loads(line)
+                        if event.get("error"):
+                            raise Exception(f"Ollama API error ({model}): {event['error']}")
+                        chunk = (event.get("message") or {}).get("content", "")
+                        if chunk:
+                            parts.append(chunk)
+                            if parser is not None:
+                                for rule_type, rule in parser.feed(chunk):
+                                    await notify_rule(on_rule, rule_type, rule)
+                        if event.get("done"):
+                            usage = event
+                            break
+        except Exception:
+            record_call(model, latency=time.monotonic() - started, error=True)
+            raise
+
+        record_call(model, usage.get("prompt_eval_count"), usage.get("eval_count"), time.monotonic() - started)
+        return "".join(parts)
 
     async def generate(self, prompt: str) -> str:
         """Implements required abstract method for LLMProviderInterface"""
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                payload = {
-                    "model": "llama3.1",   # or any default model
-                    "prompt": prompt,
-                    "stream": False,
-                }
-                response = await client.post(
-                    f"{self.base_url}/api/generate",
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                )
-                response.raise_for_status()
-                data = response.json()
-                return data.get("response", "")
+            return await self.chat_completion([{"role": "user", "content": prompt}], OLLAMA_MODEL, json_mode=False)
         except Exception as e:
             raise Exception(f"Ollama generate() failed: {str(e)}")
 
-    async def analyze_document(self, text: str, model: str) -> Dict:
-        """Analyze document using Ollama"""
-        # Calculate safe text limit: most Ollama models have context windows of 32k-128k tokens
-        # Use 100k chars as a conservative safe limit
-        max_text_length = 100000
-        
-        # Truncate only if text exceeds safe limit
+    async def analyze_document(self, text: str, model: str, on_rule: Optional[Callable[[str, Dict], Any]] = None) -> Dict:
+        """Analyze document with the extraction prompt; rules are passed to on_rule as they stream in"""
+        max_text_length = self.max_input_chars()
         text_to_analyze = text if len(text) <= max_text_length else text[:max_text_length]
         if len(text) > max_text_length:
-            logger.warning(f"Document is {len(text)} chars, truncating to {max_text_length} for Ollama analysis")
-        
-        prompt = f"""Analyze this financial document and respond with ONLY a JSON object.
-
-**CRITICAL: You must carefully search through the ENTIRE document text provided below. Rules can appear anywhere in the document.**
+            logger.warning(f"Document is {len(text)} chars, truncating to {max_text_length} for Ollama (num_ctx={OLLAMA_NUM_CTX})")
 
-Document: {text_to_analyze}
-
-Respond with this exact JSON format:
-{{"bonds": true/false, "stocks": true/false, "funds": true/false, "derivatives": true/false}}
-
-Only mark as true if the document explicitly allows that type of investment. Search through all sections of the document."""
-        
         try:
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                payload = {
-                    "model": model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {"temperature": 0.1, "top_p": 0.9}
-                }
-                response = await client.post(
-                    f"{self.base_url}/api/generate",
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                )
-                response.raise_for_status()
-                data = response.json()
-                llm_response = data.get("response", "")
-                
-                # Extract and parse JSON block
-                json_start = llm_response.find('{')
-                json_end = llm_response.rfind('}') + 1
-                if json_start != -1 and json_end > json_start:
-                    json_str = llm_response[json_start:json_end]
-                    return json.loads(json_str)
-                else:
-                    raise ValueError("No valid JSON found in Ollama response")
-                    
+            raw = await self.chat_completion(PROVIDER_EXTRACTION_PREFIX.messages(text_to_analyze), model or OLLAMA_MODEL, on_rule)
+            return parse_extraction_json(raw, f"ollama/{model}")
         except Exception as e:
             raise Exception(f"Ollama analysis failed: {str(e)}")
-    
+
     def get_available_models(self) -> List[str]:
         """Get available Ollama models"""
         try:
-            import requests
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
+            response = get_sync_client().get(f"{self.base_url}/api/tags", timeout=5)
             if response.status_code == 200:
                 data = response.json()
                 return [model["name"] for model in data.get("models", [])]
             return []
-        except:
+        except (httpx.HTTPError, ValueError):
             return []
@@ -3,7 +3,8 @@ import json
 import os
 import re
 import sys
-from typing import Dict, List
+import time
+from typing import Any, Callable, Dict, List, Optional
 from ..interfaces.llm_provider_interface import LLMProviderInterface
 from ...models.llm_response_models import LLMResponse
 
@@ -11,6 +12,13 @@ from ...models.llm_response_models import LLMResponse
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
 from config import OPENAI_API_KEY
 from ...utils.logger import setup_logger
+from ..rate_limiter import get_rate_limiter, estimate_tokens, RETRYABLE_STATUS
+from ..model_health import get_model_health, is_unavailable_error
+from ..http_clients import shared_async_client
+from ..llm_accounting import record_call, record_fallback, record_usage
+from ..stream_rule_parser import IncrementalRuleParser, LLM_STREAMING_ENABLED, notify_rule
+from ..prompt_prefix import StaticPromptPrefix
+from ..json_repair import parse_json_lenient
 
 logger = setup_logger(__name__)
 
@@ -26,83 +34,139 @@ def _clean_json_string(json_str: str) -> str:
     return cleaned
 
 
-class OpenAIProvider(LLMProviderInterface):
-    """OpenAI ChatGPT provider with enforced JSON output and GPT-5 fallback"""
+PROVIDER_SYSTEM_PROMPT = """You are an expert compliance analyst with 100% accuracy requirements specializing in investment rules extraction.
 
-    def __init__(self):
-        self.api_key = OPENAI_API_KEY
-        if not self.api_key:
-            logger.warning("⚠️ OPENAI_API_KEY not configured. OpenAI provider will not be available.")
-            self.api_key = None
+**ACCURACY REQUIREMENTS:**
+- Extract ONLY rules that are EXPLICITLY stated in the document
+- Use EXACT quotes from the document as evidence (copy text verbatim)
+- Do NOT infer, assume, or guess - only extract what is clearly written
+- Verify completeness: count items in lists and ensure you extracted all of them
+- Cross-reference different sections to catch contradictions
+- If a rule is ambiguous, mark it as conditional or include in conflicts
 
-        self.base_url = "https://api.openai.com/v1"
-        # Preferred model order (fastest first for speed optimization)
-        # gpt-5.2 is the latest and most capable model, gpt-4o-mini is 2-3x faster than gpt-4o with similar quality
-        # Removed deprecated models: gpt-4, gpt-4-turbo, gpt-3.5-turbo
-        self.model_priority = ["gpt-5.2", "gpt-5.1", "gpt-5", "gpt-4o", "gpt-4o-mini"]
+**CRITICAL INSTRUCTIONS - READ CAREFULLY:**
 
-    async def analyze_document(self, text: str, model: str) -> Dict:
-        """Analyze document using OpenAI ChatGPT with automatic fallback chain"""
-        if not self.api_key:
-            raise Exception("OpenAI API key not configured. Please set OPENAI_API_KEY environment variable.")
+1. DEFAULT ASSUMPTION: All instruments are NOT ALLOWED (prohibited) unless explicitly stated as allowed/permitted. Extract all instruments mentioned in the document, defaulting to allowed=false.
 
-        # Try the provided model first, then fallback in priority order
-        tried_models = []
-        for m in [model] + [x for x in self.model_priority if x != model]:
-            try:
-                return await self._analyze_with_model(text, m)
-            except Exception as e:
-                err_msg = str(e).lower()
-                tried_models.append(m)
-                logger.warning(f"⚠️ Model '{m}' failed: {e}")
-                if "404" in err_msg or "does not exist" in err_msg:
-                    logger.info(f"⏭️ Skipping unavailable model '{m}'...")
-                    continue
-                if "quota" in err_msg or "limit" in err_msg or "context length" in err_msg or "maximum context" in err_msg:
-                    logger.warning(f"⏭️ Skipping model '{m}' due to quota/context limit...")
-                    continue
-                # Only retry if next model available
-                continue
+2. SEARCH FOR EXPLICITLY ALLOWED ITEMS: When you find explicit evidence that an instrument is ALLOWED, mark it as allowed=true:
+   - "allowed", "permitted", "authorized", "approved", "may invest", "can invest", "eligible"
+   - German: "erlaubt", "zugelassen", "berechtigt", "darf", "ja", "zulässig"
+   - An "X" mark in tables/lists (German style) - THIS MEANS ALLOWED!
+   - Lists of permitted instruments (e.g., "Zulässige Anlagen") - extract EVERY item from these lists as allowed=true
+   - **CRITICAL**: When you see "Zulässige Anlagen" section, extract EVERY single item in that list as allowed=true
+   - **CRITICAL**: In tables with "ja" (yes) columns, if there's an "X" in the "ja" column, that instrument is ALLOWED
 
-        # If all models fail, return fallback
-        return {
-            "sector_rules": [],
-            "country_rules": [],
-            "instrument_rules": [],
-            "conflicts": [{"category": "system_error", "detail": f"All models failed: {tried_models}"}]
-        }
+3. GERMAN DOCUMENT PATTERNS - TABLE STRUCTURE (CRITICAL - HIGHEST PRIORITY):
+   **MOST IMPORTANT**: Many German investment documents use tables with "ja" (yes) and "nein" (no) columns. This is THE PRIMARY format.
+   
+   **TABLE FORMAT RECOGNITION:**
+   - Look for tables with columns: "ja", "nein", "Detailrestriktionen"
+   - Table may appear as: "Instrument | nein | ja | Detailrestriktionen"
+   - Or in text: "Aktien | nein: - | ja: X | Detailrestriktionen: ..."
+   - Or as list: "Aktien: nein: -, ja: X"
+   - **CRITICAL**: Even if table structure is broken, look for "Instrument name" + "ja: X" patterns
+   
+   **INTERPRETATION (APPLY TO EACH ROW):**
+   - **CRITICAL RULE**: "X" in "ja" column = ALLOWED (allowed=true) - THIS IS THE MOST IMPORTANT RULE
+   - "X" in "nein" column = NOT ALLOWED (allowed=false)
+   - "✓" in "ja" column = ALLOWED (allowed=true)
+   - "-" in either column = typically NOT ALLOWED
+   - **MOST IMPORTANT**: Extract EVERY row from these tables - count rows and extract all
+   
+   **OTHER PATTERNS:**
+   - "ja" = yes/allowed, "nein" = no/not allowed
+   - German keywords: "erlaubt", "zugelassen", "berechtigt", "darf" = allowed/permitted
+   - German keywords: "verboten", "nicht erlaubt", "ausgeschlossen", "darf nicht" = prohibited/not allowed
 
-    async def _analyze_with_model(self, text: str, model: str) -> Dict:
-        """Core analysis call to OpenAI API"""
-        # Calculate safe text limit based on model context window
-        # GPT-4o: 128k tokens (~512k chars), GPT-5: 128k+ tokens (assumed)
-        # Reserve tokens for system prompt, user prompt template, and completion
-        # Note: gpt-4 and gpt-4-turbo checks kept for backward compatibility but these models are deprecated
-        if model == "gpt-4":
-            # GPT-4 has 8192 token limit: reserve ~1200 for enhanced prompts, ~2000 for completion = ~5000 tokens (~10000 chars) for document
-            max_text_length = 10000  # Very conservative limit to ensure we stay within 8k token context
-        elif model == "gpt-4-turbo":
-            # GPT-4-turbo has larger context, but be conservative
-            max_text_length = 25000
-        elif model == "gpt-5" or model == "gpt-5.1" or model == "gpt-5.2":
-            # GPT-5/GPT-5.1/GPT-5.2 assumed to have large context window (128k+ tokens) - support very large files
-            max_text_length = 1000000  # 1MB chars for very large documents (150+ pages)
-        else:
-            max_text_length = 500000  # 500k chars for large documents (GPT-4o, etc.)
-        
-        # For very large documents, section-based processing will handle chunking
-        # Only truncate for deprecated models (GPT-4, GPT-4-turbo)
-        if model in ("gpt-4", "gpt-4-turbo") and len(text) > max_text_length:
-            logger.warning(f"Document is {len(text)} chars, truncating to {max_text_length} for {model} (deprecated model)")
-            text_to_analyze = text[:max_text_length]
-        else:
-            # For modern models, use full text (section-based extraction will chunk it)
-            text_to_analyze = text
-            if len(text) > max_text_length:
-                logger.info(f"Large document ({len(text)} chars) - section-based chunking will handle this")
-        
-        # Enhanced prompt that strongly emphasizes finding ALLOWED items
-        prompt = f"""You are analyzing an investment policy document (Verkaufsprospekt, Prospectus, or similar). Your PRIMARY goal is to find ALL items that are explicitly stated as ALLOWED or PERMITTED.
+3b. GERMAN SECTION HEADERS WITH LISTS (CRITICAL):
+   - When you see "Zulässige Anlagen" or "Zulässige Anlageinstrumente" section → Extract EVERY item in the list as allowed=true
+   - When you see "Unzulässige Anlagen" or "Unzulässige Anlageinstrumente" section → Extract EVERY item in the list as allowed=false
+   - These lists can be formatted as bullet points, numbered lists, comma-separated items, or table rows
+   - Each item in the list is a separate instrument that must be extracted individually
+   - DO NOT skip any items - extract every single instrument mentioned in these sections
+   - **VERIFICATION**: Count the items and ensure you extract that exact number
+   - Example: If you see "Zulässige Anlagen: Aktien, Bezugsrechte, Schatzanweisungen" → extract 3 separate rules, one for each instrument
+
+3a. DOCUMENT VERSIONING/TRACK CHANGES (if applicable):
+   - Some documents use color coding to show version changes
+   - RED text/lines or strikethrough text = DELETED/EXCLUDED from current version - COMPLETELY IGNORE this text, do NOT extract any rules from it
+   - GREEN text/lines = NEW additions in current version - EXTRACT RULES FROM THIS (these are part of the current document)
+   - BLACK text/lines (normal text) = UNCHANGED in current version - EXTRACT RULES FROM THIS (these are part of the current document)
+   - If the document has versioning colors, ONLY extract rules from BLACK and GREEN text. IGNORE any RED text as it represents deleted content that is no longer valid.
+   - If the document does NOT have versioning colors, process all text normally using the standard extraction rules above.
+
+4. RECOGNIZE ALLOWED LANGUAGE (mark as allowed=true):
+   - "permitted", "allowed", "authorized", "approved", "may invest", "can invest", "eligible"
+   - German: "erlaubt", "zugelassen", "berechtigt", "darf", "ja", "zulässig"
+   - An "X" mark in a checkbox column (German style)
+   - "investments are permitted in...", "the fund may invest in...", "investments in X are allowed"
+   - "FX Forwards are allowed", "currency futures are permitted", "forex is authorized"
+   - Lists of permitted instruments, sectors, or countries
+   - Positive statements like "investments in [X] are permitted"
+
+5. RECOGNIZE PROHIBITED LANGUAGE (mark as allowed=false):
+   - "prohibited", "forbidden", "not allowed", "restricted", "excluded", "may not invest", "not eligible"
+   - German: "verboten", "nicht erlaubt", "ausgeschlossen", "darf nicht", "nein", "unzulässig"
+   - A "-" (hyphen) or empty checkbox (German style)
+   - "investments in X are not allowed", "prohibited from investing in..."
+
+6. INSTRUMENT NAME VARIATIONS: Recognize that these refer to the SAME instrument type (but use EXACT name from document):
+   - "FX Forwards" = "forex forwards" = "foreign exchange forwards" = "FX" = "forex" = "Foreign Exchange Forwards"
+   - "currency futures" = "FX futures" = "foreign exchange futures" = "forex futures" = "Currency Futures"
+   - "derivatives" includes: options, futures, forwards, swaps, warrants, structured products
+   - Extract the specific instrument name as stated in the document (use exact name, do not translate)
+
+7. EXTRACTION RULES:
+   - Extract rules that are CLEARLY stated in the document (don't invent rules)
+   - Look for buried rules in tables, footnotes, appendices - search the ENTIRE document systematically
+   - Extract rules even if stated indirectly (e.g., "prohibited from investing in tobacco" = tobacco sector not allowed)
+   - Do NOT mix different rule categories (keep sectors, countries, instruments separate)
+   - If text is unclear or contradictory, record it in conflicts section
+   - For tables: extract every row, including nested/sub-items, as separate entries
+
+8. HANDLE CONDITIONAL RULES:
+   - If a rule says "subject to", "provided that", "up to X%", "with restrictions" → extract with allowed=true but include condition in reason
+   - Example: "FX Forwards allowed up to 10% of portfolio" → allowed=true, reason="FX Forwards allowed up to 10% of portfolio"
+
+9. CRITICAL: DO NOT OVER-GENERALIZE RULES
+   - A rule about "securities with equity character are allowed" does NOT mean ALL bonds are allowed
+   - A rule about "equity index options are allowed" does NOT mean ALL convertible bonds are allowed
+   - A rule about "unlisted equities are allowed" does NOT mean ALL debt instruments are allowed
+   - ONLY extract rules for instruments that are EXPLICITLY mentioned in the rule statement
+   - Example: If document says "convertible bonds are allowed" → extract rule for "convertible bonds" specifically
+   - Example: If document says "securities with equity character are allowed" → ONLY extract for instruments explicitly described as having equity character, NOT for regular bonds
+   - DO NOT assume that a general rule applies to all similar instruments
+
+10. EVIDENCE REQUIREMENTS:
+    - The "reason" field must contain the EXACT quote from the document (verbatim copy)
+    - Include enough context to make the rule clear
+    - If rule spans multiple sentences, include all relevant parts
+    - Do not paraphrase or summarize - use exact quotes
+
+11. COMPLETENESS VERIFICATION (MANDATORY):
+    - Did you check ALL sections? (main text, tables, footnotes, appendices, introduction, investment policy, restrictions)
+    - Did you extract ALL items from lists under "Zulässige Anlagen" and "Unzulässige Anlagen"?
+    - Did you extract ALL rows from tables (including nested items, multi-page tables)?
+    - Did you check for both allowed AND prohibited statements throughout the ENTIRE document?
+    - Did you use exact quotes as evidence?
+    - **CRITICAL**: Did you search systematically through the entire document, or did you only check the beginning?
+    - **CRITICAL**: If this is a long document (Verkaufsprospekt/Prospectus), did you check sections that might be later in the document?
+    - **CRITICAL**: Are you returning empty results? If yes, double-check - investment policy documents almost always contain rules. Search more carefully.
+
+**IF YOU ARE RETURNING EMPTY RESULTS:**
+- STOP and re-examine the document
+- Look for sections titled: "Investment Policy", "Investment Restrictions", "Zulässige Anlagen", "Unzulässige Anlagen", "Permitted Investments", "Prohibited Investments", "Investment Guidelines", "Anlagegrundsätze"
+- Check tables - even if they seem unrelated, they may contain investment rules
+- Look for lists of instruments, sectors, or countries
+- Search for keywords: "erlaubt", "zugelassen", "verboten", "nicht erlaubt", "allowed", "permitted", "prohibited", "forbidden"
+- If you still find nothing, include a conflict explaining why no rules were found
+
+Your task: Systematically search through the ENTIRE document section-by-section and extract ALL rules with maximum accuracy - prioritize finding what IS ALLOWED, then what is NOT ALLOWED. Extract every explicitly stated permission or prohibition. For long documents, be especially thorough - rules are often scattered across many sections. Verify completeness before finishing. DO NOT return empty results unless you are absolutely certain the document contains no investment rules.
+
+Return ONLY valid JSON matching the required schema."""
+
+# Enhanced prompt that strongly emphasizes finding ALLOWED items - static; the document text is appended directly after it
+PROVIDER_EXTRACTION_INSTRUCTIONS = """You are analyzing an investment policy document (Verkaufsprospekt, Prospectus, or similar). Your PRIMARY goal is to find ALL items that are explicitly stated as ALLOWED or PERMITTED.
 
 🚨🚨🚨 **MANDATORY: FUTURES & OPTIONS CLASSIFICATION - READ THIS FIRST - CRITICAL ERROR PREVENTION** 🚨🚨🚨
 
@@ -111,7 +175,7 @@ class OpenAIProvider(LLMProviderInterface):
 **🔴 ABSOLUTE RULE: SWAPS ARE ALWAYS NOT ALLOWED (NO EXCEPTIONS)**
 - **SWAPS ARE ALWAYS PROHIBITED** - mark as allowed=false (NOT ALLOWED) regardless of what the document says
 - Do NOT check the document for swaps - just mark them as allowed=false
-- If you see "Swaps" mentioned anywhere, extract it as: {{"instrument": "Swaps", "allowed": false, "reason": "Swaps are always prohibited"}}
+- If you see "Swaps" mentioned anywhere, extract it as: {"instrument": "Swaps", "allowed": false, "reason": "Swaps are always prohibited"}
 - This rule applies to ALL types of swaps: interest rate swaps, currency swaps, credit default swaps, total return swaps, etc.
 - **NO EXCEPTIONS - SWAPS ARE NEVER ALLOWED**
 
@@ -145,20 +209,20 @@ Before marking any future or option as allowed=true, you MUST verify ALL of thes
 **STEP 4: EXAMPLES - MEMORIZE THESE PATTERNS**
 ❌ **WRONG (THIS IS THE ERROR TO AVOID):**
    Document: "Derivatives: X" and "Futures: -"
-   Your extraction: {{"instrument": "Futures", "allowed": true}} ← THIS IS WRONG!
-   Correct: {{"instrument": "Futures", "allowed": false}} ← Futures are PROHIBITED
+   Your extraction: {"instrument": "Futures", "allowed": true} ← THIS IS WRONG!
+   Correct: {"instrument": "Futures", "allowed": false} ← Futures are PROHIBITED
 
 ✅ **CORRECT:**
    Document: "Derivatives: X" and "Futures: -"
-   Your extraction: {{"instrument": "Derivatives", "allowed": true}}, {{"instrument": "Futures", "allowed": false}}
+   Your extraction: {"instrument": "Derivatives", "allowed": true}, {"instrument": "Futures", "allowed": false}
 
 ✅ **CORRECT:**
    Document: "Futures: X" in "ja" column
-   Your extraction: {{"instrument": "Futures", "allowed": true}}
+   Your extraction: {"instrument": "Futures", "allowed": true}
 
 ❌ **WRONG:**
    Document: "Derivatives: X" (no mention of Futures)
-   Your extraction: {{"instrument": "Futures", "allowed": true}} ← WRONG! No explicit evidence
+   Your extraction: {"instrument": "Futures", "allowed": true} ← WRONG! No explicit evidence
    Correct: Do not extract Futures at all, or extract with allowed=false if mentioned
 
 **STEP 5: FINAL CHECKLIST BEFORE SUBMITTING**
@@ -201,9 +265,9 @@ When you see these German section headers, you MUST extract EVERY item in the li
 - These lists can be formatted as bullet points, numbered lists, comma-separated items, or table rows
 - Each item in the list is a separate instrument that must be extracted individually
 - Example: If you see "Zulässige Anlagen: Aktien, Bezugsrechte, Schatzanweisungen" → extract 3 separate rules:
-  * {{"instrument": "Aktien", "allowed": true, "reason": "Listed in Zulässige Anlagen section"}}
-  * {{"instrument": "Bezugsrechte", "allowed": true, "reason": "Listed in Zulässige Anlagen section"}}
-  * {{"instrument": "Schatzanweisungen", "allowed": true, "reason": "Listed in Zulässige Anlagen section"}}
+  * {"instrument": "Aktien", "allowed": true, "reason": "Listed in Zulässige Anlagen section"}
+  * {"instrument": "Bezugsrechte", "allowed": true, "reason": "Listed in Zulässige Anlagen section"}
+  * {"instrument": "Schatzanweisungen", "allowed": true, "reason": "Listed in Zulässige Anlagen section"}
 
 **CRITICAL: DOCUMENT VERSIONING/TRACK CHANGES (if applicable)**
 Some documents use color coding to show version changes. If you detect versioning indicators:
@@ -257,11 +321,11 @@ Recognize these as the SAME instrument types (use the exact name from document):
 - Countries: USA, China, Russia, Europe, UK, etc.
 - Instruments: Use EXACT names from document (e.g., "FX Forwards", "currency futures", "covered bonds", "common stock", "Aktien", "Bezugsrechte", "Schatzanweisungen", etc.)
 - **Extract each instrument individually - do not group them together**
-- **🔴 SWAPS**: If "Swaps" is mentioned anywhere in the document, ALWAYS extract as: {{"instrument": "Swaps", "allowed": false, "reason": "Swaps are always prohibited"}} - No checking needed, always not allowed
+- **🔴 SWAPS**: If "Swaps" is mentioned anywhere in the document, ALWAYS extract as: {"instrument": "Swaps", "allowed": false, "reason": "Swaps are always prohibited"} - No checking needed, always not allowed
 
 **CRITICAL RULES:**
-1. If document says "FX Forwards are allowed" → extract: {{"instrument": "FX Forwards", "allowed": true, "reason": "Document explicitly states FX Forwards are allowed"}}
-2. If document says "currency futures are permitted" → extract: {{"instrument": "currency futures", "allowed": true, "reason": "Document explicitly states currency futures are permitted"}}
+1. If document says "FX Forwards are allowed" → extract: {"instrument": "FX Forwards", "allowed": true, "reason": "Document explicitly states FX Forwards are allowed"}
+2. If document says "currency futures are permitted" → extract: {"instrument": "currency futures", "allowed": true, "reason": "Document explicitly states currency futures are permitted"}
 3. If document has a section "Zulässige Anlagen" with a list of 20 items → extract 20 separate instrument rules, one for each item
 4. If document has a section "Unzulässige Anlagen" with a list of 15 items → extract 15 separate instrument rules, one for each item
 5. DO NOT mark something as "not allowed" unless explicitly prohibited
@@ -331,11 +395,11 @@ Recognize these as the SAME instrument types (use the exact name from document):
 - **DO NOT** look at "Derivatives" row and assume it applies to Futures/Options - check the specific row
 
 **RULE 5: EXAMPLES OF CORRECT CLASSIFICATION**
-- ✅ CORRECT: Document shows "Derivatives: X" and "Futures: -" → Extract: {{"instrument": "Derivatives", "allowed": true}}, {{"instrument": "Futures", "allowed": false}}
-- ✅ CORRECT: Document shows "Derivatives: X" and "Options: nein" → Extract: {{"instrument": "Derivatives", "allowed": true}}, {{"instrument": "Options", "allowed": false}}
+- ✅ CORRECT: Document shows "Derivatives: X" and "Futures: -" → Extract: {"instrument": "Derivatives", "allowed": true}, {"instrument": "Futures", "allowed": false}
+- ✅ CORRECT: Document shows "Derivatives: X" and "Options: nein" → Extract: {"instrument": "Derivatives", "allowed": true}, {"instrument": "Options", "allowed": false}
 - ❌ WRONG: Document shows "Derivatives: X" and "Futures: -" → Marking Futures as allowed=true (THIS IS THE ERROR TO AVOID!)
-- ✅ CORRECT: Document shows "Futures: X" in "ja" column → Extract: {{"instrument": "Futures", "allowed": true}}
-- ✅ CORRECT: Document shows "Options: -" in "ja" column and "X" in "nein" column → Extract: {{"instrument": "Options", "allowed": false}}
+- ✅ CORRECT: Document shows "Futures: X" in "ja" column → Extract: {"instrument": "Futures", "allowed": true}
+- ✅ CORRECT: Document shows "Options: -" in "ja" column and "X" in "nein" column → Extract: {"instrument": "Options", "allowed": false}
 
 **RULE 6: WHEN IN DOUBT, CHECK FOR PROHIBITION FIRST**
 - If you're unsure whether a future or option is allowed, check for explicit prohibition markers first:
@@ -348,12 +412,12 @@ Recognize these as the SAME instrument types (use the exact name from document):
 **REMEMBER**: A future or option that is explicitly prohibited (with "-", "nein", or in prohibited section) is NEVER allowed, regardless of what the general "derivatives" rule says.
 
 **Return JSON only:**
-{{
-  "sector_rules": [{{"sector": "string", "allowed": true/false, "reason": "string"}}],
-  "country_rules": [{{"country": "string", "allowed": true/false, "reason": "string"}}],
-  "instrument_rules": [{{"instrument": "string", "allowed": true/false, "reason": "string"}}],
-  "conflicts": [{{"category": "string", "detail": "string"}}]
-}}
+{
+  "sector_rules": [{"sector": "string", "allowed": true/false, "reason": "string"}],
+  "country_rules": [{"country": "string", "allowed": true/false, "reason": "string"}],
+  "instrument_rules": [{"instrument": "string", "allowed": true/false, "reason": "string"}],
+  "conflicts": [{"category": "string", "detail": "string"}]
+}
 
 **═══════════════════════════════════════════════════════════════════════════════**
 **LEGEND / QUICK REFERENCE - READ THIS BEFORE ANALYZING THE DOCUMENT BELOW**
@@ -397,7 +461,7 @@ Recognize these as the SAME instrument types (use the exact name from document):
 
 **🔴 ABSOLUTE RULE: SWAPS ARE ALWAYS NOT ALLOWED**
 - **SWAPS = ALWAYS allowed=false** - No exceptions, no checking needed
-- Mark as: {{"instrument": "Swaps", "allowed": false, "reason": "Swaps are always prohibited"}}
+- Mark as: {"instrument": "Swaps", "allowed": false, "reason": "Swaps are always prohibited"}
 - Applies to ALL swap types: interest rate swaps, currency swaps, credit default swaps, etc.
 
 **REMEMBER:** Extract EVERY row from tables, count items in lists, search the ENTIRE document systematically.
@@ -405,152 +469,175 @@ Recognize these as the SAME instrument types (use the exact name from document):
 **═══════════════════════════════════════════════════════════════════════════════**
 
 **Document text to analyze (search through ALL of it systematically):**
-{text_to_analyze}"""
-
-        # Use connection pooling for faster requests (reuse connections)
-        # Increased timeout for large documents, but add safety limits
-        async with httpx.AsyncClient(
-            timeout=httpx.Timeout(180.0, connect=15.0, read=180.0),  # 3 min timeout for large docs
-            limits=httpx.Limits(max_keepalive_connections=5, max_connections=10)
-        ) as client:
-            payload = {
-                "model": model,
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": """You are an expert compliance analyst with 100% accuracy requirements specializing in investment rules extraction.
+"""
 
-**ACCURACY REQUIREMENTS:**
-- Extract ONLY rules that are EXPLICITLY stated in the document
-- Use EXACT quotes from the document as evidence (copy text verbatim)
-- Do NOT infer, assume, or guess - only extract what is clearly written
-- Verify completeness: count items in lists and ensure you extracted all of them
-- Cross-reference different sections to catch contradictions
-- If a rule is ambiguous, mark it as conditional or include in conflicts
+# Static prefix of every provider extraction call (bump the version when a prompt changes)
+PROVIDER_EXTRACTION_PREFIX = StaticPromptPrefix(
+    "provider_extraction", "provider-extraction-v1", PROVIDER_SYSTEM_PROMPT, PROVIDER_EXTRACTION_INSTRUCTIONS
+)
 
-**CRITICAL INSTRUCTIONS - READ CAREFULLY:**
 
-1. DEFAULT ASSUMPTION: All instruments are NOT ALLOWED (prohibited) unless explicitly stated as allowed/permitted. Extract all instruments mentioned in the document, defaulting to allowed=false.
+class OpenAIAPIError(Exception):
+    """Non-200 answer of the chat completions endpoint (status and error code kept for the circuit breaker)"""
 
-2. SEARCH FOR EXPLICITLY ALLOWED ITEMS: When you find explicit evidence that an instrument is ALLOWED, mark it as allowed=true:
-   - "allowed", "permitted", "authorized", "approved", "may invest", "can invest", "eligible"
-   - German: "erlaubt", "zugelassen", "berechtigt", "darf", "ja", "zulässig"
-   - An "X" mark in tables/lists (German style) - THIS MEANS ALLOWED!
-   - Lists of permitted instruments (e.g., "Zulässige Anlagen") - extract EVERY item from these lists as allowed=true
-   - **CRITICAL**: When you see "Zulässige Anlagen" section, extract EVERY single item in that list as allowed=true
-   - **CRITICAL**: In tables with "ja" (yes) columns, if there's an "X" in the "ja" column, that instrument is ALLOWED
+    def __init__(self, message: str, status_code: int, code: Optional[str] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
 
-3. GERMAN DOCUMENT PATTERNS - TABLE STRUCTURE (CRITICAL - HIGHEST PRIORITY):
-   **MOST IMPORTANT**: Many German investment documents use tables with "ja" (yes) and "nein" (no) columns. This is THE PRIMARY format.
-   
-   **TABLE FORMAT RECOGNITION:**
-   - Look for tables with columns: "ja", "nein", "Detailrestriktionen"
-   - Table may appear as: "Instrument | nein | ja | Detailrestriktionen"
-   - Or in text: "Aktien | nein: - | ja: X | Detailrestriktionen: ..."
-   - Or as list: "Aktien: nein: -, ja: X"
-   - **CRITICAL**: Even if table structure is broken, look for "Instrument name" + "ja: X" patterns
-   
-   **INTERPRETATION (APPLY TO EACH ROW):**
-   - **CRITICAL RULE**: "X" in "ja" column = ALLOWED (allowed=true) - THIS IS THE MOST IMPORTANT RULE
-   - "X" in "nein" column = NOT ALLOWED (allowed=false)
-   - "✓" in "ja" column = ALLOWED (allowed=true)
-   - "-" in either column = typically NOT ALLOWED
-   - **MOST IMPORTANT**: Extract EVERY row from these tables - count rows and extract all
-   
-   **OTHER PATTERNS:**
-   - "ja" = yes/allowed, "nein" = no/not allowed
-   - German keywords: "erlaubt", "zugelassen", "berechtigt", "darf" = allowed/permitted
-   - German keywords: "verboten", "nicht erlaubt", "ausgeschlossen", "darf nicht" = prohibited/not allowed
-
-3b. GERMAN SECTION HEADERS WITH LISTS (CRITICAL):
-   - When you see "Zulässige Anlagen" or "Zulässige Anlageinstrumente" section → Extract EVERY item in the list as allowed=true
-   - When you see "Unzulässige Anlagen" or "Unzulässige Anlageinstrumente" section → Extract EVERY item in the list as allowed=false
-   - These lists can be formatted as bullet points, numbered lists, comma-separated items, or table rows
-   - Each item in the list is a separate instrument that must be extracted individually
-   - DO NOT skip any items - extract every single instrument mentioned in these sections
-   - **VERIFICATION**: Count the items and ensure you extract that exact number
-   - Example: If you see "Zulässige Anlagen: Aktien, Bezugsrechte, Schatzanweisungen" → extract 3 separate rules, one for each instrument
 
-3a. DOCUMENT VERSIONING/TRACK CHANGES (if applicable):
-   - Some documents use color coding to show version changes
-   - RED text/lines or strikethrough text = DELETED/EXCLUDED from current version - COMPLETELY IGNORE this text, do NOT extract any rules from it
-   - GREEN text/lines = NEW additions in current version - EXTRACT RULES FROM THIS (these are part of the current document)
-   - BLACK text/lines (normal text) = UNCHANGED in current version - EXTRACT RULES FROM THIS (these are part of the current document)
-   - If the document has versioning colors, ONLY extract rules from BLACK and GREEN text. IGNORE any RED text as it represents deleted content that is no longer valid.
-   - If the document does NOT have versioning colors, process all text normally using the standard extraction rules above.
-
-4. RECOGNIZE ALLOWED LANGUAGE (mark as allowed=true):
-   - "permitted", "allowed", "authorized", "approved", "may invest", "can invest", "eligible"
-   - German: "erlaubt", "zugelassen", "berechtigt", "darf", "ja", "zulässig"
-   - An "X" mark in a checkbox column (German style)
-   - "investments are permitted in...", "the fund may invest in...", "investments in X are allowed"
-   - "FX Forwards are allowed", "currency futures are permitted", "forex is authorized"
-   - Lists of permitted instruments, sectors, or countries
-   - Positive statements like "investments in [X] are permitted"
+class OpenAIProvider(LLMProviderInterface):
+    """OpenAI ChatGPT provider with enforced JSON output and GPT-5 fallback"""
 
-5. RECOGNIZE PROHIBITED LANGUAGE (mark as allowed=false):
-   - "prohibited", "forbidden", "not allowed", "restricted", "excluded", "may not invest", "not eligible"
-   - German: "verboten", "nicht erlaubt", "ausgeschlossen", "darf nicht", "nein", "unzulässig"
-   - A "-" (hyphen) or empty checkbox (German style)
-   - "investments in X are not allowed", "prohibited from investing in..."
+    def __init__(self):
+        self.api_key = OPENAI_API_KEY
+        if not self.api_key:
+            logger.warning("⚠️ OPENAI_API_KEY not configured. OpenAI provider will not be available.")
+            self.api_key = None
 
-6. INSTRUMENT NAME VARIATIONS: Recognize that these refer to the SAME instrument type (but use EXACT name from document):
-   - "FX Forwards" = "forex forwards" = "foreign exchange forwards" = "FX" = "forex" = "Foreign Exchange Forwards"
-   - "currency futures" = "FX futures" = "foreign exchange futures" = "forex futures" = "Currency Futures"
-   - "derivatives" includes: options, futures, forwards, swaps, warrants, structured products
-   - Extract the specific instrument name as stated in the document (use exact name, do not translate)
+        # OPENAI_BASE_URL lets load tests point at the offline stub server (providers/stub_provider.py)
+        self.base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+        # Preferred model order (fastest first for speed optimization)
+        # gpt-5.2 is the latest and most capable model, gpt-4o-mini is 2-3x faster than gpt-4o with similar quality
+        # Removed deprecated models: gpt-4, gpt-4-turbo, gpt-3.5-turbo
+        self.model_priority = ["gpt-5.2", "gpt-5.1", "gpt-5", "gpt-4o", "gpt-4o-mini"]
 
-7. EXTRACTION RULES:
-   - Extract rules that are CLEARLY stated in the document (don't invent rules)
-   - Look for buried rules in tables, footnotes, appendices - search the ENTIRE document systematically
-   - Extract rules even if stated indirectly (e.g., "prohibited from investing in tobacco" = tobacco sector not allowed)
-   - Do NOT mix different rule categories (keep sectors, countries, instruments separate)
-   - If text is unclear or contradictory, record it in conflicts section
-   - For tables: extract every row, including nested/sub-items, as separate entries
+    async def analyze_document(self, text: str, model: str, on_rule: Optional[Callable[[str, Dict], Any]] = None, fallback: bool = True) -> Dict:
+        """
+        Analyze document using OpenAI ChatGPT with automatic fallback chain.
+        With on_rule, the completion is streamed and each rule is passed on as soon as it closes.
+        With fallback=False only `model` is called and its error is raised instead of the
+        system_error result, so a caller like the extraction cascade controls escalation.
+        """
+        if not self.api_key:
+            raise Exception("OpenAI API key not configured. Please set OPENAI_API_KEY environment variable.")
 
-8. HANDLE CONDITIONAL RULES:
-   - If a rule says "subject to", "provided that", "up to X%", "with restrictions" → extract with allowed=true but include condition in reason
-   - Example: "FX Forwards allowed up to 10% of portfolio" → allowed=true, reason="FX Forwards allowed up to 10% of portfolio"
+        # Try the provided model first, then fallback in priority order.
+        # Models with an open circuit (known 404 / no access) are skipped without a request.
+        health = get_model_health()
+        candidates = [model] + ([x for x in self.model_priority if x != model] if fallback else [])
+        tried_models = []
+        last_error: Optional[Exception] = None
+        for m in candidates:
+            # If every circuit is open, still call the last model so the caller gets a real error
+            if not health.is_available(m) and (tried_models or m != candidates[-1]):
+                logger.debug(f"⏭️ Model '{m}' marked unavailable - not calling it")
+                continue
+            if m != model:
+                record_fallback(m)
+            try:
+                result = await self._analyze_with_model(text, m, on_rule)
+                health.record_success(m)
+                return result
+            except Exception as e:
+                err_msg = str(e).lower()
+                tried_models.append(m)
+                last_error = e
+                logger.warning(f"⚠️ Model '{m}' failed: {e}")
+                health.record_failure(m, e)
+                if is_unavailable_error(e):
+                    logger.info(f"⏭️ Skipping unavailable model '{m}'...")
+                    continue
+                if "quota" in err_msg or "limit" in err_msg or "context length" in err_msg or "maximum context" in err_msg:
+                    logger.warning(f"⏭️ Skipping model '{m}' due to quota/context limit...")
+                    continue
+                # Only retry if next model available
+                continue
 
-9. CRITICAL: DO NOT OVER-GENERALIZE RULES
-   - A rule about "securities with equity character are allowed" does NOT mean ALL bonds are allowed
-   - A rule about "equity index options are allowed" does NOT mean ALL convertible bonds are allowed
-   - A rule about "unlisted equities are allowed" does NOT mean ALL debt instruments are allowed
-   - ONLY extract rules for instruments that are EXPLICITLY mentioned in the rule statement
-   - Example: If document says "convertible bonds are allowed" → extract rule for "convertible bonds" specifically
-   - Example: If document says "securities with equity character are allowed" → ONLY extract for instruments explicitly described as having equity character, NOT for regular bonds
-   - DO NOT assume that a general rule applies to all similar instruments
+        if not fallback and last_error is not None:
+            raise last_error
 
-10. EVIDENCE REQUIREMENTS:
-    - The "reason" field must contain the EXACT quote from the document (verbatim copy)
-    - Include enough context to make the rule clear
-    - If rule spans multiple sentences, include all relevant parts
-    - Do not paraphrase or summarize - use exact quotes
+        # If all models fail, return fallback
+        return {
+            "sector_rules": [],
+            "country_rules": [],
+            "instrument_rules": [],
+            "conflicts": [{"category": "system_error", "detail": f"All models failed: {tried_models}"}]
+        }
 
-11. COMPLETENESS VERIFICATION (MANDATORY):
-    - Did you check ALL sections? (main text, tables, footnotes, appendices, introduction, investment policy, restrictions)
-    - Did you extract ALL items from lists under "Zulässige Anlagen" and "Unzulässige Anlagen"?
-    - Did you extract ALL rows from tables (including nested items, multi-page tables)?
-    - Did you check for both allowed AND prohibited statements throughout the ENTIRE document?
-    - Did you use exact quotes as evidence?
-    - **CRITICAL**: Did you search systematically through the entire document, or did you only check the beginning?
-    - **CRITICAL**: If this is a long document (Verkaufsprospekt/Prospectus), did you check sections that might be later in the document?
-    - **CRITICAL**: Are you returning empty results? If yes, double-check - investment policy documents almost always contain rules. Search more carefully.
+    async def _stream_chat_completion(self, client: httpx.AsyncClient, payload: Dict, headers: Dict, on_rule: Callable[[str, Dict], Any]):
+        """
+        POST a streaming chat completion (server-sent events) and emit rules as they close.
 
-**IF YOU ARE RETURNING EMPTY RESULTS:**
-- STOP and re-examine the document
-- Look for sections titled: "Investment Policy", "Investment Restrictions", "Zulässige Anlagen", "Unzulässige Anlagen", "Permitted Investments", "Prohibited Investments", "Investment Guidelines", "Anlagegrundsätze"
-- Check tables - even if they seem unrelated, they may contain investment rules
-- Look for lists of instruments, sectors, or countries
-- Search for keywords: "erlaubt", "zugelassen", "verboten", "nicht erlaubt", "allowed", "permitted", "prohibited", "forbidden"
-- If you still find nothing, include a conflict explaining why no rules were found
+        Returns:
+            (status_code, response data in the non-streaming shape)
+        """
+        stream_payload = {**payload, "stream": True, "stream_options": {"include_usage": True}}
+        async with client.stream("POST", f"{self.base_url}/chat/completions", json=stream_payload, headers=headers) as response:
+            if response.status_code != 200:
+                await response.aread()
+                if response.status_code in RETRYABLE_STATUS:
+                    response.raise_for_status()
+                return response.status_code, (response.json() if response.content else {})
+
+            parser = IncrementalRuleParser()
+            parts = []
+            finish_reason = None
+            usage = {}
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data_str = line[5:].strip()
+                if data_str == "[DONE]":
+                    break
+                try:
+                    event = json.loads(data_str)
+                except json.JSONDecodeError:
+                    continue
+                if event.get("usage"):
+                    usage = event["usage"]
+                for choice in event.get("choices") or []:
+                    delta = (choice.get("delta") or {}).get("content") or ""
+                    if delta:
+                        parts.append(delta)
+                        for rule_type, rule in parser.feed(delta):
+                            await notify_rule(on_rule, rule_type, rule)
+                    if choice.get("finish_reason"):
+                        finish_reason = choice["finish_reason"]
+
+        return 200, {
+            "choices": [{"message": {"role": "assistant", "content": "".join(parts)}, "finish_reason": finish_reason}],
+            "usage": usage
+        }
 
-Your task: Systematically search through the ENTIRE document section-by-section and extract ALL rules with maximum accuracy - prioritize finding what IS ALLOWED, then what is NOT ALLOWED. Extract every explicitly stated permission or prohibition. For long documents, be especially thorough - rules are often scattered across many sections. Verify completeness before finishing. DO NOT return empty results unless you are absolutely certain the document contains no investment rules.
+    async def _analyze_with_model(self, text: str, model: str, on_rule: Optional[Callable[[str, Dict], Any]] = None) -> Dict:
+        """Core analysis call to OpenAI API"""
+        # Calculate safe text limit based on model context window
+        # GPT-4o: 128k tokens (~512k chars), GPT-5: 128k+ tokens (assumed)
+        # Reserve tokens for system prompt, user prompt template, and completion
+        # Note: gpt-4 and gpt-4-turbo checks kept for backward compatibility but these models are deprecated
+        if model == "gpt-4":
+            # GPT-4 has 8192 token limit: reserve ~1200 for enhanced prompts, ~2000 for completion = ~5000 tokens (~10000 chars) for document
+            max_text_length = 10000  # Very conservative limit to ensure we stay within 8k token context
+        elif model == "gpt-4-turbo":
+            # GPT-4-turbo has larger context, but be conservative
+            max_text_length = 25000
+        elif model == "gpt-5" or model == "gpt-5.1" or model == "gpt-5.2":
+            # GPT-5/GPT-5.1/GPT-5.2 assumed to have large context window (128k+ tokens) - support very large files
+            max_text_length = 1000000  # 1MB chars for very large documents (150+ pages)
+        else:
+            max_text_length = 500000  # 500k chars for large documents (GPT-4o, etc.)
+        
+        # For very large documents, section-based processing will handle chunking
+        # Only truncate for deprecated models (GPT-4, GPT-4-turbo)
+        if model in ("gpt-4", "gpt-4-turbo") and len(text) > max_text_length:
+            logger.warning(f"Document is {len(text)} chars, truncating to {max_text_length} for {model} (deprecated model)")
+            text_to_analyze = text[:max_text_length]
+        else:
+            # For modern models, use full text (section-based extraction will chunk it)
+            text_to_analyze = text
+            if len(text) > max_text_length:
+                logger.info(f"Large document ({len(text)} chars) - section-based chunking will handle this")
+        
+        # Static prefix (system prompt + instructions, cacheable by the provider) followed by the document
+        messages = PROVIDER_EXTRACTION_PREFIX.messages(text_to_analyze)
 
-Return ONLY valid JSON matching the required schema."""
-                    },
-                    {"role": "user", "content": prompt},
-                ],
+        # Shared pooled client: connections (and TLS sessions) are reused across calls
+        # Timeouts come from HTTP_CONNECT_TIMEOUT / HTTP_READ_TIMEOUT (3 min default for large docs)
+        async with shared_async_client() as client:
+            payload = {
+                "model": model,
+                "messages": messages,
                 "top_p": 1,
             }
             
@@ -587,15 +674,34 @@ Return ONLY valid JSON matching the required schema."""
                 "Content-Type": "application/json",
             }
 
-            response = await client.post(f"{self.base_url}/chat/completions", json=payload, headers=headers)
-            if response.status_code != 200:
-                error_data = response.json() if response.content else {}
-                raise Exception(
-                    f"OpenAI API error ({model}): {response.status_code} - "
-                    f"{error_data.get('error', {}).get('message', 'Unknown error')}"
+            async def post_completion():
+                if on_rule is not None and LLM_STREAMING_ENABLED:
+                    return await self._stream_chat_completion(client, payload, headers, on_rule)
+                response = await client.post(f"{self.base_url}/chat/completions", json=payload, headers=headers)
+                if response.status_code in RETRYABLE_STATUS:
+                    # Raise so the shared rate limiter backs off and retries (honours Retry-After)
+                    response.raise_for_status()
+                return response.status_code, (response.json() if response.content else {})
+
+            limiter = get_rate_limiter()
+            reserved = estimate_tokens(payload)
+            started = time.monotonic()
+            try:
+                status_code, data = await limiter.call(model, reserved, post_completion)
+            except Exception:
+                record_call(model, latency=time.monotonic() - started, error=True)
+                raise
+            if status_code != 200:
+                record_call(model, latency=time.monotonic() - started, error=True)
+                error = data.get("error") or {}
+                raise OpenAIAPIError(
+                    f"OpenAI API error ({model}): {status_code} - {error.get('message', 'Unknown error')}",
+                    status_code,
+                    error.get("code")
                 )
 
-            data = response.json()
+            record_usage(model, data.get("usage") or {}, time.monotonic() - started)
+            limiter.settle_tokens(model, reserved, (data.get("usage") or {}).get("total_tokens"))
             
             # Check if response has choices
             if "choices" not in data or len(data["choices"]) == 0:
@@ -680,7 +786,18 @@ Return ONLY valid JSON matching the required schema."""
             except json.JSONDecodeError as e:
                 logger.error(f"❌ Model '{model}' JSON parse failed: {e}")
                 logger.debug(f"Failed to parse: {llm_response[:500]}")
-                return self._fallback_response(f"Parsing error from {model}: {str(e)}")
+                # Repair malformed output; truncated output (e.g. max_tokens hit) keeps every rule that was closed
+                try:
+                    repaired, repairs = parse_json_lenient(llm_response, model)
+                except ValueError:
+                    return self._fallback_response(f"Parsing error from {model}: {str(e)}")
+                if isinstance(repaired, list):
+                    repaired = {"instrument_rules": repaired}
+                partial = self._validate_and_normalize_response(repaired if isinstance(repaired, dict) else {})
+                if "truncated" in repairs or "salvaged" in repairs:
+                    logger.warning(f"⚠️ [{model}] Salvaged {sum(len(partial[k]) for k in ('sector_rules', 'country_rules', 'instrument_rules'))} complete rules from invalid/truncated JSON")
+                    partial["conflicts"] = [{"category": "parsing_error", "detail": f"Truncated response from {model}: {str(e)}"}]
+                return partial
 
     def _fallback_response(self, reason: str) -> Dict:
         """Return safe fallback JSON"""
@@ -0,0 +1,521 @@
+"""
+Offline Stub LLM
+OpenAI-compatible stand-in for load and latency testing without network access or
+token spend. Responses are derived deterministically from the prompt text:
+
+- extraction prompts   -> {"sector_rules", "country_rules", "instrument_rules", "conflicts"}
+- Excel batch prompts  -> {"v": [{"id", "f", "a", "m", "o", "q"}]}
+- Excel entry prompts  -> {"found", "semantic_match", "ocrd_match", "allowed", "reason"}
+
+Latency (log-normal time to first token + output tokens / throughput), HTTP 429s and
+truncated outputs (finish_reason="length") are simulated with configurable rates.
+Provider prompt caching is simulated too: repeated prompt prefixes are reported as
+usage.prompt_tokens_details.cached_tokens (1024-token minimum, 128-token steps).
+
+Three ways to use it:
+- provider "stub" (LLMProvider.STUB): LLMService routes calls to the in-process client
+- LLM_STUB_ENABLED=true: every chat completion of LLMService goes to the stub
+- python -m app.services.providers.stub_provider --port 8089 serves /v1/chat/completions
+  (set OPENAI_BASE_URL=http://localhost:8089/v1 to exercise the real HTTP path)
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from ..interfaces.llm_provider_interface import LLMProviderInterface
+from ..stream_rule_parser import IncrementalRuleParser, notify_rule
+from ...utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Stub configuration
+# LLM_STUB_ENABLED: send every LLMService chat completion to the stub (no API key needed)
+# STUB_LATENCY_MEDIAN / STUB_LATENCY_SIGMA: log-normal time to first token (seconds, sigma of ln)
+# STUB_TOKENS_PER_SECOND: simulated output throughput (0 = no generation delay)
+# STUB_RATE_LIMIT_RATE: fraction of calls answered with HTTP 429 (Retry-After: STUB_RETRY_AFTER)
+# STUB_TRUNCATION_RATE: fraction of calls cut off with finish_reason="length"
+# STUB_SEED: seed for latency/fault sampling (unset = random); content never depends on it
+LLM_STUB_ENABLED = os.getenv("LLM_STUB_ENABLED", "false").lower() == "true"
+STUB_LATENCY_MEDIAN = float(os.getenv("STUB_LATENCY_MEDIAN", "1.5"))
+STUB_LATENCY_SIGMA = float(os.getenv("STUB_LATENCY_SIGMA", "0.5"))
+STUB_TOKENS_PER_SECOND = float(os.getenv("STUB_TOKENS_PER_SECOND", "80"))
+STUB_RATE_LIMIT_RATE = float(os.getenv("STUB_RATE_LIMIT_RATE", "0"))
+STUB_RETRY_AFTER = float(os.getenv("STUB_RETRY_AFTER", "1"))
+STUB_TRUNCATION_RATE = float(os.getenv("STUB_TRUNCATION_RATE", "0"))
+STUB_SEED = os.getenv("STUB_SEED")
+
+STUB_PROVIDER = "stub"
+STUB_MODEL_PREFIX = "stub-"
+STUB_MODELS = ["stub-fast", "stub-gpt-4o", "stub-gpt-5.2"]
+
+# Canonical name -> lower-case terms (German + English) recognised in documents
+INSTRUMENT_TERMS = {
+    "Equities": ["aktien", "equities", "shares", "stocks"],
+    "Bonds": ["anleihen", "renten", "bonds"],
+    "Government Bonds": ["staatsanleihen", "government bonds"],
+    "Corporate Bonds": ["unternehmensanleihen", "corporate bonds"],
+    "Covered Bonds": ["pfandbriefe", "covered bonds"],
+    "Derivatives": ["derivate", "derivatives"],
+    "Futures": ["futures", "terminkontrakte"],
+    "Options": ["optionen", "options"],
+    "Swaps": ["swaps"],
+    "Warrants": ["optionsscheine", "warrants"],
+    "Certificates": ["zertifikate", "certificates"],
+    "Investment Funds": ["investmentfonds", "investment funds", "zielfonds"],
+    "ETFs": ["etfs", "etf"],
+    "Money Market Instruments": ["geldmarktinstrumente", "money market instruments"],
+    "Commodities": ["rohstoffe", "commodities"],
+    "Real Estate": ["immobilien", "real estate"]
+}
+SECTOR_TERMS = {
+    "Tobacco": ["tabak", "tobacco"],
+    "Weapons": ["waffen", "weapons", "armaments"],
+    "Coal": ["kohle", "coal"],
+    "Gambling": ["glücksspiel", "gambling"],
+    "Nuclear Energy": ["kernenergie", "nuclear energy"]
+}
+COUNTRY_TERMS = {
+    "Russia": ["russland", "russia"],
+    "China": ["china"],
+    "Emerging Markets": ["schwellenländer", "emerging markets"],
+    "USA": ["usa", "united states"],
+    "Germany": ["deutschland", "germany"]
+}
+
+_NEGATIVE_CUES = re.compile(
+    r"\b(nein|no|darf nicht|nicht|not|verboten|unzulässig|ausgeschlossen|excluded|prohibited|forbidden|may not)\b|[:|]\s*-(?![\w-])",
+    re.IGNORECASE
+)
+_POSITIVE_CUES = re.compile(
+    r"\b(ja|yes|erlaubt|zulässig|zugelassen|darf|allowed|permitted|eligible|may invest|x)\b|✓",
+    re.IGNORECASE
+)
+_DOCUMENT_MARKER = re.compile(r"\*\*Document (?:text|excerpt)[^\n]*\*\*[ \t]*\n|Document text:\s*")
+_BATCH_ITEM = re.compile(r'^(I\d+): "([^"]+)"', re.MULTILINE)
+_ENTRY_NAME = re.compile(r'Search for "([^"]+)" followed by "Ja/yes"')
+_CATALOG_ITEM = re.compile(r"^(E\d+): (.+)$", re.MULTILINE)
+_LINE_LABEL = re.compile(r"^L(\d+)\|")
+_RULE_FAMILY = re.compile(r"^RULE FAMILY: (\w+)$", re.MULTILINE)
+
+_rng = random.Random(int(STUB_SEED)) if STUB_SEED else random.Random()
+
+
+def is_stub_model(model: Optional[str]) -> bool:
+    return bool(model) and model.startswith(STUB_MODEL_PREFIX)
+
+
+def stub_model(model: Optional[str]) -> str:
+    """Stub model name for a requested model (keeps cache keys apart from real models)"""
+    if is_stub_model(model):
+        return model
+    return f"{STUB_MODEL_PREFIX}{model or 'fast'}"
+
+
+# ---------------------------------------------------------------------------
+# Deterministic content
+# ---------------------------------------------------------------------------
+
+def _document_text(prompt: str) -> str:
+    """Document part of a prompt (instructions contain instrument names too)"""
+    matches = list(_DOCUMENT_MARKER.finditer(prompt))
+    text = prompt[matches[-1].end():] if matches else prompt
+    instruments_at = text.find("**INSTRUMENTS TO CHECK")
+    return text[:instruments_at] if instruments_at != -1 else text
+
+
+def _classify(text: str, end: int) -> Tuple[Optional[bool], str]:
+    """Allowed/prohibited from the first cue after a mention (same line, 160 chars max)"""
+    line_end = text.find("\n", end)
+    window = text[end:min(end + 160, line_end if line_end != -1 else len(text))]
+    negative = _NEGATIVE_CUES.search(window)
+    positive = _POSITIVE_CUES.search(window)
+    line_start = text.rfind("\n", 0, end) + 1
+    quote = text[line_start:end + len(window)].strip()[:200]
+    if negative and (not positive or negative.start() <= positive.start()):
+        return False, quote
+    if positive:
+        return True, quote
+    return None, quote
+
+
+def _find_term(text: str, terms: List[str]) -> Optional[Tuple[str, Optional[bool], str]]:
+    """First mention of any term: (matched phrase, allowed, quote)"""
+    lowered = text.lower()
+    best = None
+    for term in terms:
+        match = re.search(r"(?<!\w)" + re.escape(term.lower()) + r"(?!\w)", lowered)
+        if match and (best is None or match.start() < best.start()):
+            best = match
+    if best is None:
+        return None
+    allowed, quote = _classify(text, best.end())
+    return text[best.start():best.end()], allowed, quote
+
+
+def _extraction_response(document: str) -> Dict[str, Any]:
+    result = {"sector_rules": [], "country_rules": [], "instrument_rules": [], "conflicts": []}
+    for key, field, vocabulary in (
+        ("instrument_rules", "instrument", INSTRUMENT_TERMS),
+        ("sector_rules", "sector", SECTOR_TERMS),
+        ("country_rules", "country", COUNTRY_TERMS)
+    ):
+        for name, terms in vocabulary.items():
+            hit = _find_term(document, terms)
+            if hit and hit[1] is not None:
+                result[key].append({field: name, "allowed": hit[1], "reason": hit[2] or name})
+    return result
+
+
+def _compact_response(prompt: str, document: str) -> Dict[str, Any]:
+    """Extraction answer in the compact format (catalog ids + line spans, see compact_output)"""
+    catalog = {name.strip().lower(): item_id for item_id, name in _CATALOG_ITEM.findall(prompt)}
+    full = _extraction_response(document)
+    payload: Dict[str, Any] = {"i": [], "s": [], "c": [], "x": []}
+    for key, rules_key, field in (("i", "instrument_rules", "instrument"), ("s", "sector_rules", "sector"), ("c", "country_rules", "country")):
+        for rule in full[rules_key]:
+            label = _LINE_LABEL.match(rule["reason"])
+            line = int(label.group(1)) if label else 1
+            name = rule[field]
+            if key == "i":
+                name = catalog.get(name.lower(), f"n:{name}")
+            payload[key].append([name, 1 if rule["allowed"] else 0, [line, line]])
+    return payload
+
+
+def _batch_response(prompt: str, document: str) -> Dict[str, Any]:
+    verdicts = []
+    for item_id, name in _BATCH_ITEM.findall(prompt):
+        terms = [name] + INSTRUMENT_TERMS.get(name, [])
+        hit = _find_term(document, terms)
+        if not hit:
+            continue
+        verdict = {"id": item_id, "f": 1, "m": hit[0], "o": "N/A", "q": hit[2]}
+        if hit[1] is not None:
+            verdict["a"] = 1 if hit[1] else 0
+        verdicts.append(verdict)
+    return {"v": verdicts}
+
+
+def _entry_response(name: str, document: str) -> Dict[str, Any]:
+    hit = _find_term(document, [name] + INSTRUMENT_TERMS.get(name, []))
+    if not hit:
+        return {"found": False}
+    response = {"found": True, "semantic_match": hit[0], "ocrd_match": "N/A", "reason": hit[2]}
+    if hit[1] is not None:
+        response["allowed"] = hit[1]
+    return response
+
+
+def build_stub_content(messages: List[Dict[str, Any]]) -> str:
+    """Deterministic JSON answer for a chat request (shape chosen from the prompt)"""
+    prompt = "\n".join(
+        message.get("content") if isinstance(message.get("content"), str) else json.dumps(message.get("content"))
+        for message in messages if message.get("role") != "system"
+    )
+    document = _document_text(prompt)
+    if "**INSTRUMENTS TO CHECK" in prompt:
+        payload = _batch_response(prompt, document)
+    elif "**COMPACT OUTPUT FORMAT" in prompt:
+        payload = _compact_response(prompt, document)
+    else:
+        entry = _ENTRY_NAME.search(prompt)
+        payload = _entry_response(entry.group(1), document) if entry else _extraction_response(document)
+        family = _RULE_FAMILY.search(prompt)
+        if family and not entry:
+            payload = {key: value for key, value in payload.items() if key in (family.group(1), "conflicts")}
+    return json.dumps(payload, ensure_ascii=False)
+
+
+# ---------------------------------------------------------------------------
+# Latency / fault model
+# ---------------------------------------------------------------------------
+
+class StubRateLimitError(Exception):
+    """Simulated HTTP 429 (exposes status_code and Retry-After like the OpenAI SDK errors)"""
+
+    def __init__(self, retry_after: float = STUB_RETRY_AFTER):
+        super().__init__(f"Error code: 429 - stub rate limit (retry after {retry_after}s)")
+        self.status_code = 429
+        self.response = SimpleNamespace(status_code=429, headers={"retry-after": str(retry_after)})
+
+
+class _PromptCacheSim:
+    """Remembers hashed prompt prefixes like OpenAI's prompt cache (~4 chars per token)"""
+
+    MIN_CHARS = 1024 * 4
+    STEP_CHARS = 128 * 4
+    MAX_ENTRIES = 100000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._prefixes: "OrderedDict[bytes, None]" = OrderedDict()
+
+    def cached_tokens(self, prompt: str) -> int:
+        """Tokens of the longest previously seen prefix; records this prompt's prefixes"""
+        digest = hashlib.sha1()
+        cached_chars = 0
+        position = 0
+        with self._lock:
+            for boundary in range(self.MIN_CHARS, len(prompt) + 1, self.STEP_CHARS):
+                digest.update(prompt[position:boundary].encode("utf-8"))
+                position = boundary
+                key = digest.copy().digest()
+                if key in self._prefixes:
+                    self._prefixes.move_to_end(key)
+                    cached_chars = boundary
+                else:
+                    self._prefixes[key] = None
+                    if len(self._prefixes) > self.MAX_ENTRIES:
+                        self._prefixes.popitem(last=False)
+        return cached_chars // 4
+
+
+_prompt_cache = _PromptCacheSim()
+
+
+class StubPlan:
+    """Sampled behaviour of one call: delays, fault, final content"""
+
+    def __init__(self, api_params: Dict[str, Any]):
+        self.model = api_params.get("model") or "stub-fast"
+        self.rate_limited = _rng.random() < STUB_RATE_LIMIT_RATE
+        content = build_stub_content(api_params.get("messages") or [])
+        self.finish_reason = "stop"
+        if _rng.random() < STUB_TRUNCATION_RATE and len(content) > 20:
+            content = content[:int(len(content) * _rng.uniform(0.4, 0.9))]
+            self.finish_reason = "length"
+        self.content = content
+        self.first_token_delay = _rng.lognormvariate(0, STUB_LATENCY_SIGMA) * STUB_LATENCY_MEDIAN if STUB_LATENCY_MEDIAN > 0 else 0.0
+        prompt = "\n".join(str(m.get("content", "")) for m in api_params.get("messages") or [])
+        self.prompt_tokens = len(prompt) // 4
+        self.cached_tokens = 0 if self.rate_limited else _prompt_cache.cached_tokens(prompt)
+        self.completion_tokens = max(1, len(content) // 4)
+
+    def chunks(self, chunk_chars: int = 16) -> Iterator[Tuple[str, float]]:
+        """(text, delay before it) pieces at the configured throughput"""
+        per_char = 1.0 / (STUB_TOKENS_PER_SECOND * 4) if STUB_TOKENS_PER_SECOND > 0 else 0.0
+        for start in range(0, len(self.content), chunk_chars):
+            piece = self.content[start:start + chunk_chars]
+            yield piece, len(piece) * per_char
+
+    @property
+    def generation_time(self) -> float:
+        return self.completion_tokens / STUB_TOKENS_PER_SECOND if STUB_TOKENS_PER_SECOND > 0 else 0.0
+
+    def usage(self) -> Dict[str, Any]:
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": self.cached_tokens}
+        }
+
+    def completion_dict(self) -> Dict[str, Any]:
+        return {
+            "id": "stub-" + hashlib.sha1(self.content.encode("utf-8")).hexdigest()[:12],
+            "object": "chat.completion",
+            "model": self.model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": self.content}, "finish_reason": self.finish_reason}],
+            "usage": self.usage()
+        }
+
+    def chunk_dict(self, content: Optional[str] = None, finish_reason: Optional[str] = None, usage: bool = False) -> Dict[str, Any]:
+        choices = [] if usage else [{"index": 0, "delta": {"content": content} if content else {}, "finish_reason": finish_reason}]
+        return {"object": "chat.completion.chunk", "model": self.model, "choices": choices, "usage": self.usage() if usage else None}
+
+
+def _to_namespace(value: Any) -> Any:
+    """Dicts -> attribute objects, mirroring the OpenAI SDK response types"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: _to_namespace(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [_to_namespace(v) for v in value]
+    return value
+
+
+# ---------------------------------------------------------------------------
+# In-process AsyncOpenAI-compatible client
+# ---------------------------------------------------------------------------
+
+class _StubCompletions:
+    async def create(self, **api_params: Any) -> Any:
+        plan = StubPlan(api_params)
+        if plan.rate_limited:
+            await asyncio.sleep(min(plan.first_token_delay, 0.05))
+            raise StubRateLimitError()
+        if api_params.get("stream"):
+            return self._stream(plan, bool((api_params.get("stream_options") or {}).get("include_usage")))
+        await asyncio.sleep(plan.first_token_delay + plan.generation_time)
+        return _to_namespace(plan.completion_dict())
+
+    async def _stream(self, plan: StubPlan, include_usage: bool):
+        await asyncio.sleep(plan.first_token_delay)
+        for piece, delay in plan.chunks():
+            if delay:
+                await asyncio.sleep(delay)
+            yield _to_namespace(plan.chunk_dict(piece))
+        yield _to_namespace(plan.chunk_dict(finish_reason=plan.finish_reason))
+        if include_usage:
+            yield _to_namespace(plan.chunk_dict(usage=True))
+
+
+class StubOpenAIClient:
+    """Exposes client.chat.completions.create(...) like openai.AsyncOpenAI"""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=_StubCompletions())
+
+
+class StubProvider(LLMProviderInterface):
+    """Provider registered as "stub" - used by the traced analysis path"""
+
+    def __init__(self):
+        self.client = StubOpenAIClient()
+
+    async def analyze_document(self, text: str, model: str, on_rule: Optional[Callable[[str, Dict], Any]] = None) -> Dict:
+        """Stub extraction of the given document text (streams rules to on_rule)"""
+        api_params = {
+            "model": stub_model(model),
+            "messages": [{"role": "user", "content": f"**Document text to analyze:**\n{text}"}]
+        }
+        if on_rule is None:
+            response = await self.client.chat.completions.create(**api_params)
+            raw = response.choices[0].message.content
+        else:
+            parser = IncrementalRuleParser()
+            parts = []
+            async for chunk in await self.client.chat.completions.create(**api_params, stream=True):
+                delta = getattr(chunk.choices[0].delta, "content", None) if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    for rule_type, rule in parser.feed(delta):
+                        await notify_rule(on_rule, rule_type, rule)
+            raw = "".join(parts)
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            return _truncated_result(raw)
+
+    def get_available_models(self) -> List[str]:
+        return list(STUB_MODELS)
+
+    async def generate(self, prompt: str) -> str:
+        response = await self.client.chat.completions.create(
+            model="stub-fast", messages=[{"role": "user", "content": prompt}]
+        )
+        return response.choices[0].message.content
+
+
+def _truncated_result(raw: str) -> Dict[str, Any]:
+    parser = IncrementalRuleParser()
+    parser.feed(raw)
+    result = parser.partial_result()
+    result["conflicts"] = [{"category": "parsing_error", "detail": "Truncated stub response"}]
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Standalone OpenAI-compatible HTTP server
+# ---------------------------------------------------------------------------
+
+def serve(host: str = "127.0.0.1", port: int = 8089) -> None:
+    """Serve POST /v1/chat/completions (JSON and SSE streaming) until interrupted"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            logger.debug("stub server: " + format % args)
+
+        def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._send_json(200, {"object": "list", "data": [{"id": m, "object": "model"} for m in STUB_MODELS]})
+            else:
+                self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                api_params = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError:
+                self._send_json(400, {"error": {"message": "Invalid JSON body"}})
+                return
+
+            plan = StubPlan(api_params)
+            if plan.rate_limited:
+                self._send_json(
+                    429,
+                    {"error": {"message": "Rate limit reached (stub)", "type": "rate_limit_exceeded"}},
+                    {"Retry-After": str(STUB_RETRY_AFTER)}
+                )
+                return
+
+            time.sleep(plan.first_token_delay)
+            if not api_params.get("stream"):
+                time.sleep(plan.generation_time)
+                self._send_json(200, plan.completion_dict())
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            events = [plan.chunk_dict(piece) for piece, _ in plan.chunks()]
+            delays = [delay for _, delay in plan.chunks()]
+            events.append(plan.chunk_dict(finish_reason=plan.finish_reason))
+            delays.append(0.0)
+            if (api_params.get("stream_options") or {}).get("include_usage"):
+                events.append(plan.chunk_dict(usage=True))
+                delays.append(0.0)
+            for event, delay in zip(events, delays):
+                if delay:
+                    time.sleep(delay)
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    logger.info(
+        f"Stub LLM server on http://{host}:{port}/v1 (median latency {STUB_LATENCY_MEDIAN}s, "
+        f"{STUB_TOKENS_PER_SECOND} tok/s, 429 rate {STUB_RATE_LIMIT_RATE}, truncation rate {STUB_TRUNCATION_RATE})"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Offline OpenAI-compatible stub LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    args = parser.parse_args()
+    serve(args.host, args.port)
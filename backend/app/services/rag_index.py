@@ -6,8 +6,12 @@ import hashlib
 import os
 import uuid
 import gc
+import time
 from typing import Dict, List, Any, Optional
 from ..utils.logger import setup_logger
+from .rate_limiter import get_rate_limiter
+from .http_clients import get_sync_client
+from .llm_accounting import record_call
 
 logger = setup_logger(__name__)
 
@@ -28,15 +32,38 @@ except ImportError:
     CHROMADB_AVAILABLE = False
     # ChromaDB not available - RAG indexing will use mock mode
 
+EMBEDDING_MODEL = "text-embedding-3-large"
+
 # Initialize OpenAI client only if API key is available
+# (retries are handled by the shared rate limiter; connections come from the shared pool)
 try:
-    client = OpenAI()
+    client = OpenAI(max_retries=0, http_client=get_sync_client())
     OPENAI_AVAILABLE = True
 except Exception:
     client = None
     OPENAI_AVAILABLE = False
     # OpenAI API key not found - embedding generation will be disabled
 
+if CHROMADB_AVAILABLE:
+    class RateLimitedOpenAIEmbeddingFunction(embedding_functions.OpenAIEmbeddingFunction):
+        """Chroma's OpenAI embedding function, routed through the shared rate limiter"""
+
+        def __call__(self, input):
+            tokens = sum(len(text) for text in input) // 4
+            started = time.monotonic()
+            embeddings = get_rate_limiter().call_sync(EMBEDDING_MODEL, tokens, lambda: super(RateLimitedOpenAIEmbeddingFunction, self).__call__(input))
+            # Chroma does not expose usage - record the estimate
+            record_call(EMBEDDING_MODEL, tokens, 0, time.monotonic() - started)
+            return embeddings
+
+
+def get_embedding_function():
+    """Embedding function for the policy_rules collection (indexing and queries must match)"""
+    return RateLimitedOpenAIEmbeddingFunction(
+        api_key=None,  # Will use OPENAI_API_KEY from environment
+        model_name=EMBEDDING_MODEL
+    )
+
 NEG_CUES = r"\b(not|no|except|unless|excluded|exclusion|prohibit|forbidden|restricted|ban(?:ned)?)\b"
 
 def sha1(s: str) -> str:
@@ -172,7 +199,12 @@ def embed(texts: List[str]) -> List[List[float]]:
         import random
         return [[random.random() for _ in range(1536)] for _ in texts]
     
-    resp = client.embeddings.create(model="text-embedding-3-large", input=texts)
+    tokens = sum(len(text) for text in texts) // 4
+    started = time.monotonic()
+    resp = get_rate_limiter().call_sync(
+        EMBEDDING_MODEL, tokens, lambda: client.embeddings.create(model=EMBEDDING_MODEL, input=texts)
+    )
+    record_call(EMBEDDING_MODEL, getattr(getattr(resp, "usage", None), "prompt_tokens", tokens), 0, time.monotonic() - started)
     return [d.embedding for d in resp.data]
 
 def index_pdf(clean_text_path: str, chunks_path: str, vectordb_dir: str = "/tmp/chroma", doc_id: str = None, pdf_path: str = None) -> Dict[str, Any]:
@@ -230,10 +262,7 @@ def index_pdf(clean_text_path: str, chunks_path: str, vectordb_dir: str = "/tmp/
         db = PersistentClient(path=vectordb_dir)
         coll = db.get_or_create_collection(
             name="policy_rules",
-            embedding_function=embedding_functions.OpenAIEmbeddingFunction(
-                api_key=None,  # Will use OPENAI_API_KEY from environment
-                model_name="text-embedding-3-large"
-            )
+            embedding_function=get_embedding_function()
         )
         
         # Stream chunks from JSONL and process in batches
@@ -318,12 +347,12 @@ def index_pdf(clean_text_path: str, chunks_path: str, vectordb_dir: str = "/tmp/
                             embeddings=vecs
                         )
                         total_indexed += len(batch_docs)
-                    # FREE MEMORY: Clear batches and embeddings immediately after upsert
-                    batch_docs.clear()
-                    batch_meta.clear()
-                    batch_ids.clear()
-                    del vecs
-                    gc.collect()
+                        # FREE MEMORY: Clear batches and embeddings immediately after upsert
+                        batch_docs.clear()
+                        batch_meta.clear()
+                        batch_ids.clear()
+                        del vecs
+                        gc.collect()
         
         # Flush remaining items in batch
         if batch_docs:
@@ -437,7 +466,7 @@ def query_rag(vectordb_dir: str = "/tmp/chroma", query: str = "", n_results: int
         # Real ChromaDB mode
         # Open collection
         db = PersistentClient(path=vectordb_dir)
-        coll = db.get_collection("policy_rules")
+        coll = db.get_collection("policy_rules", embedding_function=get_embedding_function())
         
         # Build where clause for document filtering
         where_clause = {}
@@ -3,6 +3,7 @@ import os
 import json
 from ..utils.trace_handler import TraceHandler
 from ..utils.logger import setup_logger
+from .rag_index import get_embedding_function
 
 logger = setup_logger(__name__)
 
@@ -16,6 +17,12 @@ except ImportError:
     # ChromaDB not available - RAG retrieval will use mock mode
 
 
+def _policy_chunk_filter(doc_id: str) -> Dict[str, Any]:
+    """Chroma where-filter for policy-relevant (text/table) chunks of one document"""
+    # Filter out junk, focus on policy-relevant chunks
+    return {"$and": [{"doc_id": doc_id}, {"type": {"$in": ["text", "table"]}}]}
+
+
 def retrieve_rules(query: str, doc_id: str, k: int = 5, vectordb_dir: str = "/tmp/chroma", trace_id: str = None) -> List[Dict[str, Any]]:
     """
     Retrieve top-k most relevant chunks for a decision item (sector, country, etc.)
@@ -38,16 +45,13 @@ def retrieve_rules(query: str, doc_id: str, k: int = 5, vectordb_dir: str = "/tm
         
         # Real ChromaDB mode
         db = PersistentClient(path=vectordb_dir)
-        coll = db.get_collection("policy_rules")
+        coll = db.get_collection("policy_rules", embedding_function=get_embedding_function())
         
         # Query with metadata filtering for policy-relevant chunks
         res = coll.query(
             query_texts=[query],
             n_results=k * 2,  # Get more results for reranking
-            where={
-                "doc_id": doc_id,
-                "type": {"$in": ["text", "table"]}  # Filter out junk, focus on policy-relevant chunks
-            }
+            where=_policy_chunk_filter(doc_id)
         )
         
         # Check if we got any results
@@ -314,3 +318,138 @@ def _get_chunk_by_id_mock(chunk_id: str, vectordb_dir: str = "/tmp/chroma") -> O
     except Exception as e:
         logger.error(f"Error in _get_chunk_by_id_mock: {e}", exc_info=True)
         return None
+
+
+def retrieve_context(queries: List[str], doc_id: str, k: int = 5, vectordb_dir: str = "/tmp/chroma", window: int = 1) -> List[Dict[str, Any]]:
+    """
+    Retrieve the context for one decision item described by several queries (name + synonyms):
+    top-k negation-biased chunks over all queries, expanded by their neighbouring chunks
+    (prev_chunk/next_chunk) and returned in document order.
+    
+    Args:
+        queries: Search queries for the same item (e.g., ["Covered Bonds", "Pfandbriefe"])
+        doc_id: Document identifier to filter results
+        k: Number of top chunks to keep before neighbour expansion
+        vectordb_dir: Directory containing ChromaDB storage
+        window: Number of neighbouring chunks to add on each side (0 = none)
+    
+    Returns:
+        List of chunks ({"id", "text", "meta"}) sorted by chunk_id
+    """
+    queries = [q for q in dict.fromkeys(q.strip() for q in queries if q and q.strip())]
+    if not queries:
+        return []
+    
+    try:
+        if not CHROMADB_AVAILABLE:
+            hits = []
+            for query in queries:
+                hits.extend(_retrieve_rules_mock(query, doc_id, k, vectordb_dir))
+        else:
+            db = PersistentClient(path=vectordb_dir)
+            coll = db.get_collection("policy_rules", embedding_function=get_embedding_function())
+            # One query call for all terms (one embedding request)
+            res = coll.query(
+                query_texts=queries,
+                n_results=k * 2,
+                where=_policy_chunk_filter(doc_id)
+            )
+            hits = []
+            for q_idx in range(len(res.get("ids") or [])):
+                for i in range(len(res["ids"][q_idx])):
+                    hits.append({
+                        "id": res["ids"][q_idx][i],
+                        "text": res["documents"][q_idx][i],
+                        "meta": res["metadatas"][q_idx][i],
+                        "distance": res["distances"][q_idx][i] if res.get("distances") else 1.0
+                    })
+        
+        # Deduplicate across queries, then apply the same rerank as retrieve_rules
+        unique = {}
+        for item in hits:
+            if item["id"] not in unique or item["distance"] < unique[item["id"]]["distance"]:
+                unique[item["id"]] = item
+        items = sorted(unique.values(), key=lambda x: (
+            not x["meta"].get("has_negation", False),  # Negation chunks first
+            x["meta"].get("char_len", 1)  # Then shorter chunks (crisper rules)
+        ))[:k]
+        
+        if window > 0 and items:
+            known = {item["meta"].get("chunk_id") for item in items}
+            for neighbour in get_neighbor_chunks(items, doc_id, vectordb_dir, window):
+                if neighbour["meta"].get("chunk_id") not in known:
+                    known.add(neighbour["meta"].get("chunk_id"))
+                    items.append(neighbour)
+        
+        items.sort(key=lambda x: x["meta"].get("chunk_id") if isinstance(x["meta"].get("chunk_id"), int) else 0)
+        return items
+        
+    except Exception as e:
+        logger.error(f"Error in retrieve_context: {e}", exc_info=True)
+        return []
+
+
+def get_neighbor_chunks(chunks: List[Dict[str, Any]], doc_id: str, vectordb_dir: str = "/tmp/chroma", window: int = 1) -> List[Dict[str, Any]]:
+    """
+    Fetch the chunks surrounding the given chunks using their prev_chunk/next_chunk metadata
+    
+    Args:
+        chunks: Retrieved chunks ({"id", "text", "meta"})
+        doc_id: Document identifier the chunks belong to
+        vectordb_dir: Directory containing ChromaDB storage
+        window: Number of neighbouring chunks on each side
+    
+    Returns:
+        List of neighbouring chunks (not including the input chunks)
+    """
+    wanted = set()
+    own = set()
+    for chunk in chunks:
+        meta = chunk.get("meta", {})
+        own.add(meta.get("chunk_id"))
+        prev_id, next_id = meta.get("prev_chunk"), meta.get("next_chunk")
+        for step in range(window):
+            if isinstance(prev_id, int):
+                wanted.add(prev_id - step)
+            if isinstance(next_id, int):
+                wanted.add(next_id + step)
+    wanted = sorted(c for c in wanted - own if isinstance(c, int) and c >= 0)
+    if not wanted:
+        return []
+    
+    try:
+        if not CHROMADB_AVAILABLE:
+            return _get_neighbor_chunks_mock(wanted, doc_id, vectordb_dir)
+        
+        db = PersistentClient(path=vectordb_dir)
+        coll = db.get_collection("policy_rules")
+        res = coll.get(where={"$and": [{"doc_id": doc_id}, {"chunk_id": {"$in": wanted}}]})
+        return [
+            {"id": res["ids"][i], "text": res["documents"][i], "meta": res["metadatas"][i]}
+            for i in range(len(res.get("ids") or []))
+        ]
+        
+    except Exception as e:
+        logger.error(f"Error in get_neighbor_chunks: {e}", exc_info=True)
+        return []
+
+
+def _get_neighbor_chunks_mock(chunk_ids: List[int], doc_id: str, vectordb_dir: str = "/tmp/chroma") -> List[Dict[str, Any]]:
+    """Mock implementation of get_neighbor_chunks"""
+    try:
+        index_path = os.path.join(vectordb_dir, f"{doc_id}_index.json")
+        if not os.path.exists(index_path):
+            return []
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index_data = json.load(f)
+        
+        wanted = set(chunk_ids)
+        return [
+            {"id": chunk_id, "text": doc, "meta": meta}
+            for chunk_id, doc, meta in zip(index_data.get("ids", []), index_data.get("documents", []), index_data.get("metadatas", []))
+            if meta.get("chunk_id") in wanted
+        ]
+        
+    except Exception as e:
+        logger.error(f"Error in _get_neighbor_chunks_mock: {e}", exc_info=True)
+        return []
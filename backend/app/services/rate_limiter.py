@@ -0,0 +1,415 @@
+"""
+Process-wide OpenAI Rate Limiter
+One limiter shared by every OpenAI caller (LLMService, OpenAIProvider, embeddings in
+rag_index and the Chroma embedding function) so parallel jobs stay under the per-model
+requests/min and tokens/min quotas instead of each hitting 429s independently.
+
+Per model it combines:
+- token buckets for requests/min (RPM) and tokens/min (TPM)
+- AIMD adaptive concurrency: +1/limit per success, halved on 429/5xx
+- jittered exponential retry that honours Retry-After / retry-after-ms headers
+Async callers wait with asyncio.sleep, sync callers (worker threads) with time.sleep.
+"""
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+from ..utils.logger import setup_logger
+from .http_clients import HTTP_READ_TIMEOUT
+from .job_budget import current_budget
+from .llm_accounting import record_retry
+
+logger = setup_logger(__name__)
+
+T = TypeVar("T")
+
+# Rate limiter configuration
+# RATE_LIMIT_DEFAULT_RPM / RATE_LIMIT_DEFAULT_TPM: quotas for models without an explicit entry
+# OPENAI_MODEL_RATE_LIMITS: JSON overrides, e.g. {"gpt-4o-mini": {"rpm": 5000, "tpm": 2000000}}
+# RATE_LIMIT_MAX_CONCURRENCY: upper bound of the adaptive in-flight limit per model
+# RATE_LIMIT_MAX_RETRIES: retries after 429/5xx/connection errors
+# RATE_LIMIT_MAX_TIMEOUT_RETRIES: retries after a timed-out call (each may take HTTP_READ_TIMEOUT
+#   again, so they are only made while the job budget has that much time left)
+# RATE_LIMIT_BACKOFF_BASE / RATE_LIMIT_BACKOFF_MAX: exponential backoff bounds (seconds)
+# RATE_LIMIT_DISABLED: pass calls straight through
+RATE_LIMIT_DEFAULT_RPM = float(os.getenv("RATE_LIMIT_DEFAULT_RPM", "500"))
+RATE_LIMIT_DEFAULT_TPM = float(os.getenv("RATE_LIMIT_DEFAULT_TPM", "800000"))
+RATE_LIMIT_MAX_CONCURRENCY = int(os.getenv("RATE_LIMIT_MAX_CONCURRENCY", "16"))
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "4"))
+RATE_LIMIT_MAX_TIMEOUT_RETRIES = int(os.getenv("RATE_LIMIT_MAX_TIMEOUT_RETRIES", "1"))
+RATE_LIMIT_BACKOFF_BASE = float(os.getenv("RATE_LIMIT_BACKOFF_BASE", "1.0"))
+RATE_LIMIT_BACKOFF_MAX = float(os.getenv("RATE_LIMIT_BACKOFF_MAX", "60"))
+RATE_LIMIT_DISABLED = os.getenv("RATE_LIMIT_DISABLED", "false").lower() == "true"
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {"APIConnectionError", "ConnectError", "ReadError", "RemoteProtocolError", "WriteError", "PoolTimeout"}
+# Timeouts are not retried like the errors above (APITimeoutError subclasses APIConnectionError)
+TIMEOUT_ERRORS = {"APITimeoutError", "ReadTimeout", "WriteTimeout", "ConnectTimeout"}
+
+
+def _load_model_limits() -> Dict[str, Dict[str, float]]:
+    """Parse OPENAI_MODEL_RATE_LIMITS"""
+    raw = os.getenv("OPENAI_MODEL_RATE_LIMITS", "")
+    if not raw:
+        return {}
+    try:
+        return {model: {k: float(v) for k, v in limits.items()} for model, limits in json.loads(raw).items()}
+    except Exception as e:
+        logger.warning(f"Invalid OPENAI_MODEL_RATE_LIMITS ({e}) - using defaults")
+        return {}
+
+
+def estimate_tokens(api_params: Dict[str, Any]) -> int:
+    """
+    Rough token estimate for a request (≈4 chars per token for the prompt plus the
+    requested completion budget). Used to reserve TPM capacity before the call.
+    """
+    prompt_chars = 0
+    for message in api_params.get("messages", []) or []:
+        content = message.get("content", "")
+        if isinstance(content, str):
+            prompt_chars += len(content)
+        elif isinstance(content, list):
+            for part in content:
+                if isinstance(part, dict) and part.get("type") == "text":
+                    prompt_chars += len(part.get("text", ""))
+                else:
+                    prompt_chars += 3000  # images etc. - flat allowance
+    if "input" in api_params:
+        inputs = api_params["input"]
+        prompt_chars += sum(len(x) for x in inputs) if isinstance(inputs, list) else len(str(inputs))
+    completion = api_params.get("max_completion_tokens") or api_params.get("max_tokens") or 0
+    return prompt_chars // 4 + int(completion)
+
+
+def is_quota_exhausted(error: BaseException) -> bool:
+    """429 insufficient_quota (billing limit reached) - retrying cannot succeed"""
+    text = str(error)
+    response = getattr(error, "response", None)
+    try:
+        text += getattr(response, "text", "") or ""
+    except Exception:
+        pass  # streamed response body not read
+    return "insufficient_quota" in text or "exceeded your current quota" in text.lower()
+
+
+def _error_details(error: BaseException) -> Tuple[bool, Optional[int], Optional[float]]:
+    """
+    Classify an exception from the OpenAI SDK or httpx.
+
+    Returns:
+        (retryable, status_code, retry_after_seconds)
+    """
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+
+    retry_after = None
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        try:
+            if headers.get("retry-after-ms"):
+                retry_after = float(headers.get("retry-after-ms")) / 1000.0
+            elif headers.get("retry-after"):
+                retry_after = float(headers.get("retry-after"))
+        except (TypeError, ValueError):
+            retry_after = None
+
+    if status is not None:
+        # An exhausted quota also answers 429, but waiting does not help - fail fast
+        return status in RETRYABLE_STATUS and not is_quota_exhausted(error), status, retry_after
+    if is_timeout(error):
+        return False, None, retry_after
+    retryable = any(cls.__name__ in RETRYABLE_ERRORS for cls in type(error).__mro__)
+    return retryable, None, retry_after
+
+
+def is_timeout(error: BaseException) -> bool:
+    """Client-side timeout of a call (the request may still be running on the server)"""
+    return any(cls.__name__ in TIMEOUT_ERRORS for cls in type(error).__mro__)
+
+
+def _timeout_retry_allowed(timeouts: int) -> bool:
+    """
+    Whether a timed-out call may be retried: at most RATE_LIMIT_MAX_TIMEOUT_RETRIES times,
+    and only while the current job budget leaves room for another full read timeout.
+    """
+    if timeouts > RATE_LIMIT_MAX_TIMEOUT_RETRIES:
+        return False
+    budget = current_budget()
+    return budget is None or budget.remaining() >= HTTP_READ_TIMEOUT
+
+
+class _TokenBucket:
+    """Continuous-refill token bucket (capacity = per-minute quota)"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = max(1.0, per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount can be taken (requests larger than capacity need a full bucket)"""
+        self._refill(now)
+        needed = min(amount, self.capacity)
+        if self.tokens >= needed:
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.tokens -= amount
+
+    def give(self, amount: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class _ModelState:
+    """Limiter state for one model"""
+
+    def __init__(self, rpm: float, tpm: float, max_concurrency: int):
+        self.requests = _TokenBucket(rpm)
+        self.tokens = _TokenBucket(tpm)
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.last_decrease = 0.0
+        self.completed = 0
+        self.throttled = 0
+        self.retries = 0
+        self.failed = 0
+
+
+class RateLimiter:
+    """Per-model RPM/TPM token buckets with AIMD concurrency and retry"""
+
+    def __init__(
+        self,
+        default_rpm: float = RATE_LIMIT_DEFAULT_RPM,
+        default_tpm: float = RATE_LIMIT_DEFAULT_TPM,
+        max_concurrency: int = RATE_LIMIT_MAX_CONCURRENCY,
+        max_retries: int = RATE_LIMIT_MAX_RETRIES,
+        enabled: bool = not RATE_LIMIT_DISABLED
+    ):
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.enabled = enabled
+        self.model_limits = _load_model_limits()
+        self._lock = threading.Lock()
+        self._models: Dict[str, _ModelState] = {}
+
+    def _state(self, model: str) -> _ModelState:
+        state = self._models.get(model)
+        if state is None:
+            limits = self.model_limits.get(model, {})
+            state = _ModelState(
+                limits.get("rpm", self.default_rpm),
+                limits.get("tpm", self.default_tpm),
+                int(limits.get("concurrency", self.max_concurrency))
+            )
+            self._models[model] = state
+        return state
+
+    def _try_acquire(self, model: str, tokens: int) -> float:
+        """Take a slot if possible. Returns 0 on success, otherwise seconds to wait."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._state(model)
+            wait = max(state.requests.wait_time(1, now), state.tokens.wait_time(tokens, now))
+            if state.in_flight >= int(state.limit):
+                wait = max(wait, 0.05)
+            if wait > 0:
+                return wait
+            state.requests.take(1)
+            state.tokens.take(tokens)
+            state.in_flight += 1
+            return 0.0
+
+    def _release(self, model: str, success: bool, throttled: bool) -> None:
+        """Release a slot and adapt the concurrency limit (AIMD)"""
+        now = time.monotonic()
+        with self._lock:
+            state = self._state(model)
+            state.in_flight = max(0, state.in_flight - 1)
+            if throttled:
+                state.throttled += 1
+                # Halve at most once per second so one burst of 429s doesn't collapse the limit
+                if now - state.last_decrease > 1.0:
+                    state.limit = max(1.0, state.limit / 2)
+                    state.last_decrease = now
+                    logger.warning(f"🚦 {model}: throttled - concurrency limit lowered to {int(state.limit)}")
+            elif success:
+                state.completed += 1
+                state.limit = min(float(state.max_concurrency), state.limit + 1.0 / max(1.0, state.limit))
+
+    def settle_tokens(self, model: str, reserved: int, actual: Optional[int]) -> None:
+        """Correct the TPM bucket once the real token usage of a call is known"""
+        if not self.enabled or actual is None:
+            return
+        with self._lock:
+            state = self._state(model)
+            if actual < reserved:
+                state.tokens.give(reserved - actual)
+            else:
+                state.tokens.take(actual - reserved)
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        delay = min(RATE_LIMIT_BACKOFF_MAX, RATE_LIMIT_BACKOFF_BASE * (2 ** attempt))
+        delay = random.uniform(delay / 2, delay)  # jitter to avoid synchronized retries
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _begin_wait(self, model: str, delta: int) -> None:
+        with self._lock:
+            self._state(model).waiting += delta
+
+    def _record_retry(self, model: str, final: bool) -> None:
+        with self._lock:
+            state = self._state(model)
+            if final:
+                state.failed += 1
+            else:
+                state.retries += 1
+        if not final:
+            record_retry(model)
+
+    async def acquire(self, model: str, tokens: int) -> None:
+        """Wait (async) until a request slot for model is available"""
+        self._begin_wait(model, 1)
+        try:
+            while True:
+                wait = self._try_acquire(model, tokens)
+                if wait <= 0:
+                    return
+                await asyncio.sleep(min(wait, 1.0))
+        finally:
+            self._begin_wait(model, -1)
+
+    def acquire_sync(self, model: str, tokens: int) -> None:
+        """Wait (blocking) until a request slot for model is available"""
+        self._begin_wait(model, 1)
+        try:
+            while True:
+                wait = self._try_acquire(model, tokens)
+                if wait <= 0:
+                    return
+                time.sleep(min(wait, 1.0))
+        finally:
+            self._begin_wait(model, -1)
+
+    async def call(self, model: str, tokens: int, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run an async OpenAI call under the limiter, retrying 429/5xx/connection errors.
+        Non-retryable errors (e.g. 404 model not found) are raised immediately, timeouts
+        are retried at most RATE_LIMIT_MAX_TIMEOUT_RETRIES times within the job budget.
+        """
+        if not self.enabled:
+            return await fn()
+        attempt = 0
+        timeouts = 0
+        while True:
+            await self.acquire(model, tokens)
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                self._release(model, success=False, throttled=False)
+                raise
+            except Exception as e:
+                retryable, status, retry_after = _error_details(e)
+                self._release(model, success=False, throttled=retryable)
+                if is_timeout(e):
+                    timeouts += 1
+                    retryable = _timeout_retry_allowed(timeouts)
+                if not retryable or attempt >= self.max_retries:
+                    if retryable:
+                        self._record_retry(model, final=True)
+                    raise
+                delay = self._backoff(attempt, retry_after)
+                self._record_retry(model, final=False)
+                logger.warning(f"🔁 {model}: {status or type(e).__name__} - retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self._release(model, success=True, throttled=False)
+            return result
+
+    def call_sync(self, model: str, tokens: int, fn: Callable[[], T]) -> T:
+        """Blocking variant of call() for sync callers (embeddings, Chroma)"""
+        if not self.enabled:
+            return fn()
+        attempt = 0
+        timeouts = 0
+        while True:
+            self.acquire_sync(model, tokens)
+            try:
+                result = fn()
+            except Exception as e:
+                retryable, status, retry_after = _error_details(e)
+                self._release(model, success=False, throttled=retryable)
+                if is_timeout(e):
+                    timeouts += 1
+                    retryable = _timeout_retry_allowed(timeouts)
+                if not retryable or attempt >= self.max_retries:
+                    if retryable:
+                        self._record_retry(model, final=True)
+                    raise
+                delay = self._backoff(attempt, retry_after)
+                self._record_retry(model, final=False)
+                logger.warning(f"🔁 {model}: {status or type(e).__name__} - retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self._release(model, success=True, throttled=False)
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-model queue depth, in-flight count, adaptive limit and bucket levels"""
+        now = time.monotonic()
+        with self._lock:
+            models = {}
+            for model, state in self._models.items():
+                state.requests._refill(now)
+                state.tokens._refill(now)
+                models[model] = {
+                    "queue_depth": state.waiting,
+                    "in_flight": state.in_flight,
+                    "concurrency_limit": int(state.limit),
+                    "rpm_capacity": state.requests.capacity,
+                    "rpm_available": round(state.requests.tokens, 1),
+                    "tpm_capacity": state.tokens.capacity,
+                    "tpm_available": round(state.tokens.tokens),
+                    "completed": state.completed,
+                    "throttled": state.throttled,
+                    "retries": state.retries,
+                    "failed": state.failed
+                }
+            return {
+                "enabled": self.enabled,
+                "queue_depth": sum(m["queue_depth"] for m in models.values()),
+                "models": models
+            }
+
+
+# Process-wide limiter instance (lazy initialization)
+_rate_limiter: Optional[RateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Get the shared rate limiter (lazy initialization)"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = RateLimiter()
+    return _rate_limiter
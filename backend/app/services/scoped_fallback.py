@@ -0,0 +1,74 @@
+"""
+Scoped Fallback
+When the primary extraction finds no instrument rules, the universal fallback prompt
+is only run on the sections (or planner packs) that produced nothing and that
+contain rule content according to the section pre-screen, instead of on the whole
+document again. Sections are processed concurrently.
+
+Optionally (FALLBACK_SPECULATIVE_ENABLED) the fallback starts in parallel with the
+primary pass for documents that do not look German - the primary prompt is tuned
+for German Ja/Nein tables, so these are the documents that usually end up in the
+fallback. Speculative results are only used for sections the primary pass left
+empty; if the primary pass finds instrument rules the fallback is cancelled.
+"""
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from .conservative_classifier import GERMAN_JA, GERMAN_NEIN
+from .section_prescreen import score_section, SECTION_PRESCREEN_ENABLED, SECTION_PRESCREEN_MIN_SCORE
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Fallback configuration
+# FALLBACK_SPECULATIVE_ENABLED: start the fallback alongside the primary pass for non-German documents
+# FALLBACK_GERMAN_SHARE: documents whose German share of common function words is below this count as non-German
+# FALLBACK_TIMEOUT: seconds allowed per fallback section
+FALLBACK_SPECULATIVE_ENABLED = os.getenv("FALLBACK_SPECULATIVE_ENABLED", "false").lower() == "true"
+FALLBACK_GERMAN_SHARE = float(os.getenv("FALLBACK_GERMAN_SHARE", "0.5"))
+FALLBACK_TIMEOUT = float(os.getenv("FALLBACK_TIMEOUT", "300"))
+
+_GERMAN_WORDS = re.compile(r"\b(der|die|das|und|nicht|für|mit|des|den|ist|wird|werden|zu|von|auf|oder)\b", re.I)
+_ENGLISH_WORDS = re.compile(r"\b(the|and|of|to|is|for|with|not|be|may|shall|or|are|which|by)\b", re.I)
+_LANGUAGE_SAMPLE = 20000  # chars inspected for the language guess
+_MIN_WORDS = 20
+
+
+def looks_non_german(text: str) -> bool:
+    """Whether a document is unlikely to match the German-tuned primary prompt"""
+    sample = text[:_LANGUAGE_SAMPLE]
+    german = len(_GERMAN_WORDS.findall(sample))
+    english = len(_ENGLISH_WORDS.findall(sample))
+    if german + english < _MIN_WORDS:
+        return False
+    # Ja/Nein tables are the layout the primary prompt is written for
+    if len(GERMAN_JA.findall(sample)) + len(GERMAN_NEIN.findall(sample)) >= _MIN_WORDS:
+        return False
+    return german / (german + english) < FALLBACK_GERMAN_SHARE
+
+
+def fallback_candidates(
+    units: List[Dict[str, Any]],
+    results: List[Dict[str, Any]],
+    term_pattern: Optional[re.Pattern] = None
+) -> List[Tuple[int, Dict[str, Any]]]:
+    """
+    (index, unit) pairs that should get the fallback prompt: no instrument rules in
+    their primary result and - with mapping terms and the pre-screen enabled - a
+    pre-screen score of at least SECTION_PRESCREEN_MIN_SCORE.
+    """
+    candidates = []
+    screened_out = []
+    for idx, (unit, result) in enumerate(zip(units, results)):
+        if isinstance(result, dict) and result.get("instrument_rules"):
+            continue
+        if SECTION_PRESCREEN_ENABLED and term_pattern is not None:
+            score = score_section(unit, term_pattern)["score"]
+            if score < SECTION_PRESCREEN_MIN_SCORE:
+                screened_out.append(unit.get("section_id", idx + 1))
+                continue
+        candidates.append((idx, unit))
+
+    if screened_out:
+        logger.info(f"✂️ Fallback: {len(screened_out)} empty sections without rule content skipped: {screened_out}")
+    return candidates
@@ -0,0 +1,183 @@
+"""
+Section Planner
+Packs adjacent extraction sections into as few LLM calls as the model's context
+window allows. Each call repeats the ~20k-char system + extraction prompt, so a
+128k-context model should get a few large calls instead of many 27.5k-char ones.
+
+Budget per call = context window - completion reserve - prompt tokens, times a
+safety factor, capped by what the completion can answer: a dense section yields
+about one completion token per SECTION_PLAN_TOKENS_PER_OUTPUT_TOKEN document tokens,
+so a pack larger than that times max_tokens would come back as truncated JSON.
+SECTION_PLAN_MAX_PACK_TOKENS is an additional fixed upper bound.
+
+The planner is off by default; enable it for models with large completion limits. Sections are only packed
+with their neighbours (and with sections routed to the same model); a pack that does
+not start at the beginning of the document is prefixed with the last sentences
+before it instead of a fixed 2k-char overlap.
+"""
+import json
+import math
+import os
+import re
+from typing import Any, Dict, List, Optional
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Planner configuration
+# SECTION_PLANNER_ENABLED: pack sections up to the model's context budget
+# SECTION_PLAN_CHARS_PER_TOKEN: token estimate for German/English prospectus text
+# SECTION_PLAN_SAFETY: fraction of the computed budget that is used
+# SECTION_PLAN_TOKENS_PER_OUTPUT_TOKEN: document tokens per completion token of a dense section
+#   (pack cap = this x completion reserve; 0 = no completion-based cap)
+# SECTION_PLAN_MAX_PACK_TOKENS: upper bound of document tokens per call (0 = context budget only)
+# SECTION_PLAN_OVERLAP_SENTENCES: boundary sentences repeated at the start of each pack
+# SECTION_PLAN_PACK_TIMEOUT: seconds allowed per attempt for packs of several sections
+# MODEL_CONTEXT_WINDOWS: JSON overrides, e.g. {"gpt-4o": 128000}
+SECTION_PLANNER_ENABLED = os.getenv("SECTION_PLANNER_ENABLED", "false").lower() == "true"
+SECTION_PLAN_CHARS_PER_TOKEN = float(os.getenv("SECTION_PLAN_CHARS_PER_TOKEN", "3.5"))
+SECTION_PLAN_SAFETY = float(os.getenv("SECTION_PLAN_SAFETY", "0.9"))
+SECTION_PLAN_TOKENS_PER_OUTPUT_TOKEN = float(os.getenv("SECTION_PLAN_TOKENS_PER_OUTPUT_TOKEN", "3"))
+SECTION_PLAN_MAX_PACK_TOKENS = int(os.getenv("SECTION_PLAN_MAX_PACK_TOKENS", "60000"))
+SECTION_PLAN_OVERLAP_SENTENCES = int(os.getenv("SECTION_PLAN_OVERLAP_SENTENCES", "2"))
+SECTION_PLAN_PACK_TIMEOUT = float(os.getenv("SECTION_PLAN_PACK_TIMEOUT", "300"))
+
+# Context windows in tokens; longest matching prefix wins
+DEFAULT_CONTEXT_WINDOWS = {
+    "gpt-5": 400000,
+    "gpt-4.1": 1047576,
+    "gpt-4o": 128000,
+    "gpt-4": 8192,
+    "o1": 200000,
+    "stub-": 128000
+}
+DEFAULT_CONTEXT_WINDOW = 128000
+
+
+def _load_context_windows() -> Dict[str, int]:
+    windows = dict(DEFAULT_CONTEXT_WINDOWS)
+    raw = os.getenv("MODEL_CONTEXT_WINDOWS")
+    if raw:
+        try:
+            windows.update({name: int(size) for name, size in json.loads(raw).items()})
+        except (json.JSONDecodeError, TypeError, ValueError, AttributeError) as e:
+            logger.warning(f"Ignoring invalid MODEL_CONTEXT_WINDOWS: {e}")
+    return windows
+
+
+MODEL_CONTEXT_WINDOWS = _load_context_windows()
+
+_SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+|\n+")
+_OVERLAP_WINDOW = 1500  # chars searched backwards for boundary sentences
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / SECTION_PLAN_CHARS_PER_TOKEN)
+
+
+def context_window(model: str) -> int:
+    matches = [name for name in MODEL_CONTEXT_WINDOWS if model and model.startswith(name)]
+    return MODEL_CONTEXT_WINDOWS[max(matches, key=len)] if matches else DEFAULT_CONTEXT_WINDOW
+
+
+def completion_reserve(model: str) -> int:
+    """Completion tokens requested by LLMService.analyze_document for model"""
+    if model and model.startswith("gpt-5"):
+        return 8000
+    return 3500 if model == "gpt-4" else 4000
+
+
+def pack_budget(model: str, prompt_tokens: int) -> int:
+    """Document tokens that fit into one extraction call for model"""
+    reserve = completion_reserve(model)
+    budget = int((context_window(model) - reserve - prompt_tokens) * SECTION_PLAN_SAFETY)
+    if SECTION_PLAN_TOKENS_PER_OUTPUT_TOKEN > 0:
+        budget = min(budget, int(reserve * SECTION_PLAN_TOKENS_PER_OUTPUT_TOKEN))
+    if SECTION_PLAN_MAX_PACK_TOKENS > 0:
+        budget = min(budget, SECTION_PLAN_MAX_PACK_TOKENS)
+    return max(budget, 0)
+
+
+def boundary_sentences(text: str, end: int, count: int = SECTION_PLAN_OVERLAP_SENTENCES) -> str:
+    """The last `count` sentences of text[:end] (context for a pack starting at end)"""
+    if count <= 0 or end <= 0:
+        return ""
+    window = text[max(0, end - _OVERLAP_WINDOW):end]
+    sentences = [s for s in _SENTENCE_END.split(window) if s.strip()]
+    if len(sentences) > count and end > _OVERLAP_WINDOW:
+        sentences = sentences[1:]  # first piece is probably cut off by the window
+    return " ".join(sentences[-count:]).strip()
+
+
+def plan_sections(
+    sections: List[Dict[str, Any]],
+    text: str,
+    model: str,
+    prompt_tokens: int
+) -> List[Dict[str, Any]]:
+    """
+    Pack adjacent sections into calls that fit the model's token budget.
+
+    Args:
+        sections: Section dicts (document order) from _split_document_into_sections,
+            optionally with a per-section "model" (see section_prescreen)
+        text: Full document text (for boundary sentences)
+        model: Requested model
+        prompt_tokens: Estimated tokens of the system + extraction prompt
+
+    Returns:
+        Pack dicts with the section keys plus 'section_ids' (packed section ids)
+        and 'timeout' for packs of several sections
+    """
+    if len(sections) <= 1:
+        return sections
+
+    groups: List[List[Dict[str, Any]]] = []
+    group_tokens = 0
+    budget = 0
+    for section in sections:
+        section_model = section.get("model", model)
+        section_budget = pack_budget(section_model, prompt_tokens)
+        tokens = estimate_tokens(section["text"])
+        current = groups[-1] if groups else None
+        if (
+            current is not None
+            and current[-1].get("model", model) == section_model
+            and group_tokens + tokens <= budget
+        ):
+            current.append(section)
+            group_tokens += tokens
+        else:
+            groups.append([section])
+            group_tokens = tokens + estimate_tokens(boundary_sentences(text, section.get("start_char", 0)))
+            budget = section_budget
+
+    packs = []
+    for pack_id, group in enumerate(groups, 1):
+        first, last = group[0], group[-1]
+        parts = [group[0]["text"]]
+        for previous, section in zip(group, group[1:]):
+            if section.get("start_char") != previous.get("end_char"):
+                parts.append("\n\n[...]\n\n")  # sections skipped in between
+            parts.append(section["text"])
+        body = "".join(parts)
+        prefix = boundary_sentences(text, first.get("start_char", 0))
+        pack = {
+            "section_id": pack_id,
+            "title": first["title"],
+            "text": f"{prefix}\n{body}" if prefix else body,
+            "start_char": first.get("start_char", 0),
+            "end_char": last.get("end_char", 0),
+            "section_ids": [section["section_id"] for section in group]
+        }
+        if "model" in first:
+            pack["model"] = first["model"]
+        if len(group) > 1:
+            pack["timeout"] = SECTION_PLAN_PACK_TIMEOUT
+        packs.append(pack)
+
+    logger.info(
+        f"📦 Section planner: {len(sections)} sections packed into {len(packs)} calls "
+        f"(budget {pack_budget(model, prompt_tokens)} tokens/call, prompt ≈{prompt_tokens} tokens)"
+    )
+    return packs
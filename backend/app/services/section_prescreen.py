@@ -0,0 +1,204 @@
+"""
+Section Pre-Screen
+Cheap local relevance scoring for section-based extraction. Each section is scored
+with the conservative_classifier marker regexes (allow/prohibit wording, German
+ja/nein, X/- marks, section titles) and the Excel mapping term set; sections that
+score below the threshold (cost tables, risk boilerplate, glossaries) are not sent
+to the LLM. Every skipped section is kept in an audit record so the decision can be
+reviewed in the trace / result notes.
+
+The top SECTION_PRESCREEN_MIN_KEEP sections are always kept, so a document whose
+rules use unusual wording still gets extracted.
+"""
+import os
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from .conservative_classifier import (
+    ALLOW_MARKERS,
+    NEGATORS,
+    GERMAN_JA,
+    GERMAN_NEIN,
+    GERMAN_MARK_X,
+    GERMAN_MARK_DASH,
+    ALLOW_SECTIONS,
+    PROHIBIT_SECTIONS,
+    DEFINITION_SECTIONS
+)
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Pre-screen configuration
+# SECTION_PRESCREEN_ENABLED: score sections before the LLM and skip irrelevant ones
+# SECTION_PRESCREEN_MIN_SCORE: sections scoring below this are skipped
+# SECTION_PRESCREEN_MIN_KEEP: the N best-scoring sections are always kept
+# SECTION_PRESCREEN_DOWNGRADE_SCORE / SECTION_PRESCREEN_DOWNGRADE_MODEL: kept sections scoring
+#   below DOWNGRADE_SCORE are sent to the cheaper DOWNGRADE_MODEL (empty = no downgrade)
+SECTION_PRESCREEN_ENABLED = os.getenv("SECTION_PRESCREEN_ENABLED", "true").lower() == "true"
+SECTION_PRESCREEN_MIN_SCORE = float(os.getenv("SECTION_PRESCREEN_MIN_SCORE", "5"))
+SECTION_PRESCREEN_MIN_KEEP = int(os.getenv("SECTION_PRESCREEN_MIN_KEEP", "1"))
+SECTION_PRESCREEN_DOWNGRADE_SCORE = float(os.getenv("SECTION_PRESCREEN_DOWNGRADE_SCORE", "8"))
+SECTION_PRESCREEN_DOWNGRADE_MODEL = os.getenv("SECTION_PRESCREEN_DOWNGRADE_MODEL", "").strip()
+
+# Score weights. Marker words alone are weak evidence (risk boilerplate is full of
+# "not"/"no"), so their contribution is capped; lines that name a mapped instrument
+# together with a marker carry the score.
+RULE_LINE_WEIGHT = 3.0       # line with a mapped term and an allow/prohibit marker or X/- mark
+MARKER_WEIGHT = 0.5          # allow/prohibit wording (EN/DE) without a term
+MARK_WEIGHT = 0.1            # bare X / - marks (common in non-rule tables too)
+MARKER_SCORE_CAP = 4.0
+TERM_WEIGHT = 0.5            # each distinct mapped term mentioned
+TERM_SCORE_CAP = 5.0
+TITLE_BONUS = 5.0            # title looks like an eligible / restrictions section
+DEFINITION_FACTOR = 0.5      # glossaries mention every term without deciding anything
+
+# Sentence/line units (PDF text often has very long lines)
+_UNIT_SPLIT = re.compile(r"\n+|(?<=[.;:])\s+")
+_STRONG_MARKERS = (ALLOW_MARKERS, NEGATORS, GERMAN_JA, GERMAN_NEIN)
+
+
+@lru_cache(maxsize=8)
+def _term_pattern(terms: Tuple[str, ...]) -> Optional[re.Pattern]:
+    """One alternation over all mapped terms (longest first so specific terms win)"""
+    if not terms:
+        return None
+    alternation = "|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True))
+    return re.compile(rf"(?<!\w)(?:{alternation})(?!\w)", re.I)
+
+
+def term_pattern_for(terms: Iterable[str]) -> Optional[re.Pattern]:
+    """Compiled term matcher for an Excel mapping term set (cached)"""
+    return _term_pattern(tuple(sorted({t.strip().lower() for t in terms if t and t.strip()})))
+
+
+def score_section(section: Dict[str, Any], term_pattern: Optional[re.Pattern] = None) -> Dict[str, Any]:
+    """
+    Score one section for investment-rule content.
+
+    Returns:
+        Dict with section_id, title, chars, score and the counts behind it
+    """
+    text = section.get("text", "")
+    title = section.get("title", "") or ""
+
+    rule_lines = 0
+    marker_lines = 0
+    mark_lines = 0
+    terms_seen = set()
+
+    for unit in _UNIT_SPLIT.split(text):
+        if not unit.strip():
+            continue
+        strong = any(pattern.search(unit) for pattern in _STRONG_MARKERS)
+        marked = bool(GERMAN_MARK_X.search(unit) or GERMAN_MARK_DASH.search(unit))
+        unit_terms = {m.group(0).lower() for m in term_pattern.finditer(unit)} if term_pattern else set()
+        terms_seen.update(unit_terms)
+
+        if unit_terms and (strong or marked):
+            rule_lines += 1
+        elif strong:
+            marker_lines += 1
+        elif marked:
+            mark_lines += 1
+
+    score = (
+        rule_lines * RULE_LINE_WEIGHT
+        + min(marker_lines * MARKER_WEIGHT + mark_lines * MARK_WEIGHT, MARKER_SCORE_CAP)
+        + min(len(terms_seen) * TERM_WEIGHT, TERM_SCORE_CAP)
+    )
+    if ALLOW_SECTIONS.search(title) or PROHIBIT_SECTIONS.search(title):
+        score += TITLE_BONUS
+    elif DEFINITION_SECTIONS.search(title):
+        score *= DEFINITION_FACTOR
+
+    return {
+        "section_id": section.get("section_id"),
+        "title": title[:100],
+        "chars": len(text),
+        "score": round(score, 2),
+        "rule_lines": rule_lines,
+        "marker_lines": marker_lines,
+        "mark_lines": mark_lines,
+        "terms": len(terms_seen)
+    }
+
+
+def prescreen_sections(
+    sections: List[Dict[str, Any]],
+    terms: Iterable[str] = (),
+    min_score: float = SECTION_PRESCREEN_MIN_SCORE,
+    min_keep: int = SECTION_PRESCREEN_MIN_KEEP,
+    downgrade_score: float = SECTION_PRESCREEN_DOWNGRADE_SCORE,
+    downgrade_model: str = SECTION_PRESCREEN_DOWNGRADE_MODEL
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Split sections into those worth an LLM call and those to skip.
+
+    Kept sections keep their original order (merge precedence is unchanged). A kept
+    section scoring below downgrade_score gets section["model"] = downgrade_model
+    when a downgrade model is configured.
+
+    Args:
+        sections: Section dicts from AnalysisService._split_document_into_sections
+        terms: Excel mapping terms (ExcelMappingService.get_term_map() keys)
+
+    Returns:
+        (kept_sections, audit) where audit lists the score of every section and
+        the skipped / downgraded section ids
+    """
+    term_pattern = term_pattern_for(terms)
+    if term_pattern is None:
+        # Without the mapping terms only marker words are left - too weak to skip anything
+        logger.warning("⚠️ Section pre-screen: no mapping terms available - sending all sections to the LLM")
+        return sections, {
+            "enabled": False,
+            "reason": "no mapping terms",
+            "total_sections": len(sections),
+            "kept_sections": len(sections),
+            "skipped_sections": []
+        }
+
+    scores = [score_section(section, term_pattern) for section in sections]
+
+    ranked = sorted(range(len(sections)), key=lambda idx: scores[idx]["score"], reverse=True)
+    always_keep = set(ranked[:max(0, min_keep)])
+
+    kept: List[Dict[str, Any]] = []
+    skipped: List[Dict[str, Any]] = []
+    downgraded: List[Dict[str, Any]] = []
+    for idx, (section, score) in enumerate(zip(sections, scores)):
+        if score["score"] < min_score and idx not in always_keep:
+            skipped.append(score)
+            continue
+        if downgrade_model and score["score"] < downgrade_score:
+            section = dict(section, model=downgrade_model)
+            downgraded.append(score)
+        kept.append(section)
+
+    audit = {
+        "enabled": True,
+        "min_score": min_score,
+        "min_keep": min_keep,
+        "downgrade_model": downgrade_model or None,
+        "total_sections": len(sections),
+        "kept_sections": len(kept),
+        "skipped_sections": skipped,
+        "downgraded_sections": [s["section_id"] for s in downgraded],
+        "skipped_chars": sum(s["chars"] for s in skipped),
+        "scores": scores
+    }
+
+    if skipped:
+        logger.info(
+            f"✂️ Section pre-screen: skipping {len(skipped)}/{len(sections)} sections without rule content "
+            f"({audit['skipped_chars']} chars)"
+        )
+        for entry in skipped:
+            logger.info(f"   - section {entry['section_id']} '{entry['title'][:50]}' score={entry['score']}")
+    else:
+        logger.info(f"✂️ Section pre-screen: all {len(sections)} sections contain rule content")
+    if downgraded:
+        logger.info(f"   {len(downgraded)} low-scoring sections routed to '{downgrade_model}'")
+
+    return kept, audit
@@ -0,0 +1,180 @@
+"""
+Incremental Rule Parser
+Parses a streamed LLM extraction response ({"instrument_rules": [...], "sector_rules": [...],
+"country_rules": [...], "conflicts": [...]}) chunk by chunk and emits every rule object as
+soon as it closes, so rules can be converted and shown before the completion finishes.
+Truncated responses still yield all rules that were completely received.
+
+Only the part of the response a pending rule or string still needs is buffered, so
+feeding a long response costs linear time.
+"""
+import inspect
+import json
+import os
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Stream extraction completions when a rule listener is attached (rules are emitted as they close)
+LLM_STREAMING_ENABLED = os.getenv("LLM_STREAMING_ENABLED", "true").lower() == "true"
+
+RULE_KEYS = ("instrument_rules", "sector_rules", "country_rules")
+
+# Control characters (except \n, \r, \t) are not allowed in JSON
+_CONTROL_CHARS = re.compile(r'[\x00-\x08\x0B\x0C\x0E-\x1F]')
+
+RuleListener = Callable[[str, Dict[str, Any]], Any]
+
+# Field naming the subject of each rule type (the rule identity is type, subject and allowed)
+RULE_SUBJECT_FIELDS = {"instrument_rules": "instrument", "sector_rules": "sector", "country_rules": "country"}
+
+
+class IncrementalRuleParser:
+    """Character-level JSON scanner that tracks just enough structure to cut out rule objects"""
+
+    def __init__(self):
+        self.text = ""  # unconsumed tail of the response (from the open rule or string on)
+        self.rules: Dict[str, List[Dict[str, Any]]] = {key: [] for key in RULE_KEYS}
+        self._pos = 0
+        self._stack: List[Tuple[str, Optional[str]]] = []  # (container char, key it belongs to)
+        self._started = False
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._current_key: Optional[str] = None
+        self._rule_start: Optional[int] = None
+
+    @property
+    def rule_count(self) -> int:
+        return sum(len(rules) for rules in self.rules.values())
+
+    def feed(self, chunk: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Consume the next piece of the response.
+
+        Returns:
+            List of (rule_type, rule) pairs completed by this chunk
+        """
+        self.text += chunk
+        emitted = []
+        text = self.text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start:i]
+                continue
+
+            if not self._started:
+                # Skip anything before the top-level object (e.g. ```json fences)
+                if ch == "{":
+                    self._started = True
+                    self._stack.append(("{", None))
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i + 1
+            elif ch == ":":
+                if self._stack and self._stack[-1][0] == "{":
+                    self._current_key = self._last_string
+            elif ch == "[":
+                key = self._current_key if len(self._stack) == 1 else None
+                self._stack.append(("[", key))
+            elif ch == "{":
+                if len(self._stack) == 2 and self._stack[-1][0] == "[" and self._stack[-1][1] in RULE_KEYS:
+                    self._rule_start = i
+                self._stack.append(("{", None))
+            elif ch in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if ch == "}" and self._rule_start is not None and len(self._stack) == 2:
+                    rule_type = self._stack[-1][1]
+                    rule = self._parse_rule(text[self._rule_start:i + 1])
+                    self._rule_start = None
+                    if rule is not None:
+                        self.rules[rule_type].append(rule)
+                        emitted.append((rule_type, rule))
+        # Drop everything that no open rule or string refers to any more
+        if self._rule_start is not None:
+            keep = self._rule_start
+        elif self._in_string:
+            keep = self._string_start
+        else:
+            keep = len(text)
+        if keep:
+            self.text = text[keep:]
+            if self._rule_start is not None:
+                self._rule_start -= keep
+            self._string_start -= keep
+        self._pos = len(self.text)
+        return emitted
+
+    def _parse_rule(self, segment: str) -> Optional[Dict[str, Any]]:
+        try:
+            rule = json.loads(_CONTROL_CHARS.sub("", segment))
+        except json.JSONDecodeError as e:
+            logger.debug(f"Skipping unparseable streamed rule: {e}")
+            return None
+        return rule if isinstance(rule, dict) else None
+
+    def partial_result(self) -> Dict[str, Any]:
+        """All complete rules received so far, in the extraction response shape"""
+        return {
+            "sector_rules": list(self.rules["sector_rules"]),
+            "country_rules": list(self.rules["country_rules"]),
+            "instrument_rules": list(self.rules["instrument_rules"]),
+            "conflicts": []
+        }
+
+
+def salvage_rules(raw: str) -> Optional[Dict[str, Any]]:
+    """Recover the complete rules from a truncated/invalid response, or None if there are none"""
+    parser = IncrementalRuleParser()
+    parser.feed(raw or "")
+    return parser.partial_result() if parser.rule_count else None
+
+
+def rule_identity(rule_type: str, rule: Dict[str, Any]) -> Tuple[str, str, Any]:
+    """(rule type, normalized subject, allowed) - equal for the same rule extracted twice"""
+    subject = rule.get(RULE_SUBJECT_FIELDS.get(rule_type, ""), "")
+    return rule_type, " ".join(str(subject).lower().split()), rule.get("allowed")
+
+
+def dedupe_rules(on_rule: RuleListener) -> RuleListener:
+    """
+    Wrap a listener so each rule reaches it once per job. Retried calls, section retries
+    and re-routed providers stream the same rules again; only new ones are passed on.
+    """
+    seen = set()
+
+    async def listener(rule_type: str, rule: Dict[str, Any]) -> None:
+        identity = rule_identity(rule_type, rule)
+        if identity in seen:
+            return
+        seen.add(identity)
+        result = on_rule(rule_type, rule)
+        if inspect.isawaitable(result):
+            await result
+
+    return listener
+
+
+async def notify_rule(on_rule: Optional[RuleListener], rule_type: str, rule: Dict[str, Any]) -> None:
+    """Call a (sync or async) rule listener; listener errors never break extraction"""
+    if on_rule is None:
+        return
+    try:
+        result = on_rule(rule_type, rule)
+        if inspect.isawaitable(result):
+            await result
+    except Exception as e:
+        logger.warning(f"Rule listener failed: {e}")
@@ -18,6 +18,7 @@ from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
 from .trace_handler import TraceHandler
 from ..services.rag_index import index_pdf
+from ..services.job_budget import stage_allowed, JOB_MIN_INDEXING_SECONDS
 from .logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -355,15 +356,19 @@ class FileHandler:
             # Index chunks for RAG retrieval (chunks_path already set from streaming)
             trace_dir = self.trace_handler.get_trace_dir(trace_id)
             clean_text_path = os.path.join(trace_dir, "20_clean_text.txt")
-            vectordb_dir = "var/chroma"
+            vectordb_dir = os.getenv("RAG_VECTORDB_DIR", "var/chroma")
             
             # Perform RAG indexing (reads from disk, doesn't keep everything in memory)
-            rag_results = index_pdf(
-                clean_text_path=clean_text_path,
-                chunks_path=chunks_path,
-                vectordb_dir=vectordb_dir,
-                doc_id=trace_id
-            )
+            # Optional stage: skipped when the job budget is already short
+            if stage_allowed("indexing", JOB_MIN_INDEXING_SECONDS):
+                rag_results = index_pdf(
+                    clean_text_path=clean_text_path,
+                    chunks_path=chunks_path,
+                    vectordb_dir=vectordb_dir,
+                    doc_id=trace_id
+                )
+            else:
+                rag_results = {"success": False, "indexed": 0, "skipped": "job budget"}
             
             # Save RAG indexing results
             await self.trace_handler.save_rag_index(trace_id, rag_results)
@@ -78,6 +78,16 @@ class TraceHandler:
         
         return chunks_path
     
+    async def save_section_prescreen(self, trace_id: str, audit: Dict[str, Any]) -> str:
+        """Save 32_section_prescreen.json with section scores and skipped sections"""
+        trace_dir = self.get_trace_dir(trace_id)
+        prescreen_path = os.path.join(trace_dir, "32_section_prescreen.json")
+        
+        async with aiofiles.open(prescreen_path, 'w', encoding='utf-8') as f:
+            await f.write(json.dumps(audit, indent=2, ensure_ascii=False))
+        
+        return prescreen_path
+    
     async def save_llm_prompt(self, trace_id: str, prompt_data: Dict[str, Any]) -> str:
         """Save 40_llm_prompt.json with exact LLM messages"""
         trace_dir = self.get_trace_dir(trace_id)
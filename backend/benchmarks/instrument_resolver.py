@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the instrument → OCRD resolver (app/services/instrument_resolver.py).
+
+Usage (from the backend directory):
+    python benchmarks/instrument_resolver.py          # 2000 rounds
+    python benchmarks/instrument_resolver.py 10000
+
+Times the resolution of one instrument rule (section, direct German key, flexible key
+match) with the previous inline implementation, with cold caches and with warm caches,
+and the whole _convert_llm_response_to_ocrd_format call per rule for comparison. The
+previous implementation is kept here only as the baseline and for the equivalence
+check in test_instrument_resolver.py.
+"""
+import logging
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.analysis_service import AnalysisService  # noqa: E402
+from app.services import instrument_resolver  # noqa: E402
+from app.services.instrument_resolver import direct_ocrd_key, match_section_key, resolve_section  # noqa: E402
+
+INSTRUMENTS = [
+    "Aktien", "Stammaktien", "Vorzugsaktien", "Anleihen", "Pfandbriefe", "Covered Bonds",
+    "Asset-Backed Securities", "Commercial Paper", "Geldmarktinstrumente", "Aktienfonds",
+    "Money market funds", "Equity futures", "Equity Index Futures", "Aktienoptionen",
+    "Equity index options", "Interest rate futures (bond and money market)", "Zinsfutures",
+    "Currency options", "FX forwards", "Devisentermingeschäfte", "Credit Default Swaps",
+    "Total return swaps", "Commodity certificates", "Index certificates", "Optionsscheine",
+    "Stock warrants", "Edelmetalle", "Rohstoffe", "Bezugsrechte", "REITs",
+]
+
+
+# Previous implementation (inline in AnalysisService._convert_llm_response_to_ocrd_format),
+# kept only as the baseline for test_instrument_resolver.py and the timing below
+
+LEGACY_INSTRUMENT_MAPPING = {
+    # Generic terms (English)
+    "bonds": "bond",
+    "bond": "bond",
+    "equities": "stock",
+    "equity": "stock",
+    "stocks": "stock",
+    "stock": "stock",
+    "funds": "fund",
+    "fund": "fund",
+    "derivatives": "future",  # Map derivatives to future section (default)
+    "derivative": "future",  # Map derivative to future section (default)
+    "options": "option",
+    "option": "option",
+    "futures": "future",
+    "future": "future",
+    "warrants": "warrant",
+    "warrant": "warrant",
+    "commodities": "commodity",
+    "commodity": "commodity",
+    "forex": "forex",
+    "swaps": "swap",
+    "swap": "swap",
+    # Generic terms (German)
+    "anleihen": "bond",
+    "renten": "bond",
+    "rentenquote": "bond",
+    "aktien": "stock",
+    "stammaktien": "stock",
+    "vorzugsaktien": "stock",
+    "fonds": "fund",
+    "aktienfonds": "fund",
+    "rentenfonds": "fund",
+    "geldmarktfonds": "fund",
+    "derivate": "future",
+    "optionen": "option",
+    "futures": "future",
+    "scheine": "warrant",
+    "warrants": "warrant",
+    "rohstoffe": "commodity",
+    "währung": "forex",
+    "devisen": "forex",
+    "swaps": "swap",
+    # Money market instruments (German)
+    "geldmarktinstrumente": "deposit",
+    "geldmarktprodukte": "deposit",
+    "geldmarkt": "deposit",
+    # Specific bond types (English)
+    "covered bond": "bond",
+    "covered_bond": "bond",
+    "asset backed security": "bond",
+    "asset_backed_security": "bond",
+    "asset-backed security": "bond",
+    "mortgage bond": "bond",
+    "mortgage_bond": "bond",
+    "mortgage-bond": "bond",
+    "pfandbrief": "bond",
+    "pfandbriefe": "bond",
+    "convertible bond": "bond",
+    "convertible_bond": "bond",
+    "commercial paper": "bond",
+    "commercial_paper": "bond",
+    # Specific bond types (German)
+    "staatsanleihen": "bond",
+    "corporate bonds": "bond",
+    "corporate_bonds": "bond",
+    "schatzanweisungen": "bond",
+    "bezugsrechte": "right",
+    "subscription rights": "right",
+    "subscription_rights": "right",
+    # Specific stock types (English)
+    "common stock": "stock",
+    "common_stock": "stock",
+    "preferred stock": "stock",
+    "preferred_stock": "stock",
+    # Specific stock types (German)
+    "stammaktien": "stock",
+    "common_stock": "stock",
+    # Specific fund types (English)
+    "equity fund": "fund",
+    "equity_fund": "fund",
+    "fixed income fund": "fund",
+    "fixed_income_fund": "fund",
+    "money market fund": "fund",
+    "moneymarket_fund": "fund",
+    # Specific fund types (German)
+    "aktienfonds": "fund",
+    "rentenfonds": "fund",
+    "geldmarktfonds": "fund",
+    # Swaps (German)
+    "zinsswaps": "swap",
+    "interest swap": "swap",
+    "interest_swap": "swap",
+    "credit default swap": "swap",
+    "credit_default_swap": "swap",
+    "total return swap": "swap",
+    "total_return_swap": "swap",
+    # Forex (German)
+    "devisentermingeschäfte": "forex",
+    "fx forward": "forex",
+    "fx_forward": "forex",
+    "forex_outright": "forex",
+    "forex_spot": "forex",
+    "currency futures": "forex",
+    "currency_futures": "forex",
+}
+
+LEGACY_GERMAN_TO_OCRD = {
+    "stammaktien": "common_stock",
+    "common stock": "common_stock",
+    "vorzugsaktien": "preferred_stock",
+    "preferred stock": "preferred_stock",
+    "geldmarktinstrumente": "call_money",  # or time_deposit, cash
+    "geldmarktprodukte": "call_money",
+    "money market": "call_money",
+    "credit default swap": "credit_default_swap",
+    "credit-default-swap": "credit_default_swap",
+    "interest swap": "interest_swap",
+    "zinsswap": "interest_swap",
+    "total return swap": "total_return_swap",
+    "fx forward": "forex_outright",
+    "forex forward": "forex_outright",
+    "devisentermingeschäft": "forex_outright",
+    "currency future": "forex_spot",
+    "devisenfuture": "forex_spot",
+    "bezugsrecht": "subscription_rights",
+    "subscription right": "subscription_rights",
+    "edelmetall": "precious_metal",
+    "precious metal": "precious_metal",
+    # Equity derivatives (critical for matching)
+    "equity future": "single_stock_future",
+    "equity futures": "single_stock_future",
+    "aktienfutures": "single_stock_future",
+    "equity index future": "index_future",
+    "equity index futures": "index_future",
+    "aktienindexfutures": "index_future",
+    "equity option": "stock_option",
+    "equity options": "stock_option",
+    "aktienoptionen": "stock_option",
+    "equity index option": "index_option",
+    "equity index options": "index_option",
+    "aktienindexoptionen": "index_option",
+    # Interest rate futures (critical for correct classification)
+    "interest rate future": "bond_future",
+    "interest rate futures": "bond_future",
+    "interest-rate future": "bond_future",
+    "interest-rate futures": "bond_future",
+    "zinsfutures": "bond_future",
+    "zinsfuture": "bond_future",
+    "zins futures": "bond_future",
+    "zins future": "bond_future",
+    "rentenfutures": "bond_future",
+    "rentenfuture": "bond_future",
+    "renten futures": "bond_future",
+    "renten future": "bond_future",
+    "geldmarktfutures": "bond_future",
+    "geldmarktfuture": "bond_future",
+    "geldmarkt futures": "bond_future",
+    "geldmarkt future": "bond_future",
+    "bond future": "bond_future",
+    "bond futures": "bond_future",
+    "money market future": "bond_future",
+    "money market futures": "bond_future",
+    # Handle German compound terms that might be extracted separately
+    "zinsfutures renten und geldmarktfutures": "bond_future",
+    "zinsfutures renten geldmarktfutures": "bond_future",
+}
+
+
+def legacy_normalize(name):
+    if not name:
+        return ""
+    normalized = name.lower().strip()
+    normalized = normalized.replace("-", " ")
+    normalized = normalized.replace("_", " ")
+    normalized = re.sub(r"\([^)]*\)", "", normalized)
+    normalized = re.sub(r"\bfx\b", "forex", normalized)
+    normalized = re.sub(r"\bfx(?=\s)", "forex", normalized)
+    normalized = re.sub(r"\bfx(?=[a-z])", "forex", normalized)
+    normalized = normalized.replace("foreign exchange", "forex")
+    normalized = re.sub(r"\s+", " ", normalized)
+    return normalized.strip()
+
+
+def legacy_resolve_section(instrument_lower, instrument_normalized):
+    # First try exact match
+    lookup_candidates = [instrument_lower, instrument_lower.replace(" ", "_"), instrument_normalized]
+    section = None
+    for candidate in lookup_candidates:
+        if candidate in LEGACY_INSTRUMENT_MAPPING:
+            section = LEGACY_INSTRUMENT_MAPPING[candidate]
+            break
+    if not section and instrument_normalized:
+        section = LEGACY_INSTRUMENT_MAPPING.get(instrument_normalized)
+
+    # If no exact match, try partial matching
+    if not section:
+        for key, value in LEGACY_INSTRUMENT_MAPPING.items():
+            if key in instrument_normalized or instrument_normalized in key:
+                section = value
+                break
+
+    # If still no match, try to infer from instrument name (English and German)
+    if not section:
+        instrument_lower_normalized = instrument_normalized.lower()
+        # German terms
+        if any(term in instrument_lower_normalized for term in ["anleihe", "rente", "pfandbrief", "schatzanweisung"]):
+            section = "bond"
+        elif any(term in instrument_lower_normalized for term in ["aktie", "stammaktie", "vorzugsaktie"]):
+            section = "stock"
+        elif any(term in instrument_lower_normalized for term in ["fonds", "aktienfonds", "rentenfonds", "geldmarktfonds"]):
+            section = "fund"
+        elif any(term in instrument_lower_normalized for term in ["option", "optionen"]):
+            section = "option"
+        elif any(term in instrument_lower_normalized for term in ["future", "futures"]):
+            section = "future"
+        elif any(term in instrument_lower_normalized for term in ["warrant", "schein", "scheine"]):
+            section = "warrant"
+        elif any(term in instrument_lower_normalized for term in ["swap", "swaps", "zinsswap"]):
+            section = "swap"
+        elif any(term in instrument_lower_normalized for term in ["rohstoff", "commodity", "edelmetall"]):
+            section = "commodity"
+        elif any(term in instrument_lower_normalized for term in ["forex", "währung", "devisen", "currency"]):
+            section = "forex"
+        elif any(term in instrument_lower_normalized for term in ["geldmarkt", "money market", "deposit", "kasse", "bankguthaben"]):
+            section = "deposit"
+        elif any(term in instrument_lower_normalized for term in ["bezugsrecht", "subscription right", "right"]):
+            section = "rights"
+        # English terms (fallback)
+        elif "bond" in instrument_lower_normalized:
+            section = "bond"
+        elif "stock" in instrument_lower_normalized or "equity" in instrument_lower_normalized:
+            section = "stock"
+        elif "fund" in instrument_lower_normalized:
+            section = "fund"
+        elif "option" in instrument_lower_normalized:
+            section = "option"
+        elif "future" in instrument_lower_normalized:
+            section = "future"
+        elif "warrant" in instrument_lower_normalized:
+            section = "warrant"
+        elif "swap" in instrument_lower_normalized:
+            section = "swap"
+        elif "commodity" in instrument_lower_normalized:
+            section = "commodity"
+        elif "forex" in instrument_lower_normalized or "currency" in instrument_lower_normalized:
+            section = "forex"
+    return section
+
+
+def legacy_direct_ocrd_key(instrument_normalized):
+    return LEGACY_GERMAN_TO_OCRD.get(instrument_normalized.lower().strip())
+
+
+def legacy_matches_flexibly(instrument_str: str, instrument_word_set: set, key_str: str, key_word_set: set) -> bool:
+    """Check if instrument matches key with flexible word matching"""
+    # Exact match
+    if instrument_str == key_str:
+        return True
+
+    # One contains the other (handles "commodity certificate" -> "commodity_certificate")
+    if instrument_str in key_str or key_str in instrument_str:
+        return True
+
+    # Word-based matching: check if all significant words from instrument are in key
+    # Significant words are those with 3+ characters (skip "the", "a", "an", etc.)
+    significant_instrument_words = {w for w in instrument_word_set if len(w) >= 3}
+    significant_key_words = {w for w in key_word_set if len(w) >= 3}
+
+    # Special handling for equity derivatives:
+    # "equity future" / "equity futures" should match "single_stock_future"
+    # "equity option" / "equity options" should match "stock_option"
+    # "equity index future" should match "index_future"
+    # "equity index option" should match "index_option"
+    # CRITICAL: Any variant of "index future" (equity index future, etc.) should match "index_future"
+    # CRITICAL: Any variant of "index option" (equity index option, etc.) should match "index_option"
+    equity_derivative_mappings = {
+        ("equity", "future"): ("single", "stock", "future"),
+        ("equity", "futures"): ("single", "stock", "future"),
+        ("equity", "option"): ("stock", "option"),
+        ("equity", "options"): ("stock", "option"),
+        ("equity", "index", "future"): ("index", "future"),
+        ("equity", "index", "futures"): ("index", "future"),
+        ("equity", "index", "option"): ("index", "option"),
+        ("equity", "index", "options"): ("index", "option"),
+    }
+    instrument_tuple = tuple(sorted(significant_instrument_words))
+    if instrument_tuple in equity_derivative_mappings:
+        expected_key_words = set(equity_derivative_mappings[instrument_tuple])
+        if expected_key_words.issubset(significant_key_words):
+            return True
+
+    # CRITICAL FIX: Handle any variant of index future/option matching to base category
+    # If instrument contains "index" and "future" (or "futures"), and key is "index_future", match it
+    # If instrument contains "index" and "option" (or "options"), and key is "index_option", match it
+    # This ensures "equity index future" -> "index_future" and "equity index option" -> "index_option"
+    has_index = "index" in significant_instrument_words
+    has_future = "future" in significant_instrument_words or "futures" in significant_instrument_words
+    has_option = "option" in significant_instrument_words or "options" in significant_instrument_words
+
+    # Check if key is index_future
+    is_index_future = "index" in significant_key_words and "future" in significant_key_words
+    # Check if key is index_option
+    is_index_option = "index" in significant_key_words and "option" in significant_key_words
+
+    # Match any variant of index future to index_future
+    if has_index and has_future and is_index_future:
+        return True
+
+    # Match any variant of index option to index_option
+    if has_index and has_option and is_index_option:
+        return True
+
+    # Special handling for interest rate futures:
+    # "interest rate future" / "interest rate futures" / "zinsfutures" should match "bond_future"
+    # "rentenfutures" / "geldmarktfutures" should match "bond_future"
+    # Also handle "Interest rate futures (bond and money market)" -> "bond_future"
+    interest_rate_future_terms = {"interest", "rate", "zins", "renten", "geldmarkt", "bond", "money", "market"}
+    bond_future_terms = {"bond", "future"}
+
+    # Check if instrument contains interest rate future terms AND future/futures
+    has_interest_rate_terms = bool(interest_rate_future_terms & significant_instrument_words)
+    has_future_term = "future" in significant_instrument_words or "futures" in significant_instrument_words
+
+    # Check if key is bond_future
+    is_bond_future = bond_future_terms.issubset(significant_key_words)
+
+    if has_interest_rate_terms and has_future_term and is_bond_future:
+        return True
+
+    # Also check if instrument contains "bond" and "future" together (for "bond future" variations)
+    if "bond" in significant_instrument_words and has_future_term and is_bond_future:
+        return True
+
+    # If all significant instrument words are in key words, it's a match
+    # E.g., "commodity certificate" -> ["commodity", "certificate"] both in "commodity_certificate"
+    if significant_instrument_words and significant_instrument_words.issubset(significant_key_words):
+        return True
+
+    # Reverse: if all significant key words are in instrument words
+    if significant_key_words and significant_key_words.issubset(significant_instrument_words):
+        return True
+
+    # Partial overlap: if at least 1 significant word matches (reduced from 2 for better matching)
+    # This helps match "equity future" -> "single_stock_future" (both have "future")
+    # E.g., "certificate" should match "commodity_certificate" if certificate is the main word
+    overlap = significant_instrument_words & significant_key_words
+    if len(overlap) >= min(1, len(significant_instrument_words), len(significant_key_words)):
+        # Additional check: if one word matches and it's a key term (future, option, etc.)
+        key_terms = {"future", "futures", "option", "options", "warrant", "warrants", "stock", "equity", "index"}
+        if overlap & key_terms:  # If overlap contains any key term
+            return True
+
+    return False
+
+
+def legacy_match_section_key(instrument_normalized, keys):
+    instrument_words = set(instrument_normalized.split())
+    for key in keys:
+        key_normalized = key.replace("_", " ").replace("-", " ")
+        key_words = set(key_normalized.split())
+        if legacy_matches_flexibly(instrument_normalized, instrument_words, key_normalized, key_words):
+            if instrument_normalized == key_normalized:
+                confidence = 0.9
+            elif instrument_normalized in key_normalized or key_normalized in instrument_normalized:
+                confidence = 0.7
+            else:
+                confidence = 0.5
+            return key, confidence
+    return None
+
+
+
+def resolve(svc, sections, name):
+    normalized = svc._normalize_instrument_name(name)
+    section = resolve_section(name.lower(), normalized)
+    if section not in sections:
+        return None
+    keys = tuple(key for key in sections[section] if key != "special_other_restrictions")
+    return direct_ocrd_key(normalized) or match_section_key(normalized, keys)
+
+
+def legacy_resolve(sections, name):
+    normalized = legacy_normalize(name)
+    section = legacy_resolve_section(name.lower(), normalized)
+    if section not in sections:
+        return None
+    keys = tuple(key for key in sections[section] if key != "special_other_restrictions")
+    return legacy_direct_ocrd_key(normalized) or legacy_match_section_key(normalized, keys)
+
+
+def clear_caches():
+    for cached in (instrument_resolver.normalize_instrument_name, resolve_section, match_section_key,
+                   instrument_resolver.key_profile, instrument_resolver.instrument_profile):
+        cached.cache_clear()
+
+
+def main(rounds):
+    logging.disable(logging.CRITICAL)
+    svc = AnalysisService.__new__(AnalysisService)
+    svc.excel_mapping = None
+    sections = svc._create_empty_ocrd_json("bench")["sections"]
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        clear_caches()
+        for name in INSTRUMENTS:
+            resolve(svc, sections, name)
+    cold = (time.perf_counter() - started) / (rounds * len(INSTRUMENTS))
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for name in INSTRUMENTS:
+            resolve(svc, sections, name)
+    warm = (time.perf_counter() - started) / (rounds * len(INSTRUMENTS))
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for name in INSTRUMENTS:
+            legacy_resolve(sections, name)
+    legacy = (time.perf_counter() - started) / (rounds * len(INSTRUMENTS))
+
+    rules = [{"instrument": name, "allowed": True, "reason": "Laut Anlagebedingungen zulässig"} for name in INSTRUMENTS]
+    response = {"instrument_rules": rules, "sector_rules": [], "country_rules": []}
+    conversions = max(1, rounds // 100)
+    started = time.perf_counter()
+    for _ in range(conversions):
+        svc._convert_llm_response_to_ocrd_format(response, full_text="")
+    convert = (time.perf_counter() - started) / (conversions * len(INSTRUMENTS))
+
+    print(f"previous resolution per rule:      {legacy * 1e6:8.1f} µs")
+    print(f"resolution per rule (cold caches): {cold * 1e6:8.1f} µs")
+    print(f"resolution per rule (warm caches): {warm * 1e6:8.1f} µs")
+    print(f"full conversion per rule:          {convert * 1e6:8.1f} µs")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
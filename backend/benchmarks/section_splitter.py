@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the section splitter (find_section_boundaries) against the previous
+line-by-line implementation, on synthetic 1-5 MB prospectus texts.
+
+Usage (from the backend directory):
+    python benchmarks/section_splitter.py            # 1, 2, 3, 4 and 5 MB
+    python benchmarks/section_splitter.py 1 10       # custom sizes in MB
+
+The previous implementation rebuilt the text prefix for every header line
+(len('\\n'.join(lines[:i]))) and tried up to eight regexes per line; it is kept here
+only as the baseline and to check that both give the same boundaries.
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.analysis_service import AnalysisService, find_section_boundaries  # noqa: E402
+
+LEGACY_PATTERNS = [
+    r'(?i)^\s*(Zulässige\s+Anlagen?|Zulässige\s+Anlageinstrumente?)',
+    r'(?i)^\s*(Unzulässige\s+Anlagen?|Unzulässige\s+Anlageinstrumente?)',
+    r'(?i)^\s*(Erlaubte\s+Anlagen?|Erlaubte\s+Instrumente?)',
+    r'(?i)^\s*(Verbotene\s+Anlagen?|Verbotene\s+Instrumente?)',
+    r'(?i)^\s*(Zugelassene\s+Anlagen?|Zugelassene\s+Instrumente?)',
+    r'^\s*\d+[\.\)]\s+[A-ZÄÖÜ][^\n]{5,100}',
+    r'^\s*[A-ZÄÖÜ][A-ZÄÖÜ\s]{5,50}:?\s*$',
+    r'^\s*[A-ZÄÖÜ][^\n]{5,100}\s*$',
+]
+
+HEADERS = [
+    "Zulässige Anlagen",
+    "  unzulässige Anlageinstrumente",
+    "Erlaubte Instrumente:",
+    "VERBOTENE ANLAGEN",
+    "{n}. Anlagegrundsätze und Anlagegrenzen",
+    "{n}) Derivative Finanzinstrumente",
+    "ALLGEMEINE ANLAGEBEDINGUNGEN:",
+    "Risikohinweise",
+]
+
+BODY = [
+    "der fonds darf bis zu 10 % des wertes in anteile an anderen investmentvermögen anlegen.",
+    "wertpapiere im sinne des § 193 kagb dürfen erworben werden, sofern sie an einer börse zugelassen sind.",
+    "derivate dürfen nur zu absicherungszwecken eingesetzt werden; leerverkäufe sind nicht zulässig.",
+    "\tgeldmarktinstrumente und bankguthaben bis zu 49 % des fondsvermögens.",
+    "",
+    "  - rohstoffe, edelmetalle und zertifikate darauf sind ausgeschlossen. ",
+    "Die Gesellschaft kann Wertpapierdarlehen gewähren.\r",
+]
+
+
+def legacy_boundaries(text):
+    lines = text.split('\n')
+    section_boundaries = [0]
+    for i, line in enumerate(lines):
+        for pattern in LEGACY_PATTERNS:
+            if re.search(pattern, line):
+                char_pos = len('\n'.join(lines[:i]))
+                if char_pos > section_boundaries[-1] + 1000:
+                    section_boundaries.append(char_pos)
+                break
+    section_boundaries.append(len(text))
+    return section_boundaries
+
+
+def synthetic_text(size, seed=0):
+    rng = random.Random(seed)
+    lines = []
+    length = 0
+    n = 1
+    while length < size:
+        if rng.random() < 0.04:
+            line = rng.choice(HEADERS).format(n=n)
+            n += 1
+        else:
+            line = rng.choice(BODY)
+        lines.append(line)
+        length += len(line) + 1
+    return '\n'.join(lines)
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def main(sizes_mb):
+    splitter = AnalysisService.__new__(AnalysisService)
+    print(f"{'size':>6} {'headers':>8} {'legacy':>10} {'boundaries':>11} {'split':>9}")
+    for mb in sizes_mb:
+        text = synthetic_text(int(mb * 1024 * 1024), seed=int(mb * 10))
+        expected, legacy_time = timed(legacy_boundaries, text)
+        boundaries, new_time = timed(find_section_boundaries, text)
+        if boundaries != expected:
+            raise SystemExit(f"{mb} MB: boundaries differ from the previous implementation")
+        _, split_time = timed(splitter._split_document_into_sections, text)
+        print(f"{mb:>4}MB {len(boundaries) - 2:>8} {legacy_time:>9.2f}s {new_time * 1000:>9.1f}ms {split_time * 1000:>7.1f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main([float(arg) for arg in sys.argv[1:]] or [1, 2, 3, 4, 5]))
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Offline bulk analysis through provider batch endpoints (see app/services/batch_analysis.py)
+
+Usage (from the backend directory):
+    python bulk_analyze.py run --model gpt-4o docs/*.pdf          # prepare, submit, wait, collect
+    python bulk_analyze.py submit --model gpt-4o docs/*.pdf       # prepare + submit, prints the batch dir
+    python bulk_analyze.py collect var/batches/batch_20250101_0100  # wait for a submitted batch, collect
+
+Inputs are PDFs (text extracted like uploads) or .txt / .md files; the fund id is
+the file name without extension. Results are written to <batch dir>/results.json.
+Use --backend local (or BATCH_BACKEND=local) to answer the batch with the offline stub.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.services.analysis_service import AnalysisService  # noqa: E402
+from app.services.batch_analysis import BulkAnalyzer, get_batch_backend, BATCH_POLL_INTERVAL  # noqa: E402
+from app.utils.file_handler import FileHandler  # noqa: E402
+
+
+async def load_documents(paths):
+    file_handler = FileHandler()
+    documents = []
+    for path in paths:
+        fund_id = os.path.splitext(os.path.basename(path))[0]
+        if path.lower().endswith(".pdf"):
+            text = await file_handler.extract_pdf_text(path)
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        documents.append((fund_id, text))
+    return documents
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Offline bulk analysis through provider batch endpoints")
+    parser.add_argument("command", choices=["run", "submit", "collect"])
+    parser.add_argument("paths", nargs="+", help="documents (run/submit) or the batch directory (collect)")
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--provider", default="openai")
+    parser.add_argument("--backend", default=None, help="openai or local (defaults to BATCH_BACKEND)")
+    parser.add_argument("--name", default=None, help="batch name (defaults to a timestamp)")
+    parser.add_argument("--poll-interval", type=float, default=BATCH_POLL_INTERVAL)
+    args = parser.parse_args()
+
+    service = AnalysisService()
+    analyzer = BulkAnalyzer(service, get_batch_backend(service.llm_service, args.backend))
+
+    if args.command == "collect":
+        batch_dir = args.paths[0]
+    else:
+        documents = await load_documents(args.paths)
+        batch_dir = analyzer.prepare(documents, args.provider, args.model, args.name)
+        await analyzer.submit(batch_dir)
+        if args.command == "submit":
+            print(batch_dir)
+            return 0
+
+    status = await analyzer.wait(batch_dir, args.poll_interval)
+    results = await analyzer.collect(batch_dir, status)
+    for result in results:
+        if "error" in result:
+            print(f"{result['fund_id']}: failed - {result['error']}")
+        else:
+            print(f"{result['fund_id']}: {result['allowed_instruments']}/{result['total_instruments']} allowed, confidence {result['confidence_score']}")
+    print(os.path.join(batch_dir, "results.json"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
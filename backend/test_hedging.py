@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Test script for hedged LLM requests
+Checks the percentile hedge delay, the hedge budget and that the losing attempt is cancelled
+"""
+
+import sys
+import os
+import asyncio
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.hedging import RequestHedger, size_bucket
+
+KEY = ("gpt-test", 1024)
+
+
+def make_hedger(**kwargs):
+    options = {"enabled": True, "percentile": 90, "min_samples": 10, "min_delay": 0.01, "budget": 1.0}
+    options.update(kwargs)
+    return RequestHedger(**options)
+
+
+def test_hedge_delay_needs_history():
+    """No hedging before min_samples latencies, then the configured percentile"""
+    print("Testing hedge delay...")
+    hedger = make_hedger()
+    for latency in range(1, 10):
+        hedger.record(KEY, latency / 100)
+    assert hedger.hedge_delay(KEY) is None
+    hedger.record(KEY, 0.10)
+    assert hedger.hedge_delay(KEY) == 0.09, hedger.hedge_delay(KEY)
+    assert make_hedger(min_delay=5).hedge_delay(KEY) is None
+    assert size_bucket(100) == 1024 and size_bucket(3000) == 4096
+    print(f"  p90 of 10 samples: {hedger.hedge_delay(KEY)}s")
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    """A hedge is sent when the primary is slow; the first valid answer wins, the other is cancelled"""
+    print("Testing hedged request...")
+    hedger = make_hedger()
+    for _ in range(10):
+        hedger.record(KEY, 0.01)
+    attempts = []
+    cancelled = []
+
+    async def call():
+        attempt = len(attempts)
+        attempts.append(attempt)
+        try:
+            await asyncio.sleep(1.0 if attempt == 0 else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(attempt)
+            raise
+        return f"answer {attempt}"
+
+    async def run():
+        result = await hedger.run(KEY, call, lambda r: True)
+        await asyncio.sleep(0)  # let the cancellation reach the loser
+        return result
+
+    assert asyncio.run(run()) == "answer 1"
+    assert cancelled == [0], cancelled
+    stats = hedger.stats()
+    assert stats["hedges"] == 1 and stats["hedge_wins"] == 1, stats
+    print("  Hedge won, slow primary cancelled")
+
+
+def test_invalid_hedge_result_is_ignored():
+    """An invalid fast answer does not win over a valid slower one"""
+    print("Testing invalid hedge result...")
+    hedger = make_hedger()
+    for _ in range(10):
+        hedger.record(KEY, 0.01)
+    attempts = []
+
+    async def call():
+        attempt = len(attempts)
+        attempts.append(attempt)
+        await asyncio.sleep(0.05 if attempt == 0 else 0.0)
+        return "valid" if attempt == 0 else "not json"
+
+    assert asyncio.run(hedger.run(KEY, call, lambda r: r == "valid")) == "valid"
+    assert hedger.stats()["hedge_wins"] == 0
+    print("  Valid primary answer kept")
+
+
+def test_budget_limits_hedges():
+    """With budget 0 only the one hedge of burst allowance is sent"""
+    print("Testing hedge budget...")
+    hedger = make_hedger(budget=0.0)
+    for _ in range(50):
+        hedger.record(KEY, 0.01)
+
+    async def call():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def run():
+        for _ in range(3):
+            await hedger.run(KEY, call, lambda r: True)
+
+    asyncio.run(run())
+    stats = hedger.stats()
+    assert stats["hedges"] == 1 and stats["budget_denied"] == 2, stats
+    print(f"  {stats['hedges']} hedge, {stats['budget_denied']} denied")
+
+
+def test_caller_cancellation_cancels_attempts():
+    """Cancelling the caller (job budget, wait_for) cancels every running attempt"""
+    print("Testing caller cancellation...")
+    hedger = make_hedger()
+    for _ in range(10):
+        hedger.record(KEY, 0.01)
+    cancelled = []
+
+    async def call():
+        try:
+            await asyncio.sleep(1.0)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+        return "late"
+
+    async def run():
+        try:
+            await asyncio.wait_for(hedger.run(KEY, call, lambda r: True), timeout=0.1)
+        except asyncio.TimeoutError:
+            pass
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert len(cancelled) == 2, cancelled
+    print("  Primary and hedge cancelled")
+
+
+def main():
+    test_hedge_delay_needs_history()
+    test_slow_primary_is_hedged_and_cancelled()
+    test_invalid_hedge_result_is_ignored()
+    test_budget_limits_hedges()
+    test_caller_cancellation_cancels_attempts()
+    print("\nAll hedging tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test script for the precompiled instrument → OCRD resolver
+Checks that normalization, section resolution and key matching give the same answers as the
+previous inline implementation (kept in benchmarks/instrument_resolver.py) for every OCRD section
+"""
+
+import sys
+import os
+import random
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.models.ocrd_taxonomy import OCRD_SCHEMA
+from app.services.instrument_resolver import direct_ocrd_key, match_section_key, normalize_instrument_name, resolve_section
+from benchmarks.instrument_resolver import (
+    INSTRUMENTS, LEGACY_GERMAN_TO_OCRD, LEGACY_INSTRUMENT_MAPPING,
+    legacy_direct_ocrd_key, legacy_match_section_key, legacy_normalize, legacy_resolve_section
+)
+
+VARIANTS = [
+    "", "  Aktien  ", "FX Forwards", "fx-swaps", "FXoptions", "Foreign Exchange Forwards",
+    "Interest rate futures (bond and money market)", "Equity-Index-Futures", "equity_index_options",
+    "Zinsfutures, Renten- und Geldmarktfutures", "Devisentermingeschäfte", "Bankguthaben",
+    "Kasse", "Subscription rights", "Right issues", "Gratisaktien", "Optionsscheine auf Aktien",
+    "Certificates on commodities", "Währungsoptionen", "ABS", "Hedge funds", "Sonstiges",
+]
+
+
+def instrument_names():
+    """Table keys, OCRD keys, known instrument names, variants and random word combinations"""
+    names = set(VARIANTS) | set(INSTRUMENTS) | set(LEGACY_INSTRUMENT_MAPPING) | set(LEGACY_GERMAN_TO_OCRD)
+    for keys in OCRD_SCHEMA.values():
+        for key in keys:
+            names.update((key, key.replace("_", " "), key.replace("_", "-").title()))
+    words = sorted({word for name in names for word in name.replace("_", " ").split()})
+    rng = random.Random(49)
+    for _ in range(1500):
+        names.add(" ".join(rng.sample(words, rng.randint(1, 3))))
+    return sorted(names)
+
+
+def test_normalization_matches_legacy():
+    print("Testing name normalization...")
+    names = instrument_names()
+    for name in names:
+        assert normalize_instrument_name(name) == legacy_normalize(name), name
+    print(f"  {len(names)} names normalized identically")
+
+
+def test_section_resolution_matches_legacy():
+    print("Testing section resolution...")
+    names = instrument_names()
+    for name in names:
+        normalized = legacy_normalize(name)
+        expected = legacy_resolve_section(name.lower(), normalized)
+        assert resolve_section(name.lower(), normalized) == expected, (name, expected)
+    print(f"  {len(names)} names resolved to the same section")
+
+
+def test_key_matching_matches_legacy():
+    print("Testing key matching in every section...")
+    names = instrument_names()
+    checked = 0
+    for keys in OCRD_SCHEMA.values():
+        keys = tuple(keys)
+        for name in names:
+            normalized = legacy_normalize(name)
+            assert direct_ocrd_key(normalized) == legacy_direct_ocrd_key(normalized), name
+            assert match_section_key(normalized, keys) == legacy_match_section_key(normalized, keys), (name, keys)
+            checked += 1
+    print(f"  {checked} name/section pairs matched identically")
+
+
+def main():
+    test_normalization_matches_legacy()
+    test_section_resolution_matches_legacy()
+    test_key_matching_matches_legacy()
+    print("\nAll instrument resolver tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test script for the per-job time budget
+Checks stage timeouts, skipped optional stages, calls cut at the deadline and per-task isolation
+"""
+
+import sys
+import os
+import asyncio
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.job_budget import (
+    JobBudget, JobBudgetExceeded, current_budget, stage_allowed, stage_timeout, start_job_budget, within_budget
+)
+
+
+def test_stage_timeout():
+    """A stage gets its cap, or its share of the time left if that is smaller"""
+    print("Testing stage timeouts...")
+    budget = JobBudget(seconds=100, reserve=10)
+    assert budget.timeout("sections", 30) == 30
+    assert 80 < budget.timeout("sections", 300) <= 90
+    assert 26 < budget.timeout("excel_search", 300, share=0.3) <= 27
+    assert stage_timeout("sections", 30) == 30  # no job budget in this context
+    print("  Cap, time left and share respected")
+
+
+def test_optional_stage_is_skipped():
+    """An optional stage needing more time than is left is skipped and noted"""
+    print("Testing skipped stage...")
+
+    async def job():
+        budget = start_job_budget("job-1", seconds=60)
+        assert stage_allowed("fallback", 10)
+        assert not stage_allowed("indexing", 300)
+        return budget
+
+    budget = asyncio.run(job())
+    assert budget.skipped == ["indexing"], budget.skipped
+    assert "skipped indexing" in budget.note()
+    print(f"  {budget.note()}")
+
+
+def test_call_cut_at_deadline():
+    """within_budget cancels a call that outlives the budget and records the stage"""
+    print("Testing deadline...")
+    cancelled = []
+
+    async def slow_call():
+        try:
+            await asyncio.sleep(1.0)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def job():
+        budget = start_job_budget("job-2", seconds=0.05)
+        budget.reserve = 0
+        try:
+            await within_budget(slow_call(), "extraction")
+        except JobBudgetExceeded:
+            pass
+        else:
+            raise AssertionError("call was not cut")
+        try:
+            await within_budget(slow_call(), "fallback")
+        except JobBudgetExceeded:
+            pass
+        return budget
+
+    budget = asyncio.run(job())
+    assert cancelled == [True], cancelled  # the second call never started
+    assert budget.cut == ["extraction", "fallback"], budget.cut
+    print(f"  cut short: {budget.cut}")
+
+
+def test_budget_is_per_job():
+    """Concurrent jobs each see their own budget; the caller's context is untouched"""
+    print("Testing per-job isolation...")
+
+    async def job(job_id, seconds):
+        start_job_budget(job_id, seconds=seconds)
+        await asyncio.sleep(0.01)
+        return current_budget().job_id, current_budget().seconds
+
+    async def run():
+        results = await asyncio.gather(asyncio.create_task(job("a", 100)), asyncio.create_task(job("b", 200)))
+        return results, current_budget()
+
+    results, outer = asyncio.run(run())
+    assert results == [("a", 100), ("b", 200)], results
+    assert outer is None
+    print("  Each job sees its own deadline")
+
+
+def main():
+    test_stage_timeout()
+    test_optional_stage_is_skipped()
+    test_call_cut_at_deadline()
+    test_budget_is_per_job()
+    print("\nAll job budget tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test script for the lenient JSON parsing of LLM extraction responses
+Checks that repairs keep every rule and that a repair losing rules is rejected
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.json_repair import JsonRepairLossError, parse_extraction_json
+
+# Unescaped quote followed by a comma inside a string
+UNESCAPED_QUOTE_COMMA = (
+    '{"instrument_rules": ['
+    '{"instrument": "Aktien", "allowed": true, "reason": "Liste "A", B"}, '
+    '{"instrument": "Bonds", "allowed": false, "reason": "Anleihen ausgeschlossen"}], '
+    '"sector_rules": [{"sector": "Tabak", "allowed": false, "reason": "Tabak ausgeschlossen"}], '
+    '"country_rules": [], "conflicts": []}'
+)
+
+# Response cut off by max_tokens in the middle of the second rule
+TRUNCATED = (
+    '```json\n{"instrument_rules": ['
+    '{"instrument": "Aktien", "allowed": true, "reason": "Aktien: ja"}, '
+    '{"instrument": "Bonds", "allowed": false, "reas'
+)
+
+
+def test_unescaped_quote_comma_is_repaired():
+    """A quote followed by a comma inside a reason stays part of the reason - no rule is lost"""
+    print("Testing unescaped quote + comma inside a string...")
+    result = parse_extraction_json(UNESCAPED_QUOTE_COMMA, "test")
+    assert [rule["instrument"] for rule in result["instrument_rules"]] == ["Aktien", "Bonds"], result
+    assert result["instrument_rules"][0]["reason"] == 'Liste "A", B', result
+    assert [rule["sector"] for rule in result["sector_rules"]] == ["Tabak"], result
+    print(f"  Recovered all {len(result['instrument_rules']) + len(result['sector_rules'])} rules")
+
+
+def test_ambiguous_repair_is_rejected():
+    """A repair that would drop rules fails instead of returning fewer rules"""
+    print("Testing repair that cannot keep every rule...")
+    raw = '{"instrument_rules": [{"instrument": "A", "allowed": true, "reason": "say "hi", "allowed": no"}]}'
+    try:
+        result = parse_extraction_json(raw, "test")
+    except JsonRepairLossError as e:
+        print(f"  Rejected as expected: {e}")
+        return
+    raise AssertionError(f"Repair silently dropped rules: {result}")
+
+
+def test_truncated_keeps_complete_rules():
+    """A truncated response keeps every rule that was completely received"""
+    print("Testing truncated response...")
+    result = parse_extraction_json(TRUNCATED, "test")
+    assert [rule["instrument"] for rule in result["instrument_rules"]] == ["Aktien"], result
+    assert result["sector_rules"] == [] and result["country_rules"] == [], result
+    print(f"  Recovered {len(result['instrument_rules'])} complete rule")
+
+
+def test_trailing_comma_keeps_all_rules():
+    """A harmless repair (trailing comma) keeps every rule"""
+    print("Testing trailing comma...")
+    raw = '{"instrument_rules": [{"instrument": "Aktien", "allowed": true, "reason": "ja"},], "sector_rules": []}'
+    result = parse_extraction_json(raw, "test")
+    assert len(result["instrument_rules"]) == 1, result
+    print("  Repaired without losing rules")
+
+
+def main():
+    test_unescaped_quote_comma_is_repaired()
+    test_ambiguous_repair_is_rejected()
+    test_truncated_keeps_complete_rules()
+    test_trailing_comma_keeps_all_rules()
+    print("\nAll JSON repair tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test script for the persistent (SQLite) LLM response cache
+Checks the cache key, hits after a restart, LRU eviction, TTL expiry and discard
+"""
+
+import sys
+import os
+import time
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.llm_cache import LLMResponseCache, make_cache_key
+
+PARAMS = {"model": "gpt-4o", "temperature": 0, "messages": [{"role": "user", "content": "Aktien: ja"}]}
+
+
+def test_cache_key():
+    """The key covers every request parameter and the prompt version, not the dict order"""
+    print("Testing cache key...")
+    key = make_cache_key(PARAMS, "extraction-v1")
+    assert key == make_cache_key(dict(reversed(list(PARAMS.items()))), "extraction-v1")
+    assert key != make_cache_key(PARAMS, "extraction-v2")
+    assert key != make_cache_key({**PARAMS, "temperature": 1}, "extraction-v1")
+    print("  Stable across dict order, changes with version and parameters")
+
+
+def test_hit_after_reopen(directory):
+    """A stored response is served from disk by a new cache instance"""
+    print("Testing persistence...")
+    path = os.path.join(directory, "persist.sqlite3")
+    key = make_cache_key(PARAMS, "extraction-v1")
+    LLMResponseCache(path=path).set(key, '{"instrument_rules": []}', "gpt-4o", "extraction-v1")
+    cache = LLMResponseCache(path=path)
+    assert cache.get(key) == '{"instrument_rules": []}'
+    assert cache.get(make_cache_key(PARAMS, "extraction-v2")) is None
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1, stats
+    print("  Hit after reopening the database")
+
+
+def test_lru_eviction(directory):
+    """Beyond max_entries the least recently used entry is evicted"""
+    print("Testing LRU eviction...")
+    cache = LLMResponseCache(path=os.path.join(directory, "lru.sqlite3"), max_entries=2)
+    cache.set("a", "A")
+    time.sleep(0.01)
+    cache.set("b", "B")
+    time.sleep(0.01)
+    assert cache.get("a") == "A"  # a is now more recently used than b
+    time.sleep(0.01)
+    cache.set("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+    assert cache.stats()["evictions"] == 1
+    print("  Least recently used entry evicted")
+
+
+def test_ttl_and_discard(directory):
+    """Expired entries are misses; discard removes an entry (e.g. unparseable response)"""
+    print("Testing TTL and discard...")
+    cache = LLMResponseCache(path=os.path.join(directory, "ttl.sqlite3"), ttl_seconds=0.05)
+    cache.set("old", "response")
+    time.sleep(0.06)
+    assert cache.get("old") is None
+    assert cache.stats()["expired"] == 1
+    cache.set("bad", "not json")
+    cache.discard("bad")
+    assert cache.get("bad") is None
+    print("  Expired and discarded entries are misses")
+
+
+def test_disabled_cache(directory):
+    """LLM_CACHE_DISABLED: nothing is stored"""
+    print("Testing disabled cache...")
+    cache = LLMResponseCache(path=os.path.join(directory, "off.sqlite3"), enabled=False)
+    cache.set("a", "A")
+    assert cache.get("a") is None
+    assert not os.path.exists(os.path.join(directory, "off.sqlite3"))
+    print("  No reads, no writes")
+
+
+def main():
+    test_cache_key()
+    with tempfile.TemporaryDirectory() as directory:
+        test_hit_after_reopen(directory)
+        test_lru_eviction(directory)
+        test_ttl_and_discard(directory)
+        test_disabled_cache(directory)
+    print("\nAll LLM cache tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test script for the per-model circuit breaker
+Checks which errors mark a model unavailable, routing around it and the half-open probe
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.model_health import ModelHealthRegistry, is_unavailable_error, CLOSED, OPEN
+
+
+class APIStatusError(Exception):
+    def __init__(self, status_code, message="error", code=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
+
+
+class NotFoundError(Exception):
+    pass
+
+
+class CodedError(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+def test_unavailable_errors():
+    """Only status, SDK class or error code mark a model unavailable - never free text"""
+    print("Testing availability errors...")
+    assert is_unavailable_error(APIStatusError(404, "The model does not exist"))
+    assert is_unavailable_error(APIStatusError(403, "no access"))
+    assert is_unavailable_error(NotFoundError("gone"))
+    assert is_unavailable_error(CodedError("model_not_found"))
+    assert not is_unavailable_error(APIStatusError(429, "Rate limit reached"))
+    assert not is_unavailable_error(APIStatusError(500, "model not found on page 404"))
+    assert not is_unavailable_error(Exception("Error code: 404 - permission denied"))
+    print("  404/403, NotFoundError and model_not_found only")
+
+
+def test_open_circuit_routes_to_next_model():
+    """An unavailable model is skipped by route(); transient errors keep it in use"""
+    print("Testing routing around an open circuit...")
+    health = ModelHealthRegistry(cooldown=60)
+    assert not health.record_failure("gpt-a", APIStatusError(429))
+    assert health.route(["gpt-a", "gpt-b"]) == "gpt-a"
+    assert health.record_failure("gpt-a", APIStatusError(404))
+    assert health.route(["gpt-a", "gpt-b"]) == "gpt-b"
+    assert health.stats()["models"]["gpt-a"]["state"] == OPEN
+    # Every circuit open: the first model is still returned so the caller gets a real error
+    health.record_failure("gpt-b", APIStatusError(404))
+    assert health.route(["gpt-a", "gpt-b"]) == "gpt-a"
+    print("  gpt-a skipped while its circuit is open")
+
+
+def test_half_open_probe():
+    """After the cool-down exactly one probe is let through; success closes the circuit"""
+    print("Testing half-open probe...")
+    health = ModelHealthRegistry(cooldown=0.05)
+    health.record_failure("gpt-a", APIStatusError(404))
+    assert not health.is_available("gpt-a")
+    time.sleep(0.06)
+    assert health.is_available("gpt-a")
+    assert not health.is_available("gpt-a")  # only one probe at a time
+    health.record_success("gpt-a")
+    assert health.is_available("gpt-a")
+    assert health.stats()["models"]["gpt-a"]["state"] == CLOSED
+    print("  Probe passed, circuit closed")
+
+
+def test_disabled_registry():
+    """MODEL_HEALTH_DISABLED: every model stays available"""
+    print("Testing disabled registry...")
+    health = ModelHealthRegistry(enabled=False)
+    assert not health.record_failure("gpt-a", APIStatusError(404))
+    assert health.is_available("gpt-a")
+    print("  No circuit opened")
+
+
+def main():
+    test_unavailable_errors()
+    test_open_circuit_routes_to_next_model()
+    test_half_open_probe()
+    test_disabled_registry()
+    print("\nAll model health tests passed")
+
+
+if __name__ == "__main__":
+    main()
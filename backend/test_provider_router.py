@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test script for the OpenAI / Ollama provider router
+Checks route choice by expected time and context window, re-routing on errors and quota cool-down
+"""
+
+import sys
+import os
+import asyncio
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.provider_router import ProviderRouter, Route
+
+
+class QuotaError(Exception):
+    def __init__(self):
+        super().__init__("Error code: 429 - You exceeded your current quota (insufficient_quota)")
+        self.status_code = 429
+
+
+def make_router(ollama_context=32000):
+    return ProviderRouter([Route("openai", None, 4), Route("ollama", "llama3", 1, ollama_context)])
+
+
+def test_choose_fastest_fitting_route():
+    """The route with the lowest expected time wins; queue depth and context window count"""
+    print("Testing route choice...")
+    router = make_router()
+    assert router.choose(1000, "gpt-4o").name == "openai"
+    openai, ollama = router.routes
+    openai.seconds_per_ktoken = 20.0
+    assert router.choose(1000, "gpt-4o").name == "ollama"
+    assert router.choose(50000, "gpt-4o").name == "openai"  # too large for the Ollama context
+    ollama.in_flight = 3  # three calls queued on the single Ollama slot
+    openai.seconds_per_ktoken = 30.0
+    assert router.choose(1000, "gpt-4o").name == "openai"
+    print("  Latency, queue depth and context window respected")
+
+
+def test_failed_call_is_rerouted():
+    """A failed call is retried once on the next route"""
+    print("Testing re-routing...")
+    router = make_router()
+    calls = []
+
+    async def call(route):
+        calls.append((route.name, route.model_for("gpt-4o")))
+        if route.name == "openai":
+            raise RuntimeError("connection reset")
+        return {"instrument_rules": []}
+
+    assert asyncio.run(router.run("Aktien: ja", "gpt-4o", call)) == {"instrument_rules": []}
+    assert calls == [("openai", "gpt-4o"), ("ollama", "llama3")], calls
+    stats = router.stats()["routes"]
+    assert stats["openai"]["errors"] == 1 and stats["ollama"]["calls"] == 1
+    assert stats["openai"]["in_flight"] == 0 and stats["ollama"]["in_flight"] == 0
+    print("  openai failed, ollama answered")
+
+
+def test_all_routes_fail():
+    """When every route fails the last error is raised"""
+    print("Testing all routes failing...")
+    router = make_router()
+
+    async def call(route):
+        raise RuntimeError(f"{route.name} down")
+
+    try:
+        asyncio.run(router.run("Aktien: ja", "gpt-4o", call))
+    except RuntimeError as e:
+        assert str(e) == "ollama down", e
+    else:
+        raise AssertionError("error was swallowed")
+    print("  Last error raised")
+
+
+def test_quota_exhaustion_cools_route_down():
+    """After insufficient_quota the route is skipped while an alternative exists"""
+    print("Testing quota cool-down...")
+    router = make_router()
+
+    async def call(route):
+        if route.name == "openai":
+            raise QuotaError()
+        return {"route": route.name}
+
+    async def run():
+        return [await router.run("Aktien: ja", "gpt-4o", call) for _ in range(3)]
+
+    assert asyncio.run(run()) == [{"route": "ollama"}] * 3
+    stats = router.stats()["routes"]
+    assert stats["openai"]["calls"] == 1 and stats["openai"]["cooldown_seconds"] > 0, stats
+    print("  OpenAI skipped after quota exhaustion")
+
+
+def main():
+    test_choose_fastest_fitting_route()
+    test_failed_call_is_rerouted()
+    test_all_routes_fail()
+    test_quota_exhaustion_cools_route_down()
+    print("\nAll provider router tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared LLM rate limiter
+Checks the concurrency cap, which errors are retried and the adaptive concurrency limit
+"""
+
+import sys
+import os
+import asyncio
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.rate_limiter import RateLimiter, RATE_LIMIT_MAX_TIMEOUT_RETRIES
+
+
+class APIStatusError(Exception):
+    def __init__(self, status_code, message="error"):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ReadTimeout(Exception):
+    pass
+
+
+def make_limiter(**kwargs):
+    limiter = RateLimiter(default_rpm=10000, default_tpm=10_000_000, **kwargs)
+    limiter._backoff = lambda attempt, retry_after: 0.0  # no real backoff sleeps in tests
+    return limiter
+
+
+def test_concurrency_cap():
+    """No more calls than max_concurrency run at the same time"""
+    print("Testing concurrency cap...")
+    limiter = make_limiter(max_concurrency=2)
+    running = {"now": 0, "max": 0}
+
+    async def call():
+        running["now"] += 1
+        running["max"] = max(running["max"], running["now"])
+        await asyncio.sleep(0.02)
+        running["now"] -= 1
+        return "ok"
+
+    async def run():
+        return await asyncio.gather(*(limiter.call("gpt-test", 100, call) for _ in range(6)))
+
+    results = asyncio.run(run())
+    assert results == ["ok"] * 6, results
+    assert running["max"] == 2, running
+    print(f"  At most {running['max']} calls in flight")
+
+
+def test_retries_rate_limit_errors():
+    """429 answers are retried until the call succeeds"""
+    print("Testing retry of 429 errors...")
+    limiter = make_limiter()
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise APIStatusError(429, "Rate limit reached")
+        return "ok"
+
+    assert asyncio.run(limiter.call("gpt-test", 100, call)) == "ok"
+    assert len(attempts) == 3, attempts
+    assert limiter.stats()["models"]["gpt-test"]["retries"] == 2
+    print(f"  Succeeded after {len(attempts)} attempts")
+
+
+def test_no_retry_for_permanent_errors():
+    """404 and an exhausted quota fail on the first attempt"""
+    print("Testing permanent errors...")
+    for error in (APIStatusError(404, "model not found"), APIStatusError(429, "insufficient_quota")):
+        limiter = make_limiter()
+        attempts = []
+
+        async def call():
+            attempts.append(1)
+            raise error
+
+        try:
+            asyncio.run(limiter.call("gpt-test", 100, call))
+        except APIStatusError:
+            pass
+        else:
+            raise AssertionError(f"{error} was swallowed")
+        assert len(attempts) == 1, (error, attempts)
+    print("  Raised without retry")
+
+
+def test_timeout_retries_are_capped():
+    """A timed-out call is retried at most RATE_LIMIT_MAX_TIMEOUT_RETRIES times"""
+    print("Testing timeout retry cap...")
+    limiter = make_limiter(max_retries=10)
+    attempts = []
+
+    def call():
+        attempts.append(1)
+        raise ReadTimeout("read timed out")
+
+    try:
+        limiter.call_sync("gpt-test", 100, call)
+    except ReadTimeout:
+        pass
+    else:
+        raise AssertionError("timeout was swallowed")
+    assert len(attempts) == 1 + RATE_LIMIT_MAX_TIMEOUT_RETRIES, attempts
+    print(f"  {len(attempts)} attempts for a call that always times out")
+
+
+def test_throttling_halves_concurrency():
+    """A 429 halves the concurrency limit, successes raise it again slowly"""
+    print("Testing adaptive concurrency limit...")
+    limiter = make_limiter(max_concurrency=8)
+    limiter._release("gpt-test", success=False, throttled=True)
+    assert limiter.stats()["models"]["gpt-test"]["concurrency_limit"] == 4
+    for _ in range(5):
+        limiter._release("gpt-test", success=True, throttled=False)
+    assert limiter.stats()["models"]["gpt-test"]["concurrency_limit"] == 5
+    print("  8 -> 4 after a 429, back to 5 after 5 successes")
+
+
+def test_disabled_limiter_calls_directly():
+    """RATE_LIMIT_DISABLED: calls and errors pass straight through"""
+    print("Testing disabled limiter...")
+    limiter = make_limiter(enabled=False)
+    attempts = []
+
+    def call():
+        attempts.append(1)
+        raise APIStatusError(429)
+
+    try:
+        limiter.call_sync("gpt-test", 100, call)
+    except APIStatusError:
+        pass
+    assert len(attempts) == 1 and limiter.stats()["models"] == {}
+    print("  No retry, no limiter state")
+
+
+def main():
+    test_concurrency_cap()
+    test_retries_rate_limit_errors()
+    test_no_retry_for_permanent_errors()
+    test_timeout_retries_are_capped()
+    test_throttling_halves_concurrency()
+    test_disabled_limiter_calls_directly()
+    print("\nAll rate limiter tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test script for the section planner
+Checks the per-call token budget and that packs keep every section once, in order
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.section_planner import (
+    boundary_sentences, completion_reserve, context_window, estimate_tokens, pack_budget, plan_sections,
+    SECTION_PLAN_TOKENS_PER_OUTPUT_TOKEN
+)
+
+PROMPT_TOKENS = 6000
+SENTENCE = "Der Fonds darf bis zu 10 % in Aktien anlegen. "
+
+
+def make_sections(count, chars, model=None):
+    """Adjacent sections of about `chars` characters each"""
+    sections = []
+    text = ""
+    for section_id in range(1, count + 1):
+        body = SENTENCE * (chars // len(SENTENCE))
+        section = {"section_id": section_id, "title": f"Abschnitt {section_id}", "text": body,
+                   "start_char": len(text), "end_char": len(text) + len(body)}
+        if model:
+            section["model"] = model
+        sections.append(section)
+        text += body
+    return sections, text
+
+
+def test_pack_budget():
+    """The budget is capped by what one completion can answer"""
+    print("Testing pack budget...")
+    assert context_window("gpt-4o-mini") == 128000 and context_window("gpt-5.2") == 400000
+    budget = pack_budget("gpt-4o", PROMPT_TOKENS)
+    if SECTION_PLAN_TOKENS_PER_OUTPUT_TOKEN > 0:
+        assert budget <= completion_reserve("gpt-4o") * SECTION_PLAN_TOKENS_PER_OUTPUT_TOKEN, budget
+    assert pack_budget("gpt-4", PROMPT_TOKENS) < budget
+    assert pack_budget("gpt-4", 10000) == 0  # prompt alone exceeds the 8k window
+    print(f"  gpt-4o: {budget} document tokens per call")
+
+
+def test_packs_fit_budget_and_keep_order():
+    """Every section lands in exactly one pack, in document order, within the budget"""
+    print("Testing packing...")
+    sections, text = make_sections(12, 8000)
+    budget = pack_budget("gpt-4o", PROMPT_TOKENS)
+    packs = plan_sections(sections, text, "gpt-4o", PROMPT_TOKENS)
+    assert 1 < len(packs) < len(sections), len(packs)
+    packed_ids = [section_id for pack in packs for section_id in pack["section_ids"]]
+    assert packed_ids == list(range(1, 13)), packed_ids
+    for pack in packs:
+        assert estimate_tokens(pack["text"]) <= budget + 1, (pack["section_ids"], estimate_tokens(pack["text"]))
+        if len(pack["section_ids"]) > 1:
+            assert "timeout" in pack
+    assert packs[1]["text"].startswith(boundary_sentences(text, packs[1]["start_char"]))
+    print(f"  12 sections -> {len(packs)} calls")
+
+
+def test_models_are_not_mixed():
+    """Sections routed to different models are never packed together"""
+    print("Testing model boundaries...")
+    first, text = make_sections(2, 2000, model="gpt-4o")
+    second, _ = make_sections(2, 2000, model="gpt-4o-mini")
+    for section in second:
+        section["section_id"] += 2
+        section["start_char"] += len(text)
+        section["end_char"] += len(text)
+    packs = plan_sections(first + second, text * 2, "gpt-4o", PROMPT_TOKENS)
+    assert [pack["section_ids"] for pack in packs] == [[1, 2], [3, 4]], packs
+    assert [pack["model"] for pack in packs] == ["gpt-4o", "gpt-4o-mini"]
+    print("  One pack per model")
+
+
+def test_single_section_unchanged():
+    """A single section is passed through as is"""
+    print("Testing single section...")
+    sections, text = make_sections(1, 2000)
+    assert plan_sections(sections, text, "gpt-4o", PROMPT_TOKENS) == sections
+    print("  Unchanged")
+
+
+def main():
+    test_pack_budget()
+    test_packs_fit_budget_and_keep_order()
+    test_models_are_not_mixed()
+    test_single_section_unchanged()
+    print("\nAll section planner tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test script for the section pre-screen
+Checks that rule sections are kept, boilerplate is skipped and audited, and the keep/downgrade options
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.section_prescreen import prescreen_sections, score_section, term_pattern_for
+
+TERMS = ["aktien", "anleihen", "derivate", "zertifikate", "rohstoffe"]
+
+RULES = {
+    "section_id": 1,
+    "title": "Zulässige Vermögensgegenstände",
+    "text": "Aktien sind erlaubt.\nAnleihen sind zugelassen.\nDerivate sind verboten.\nRohstoffe sind ausgeschlossen.\n"
+}
+COSTS = {
+    "section_id": 2,
+    "title": "Kosten und Gebühren",
+    "text": "Die Verwaltungsvergütung beträgt 1,5 % p.a. Die Verwahrstelle erhält 0,05 % p.a. zuzüglich Umsatzsteuer.\n"
+}
+RISKS = {
+    "section_id": 3,
+    "title": "Risikohinweise",
+    "text": "Der Wert der Anteile kann schwanken. Vergangene Wertentwicklung ist kein Indikator für die Zukunft.\n"
+}
+
+
+def test_rule_section_scores_high():
+    """A section with mapped terms next to allow/prohibit wording outscores boilerplate"""
+    print("Testing section scores...")
+    pattern = term_pattern_for(TERMS)
+    rules, costs = score_section(RULES, pattern), score_section(COSTS, pattern)
+    assert rules["rule_lines"] == 4 and rules["terms"] == 4, rules
+    assert rules["score"] > costs["score"], (rules, costs)
+    print(f"  rules={rules['score']} costs={costs['score']}")
+
+
+def test_irrelevant_sections_are_skipped():
+    """Low-scoring sections are skipped and listed in the audit; order of kept sections is unchanged"""
+    print("Testing skipping...")
+    kept, audit = prescreen_sections([COSTS, RULES, RISKS], TERMS, min_score=5, min_keep=1)
+    assert [section["section_id"] for section in kept] == [1], kept
+    assert [entry["section_id"] for entry in audit["skipped_sections"]] == [2, 3], audit
+    assert audit["skipped_chars"] == len(COSTS["text"]) + len(RISKS["text"])
+    print(f"  Kept {audit['kept_sections']}/{audit['total_sections']} sections")
+
+
+def test_min_keep_and_downgrade():
+    """The best sections are always kept; weak kept sections go to the downgrade model"""
+    print("Testing min_keep and downgrade...")
+    kept, audit = prescreen_sections([COSTS, RISKS], TERMS, min_score=5, min_keep=1)
+    assert len(kept) == 1 and audit["skipped_sections"], audit
+    kept, audit = prescreen_sections([RULES, COSTS], TERMS, min_score=0, min_keep=0,
+                                     downgrade_score=5, downgrade_model="gpt-4o-mini")
+    assert [section.get("model") for section in kept] == [None, "gpt-4o-mini"], kept
+    assert audit["downgraded_sections"] == [2] and "model" not in COSTS
+    print("  Best section kept, weak section downgraded")
+
+
+def test_no_terms_keeps_everything():
+    """Without mapping terms nothing is skipped"""
+    print("Testing without mapping terms...")
+    kept, audit = prescreen_sections([COSTS, RULES, RISKS], [])
+    assert len(kept) == 3 and not audit["enabled"], audit
+    print("  All sections kept")
+
+
+def main():
+    test_rule_section_scores_high()
+    test_irrelevant_sections_are_skipped()
+    test_min_keep_and_downgrade()
+    test_no_terms_keeps_everything()
+    print("\nAll section pre-screen tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Test script for the section splitter
+Checks that find_section_boundaries gives the same boundaries as the previous line-by-line
+implementation (kept in benchmarks/section_splitter.py) and that sections cover the document
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.analysis_service import AnalysisService, find_section_boundaries
+from benchmarks.section_splitter import legacy_boundaries, synthetic_text
+
+EDGE_CASES = [
+    "",
+    "nur ein satz ohne überschrift.",
+    "Zulässige Anlagen\n" + "x" * 5000,
+    ("a" * 1500 + "\n") * 3 + "Zulässige Anlagen\n" + "b" * 3000,
+    ("text " * 300 + "\r\n") * 5 + "VERBOTENE ANLAGEN\r\n" + "c" * 2000,
+    ("z" * 999 + "\n1. Anlagegrundsätze und Anlagegrenzen\n") * 4,
+    "\n\n\n" + ("  Erlaubte Instrumente:\n" + "d" * 1200 + "\n") * 6,
+]
+
+
+def test_synthetic_documents_match_legacy():
+    """Randomized prospectus-like texts give exactly the previous boundaries"""
+    print("Testing synthetic documents...")
+    for seed in range(8):
+        text = synthetic_text(200_000, seed=seed)
+        expected = legacy_boundaries(text)
+        assert find_section_boundaries(text) == expected, f"seed {seed} differs"
+    print("  8 documents, identical boundaries")
+
+
+def test_edge_cases_match_legacy():
+    """Empty text, no headers, CRLF, headers at the minimum distance"""
+    print("Testing edge cases...")
+    for index, text in enumerate(EDGE_CASES):
+        assert find_section_boundaries(text) == legacy_boundaries(text), f"edge case {index} differs"
+    print(f"  {len(EDGE_CASES)} edge cases, identical boundaries")
+
+
+def test_sections_cover_document():
+    """Without overlap the sections are adjacent and cover the whole text"""
+    print("Testing section coverage...")
+    text = synthetic_text(300_000, seed=42)
+    splitter = AnalysisService.__new__(AnalysisService)
+    sections = splitter._split_document_into_sections(text, overlap=0)
+    assert len(sections) > 1
+    assert sections[0]["start_char"] == 0 and sections[-1]["end_char"] == len(text)
+    for previous, section in zip(sections, sections[1:]):
+        assert section["start_char"] == previous["end_char"], (previous["section_id"], section["section_id"])
+    print(f"  {len(sections)} adjacent sections")
+
+
+def main():
+    test_synthetic_documents_match_legacy()
+    test_edge_cases_match_legacy()
+    test_sections_cover_document()
+    print("\nAll section splitter tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test script for the incremental (streaming) rule parser
+Checks that rules are emitted as soon as they close, whatever the chunking, and de-duplication
+"""
+
+import sys
+import os
+import json
+import asyncio
+import random
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.stream_rule_parser import IncrementalRuleParser, dedupe_rules, salvage_rules
+
+RESPONSE = "```json\n" + json.dumps({
+    "sector_rules": [{"sector": "Tabak", "allowed": False, "reason": "Tabak {ausgeschlossen}"}],
+    "country_rules": [{"country": "Russland", "allowed": False, "reason": "Sanktionen [EU]"}],
+    "instrument_rules": [
+        {"instrument": "Aktien", "allowed": True, "reason": "Liste \"A\", B"},
+        {"instrument": "Derivate", "allowed": False, "reason": "nur {Absicherung}", "details": {"limit": [10, 20]}}
+    ],
+    "conflicts": [{"category": "instrument", "detail": "{not a rule}"}]
+}, ensure_ascii=False) + "\n```"
+
+
+def parse_in_chunks(text, sizes):
+    parser = IncrementalRuleParser()
+    emitted = []
+    position = 0
+    for size in sizes:
+        emitted.extend(parser.feed(text[position:position + size]))
+        position += size
+    emitted.extend(parser.feed(text[position:]))
+    return parser, emitted
+
+
+def test_any_chunking_gives_same_rules():
+    """One character at a time, random chunks or all at once - the same rules in the same order"""
+    print("Testing chunking...")
+    _, expected = parse_in_chunks(RESPONSE, [len(RESPONSE)])
+    assert [rule_type for rule_type, _ in expected] == ["sector_rules", "country_rules", "instrument_rules", "instrument_rules"]
+    assert expected[2][1]["reason"] == 'Liste "A", B' and expected[3][1]["details"] == {"limit": [10, 20]}
+    _, single = parse_in_chunks(RESPONSE, [1] * len(RESPONSE))
+    assert single == expected
+    rng = random.Random(7)
+    for _ in range(20):
+        _, chunked = parse_in_chunks(RESPONSE, [rng.randint(1, 40) for _ in range(len(RESPONSE) // 5)])
+        assert chunked == expected
+    print(f"  {len(expected)} rules, conflicts ignored")
+
+
+def test_rule_emitted_when_it_closes():
+    """A rule is emitted by the chunk that closes it, before the response ends"""
+    print("Testing early emission...")
+    parser = IncrementalRuleParser()
+    assert parser.feed('{"instrument_rules": [{"instrument": "Aktien", "allowed": tr') == []
+    emitted = parser.feed('ue}, {"instrument": "Bon')
+    assert emitted == [("instrument_rules", {"instrument": "Aktien", "allowed": True})], emitted
+    assert len(parser.text) < 30  # only the open rule is buffered
+    print("  Emitted mid-stream")
+
+
+def test_salvage_truncated_response():
+    """A truncated response still yields every complete rule"""
+    print("Testing salvage...")
+    result = salvage_rules(RESPONSE[:RESPONSE.index('"Derivate"')])
+    assert [rule["instrument"] for rule in result["instrument_rules"]] == ["Aktien"], result
+    assert len(result["sector_rules"]) == 1 and len(result["country_rules"]) == 1
+    assert salvage_rules('{"instrument_rules": [{"instrument": "Akt') is None
+    print("  Complete rules recovered")
+
+
+def test_dedupe_rules():
+    """A rule streamed again (retry, section overlap) reaches the listener once"""
+    print("Testing de-duplication...")
+    received = []
+    listener = dedupe_rules(lambda rule_type, rule: received.append((rule_type, rule["instrument"])))
+
+    async def run():
+        await listener("instrument_rules", {"instrument": "Aktien", "allowed": True})
+        await listener("instrument_rules", {"instrument": " aktien ", "allowed": True, "reason": "again"})
+        await listener("instrument_rules", {"instrument": "Aktien", "allowed": False})
+
+    asyncio.run(run())
+    assert received == [("instrument_rules", "Aktien"), ("instrument_rules", "Aktien")], received
+    print("  Duplicate dropped, changed decision passed on")
+
+
+def main():
+    test_any_chunking_gives_same_rules()
+    test_rule_emitted_when_it_closes()
+    test_salvage_truncated_response()
+    test_dedupe_rules()
+    print("\nAll stream rule parser tests passed")
+
+
+if __name__ == "__main__":
+    main()